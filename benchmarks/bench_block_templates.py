@@ -0,0 +1,156 @@
+"""
+Block Kit response benchmark.
+
+Compares the per-response CPU time and memory allocations of building Block Kit
+objects on every request, as the handlers used to, with the pre-serialized templates.
+Both paths include the dictionary conversion and the JSON encoding done before the
+blocks are sent to Slack.
+
+Usage:
+    python -m benchmarks.bench_block_templates --iterations 100000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+from slack_bolt.util.utils import convert_to_dict_list
+from slack_sdk.models.blocks import (
+    ActionsBlock,
+    Block,
+    ButtonElement,
+    MarkdownTextObject,
+    PlainTextObject,
+    SectionBlock,
+    TextObject,
+)
+
+from src.slack_bot.services.slack_block_templates import SlackBlockTemplates
+
+Blocks = Sequence[Union[Dict[str, Any], Block]]
+
+
+def builder_wake_up(user: str) -> Blocks:
+    """Build the wake up response with Block Kit objects."""
+    return [
+        SectionBlock(block_id="response", text=f"Hi <@{user}>! How are you feeling!"),
+        ActionsBlock(
+            block_id="how_are_you",
+            elements=[
+                ButtonElement(
+                    action_id="good",
+                    text=TextObject(type=PlainTextObject.type, text="Good", emoji=True),
+                    value="good",
+                    style="primary",
+                ),
+                ButtonElement(
+                    action_id="bad",
+                    text=TextObject(type=PlainTextObject.type, text="Bad", emoji=True),
+                    value="bad",
+                    style="danger",
+                ),
+            ],
+        ),
+    ]
+
+
+def builder_good_quote(quote: str, person: str) -> Blocks:
+    """Build the good interaction response with Block Kit objects."""
+    return [
+        SectionBlock(
+            block_id="response_1",
+            text=MarkdownTextObject(
+                text="*Amazing!* Let's see if this quote will enhance your day a bit more."
+            ),
+        ),
+        SectionBlock(
+            block_id="response_2",
+            text=MarkdownTextObject(text=f'*"{quote}"* by {person}'),
+        ),
+    ]
+
+
+def builder_sleeping() -> Blocks:
+    """Build the sleeping response with Block Kit objects."""
+    return [
+        SectionBlock(block_id="response", text=MarkdownTextObject(text="*Sleeeeeping* :sleeping:"))
+    ]
+
+
+def send(blocks: Blocks) -> str:
+    """Convert and encode the blocks the way they are prepared for the Slack API."""
+    return json.dumps({"blocks": convert_to_dict_list(blocks)})
+
+
+CASES: Dict[str, Dict[str, Callable[[], Blocks]]] = {
+    "wake_up": {
+        "builder": lambda: builder_wake_up("U12345"),
+        "template": lambda: SlackBlockTemplates.wake_up("U12345"),
+    },
+    "good_quote": {
+        "builder": lambda: builder_good_quote("Stay hungry, stay foolish.", "Steve Jobs"),
+        "template": lambda: SlackBlockTemplates.good_quote(
+            "Stay hungry, stay foolish.", "Steve Jobs"
+        ),
+    },
+    "sleeping": {
+        "builder": builder_sleeping,
+        "template": SlackBlockTemplates.sleeping,
+    },
+}
+
+
+def cpu_time_per_response(build: Callable[[], Blocks], iterations: int) -> float:
+    """Return the CPU time of one response in microseconds."""
+    started = time.process_time()
+    for _ in range(iterations):
+        send(build())
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+def allocations_per_response(build: Callable[[], Blocks], iterations: int) -> Dict[str, float]:
+    """Return the memory blocks and bytes allocated by one response."""
+    results: List[str] = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(iterations):
+        # Keep the intermediate objects alive so every allocation shows in the snapshot.
+        blocks = build()
+        results.append(send(blocks))
+        results.append(blocks)  # type: ignore
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    return {
+        "blocks": sum(stat.count_diff for stat in stats) / iterations,
+        "bytes": sum(stat.size_diff for stat in stats) / iterations,
+    }
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=100_000, help="Responses per case.")
+    parser.add_argument(
+        "--allocation-iterations", type=int, default=1_000, help="Responses traced per case."
+    )
+    args = parser.parse_args()
+
+    for case, builds in CASES.items():
+        for name, build in builds.items():
+            cpu_us = cpu_time_per_response(build, args.iterations)
+            allocations = allocations_per_response(build, args.allocation_iterations)
+            print(
+                f"{case:<11} {name:<9} cpu={cpu_us:8.2f}us "
+                f"allocations={allocations['blocks']:8.1f} bytes={allocations['bytes']:10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
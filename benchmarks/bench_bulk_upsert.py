@@ -0,0 +1,131 @@
+"""
+Bulk document upsert benchmark.
+
+Compares the write throughput of looping `add_document`, one FT.ADD round trip per
+document, and of looping a single HSET per document, with `upsert_documents` writing
+the same documents in concurrent pipelines. FT.ADD is a legacy command missing from
+recent RediSearch versions, the `add_document` case is reported as unsupported there.
+
+Usage:
+    python -m benchmarks.bench_bulk_upsert --sizes 1000 10000 100000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+
+from src.jobs.redis_job import REDIS_FIELDS
+from src.slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
+from src.slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO, Document
+
+from .common import add_redis_arguments, redis_endpoint
+
+
+def make_documents(prefix: str, size: int) -> List[Document]:
+    """Create `size` synthetic quotes."""
+    return [
+        (f"{prefix}{idx}", {"quote": f"Quote number {idx}", "person": f"P{idx}"})
+        for idx in range(size)
+    ]
+
+
+async def add_document_loop(dao: AsyncSearchRedisDAO, documents: List[Document]) -> bool:
+    """Write the documents one FT.ADD at a time, False if FT.ADD is not supported."""
+    for key, fields in documents:
+        if not await dao.add_document(key, dict(fields), replace=True):
+            return False
+    return True
+
+
+async def hset_loop(dao: AsyncSearchRedisDAO, documents: List[Document]) -> bool:
+    """Write the documents one HSET and SADD round trip at a time."""
+    for key, fields in documents:
+        await dao.client.hset(key, mapping=fields)  # type: ignore
+        await dao.client.sadd(dao.keyset_name, key)  # type: ignore
+    return True
+
+
+def bulk_upsert(
+    batch_size: int, concurrency: int
+) -> Callable[[AsyncSearchRedisDAO, List[Document]], Awaitable[bool]]:
+    """Write the documents with `upsert_documents`."""
+
+    async def upsert(dao: AsyncSearchRedisDAO, documents: List[Document]) -> bool:
+        result = await dao.upsert_documents(documents, batch_size, concurrency)
+        return not result.failed
+
+    return upsert
+
+
+async def measure(
+    write: Callable[[AsyncSearchRedisDAO, List[Document]], Awaitable[bool]],
+    dao: AsyncSearchRedisDAO,
+    documents: List[Document],
+) -> Optional[float]:
+    """Return the documents written per second, None if the write is not supported."""
+    started = time.perf_counter()
+    if not await write(dao, documents):
+        return None
+    return len(documents) / (time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, host: str, port: int) -> None:
+    """Run every write approach for every corpus size."""
+    dao = AsyncRedisDAOFactory.create_redis_dao(
+        host=host,
+        port=port,
+        db=0,
+        password=args.redis_password,
+        max_connections=max(args.concurrency, 1),
+        search_index_name="bench_upsert",
+    )
+    cases = {
+        "add_document": add_document_loop,
+        "hset_loop": hset_loop,
+        "upsert": bulk_upsert(args.batch_size, args.concurrency),
+    }
+    for size in args.sizes:
+        report: Dict[str, Optional[float]] = {}
+        for name, write in cases.items():
+            prefix = f"bench_upsert_{name}:"
+            await dao.index_create(
+                REDIS_FIELDS, definition=IndexDefinition(prefix=[prefix], index_type=IndexType.HASH)
+            )
+            report[name] = await measure(write, dao, make_documents(prefix, size))
+            await dao.index_drop(delete_documents=True)
+            await dao.client.delete(dao.keyset_name)
+
+        baseline = report["hset_loop"]
+        for name, rate in report.items():
+            if rate is None:
+                print(f"size={size:>9} {name:<12} unsupported by this server")
+                continue
+            speedup = f" ({rate / baseline:.1f}x hset_loop)" if baseline else ""
+            print(f"size={size:>9} {name:<12} {rate:>10.0f} docs/s{speedup}")
+
+    await AsyncRedisDAOFactory.reset_connection_pool()
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_redis_arguments(parser)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Documents."
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per pipeline.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Pipelines in flight.")
+    args = parser.parse_args()
+
+    with redis_endpoint(args.redis_host, args.redis_port) as (host, port):
+        asyncio.run(run(args, host, port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+DAO lookup benchmark.
+
+Compares the per-request CPU time and memory allocations of constructing a DAO, with its
+Redis client and Search client, on every request, as `SlackService.get_quote` used to,
+with handing out the long-lived DAO cached by the factory. No Redis server is needed,
+the pool does not connect until a command is sent.
+
+Usage:
+    python -m benchmarks.bench_dao_lookup --iterations 100000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from src.slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
+from src.slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
+
+SEARCH_INDEX = "quotes"
+
+CASES: Dict[str, Callable[[], AsyncSearchRedisDAO]] = {
+    "per_request": lambda: AsyncRedisDAOFactory.create_redis_dao_with_existing_pool(SEARCH_INDEX),
+    "cached": lambda: AsyncRedisDAOFactory.get_redis_dao_with_existing_pool(SEARCH_INDEX),
+}
+
+
+def cpu_time_per_lookup(lookup: Callable[[], AsyncSearchRedisDAO], iterations: int) -> float:
+    """Return the CPU time of one lookup in microseconds."""
+    started = time.process_time()
+    for _ in range(iterations):
+        lookup()
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+def allocations_per_lookup(
+    lookup: Callable[[], AsyncSearchRedisDAO], iterations: int
+) -> Dict[str, float]:
+    """Return the memory blocks and bytes allocated by one lookup."""
+    daos: List[AsyncSearchRedisDAO] = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(iterations):
+        # Keep the DAOs alive so every allocation shows in the snapshot.
+        daos.append(lookup())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    return {
+        "blocks": sum(stat.count_diff for stat in stats) / iterations,
+        "bytes": sum(stat.size_diff for stat in stats) / iterations,
+    }
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=100_000, help="Lookups per case.")
+    parser.add_argument(
+        "--allocation-iterations", type=int, default=1_000, help="Lookups traced per case."
+    )
+    args = parser.parse_args()
+
+    AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    for name, lookup in CASES.items():
+        cpu_us = cpu_time_per_lookup(lookup, args.iterations)
+        allocations = allocations_per_lookup(lookup, args.allocation_iterations)
+        print(
+            f"{name:<12} cpu={cpu_us:8.2f}us "
+            f"allocations={allocations['blocks']:8.1f} bytes={allocations['bytes']:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+ETL benchmark.
+
+Runs the IndexerJob load modes against synthetic corpora and reports the throughput,
+latency and peak memory of every stage, and the growth of the Redis memory. Every run
+is made in a fresh process so the peak memory of one run does not hide the next one.
+The results are saved as JSON and compared with a baseline results file when one is
+given, so regressions between versions can be diffed.
+
+Usage:
+    python -m benchmarks.bench_etl --sizes 10000 100000 1000000 --output etl.json
+    python -m benchmarks.bench_etl --baseline etl.json --output etl-new.json
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+
+from src.jobs.redis_job import REDIS_FIELDS, IndexerJob, peak_rss_mib
+from src.slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
+
+from .common import add_redis_arguments, redis_endpoint, summarize_latencies
+from .generate_corpus import generate_corpus
+
+BENCH_INDEX = "bench_etl"
+
+MIB = 1024 * 1024
+
+
+def stage_report(rows: int, seconds: float) -> Dict[str, float]:
+    """Report the duration, throughput and peak memory of a stage that just ended.
+
+    The peak RSS is the one of the benchmark process, the parse workers of the parallel
+    mode are reported apart as the peak of the largest child process.
+    """
+    return {
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+        "peak_rss_mib": peak_rss_mib(),
+        "peak_children_rss_mib": peak_rss_mib(children=True),
+    }
+
+
+async def used_memory_mib(client: Any) -> float:
+    """Read the memory used by Redis in MiB."""
+    return (await client.info("memory"))["used_memory"] / MIB
+
+
+async def run_job(job: IndexerJob) -> Dict[str, Any]:
+    """
+    Run the stages of an IndexerJob load and measure them.
+
+    The parse stage reads the files without writing them and shows the single process
+    parsing cost, the load stage runs the configured load mode and the index stage waits
+    for RediSearch to index the loaded documents.
+
+    Args:
+        job (IndexerJob): The job, configured through the environment.
+
+    Returns:
+        Dict[str, Any]: The stage reports and the Redis memory growth.
+    """
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    started = time.perf_counter()
+    rows = sum(1 for _ in job.read_rows())
+    stages["parse"] = stage_report(rows, time.perf_counter() - started)
+
+    dao = job.create_redis_dao(BENCH_INDEX)
+    memory_before = await used_memory_mib(dao.client)
+    await dao.index_create(
+        REDIS_FIELDS, definition=IndexDefinition(prefix=[job.prefix], index_type=IndexType.HASH)
+    )
+
+    # Time every batch written by the streaming and parallel modes.
+    batch_latencies: List[float] = []
+    write_documents = dao.write_documents
+
+    async def timed_write_documents(*args: Any) -> Dict[str, str]:
+        batch_started = time.perf_counter()
+        try:
+            return await write_documents(*args)
+        finally:
+            batch_latencies.append(time.perf_counter() - batch_started)
+
+    dao.write_documents = timed_write_documents  # type: ignore
+
+    started = time.perf_counter()
+    await job.redis_pipeline(dao)
+    stages["load"] = stage_report(rows, time.perf_counter() - started)
+    if batch_latencies:
+        stages["load"]["batch_latency"] = summarize_latencies(batch_latencies)
+    memory_loaded = await used_memory_mib(dao.client)
+
+    started = time.perf_counter()
+    await dao.wait_for_indexing(poll_interval=0.1, timeout=job.etl_settings.index_build_timeout)
+    stages["index"] = stage_report(rows, time.perf_counter() - started)
+    memory_indexed = await used_memory_mib(dao.client)
+
+    await job.cleanup_generation(dao, [job.prefix], dao.keyset_name)
+    await AsyncRedisDAOFactory.reset_connection_pool()
+
+    return {
+        "rows": rows,
+        "stages": stages,
+        "total_seconds": sum(stage["seconds"] for stage in stages.values()),
+        "redis_memory": {
+            "before_mib": memory_before,
+            "load_growth_mib": memory_loaded - memory_before,
+            "index_growth_mib": memory_indexed - memory_loaded,
+        },
+    }
+
+
+def run_case(args: argparse.Namespace, data_dir: str, size: int, mode: str) -> Dict[str, Any]:
+    """
+    Run one load of a corpus in a fresh process.
+
+    Args:
+        args (argparse.Namespace): The benchmark arguments.
+        data_dir (str): The directory of the corpus.
+        size (int): The number of rows of the corpus.
+        mode (str): The load mode.
+
+    Returns:
+        Dict[str, Any]: The measurements of the run.
+    """
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "REDIS_HOST": args.host,
+        "REDIS_PORT": str(args.port),
+        "REDIS_PASSWORD": args.redis_password,
+        "LOAD_MODE": mode,
+        "LOAD_BATCH_SIZE": str(args.batch_size),
+        "LOAD_CONCURRENCY": str(args.concurrency),
+    }
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_etl", "--case-output", output.name],
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        result = json.load(output)
+    return {"size": size, "load_mode": mode, **result}
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    """Print the change of the stage throughputs against a baseline results file."""
+    previous = {(run["size"], run["load_mode"]): run for run in baseline["runs"]}
+    for run in results:
+        base = previous.get((run["size"], run["load_mode"]))
+        if base is None:
+            continue
+        for name, stage in run["stages"].items():
+            base_rate = base["stages"].get(name, {}).get("rows_per_sec")
+            if base_rate:
+                change = (stage["rows_per_sec"] / base_rate - 1) * 100
+                print(
+                    f"size={run['size']:>9} {run['load_mode']:<11} {name:<6} "
+                    f"{stage['rows_per_sec']:>12.0f} rows/s ({change:+.1f}% vs baseline)"
+                )
+
+
+def git_revision() -> Optional[str]:
+    """Get the git commit of the benchmarked code, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Generate the corpora and run every load mode on them."""
+    runs: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            data_dir = os.path.join(workdir, str(size))
+            generate_corpus(data_dir, size, files=args.files)
+            for mode in args.modes:
+                result = run_case(args, data_dir, size, mode)
+                runs.append(result)
+                stages = " ".join(
+                    f"{name}={stage['rows_per_sec']:.0f}rows/s"
+                    for name, stage in result["stages"].items()
+                )
+                print(
+                    f"size={size:>9} {mode:<11} {stages} "
+                    f"peak_rss={result['stages']['index']['peak_rss_mib']:.1f}MiB "
+                    f"children={result['stages']['index']['peak_children_rss_mib']:.1f}MiB "
+                    f"redis=+{result['redis_memory']['load_growth_mib']:.1f}MiB"
+                )
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "files": args.files,
+            "load_batch_size": args.batch_size,
+            "load_concurrency": args.concurrency,
+        },
+        "runs": runs,
+    }
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_redis_arguments(parser)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Corpus rows."
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["transaction", "streaming", "parallel"],
+        choices=["transaction", "streaming", "parallel"],
+        help="Load modes to run.",
+    )
+    parser.add_argument("--files", type=int, default=4, help="CSV files per corpus.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="LOAD_BATCH_SIZE.")
+    parser.add_argument("--concurrency", type=int, default=4, help="LOAD_CONCURRENCY.")
+    parser.add_argument("--output", default="etl-benchmark.json", help="Results file.")
+    parser.add_argument("--baseline", default=None, help="Results file to compare with.")
+    parser.add_argument("--case-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case_output:
+        # A single run, started by run_case and configured through the environment.
+        result = asyncio.run(run_job(IndexerJob()))
+        with open(args.case_output, "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        return
+
+    with redis_endpoint(args.redis_host, args.redis_port) as (host, port):
+        args.host, args.port = host, port
+        results = run(args)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            compare(results["runs"], json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+JSON log formatter benchmark.
+
+Compares the records per second formatted by the JSON formatter, with its field plan
+and with the orjson serializer when orjson is installed, against the formatter it
+replaced, python-json-logger with the reserved attributes. The records are an app log
+line and a uvicorn access log line, formatted with the format of `logging.json`.
+
+Usage:
+    python -m benchmarks.bench_json_formatter --records 100000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import logging
+import time
+from typing import Callable, Dict
+
+from pythonjsonlogger import jsonlogger
+
+from src.slack_bot.utils.json_logger import JsonFormatter, load_serializer
+
+FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+
+class PreviousJsonFormatter(jsonlogger.JsonFormatter):
+    """The JSON formatter before the field plan."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the formatter, excluding the uvicorn color message."""
+        kwargs["reserved_attrs"] = ["color_message", *jsonlogger.RESERVED_ATTRS]
+        super().__init__(*args, **kwargs)
+
+
+def app_record() -> logging.LogRecord:
+    """Create the record of a quote lookup."""
+    return logging.LogRecord(
+        "app", logging.INFO, __file__, 1, "Found the quote %s", ("quote:42",), None
+    )
+
+
+def access_record() -> logging.LogRecord:
+    """Create the record of a uvicorn access log line."""
+    record = logging.LogRecord(
+        "uvicorn.access",
+        logging.INFO,
+        __file__,
+        1,
+        '%s - "%s %s HTTP/%s" %d',
+        ("10.0.0.1:50000", "POST", "/slack/events", "1.1", 200),
+        None,
+    )
+    record.color_message = record.msg
+    return record
+
+
+RECORDS: Dict[str, Callable[[], logging.LogRecord]] = {
+    "app": app_record,
+    "access": access_record,
+}
+
+
+def records_per_second(formatter: logging.Formatter, record: logging.LogRecord, count: int):
+    """Return the records formatted per second."""
+    started = time.perf_counter()
+    for _ in range(count):
+        formatter.format(record)
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=100_000, help="Records per case.")
+    args = parser.parse_args()
+
+    formatters: Dict[str, logging.Formatter] = {
+        "previous": PreviousJsonFormatter(FORMAT),
+        "planned": JsonFormatter(FORMAT),
+    }
+    if load_serializer("orjson", str) is not None:
+        formatters["orjson"] = JsonFormatter(FORMAT, serializer="orjson")
+
+    for case, make_record in RECORDS.items():
+        record = make_record()
+        baseline = records_per_second(formatters["previous"], record, args.records)
+        for name, formatter in formatters.items():
+            rate = records_per_second(formatter, record, args.records)
+            print(f"{case:<7} {name:<9} {rate:12,.0f} records/s {rate / baseline:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
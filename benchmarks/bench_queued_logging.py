@@ -0,0 +1,95 @@
+"""
+Queued logging benchmark.
+
+Measures how long a logging call holds the calling thread, the event loop in the
+application, when the handler writes to a deliberately slow sink: directly, as the
+handlers configured by `logging.json` do, and through the queued logging with each
+overflow policy. The records dropped by a full queue are reported.
+
+Usage:
+    python -m benchmarks.bench_queued_logging --records 2000 --sink-delay-ms 1
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import logging
+import time
+from typing import List, Optional
+
+from prometheus_client import REGISTRY
+
+from benchmarks.common import summarize_latencies
+from src.slack_bot.utils.json_logger import JsonFormatter
+from src.slack_bot.utils.queued_logging import OverflowPolicy, QueuedLogging
+
+
+class SlowSink:
+    """Stream whose writes take a fixed time, like a backed up stdout pipe."""
+
+    def __init__(self, delay: float):
+        """Initialize the sink with the time a write takes."""
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        """Write a line, taking the delay."""
+        time.sleep(self.delay)
+        self.lines += 1
+
+    def flush(self) -> None:
+        """Flush nothing, the writes are not buffered."""
+
+
+def dropped() -> float:
+    """Return the count of dropped log records."""
+    return REGISTRY.get_sample_value("slack_bot_log_records_dropped_total") or 0.0
+
+
+def run(overflow: Optional[OverflowPolicy], records: int, delay: float, queue_size: int) -> None:
+    """Log the records through a slow sink and print the latency of the logging calls."""
+    sink = SlowSink(delay)
+    handler = logging.StreamHandler(sink)  # type: ignore
+    handler.setFormatter(JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    bench_logger = logging.getLogger("bench_queued_logging")
+    bench_logger.handlers = [handler]
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    if overflow is not None:
+        QueuedLogging.start(queue_size=queue_size, overflow=overflow)
+
+    dropped_before = dropped()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for number in range(records):
+        call_started = time.perf_counter()
+        bench_logger.info("Found the quote %d", number)
+        latencies.append(time.perf_counter() - call_started)
+    logging_time = time.perf_counter() - started
+    QueuedLogging.stop()
+
+    summary = summarize_latencies(latencies)
+    print(
+        f"{overflow or 'direct':<12} p50={summary['p50_ms']:8.3f}ms "
+        f"p99={summary['p99_ms']:8.3f}ms total={logging_time:7.2f}s "
+        f"written={sink.lines:6d} dropped={dropped() - dropped_before:6.0f}"
+    )
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=2_000, help="Records per mode.")
+    parser.add_argument(
+        "--sink-delay-ms", type=float, default=1.0, help="Time the sink takes per write."
+    )
+    parser.add_argument("--queue-size", type=int, default=500, help="Queued records.")
+    args = parser.parse_args()
+
+    for overflow in (None, "drop_oldest", "block"):
+        run(overflow, args.records, args.sink_delay_ms / 1000, args.queue_size)  # type: ignore
+
+
+if __name__ == "__main__":
+    main()
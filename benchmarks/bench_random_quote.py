@@ -0,0 +1,118 @@
+"""
+Random quote selection benchmark.
+
+Compares the latency of the two FT.SEARCH calls used to pick a random quote
+(a count query followed by a fetch at a random offset) with the single round trip
+through the key set maintained by the indexer.
+
+Usage:
+    python -m benchmarks.bench_random_quote --sizes 1000 100000 1000000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from redis.commands.search.field import TextField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+from src.slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
+from src.slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
+
+from .common import add_redis_arguments, redis_endpoint, summarize_latencies
+
+LOAD_CHUNK_SIZE = 10_000
+
+
+async def load_documents(dao: AsyncSearchRedisDAO, prefix: str, size: int) -> None:
+    """Load `size` synthetic quotes and their key set."""
+    await dao.index_create(
+        [TextField("quote"), TextField("person")],
+        definition=IndexDefinition(prefix=[prefix], index_type=IndexType.HASH),
+    )
+    for start in range(0, size, LOAD_CHUNK_SIZE):
+        async with dao.client.pipeline(transaction=False) as pipe:
+            for idx in range(start, min(start + LOAD_CHUNK_SIZE, size)):
+                key = f"{prefix}{idx}"
+                pipe.hset(key, mapping={"quote": f"Quote number {idx}", "person": f"P{idx}"})
+                pipe.sadd(dao.keyset_name, key)
+            await pipe.execute()
+    await dao.wait_for_indexing(poll_interval=0.1)
+
+
+async def two_query_selection(dao: AsyncSearchRedisDAO) -> None:
+    """Pick a random quote with a count query and a projected fetch at a random offset."""
+    results = await dao.index_search(Query("*").verbatim().no_content().paging(0, 0))
+    offset = random.randint(0, results["total_results"] - 1)
+    await dao.search_quotes(Query("*").verbatim().paging(offset, 1))
+
+
+async def keyset_selection(dao: AsyncSearchRedisDAO) -> None:
+    """Pick a random quote through the key set in a single round trip."""
+    await dao.random_document()
+
+
+async def measure(selection, dao: AsyncSearchRedisDAO, iterations: int) -> List[float]:
+    """Run the selection `iterations` times and return the latencies in seconds."""
+    samples: List[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await selection(dao)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(args: argparse.Namespace, host: str, port: int) -> None:
+    """Run the benchmark for every corpus size."""
+    for size in args.sizes:
+        dao = AsyncRedisDAOFactory.create_redis_dao(
+            host=host,
+            port=port,
+            db=0,
+            password=args.redis_password,
+            max_connections=10,
+            search_index_name=f"bench_random_{size}",
+        )
+        prefix = f"bench_random_{size}:"
+        await load_documents(dao, prefix, size)
+
+        report: Dict[str, Dict[str, float]] = {}
+        for name, selection in (("two_query", two_query_selection), ("keyset", keyset_selection)):
+            # Warm up the connections and the script cache before measuring.
+            await measure(selection, dao, 10)
+            report[name] = summarize_latencies(await measure(selection, dao, args.iterations))
+
+        for name, stats in report.items():
+            print(
+                f"size={size:>9} {name:<10} p50={stats['p50_ms']:.3f}ms "
+                f"p99={stats['p99_ms']:.3f}ms mean={stats['mean_ms']:.3f}ms"
+            )
+
+        await dao.index_drop(delete_documents=True)
+        await dao.client.delete(dao.keyset_name)
+
+    await AsyncRedisDAOFactory.reset_connection_pool()
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_redis_arguments(parser)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000], help="Corpus sizes."
+    )
+    parser.add_argument("--iterations", type=int, default=1_000, help="Selections per approach.")
+    args = parser.parse_args()
+
+    with redis_endpoint(args.redis_host, args.redis_port) as (host, port):
+        asyncio.run(run(args, host, port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Request logging benchmark.
+
+Compares the per-request CPU time of the request logging middleware with the eager
+json.dumps it used to run, for every logging setting, with the "app" logger at DEBUG
+and at INFO. The records go through the JSON formatter to a discarded stream, as in
+production, and the next middleware does nothing.
+
+Usage:
+    python -m benchmarks.bench_request_logging --iterations 20000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from src.slack_bot.services.slack_request_logger import RequestLogger
+from src.slack_bot.utils.json_logger import JsonFormatter
+
+# A block_actions payload the size of the "good" button clicks.
+BODY: Dict[str, Any] = {
+    "type": "block_actions",
+    "user": {"id": "U12345", "username": "user", "name": "user", "team_id": "T12345"},
+    "api_app_id": "A12345",
+    "token": "token",
+    "container": {"type": "message", "message_ts": "1700000000.000100", "channel_id": "C12345"},
+    "trigger_id": "1234567890.123456789.abcdef",
+    "team": {"id": "T12345", "domain": "workspace"},
+    "channel": {"id": "C12345", "name": "webinar"},
+    "message": {
+        "type": "message",
+        "user": "U67890",
+        "ts": "1700000000.000100",
+        "text": "Hi <@U12345>! How are you feeling!",
+        "blocks": [
+            {
+                "type": "actions",
+                "block_id": "how_are_you",
+                "elements": [
+                    {"type": "button", "action_id": action, "value": action}
+                    for action in ("good", "bad")
+                ],
+            }
+        ]
+        * 4,
+    },
+    "response_url": "https://hooks.slack.com/actions/T12345/1/abcdef",
+    "actions": [
+        {
+            "action_id": "good",
+            "block_id": "how_are_you",
+            "type": "button",
+            "value": "good",
+            "action_ts": "1700000001.000200",
+        }
+    ],
+}
+
+logger = logging.getLogger("app")
+
+Middleware = Callable[[Dict[str, Any], Callable[[], Awaitable[None]]], Awaitable[None]]
+
+
+async def eager(body: Dict[str, Any], next_: Callable[[], Awaitable[None]]):
+    """Log the request the way the middleware used to."""
+    logger.debug(json.dumps(body))
+    return await next_()
+
+
+async def next_middleware() -> None:
+    """Do nothing, as the next middleware."""
+
+
+async def next_middleware_only(body: Dict[str, Any], next_: Callable[[], Awaitable[None]]):
+    """Call the next middleware without logging, the baseline of the overhead."""
+    return await next_()
+
+
+SETTINGS: Dict[str, Middleware] = {
+    "eager json.dumps": eager,
+    "full": RequestLogger().log,
+    "full, 10% sampled": RequestLogger(sample_rate=0.1).log,
+    "full, 512 bytes": RequestLogger(max_bytes=512).log,
+    "full, 4 fields": RequestLogger(fields=["type", "team.id", "channel.id", "actions"]).log,
+    "summary": RequestLogger(mode="summary").log,
+    "off": RequestLogger(mode="off").log,
+}
+
+
+async def cpu_time_per_request(middleware: Middleware, iterations: int) -> float:
+    """Return the CPU time of one request in microseconds."""
+    started = time.process_time()
+    for _ in range(iterations):
+        await middleware(BODY, next_middleware)
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+async def run(iterations: int) -> None:
+    """Send the log records to a discarded stream and run the settings."""
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+        logger.propagate = False
+        await run_settings(iterations)
+
+
+async def run_settings(iterations: int) -> None:
+    """Run every setting at both logger levels."""
+    baseline = await cpu_time_per_request(next_middleware_only, iterations)
+    print(f"{'no middleware':<20} {'':<5} cpu={baseline:8.2f}us")
+    for level in (logging.DEBUG, logging.INFO):
+        logger.setLevel(level)
+        for name, middleware in SETTINGS.items():
+            cpu_us = await cpu_time_per_request(middleware, iterations)
+            print(
+                f"{name:<20} {logging.getLevelName(level):<5} cpu={cpu_us:8.2f}us "
+                f"overhead={cpu_us - baseline:8.2f}us"
+            )
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=20_000, help="Requests per setting.")
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Tracing overhead benchmark.
+
+Measures the time a call of a service method takes through the tracing decorator and
+a Redis command span, with tracing disabled, as it is by default, and enabled with the
+in-memory exporter, against the same call without tracing.
+
+Usage:
+    python -m benchmarks.bench_tracing --calls 200000
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from src.slack_bot.utils.tracing import InMemorySpanExporter, Tracer
+
+
+async def plain() -> int:
+    """Return the quote ID, untraced."""
+    return 42
+
+
+@Tracer.traced("service.get_quote")
+async def traced() -> int:
+    """Return the quote ID in a service span with a Redis span."""
+    with Tracer.span("redis.EVALSHA"):
+        return 42
+
+
+async def nanoseconds_per_call(function: Callable[[], Awaitable[int]], calls: int) -> float:
+    """Return the nanoseconds a call takes."""
+    started = time.perf_counter()
+    for _ in range(calls):
+        await function()
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+async def run(calls: int) -> None:
+    """Time the calls untraced, with tracing disabled and with tracing enabled."""
+    baseline = await nanoseconds_per_call(plain, calls)
+    print(f"{'untraced':<9} {baseline:9.0f} ns/call")
+
+    Tracer.shutdown()
+    disabled = await nanoseconds_per_call(traced, calls)
+    print(f"{'disabled':<9} {disabled:9.0f} ns/call {disabled - baseline:+9.0f} ns")
+
+    Tracer.configure([InMemorySpanExporter()])
+    enabled = await nanoseconds_per_call(traced, calls)
+    Tracer.shutdown()
+    print(f"{'enabled':<9} {enabled:9.0f} ns/call {enabled - baseline:+9.0f} ns")
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=200_000, help="Calls per case.")
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
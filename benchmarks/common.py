@@ -0,0 +1,82 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks run against a real Redis Stack server. When no host is given a local
+redis-stack container is started, the same way the integration tests start one.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import contextlib
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+def add_redis_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the Redis connection arguments shared by all the benchmarks."""
+    parser.add_argument(
+        "--redis-host",
+        default=None,
+        help="Redis host. A local redis-stack container is started when omitted.",
+    )
+    parser.add_argument("--redis-port", type=int, default=6379, help="Redis port.")
+    parser.add_argument("--redis-password", default="", help="Redis password.")
+
+
+@contextlib.contextmanager
+def redis_endpoint(host: Optional[str], port: int) -> Iterator[Tuple[str, int]]:
+    """
+    Yield the host and port of the Redis server to benchmark against.
+
+    Args:
+        host (Optional[str]): Redis host. If None, a redis-stack container is started.
+        port (int): Redis port, used only when a host is given.
+
+    Yields:
+        Tuple[str, int]: The host and port of the Redis server.
+    """
+    if host:
+        yield host, port
+        return
+
+    from testcontainers.redis import RedisContainer
+
+    with RedisContainer(image="redis/redis-stack:latest") as container:
+        yield container.get_container_host_ip(), int(container.get_exposed_port(6379))
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """
+    Return the nearest-rank percentile of the samples.
+
+    Args:
+        samples (Sequence[float]): The measured samples.
+        pct (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile value, or 0.0 for no samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples measured in seconds.
+
+    Args:
+        samples (List[float]): Latency samples in seconds.
+
+    Returns:
+        Dict[str, float]: The p50, p99 and mean latencies in milliseconds.
+    """
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": (sum(samples) / len(samples)) * 1000 if samples else 0.0,
+    }
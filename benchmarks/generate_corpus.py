@@ -0,0 +1,89 @@
+"""
+Synthetic quote corpus generator.
+
+Writes CSV files in the `Quote,Person` schema of the files in `etl/data`. The rows are
+generated from a seeded vocabulary, so the same arguments always produce the same corpus,
+and are written one at a time, so corpora of millions of rows take little memory.
+
+Usage:
+    python -m benchmarks.generate_corpus --rows 1000000 --files 4 --output /tmp/corpus
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import argparse
+import csv
+import os
+import random
+from typing import List
+
+WORDS = (
+    "change courage dream effort failure future happiness journey leader learn life "
+    "mind opportunity patience progress purpose success team time trust vision work "
+    "always never every today tomorrow together alone great small simple hard "
+    "begin create believe grow keep make start try win give"
+).split()
+
+FIRST_NAMES = "Ada Alan Grace Linus Margaret Dennis Barbara Ken Frances Edsger".split()
+
+LAST_NAMES = "Lovelace Turing Hopper Torvalds Hamilton Ritchie Liskov Thompson Allen".split()
+
+
+def generate_corpus(directory: str, rows: int, files: int = 4, seed: int = 0) -> List[str]:
+    """
+    Generate a synthetic quote corpus.
+
+    Every row is unique. Some quotes contain commas and double quotes so the files
+    exercise the CSV quoting the same way the real data does.
+
+    Args:
+        directory (str): The directory to write the CSV files to, created if missing.
+        rows (int): The total number of rows, spread evenly over the files.
+        files (int, optional): The number of CSV files. Defaults to 4.
+        seed (int, optional): The seed of the generator. Defaults to 0.
+
+    Returns:
+        List[str]: The paths of the written files.
+    """
+    rng = random.Random(seed)
+    persons = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    os.makedirs(directory, exist_ok=True)
+
+    paths: List[str] = []
+    written = 0
+    for file_no in range(files):
+        file_rows = rows // files + (1 if file_no < rows % files else 0)
+        path = os.path.join(directory, f"synthetic_quotes_{file_no}.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Quote", "Person"])
+            for _ in range(file_rows):
+                words = rng.choices(WORDS, k=rng.randint(6, 24))
+                if rng.random() < 0.1:
+                    words[len(words) // 2] += ","
+                if rng.random() < 0.05:
+                    words[0] = f'"{words[0]}"'
+                # The row number keeps the rows unique.
+                quote = f"{' '.join(words).capitalize()} #{written}."
+                writer.writerow([quote, rng.choice(persons)])
+                written += 1
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    """Parse the arguments and generate the corpus."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000, help="Total number of rows.")
+    parser.add_argument("--files", type=int, default=4, help="Number of CSV files.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generator.")
+    parser.add_argument("--output", required=True, help="Directory to write the files to.")
+    args = parser.parse_args()
+
+    for path in generate_corpus(args.output, args.rows, args.files, args.seed):
+        print(f"{path} {os.path.getsize(path) / (1024 * 1024):.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+from typing import Dict, List, Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -22,9 +24,72 @@ class Settings(BaseSettings):
     redis_db: int = 0
     redis_password: str = ""
     redis_max_connections: int = 10
+    redis_warm_up_connections: int = 2
 
     redis_search_index: str = ""
 
+    # In-process cache of the quote corpus, reloaded on a new corpus version and checked
+    # every refresh interval in seconds. Larger corpora are read from Redis.
+    corpus_cache_enabled: bool = False
+    corpus_cache_max_size: int = 10000
+    corpus_cache_refresh_interval: float = 30.0
+
+    # Client-side caching of the quote documents and search results with CLIENT TRACKING,
+    # "default" tracks the keys read, "broadcast" tracks all the keys with the prefixes.
+    # The tracked connections have their own pool, on top of redis_max_connections.
+    client_cache_enabled: bool = False
+    client_cache_mode: Literal["default", "broadcast"] = "default"
+    client_cache_prefixes: List[str] = []
+    client_cache_max_entries: int = 10000
+    client_cache_max_connections: int = 2
+
+    # In-process cache of repeated search query results, such as the corpus count query.
+    query_cache_enabled: bool = False
+    query_cache_ttl: float = 5.0
+    query_cache_max_entries: int = 1000
+    query_cache_max_bytes: int = 16 * 1024 * 1024
+
+    # Slack listeners, by event type or action ID, acknowledged in the request task with
+    # their follow-up work queued on a bounded pool of background workers.
+    listener_executor_listeners: List[str] = []
+    listener_executor_workers: int = 4
+    listener_executor_queue_size: int = 100
+    listener_executor_overflow: Literal["reject", "drop_oldest", "run_inline"] = "reject"
+
+    # Shared keep-alive session of the outbound Slack Web API and response_url calls,
+    # a connection limit of 0 is unlimited. The timeout, the total time of a call, is also
+    # set on the Slack clients for the calls made before the session starts. The connect
+    # timeout is only honored by the shared session.
+    slack_http_max_connections: int = 100
+    slack_http_max_connections_per_host: int = 0
+    slack_http_keepalive_timeout: float = 30.0
+    slack_http_dns_cache_ttl: int = 300
+    slack_http_timeout: float = 10.0
+    slack_http_connect_timeout: float = 2.0
+
+    # Outbound message scheduler, token buckets in calls per second per Web API method and
+    # per channel, queuing the sends and retrying the rate limited ones after Retry-After.
+    slack_scheduler_enabled: bool = False
+    slack_scheduler_method_rates: Dict[str, float] = {"chat.postMessage": 5.0}
+    slack_scheduler_default_rate: float = 50 / 60
+    slack_scheduler_channel_rate: float = 1.0
+    slack_scheduler_burst: int = 3
+    slack_scheduler_max_retries: int = 5
+
+    # Deduplication of the Slack retries by event_id and trigger_id, claimed in Redis for
+    # the TTL in seconds and remembered in an in-process LRU.
+    slack_dedup_enabled: bool = True
+    slack_dedup_ttl: int = 600
+    slack_dedup_lru_size: int = 1024
+
+    # Debug logging of the Slack requests: the "full" payloads, a "summary" with the
+    # handling time, or "off". Only the sampled share of the requests is logged, and the
+    # payloads are reduced to the allowed fields (dotted paths) and capped in characters.
+    request_log_mode: Literal["full", "summary", "off"] = "full"
+    request_log_sample_rate: float = 1.0
+    request_log_max_bytes: int = 0
+    request_log_fields: List[str] = []
+
     host: str = "0.0.0.0"
     port: int = 3000
 
@@ -32,4 +97,26 @@ class Settings(BaseSettings):
     app_log_level: str = "debug"
     logging_path: str = "logging.json"
 
+    # Access log sampling: the share of the successful responses logged by request path,
+    # exact or, ending with "/*", the paths under a prefix. Errors have their own rate.
+    access_log_sample_rates: Dict[str, float] = {"/metrics": 0.0, "/healthcheck": 0.0}
+    access_log_error_sample_rate: float = 1.0
+
+    # Queued logging: the records go through a bounded queue to a thread running the
+    # handlers, so a slow stdout does not block the event loop. A full queue drops its
+    # oldest record or blocks the logging call.
+    log_queue_enabled: bool = False
+    log_queue_size: int = 10000
+    log_queue_overflow: Literal["drop_oldest", "block"] = "drop_oldest"
+
+    # In-process tracing of the Slack requests through the route, the listeners, the
+    # services, the Redis commands and the outbound Slack calls. The spans go to the
+    # exporters: "memory" keeps the latest spans, "jsonl" appends them to a local file.
+    # The Server-Timing header of the Slack responses reports the span times.
+    tracing_enabled: bool = False
+    tracing_exporters: List[Literal["memory", "jsonl"]] = ["memory"]
+    tracing_memory_max_spans: int = 1000
+    tracing_jsonl_path: str = "traces.jsonl"
+    tracing_server_timing: bool = False
+
     model_config = SettingsConfigDict(env_file=".env")
@@ -6,10 +6,24 @@ Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
 import os
+from typing import Literal
 
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+def available_cores() -> int:
+    """
+    Get the number of cores the process may run on.
+
+    Returns:
+        int: The number of usable cores, at least 1.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
 class ETLSettings(BaseSettings):
     """Configuration settings for Etl job."""
 
@@ -21,4 +35,23 @@ class ETLSettings(BaseSettings):
 
     redis_search_index: str = ""
 
+    # "transaction" loads everything in one MULTI/EXEC, "streaming" loads in concurrent batches,
+    # "parallel" also parses the files in a process pool while the batches are written.
+    load_mode: Literal["transaction", "streaming", "parallel"] = "transaction"
+    load_batch_size: int = 1000
+    load_concurrency: int = 4
+
+    # Process pool parsing of the "parallel" load mode, files are split into chunks of about
+    # parse_chunk_size bytes and at most parse_queue_size parsed chunks wait for the writer.
+    parse_workers: int = Field(default_factory=available_cores)
+    parse_chunk_size: int = 8 * 1024 * 1024
+    parse_queue_size: int = 8
+
+    # "drop" rebuilds the index in place, "alias" builds a new generation and swaps an alias.
+    rebuild_mode: Literal["drop", "alias"] = "drop"
+    index_build_timeout: float = 600.0
+
+    # Apply only the changes since the previous run, tracked in a manifest stored in Redis.
+    incremental: bool = False
+
     model_config = SettingsConfigDict(env_file=os.environ.get("ENV_FILE_PATH"))
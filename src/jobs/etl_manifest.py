@@ -0,0 +1,184 @@
+"""
+ETL Manifest Module.
+
+Provides the manifest that incremental indexer runs keep in Redis to find what changed
+since the previous run.
+
+The manifest is a hash, `<index>:manifest`, holding the key prefix of the live documents
+and the size, mtime, content hash and row count of every loaded file. The content hashes
+of the rows loaded from a file are kept in a set, `<index>:manifest:<filename>`.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from ..slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
+
+# Manifest hash field holding the key prefix of the live documents.
+PREFIX_FIELD = "prefix"
+
+# Manifest hash field prefix of the per-file entries.
+FILE_FIELD_PREFIX = "file:"
+
+
+class FileEntry(NamedTuple):
+    """Fingerprint of a loaded CSV file."""
+
+    size: int
+    mtime_ns: int
+    sha256: str
+    rows: int
+
+
+def _decode(value: Any) -> Any:
+    """Decode bytes replies, the ETL connection pool does not decode responses."""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def file_stat(filepath: str) -> Tuple[int, int]:
+    """
+    Get the size and the modification time of a file.
+
+    Args:
+        filepath: The path of the file.
+
+    Returns:
+        Tuple[int, int]: The size in bytes and the mtime in nanoseconds.
+    """
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_digest(filepath: str) -> str:
+    """
+    Compute the SHA-256 content hash of a file.
+
+    Args:
+        filepath: The path of the file.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ETLManifest:
+    """Reads and writes the incremental load manifest of an index."""
+
+    def __init__(self, redis_dao: AsyncSearchRedisDAO):
+        """
+        Initialize the manifest of the index.
+
+        Args:
+            redis_dao: The DAO of the index, or of the alias the bot queries.
+        """
+        self.client = redis_dao.client
+        self.key = f"{redis_dao.search_index_name}:manifest"
+
+    def rows_key(self, filename: str) -> str:
+        """
+        Get the name of the set holding the row hashes of a file.
+
+        Args:
+            filename: The name of the CSV file.
+
+        Returns:
+            str: The name of the set.
+        """
+        return f"{self.key}:{filename}"
+
+    async def load(self) -> Tuple[Optional[str], Dict[str, FileEntry]]:
+        """
+        Load the manifest.
+
+        Returns:
+            Tuple[Optional[str], Dict[str, FileEntry]]: The prefix of the live documents,
+                None if there is no manifest, and the entries of the loaded files.
+        """
+        fields = {
+            _decode(key): _decode(value)
+            for key, value in (await self.client.hgetall(self.key)).items()
+        }
+        entries = {
+            name.removeprefix(FILE_FIELD_PREFIX): FileEntry(**json.loads(value))
+            for name, value in fields.items()
+            if name.startswith(FILE_FIELD_PREFIX)
+        }
+        return fields.get(PREFIX_FIELD), entries
+
+    async def row_hashes(self, filename: str) -> Set[str]:
+        """
+        Get the hashes of the rows loaded from a file.
+
+        Args:
+            filename: The name of the CSV file.
+
+        Returns:
+            Set[str]: The row hashes.
+        """
+        return {
+            _decode(row_hash) for row_hash in await self.client.smembers(self.rows_key(filename))
+        }
+
+    def update_file(
+        self,
+        pipe: Any,
+        filename: str,
+        entry: FileEntry,
+        added: Iterable[str] = (),
+        removed: Iterable[str] = (),
+    ) -> None:
+        """
+        Queue the update of a file entry and its row hashes on a pipeline.
+
+        Args:
+            pipe: The pipeline to queue the commands on.
+            filename: The name of the CSV file.
+            entry: The new fingerprint of the file.
+            added: The hashes of the rows added to the index.
+            removed: The hashes of the rows removed from the index.
+        """
+        pipe.hset(self.key, f"{FILE_FIELD_PREFIX}{filename}", json.dumps(entry._asdict()))
+        added, removed = list(added), list(removed)
+        if added:
+            pipe.sadd(self.rows_key(filename), *added)
+        if removed:
+            pipe.srem(self.rows_key(filename), *removed)
+
+    def delete_file(self, pipe: Any, filename: str) -> None:
+        """
+        Queue the removal of a file entry and its row hashes on a pipeline.
+
+        Args:
+            pipe: The pipeline to queue the commands on.
+            filename: The name of the CSV file.
+        """
+        pipe.hdel(self.key, f"{FILE_FIELD_PREFIX}{filename}")
+        pipe.unlink(self.rows_key(filename))
+
+    async def reset(self, prefix: str, files: Dict[str, Tuple[FileEntry, Set[str]]]) -> None:
+        """
+        Replace the manifest after a full load.
+
+        Args:
+            prefix: The key prefix of the loaded documents.
+            files: The fingerprint and the row hashes of every loaded file.
+        """
+        _, previous = await self.load()
+        async with self.client.pipeline(transaction=True) as pipe:
+            for filename in previous:
+                pipe.unlink(self.rows_key(filename))
+            pipe.unlink(self.key)
+            pipe.hset(self.key, PREFIX_FIELD, prefix)
+            for filename, (entry, row_hashes) in files.items():
+                self.update_file(pipe, filename, entry, added=row_hashes)
+            await pipe.execute()
@@ -14,12 +14,19 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+import asyncio
 import csv
+import hashlib
+import io
 import logging
 import os
+import resource
 import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from redis.commands.search import AsyncPipeline
 from redis.commands.search.field import Field, TextField
@@ -27,13 +34,23 @@ from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from redis.exceptions import RedisError
 
 from ..slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
-from ..slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
-from ..slack_bot.exceptions.custom_exceptions import CSVFileReadError
+from ..slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO, BulkWriteResult
+from ..slack_bot.exceptions.custom_exceptions import CSVFileReadError, IndexingError
 from .etl_config import ETLSettings
 from .etl_job import ETLJob
+from .etl_manifest import ETLManifest, FileEntry, file_digest, file_stat
 
 logger = logging.getLogger("etl")
 
+# Fields of the quote documents.
+REDIS_FIELDS: List[Field] = [TextField("quote"), TextField("person")]
+
+# Keys scanned and unlinked per round trip when cleaning up an index generation.
+CLEANUP_BATCH_SIZE = 1000
+
+# Failed documents logged when a bulk upsert fails, the rest are only counted.
+FAILED_DOCUMENTS_LOGGED = 10
+
 
 class IndexerJob(ETLJob):
     """
@@ -89,8 +106,207 @@ class IndexerJob(ETLJob):
         """
 
         # create the Redis DAO
-        redis_dao = AsyncRedisDAOFactory().create_redis_dao(
-            search_index_name=self.etl_settings.redis_search_index,
+        redis_dao = self.create_redis_dao(self.etl_settings.redis_search_index)
+
+        manifest = ETLManifest(redis_dao) if self.etl_settings.incremental else None
+        if manifest is not None and await self.incremental_run(redis_dao, manifest):
+            return
+
+        cleanup: Optional["asyncio.Task[None]"] = None
+        if self.etl_settings.rebuild_mode == "alias":
+            cleanup = await self.alias_rebuild(redis_dao)
+        else:
+            await self.drop_rebuild(redis_dao)
+
+        if manifest is not None:
+            await manifest.reset(self.prefix, self.fingerprint_files())
+            logger.info("Saved the manifest of the prefix %s", self.prefix)
+
+        # Bump the corpus version so the running bots refresh their caches.
+        version = await redis_dao.bump_corpus_version()
+        logger.info("Published corpus version %s", version)
+
+        if cleanup is not None:
+            await cleanup
+
+    async def incremental_run(self, redis_dao: AsyncSearchRedisDAO, manifest: ETLManifest) -> bool:
+        """
+        Apply only the changes to the CSV files since the previous run to the live documents.
+
+        Files with the size and mtime recorded in the manifest are skipped without being
+        read, and files with an unchanged content hash are skipped without being parsed.
+        The rows of changed files are diffed against the row hashes in the manifest, so
+        only new rows are written and only removed rows are deleted.
+
+        Args:
+            redis_dao: The DAO of the index, or of the alias the bot queries.
+            manifest: The manifest of the previous runs.
+
+        Returns:
+            bool: False if there is no manifest matching the live index and a full
+                rebuild is needed.
+        """
+        prefix, entries = await manifest.load()
+        if prefix is None or prefix not in await self.live_prefixes(redis_dao):
+            logger.info("No manifest matching the live index, running a full rebuild.")
+            return False
+
+        # Changed rows are written next to the live documents.
+        self.prefix = prefix
+        skipped = updated = deleted = 0
+        for filepath in self.csv_files():
+            filename = os.path.basename(filepath)
+            size, mtime_ns = file_stat(filepath)
+            previous = entries.pop(filename, None)
+            if previous is not None and (previous.size, previous.mtime_ns) == (size, mtime_ns):
+                skipped += previous.rows
+                continue
+
+            digest = file_digest(filepath)
+            if previous is not None and previous.sha256 == digest:
+                # Touched but not changed, record the new mtime so it is not hashed again.
+                await self.apply_changes(
+                    redis_dao, manifest, filename, previous._replace(size=size, mtime_ns=mtime_ns)
+                )
+                skipped += previous.rows
+                continue
+
+            rows = dict(self.read_file_rows(filepath))
+            loaded = await manifest.row_hashes(filename) if previous is not None else set()
+            added = {row_hash: rows[row_hash] for row_hash in rows.keys() - loaded}
+            removed = loaded - rows.keys()
+            await self.apply_changes(
+                redis_dao,
+                manifest,
+                filename,
+                FileEntry(size, mtime_ns, digest, len(rows)),
+                added,
+                removed,
+            )
+            skipped += len(rows) - len(added)
+            updated += len(added)
+            deleted += len(removed)
+
+        # Files that were removed from the data directory.
+        for filename in entries:
+            removed = await manifest.row_hashes(filename)
+            await self.apply_changes(redis_dao, manifest, filename, None, removed=removed)
+            deleted += len(removed)
+
+        logger.info(
+            "Incremental run: %s documents skipped, %s updated, %s deleted",
+            skipped,
+            updated,
+            deleted,
+        )
+        if updated or deleted:
+            version = await redis_dao.bump_corpus_version()
+            logger.info("Published corpus version %s", version)
+        return True
+
+    async def live_prefixes(self, redis_dao: AsyncSearchRedisDAO) -> List[str]:
+        """
+        Get the key prefixes of the live index.
+
+        Args:
+            redis_dao: The DAO of the index, or of the alias the bot queries.
+
+        Returns:
+            List[str]: The key prefixes, empty if the index does not exist.
+        """
+        try:
+            return await redis_dao.index_prefixes()
+        except RedisError:
+            return []
+
+    async def apply_changes(
+        self,
+        redis_dao: AsyncSearchRedisDAO,
+        manifest: ETLManifest,
+        filename: str,
+        entry: Optional[FileEntry],
+        added: Optional[Dict[str, Dict[str, str]]] = None,
+        removed: Iterable[str] = (),
+    ) -> None:
+        """
+        Write the changed rows of a file and then record them in the manifest.
+
+        The new documents are upserted in bulk and the removed ones deleted in
+        non-transactional pipelines of `load_batch_size` documents. The manifest is updated
+        last, so a failed run leaves the file to be diffed again by the next run.
+
+        Args:
+            redis_dao: The DAO of the index being updated.
+            manifest: The manifest of the index.
+            filename: The name of the CSV file.
+            entry: The new fingerprint of the file, None if the file was removed.
+            added: The fields of the new rows, keyed by row hash.
+            removed: The hashes of the removed rows.
+
+        Raises:
+            IndexingError: If the changes could not be written to Redis.
+        """
+        added = added or {}
+        removed_keys = [self.document_key(filename, row_hash) for row_hash in removed]
+        batch_size = self.etl_settings.load_batch_size
+        try:
+            result = await redis_dao.upsert_documents(
+                (
+                    (self.document_key(filename, row_hash), mapping)
+                    for row_hash, mapping in added.items()
+                ),
+                batch_size=batch_size,
+                concurrency=self.etl_settings.load_concurrency,
+            )
+            self.check_bulk_result(result)
+            for start in range(0, len(removed_keys), batch_size):
+                end = start + batch_size
+                async with redis_dao.client.pipeline(transaction=False) as pipe:
+                    for key in removed_keys[start:end]:
+                        pipe.unlink(key)
+                        pipe.srem(redis_dao.keyset_name, key)
+                    await pipe.execute(raise_on_error=True)
+
+            async with redis_dao.client.pipeline(transaction=True) as pipe:
+                if entry is None:
+                    manifest.delete_file(pipe, filename)
+                else:
+                    manifest.update_file(pipe, filename, entry, added, removed)
+                await pipe.execute(raise_on_error=True)
+        except RedisError as exc:
+            logger.error("Error applying the changes of %s: %s", filename, str(exc))
+            raise IndexingError(f"Failed to update the documents: {str(exc)}") from exc
+
+    def fingerprint_files(self) -> Dict[str, Tuple[FileEntry, Set[str]]]:
+        """
+        Fingerprint the CSV files for the manifest of a full load.
+
+        Returns:
+            Dict[str, Tuple[FileEntry, Set[str]]]: The fingerprint and the row hashes of
+                every file, keyed by file name.
+        """
+        files: Dict[str, Tuple[FileEntry, Set[str]]] = {}
+        for filepath in self.csv_files():
+            size, mtime_ns = file_stat(filepath)
+            row_hashes = {row_hash for row_hash, _ in self.read_file_rows(filepath)}
+            files[os.path.basename(filepath)] = (
+                FileEntry(size, mtime_ns, file_digest(filepath), len(row_hashes)),
+                row_hashes,
+            )
+        return files
+
+    def create_redis_dao(self, search_index_name: str) -> AsyncSearchRedisDAO:
+        """
+        Create a DAO for the index, sharing the job's connection pool.
+
+        Args:
+            search_index_name: The name of the index or alias.
+
+        Returns:
+            AsyncSearchRedisDAO: The DAO of the index.
+        """
+        return AsyncRedisDAOFactory().create_redis_dao(
+            search_index_name=search_index_name,
             host=self.etl_settings.redis_host,
             port=self.etl_settings.redis_port,
             db=self.etl_settings.redis_db,
@@ -99,9 +315,15 @@ class IndexerJob(ETLJob):
             decode_responses=False,
         )
 
-        # Fields
-        redis_fields: List[Field] = [TextField("quote"), TextField("person")]
+    async def drop_rebuild(self, redis_dao: AsyncSearchRedisDAO) -> None:
+        """
+        Drop the index with its documents and rebuild it in place.
+
+        The index is missing or incomplete for the bot while it is rebuilt.
 
+        Args:
+            redis_dao: The DAO of the index.
+        """
         try:
             # check to see if index exists
             await redis_dao.index_info()
@@ -113,7 +335,7 @@ class IndexerJob(ETLJob):
 
         # create index
         await redis_dao.index_create(
-            redis_fields,
+            REDIS_FIELDS,
             definition=IndexDefinition(prefix=[self.prefix], index_type=IndexType.HASH),
         )
 
@@ -122,39 +344,522 @@ class IndexerJob(ETLJob):
             redis_dao,
         )
 
+    async def alias_rebuild(self, alias_dao: AsyncSearchRedisDAO) -> "asyncio.Task[None]":
+        """
+        Build a new index generation next to the live one and swap the alias to it.
+
+        The new generation is indexed under the run's key prefix, and the alias named in
+        the settings is moved to it only once FT.INFO reports the indexing is complete,
+        so the bot never sees a missing or partial index. The key set is swapped in the
+        same step. The previous generation is cleaned up in the background.
+
+        Args:
+            alias_dao: The DAO of the alias the bot queries.
+
+        Returns:
+            asyncio.Task[None]: The task cleaning up the previous generation.
+
+        Raises:
+            IndexingError: If the new generation failed to load or index. The alias keeps
+                pointing to the previous generation.
+        """
+        alias = alias_dao.search_index_name
+        generation_dao = self.create_redis_dao(f"{alias}-{self.prefix.rstrip(':')}")
+
+        previous_index = await alias_dao.resolve_index_name()
+        previous_prefixes = await alias_dao.index_prefixes() if previous_index else []
+
+        await generation_dao.index_create(
+            REDIS_FIELDS,
+            definition=IndexDefinition(prefix=[self.prefix], index_type=IndexType.HASH),
+        )
+        try:
+            await self.redis_pipeline(generation_dao)
+            await generation_dao.wait_for_indexing(timeout=self.etl_settings.index_build_timeout)
+        except (IndexingError, CSVFileReadError):
+            logger.error(
+                "Failed to build %s, %s stays live.", generation_dao.search_index_name, alias
+            )
+            await self.cleanup_generation(generation_dao, [self.prefix], generation_dao.keyset_name)
+            raise
+
+        if previous_index == alias:
+            # The live index predates alias rebuilds and owns the alias name.
+            logger.info("Dropping the index %s to replace it with an alias.", alias)
+            await alias_dao.index_drop(delete_documents=False)
+
+        await generation_dao.alias_update(alias)
+
+        # Move the live key set aside and promote the new one atomically.
+        retired_keyset = f"{alias_dao.keyset_name}:retired"
+        async with alias_dao.client.pipeline(transaction=True) as pipe:
+            pipe.rename(alias_dao.keyset_name, retired_keyset)
+            pipe.rename(generation_dao.keyset_name, alias_dao.keyset_name)
+            await pipe.execute(raise_on_error=False)
+        logger.info("Alias %s now points to %s", alias, generation_dao.search_index_name)
+
+        previous_dao = None
+        if previous_index is not None and previous_index != alias:
+            previous_dao = self.create_redis_dao(previous_index)
+        return asyncio.create_task(
+            self.cleanup_generation(previous_dao, previous_prefixes, retired_keyset)
+        )
+
+    async def cleanup_generation(
+        self,
+        generation_dao: Optional[AsyncSearchRedisDAO],
+        prefixes: List[str],
+        keyset_name: str,
+    ) -> None:
+        """
+        Drop an index generation and delete its documents without blocking Redis.
+
+        The index is dropped without its documents, which are then deleted with
+        UNLINK in SCAN sized batches so that Redis keeps serving the live generation.
+
+        Args:
+            generation_dao: The DAO of the index to drop, or None if it is already dropped.
+            prefixes: The key prefixes of the generation's documents.
+            keyset_name: The key set of the generation.
+        """
+        client = self.create_redis_dao(self.etl_settings.redis_search_index).client
+        try:
+            if generation_dao is not None:
+                await generation_dao.index_drop(delete_documents=False)
+            deleted = 0
+            for prefix in prefixes:
+                batch: List[Any] = []
+                async for key in client.scan_iter(
+                    match=f"{escape_glob(prefix)}*", count=CLEANUP_BATCH_SIZE
+                ):
+                    batch.append(key)
+                    if len(batch) == CLEANUP_BATCH_SIZE:
+                        deleted += await client.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += await client.unlink(*batch)
+            await client.unlink(keyset_name)
+            logger.info("Cleaned up %s documents with prefixes %s", deleted, prefixes)
+        except RedisError as exc:
+            logger.error("Failed to clean up prefixes %s: %s", prefixes, str(exc))
+
     async def redis_pipeline(self, redis_dao: AsyncSearchRedisDAO):
-        """Execute redis pipeline on the CSV files."""
+        """
+        Execute redis pipeline on the CSV files.
+
+        Raises:
+            IndexingError: If the documents could not be written to Redis.
+        """
+        started = time.perf_counter()
+        rows = 0
         try:
-            async with redis_dao.search_client.pipeline(transaction=True) as pipe:
-                for filename in os.listdir(self.csv_directory_path):
-                    if filename.endswith(".csv"):
-                        await self.process_file(
-                            os.path.join(self.csv_directory_path, filename), pipe
-                        )
-                res: List[Any] = await pipe.execute(raise_on_error=True)
-                logger.info("Processed %s documents", len(res))
+            if self.etl_settings.load_mode == "streaming":
+                rows = await self.redis_streaming_load(redis_dao)
+            elif self.etl_settings.load_mode == "parallel":
+                rows = await self.redis_parallel_load(redis_dao)
+            else:
+                rows = await self.redis_transaction_load(redis_dao)
         except RedisError as exc:
             logger.error("Error adding vectors to Redis: %s", str(exc))
+            raise IndexingError(f"Failed to load the documents: {str(exc)}") from exc
+        finally:
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Loaded %s rows in %.2fs (%.0f rows/sec), peak RSS %.1f MiB, "
+                "largest child process %.1f MiB",
+                rows,
+                elapsed,
+                rows / elapsed if elapsed > 0 else 0.0,
+                peak_rss_mib(),
+                peak_rss_mib(children=True),
+            )
 
-    async def process_file(self, filepath: str, redis_pipeline: AsyncPipeline) -> None:
+    async def redis_transaction_load(self, redis_dao: AsyncSearchRedisDAO) -> int:
         """
-        Processes a single CSV file and adds its contents to the Redis pipeline.
+        Load all the CSV files in a single transaction.
 
         Args:
-            filepath: The path of the file to process.
-            redis_pipeline: The Redis pipeline object for batch operations.
+            redis_dao: The DAO of the index being loaded.
+
+        Returns:
+            int: The number of rows loaded.
+        """
+        rows = 0
+        async with redis_dao.search_client.pipeline(transaction=True) as pipe:
+            # Rebuild the key set used for random document selection.
+            pipe.delete(redis_dao.keyset_name)
+            for filepath in self.csv_files():
+                rows += await self.process_file(filepath, pipe, redis_dao.keyset_name)
+            await pipe.execute(raise_on_error=True)
+            logger.info("Processed %s documents", rows)
+        return rows
+
+    async def redis_streaming_load(self, redis_dao: AsyncSearchRedisDAO) -> int:
+        """
+        Stream the CSV rows to Redis in non-transactional pipelines.
+
+        Rows are read lazily and upserted in batches of `load_batch_size`, with up to
+        `load_concurrency` batches in flight at once, so memory stays bounded by the
+        batches in flight.
+
+        Args:
+            redis_dao: The DAO of the index being loaded.
+
+        Returns:
+            int: The number of rows loaded.
+
+        Raises:
+            IndexingError: If any of the rows failed, after the remaining rows loaded.
+        """
+        await redis_dao.client.delete(redis_dao.keyset_name)
+        result = await redis_dao.upsert_documents(
+            self.read_rows(),
+            batch_size=self.etl_settings.load_batch_size,
+            concurrency=self.etl_settings.load_concurrency,
+        )
+        return self.check_bulk_result(result)
+
+    async def redis_parallel_load(self, redis_dao: AsyncSearchRedisDAO) -> int:
+        """
+        Parse the CSV files in a process pool while the parsed rows are written to Redis.
+
+        The files are split into chunks that are parsed in parallel by `parse_workers`
+        processes. The parsed chunks are handed to the writer through a queue of
+        `parse_queue_size` chunks, so parsing stalls instead of buffering when Redis
+        falls behind. The parsed rows are upserted like the streaming mode does.
+
+        Args:
+            redis_dao: The DAO of the index being loaded.
+
+        Returns:
+            int: The number of rows loaded.
+
+        Raises:
+            IndexingError: If any of the rows failed, after the remaining rows loaded.
+            CSVFileReadError: If a file could not be read, after the parsed rows loaded.
+        """
+        queue: "asyncio.Queue[Optional[List[Tuple[str, str, str]]]]" = asyncio.Queue(
+            maxsize=self.etl_settings.parse_queue_size
+        )
+
+        async def parsed_rows() -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+            while (rows := await queue.get()) is not None:
+                for key, quote, person in rows:
+                    yield key, {"quote": quote, "person": person}
+
+        await redis_dao.client.delete(redis_dao.keyset_name)
+
+        with self.create_parse_executor() as executor:
+            parser = asyncio.create_task(self.parse_stage(executor, queue))
+            result = await redis_dao.upsert_documents(
+                parsed_rows(),
+                batch_size=self.etl_settings.load_batch_size,
+                concurrency=self.etl_settings.load_concurrency,
+            )
+            # Raises the read error of the parse stage, once the parsed rows are loaded.
+            await parser
+
+        return self.check_bulk_result(result)
+
+    def create_parse_executor(self) -> Executor:
+        """
+        Create the process pool of the parse stage.
+
+        Returns:
+            Executor: The pool of `parse_workers` processes.
+        """
+        return ProcessPoolExecutor(max_workers=self.etl_settings.parse_workers)
+
+    async def parse_stage(
+        self,
+        executor: Executor,
+        queue: "asyncio.Queue[Optional[List[Tuple[str, str, str]]]]",
+    ) -> None:
+        """
+        Parse the chunks of the CSV files in the executor and queue the parsed rows.
+
+        Two chunks per worker are parsed ahead of the queue, and the chunks are queued in
+        file order. The end of the rows is marked with None, also when reading failed.
+
+        Args:
+            executor: The pool parsing the chunks.
+            queue: The queue of parsed rows read by the writer.
+
+        Raises:
+            CSVFileReadError: If a file could not be read.
+        """
+        loop = asyncio.get_running_loop()
+        ahead = 2 * self.etl_settings.parse_workers
+        pending: "deque[asyncio.Future[List[Tuple[str, str, str]]]]" = deque()
+        error: Optional[IOError] = None
+        try:
+            for filepath in self.csv_files():
+                for start, end in file_chunks(filepath, self.etl_settings.parse_chunk_size):
+                    pending.append(
+                        loop.run_in_executor(
+                            executor, parse_chunk, filepath, start, end, self.prefix
+                        )
+                    )
+                    if len(pending) >= ahead:
+                        await queue.put(await pending.popleft())
+        except IOError as exc:
+            error = exc
+
+        try:
+            # Hand over the chunks parsed before a read error too.
+            while pending:
+                await queue.put(await pending.popleft())
+        except IOError as exc:
+            error = error or exc
+        finally:
+            for future in pending:
+                future.cancel()
+            await queue.put(None)
+
+        if error is not None:
+            raise CSVFileReadError(f"Failed to read the CSV files: {str(error)}") from error
+
+    def check_bulk_result(self, result: BulkWriteResult) -> int:
+        """
+        Log the outcome of a bulk upsert and fail the load if any document failed.
+
+        Args:
+            result: The outcome of the upsert.
+
+        Returns:
+            int: The number of documents written.
+
+        Raises:
+            IndexingError: If any of the documents failed.
+        """
+        logger.info("Processed %s documents in %s batches", result.written, result.batches)
+        if result.failed:
+            for key, error in list(result.failed.items())[:FAILED_DOCUMENTS_LOGGED]:
+                logger.error("Document %s failed: %s", key, error)
+            total = result.written + len(result.failed)
+            raise IndexingError(f"{len(result.failed)} of {total} documents failed to load.")
+        return result.written
+
+    def csv_files(self) -> List[str]:
+        """
+        List the CSV files in the data directory.
+
+        Returns:
+            List[str]: The paths of the CSV files.
+        """
+        return [
+            os.path.join(self.csv_directory_path, filename)
+            for filename in os.listdir(self.csv_directory_path)
+            if filename.endswith(".csv")
+        ]
+
+    def read_rows(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """
+        Lazily read the rows of all the CSV files.
+
+        Yields:
+            Tuple[str, Dict[str, str]]: The document key and its fields.
+        """
+        for filepath in self.csv_files():
+            yield from self.read_file(filepath)
+
+    def read_file(self, filepath: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """
+        Lazily read the rows of a single CSV file.
+
+        Args:
+            filepath: The path of the file to read.
+
+        Yields:
+            Tuple[str, Dict[str, str]]: The document key and its fields.
+
+        Raises:
+            CSVFileReadError: If the file could not be read.
+        """
+        filename = os.path.basename(filepath)
+        for content_hash, mapping in self.read_file_rows(filepath):
+            yield self.document_key(filename, content_hash), mapping
+
+    def read_file_rows(self, filepath: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """
+        Lazily read the rows of a single CSV file with their content hashes.
+
+        Args:
+            filepath: The path of the file to read.
+
+        Yields:
+            Tuple[str, Dict[str, str]]: The row hash and the document fields.
+
+        Raises:
+            CSVFileReadError: If the file could not be read.
         """
         try:
             with open(filepath, "r", encoding="utf-8") as file:
                 csv_reader = csv.DictReader(file)
-                for idx, row in enumerate(csv_reader):
-                    key = f"{self.prefix}_{os.path.basename(filepath)}_{idx}"
-                    redis_pipeline.hset(  # type: ignore
-                        key, mapping={"quote": row["Quote"], "person": row["Person"]}
-                    )
+                for row in csv_reader:
+                    mapping = {"quote": row["Quote"], "person": row["Person"]}
+                    yield row_hash(mapping), mapping
         except IOError as exc:
             raise CSVFileReadError(f"Failed to read {filepath} : {str(exc)}") from exc
 
+    def document_key(self, filename: str, content_hash: str) -> str:
+        """
+        Get the key of a document.
+
+        Keys are derived from the row content, so the same row keeps its key across
+        runs and identical rows of a file are stored once.
+
+        Args:
+            filename: The name of the CSV file the row is read from.
+            content_hash: The content hash of the row.
+
+        Returns:
+            str: The document key.
+        """
+        return document_key(self.prefix, filename, content_hash)
+
+    async def process_file(
+        self, filepath: str, redis_pipeline: AsyncPipeline, keyset_name: str
+    ) -> int:
+        """
+        Process a single CSV file and add its contents to the Redis pipeline.
+
+        Every document key is also added to the key set used for random selection.
+
+        Args:
+            filepath: The path of the file to process.
+            redis_pipeline: The Redis pipeline object for batch operations.
+            keyset_name: The name of the set holding the keys of the indexed documents.
+
+        Returns:
+            int: The number of rows added to the pipeline.
+        """
+        rows = 0
+        for key, mapping in self.read_file(filepath):
+            redis_pipeline.hset(key, mapping=mapping)  # type: ignore
+            redis_pipeline.sadd(keyset_name, key)  # type: ignore
+            rows += 1
+        return rows
+
+
+def row_hash(mapping: Dict[str, str]) -> str:
+    """
+    Compute the content hash of a row.
+
+    Args:
+        mapping: The document fields of the row.
+
+    Returns:
+        str: The hex digest of the quote and the person.
+    """
+    content = f"{mapping['quote']}\x1f{mapping['person']}".encode("utf-8")
+    return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+
+def document_key(prefix: str, filename: str, content_hash: str) -> str:
+    """
+    Get the key of a document.
+
+    Args:
+        prefix: The key prefix of the run.
+        filename: The name of the CSV file the row is read from.
+        content_hash: The content hash of the row.
+
+    Returns:
+        str: The document key.
+    """
+    return f"{prefix}{filename}:{content_hash}"
+
+
+def file_chunks(filepath: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into byte ranges of about chunk_size bytes, ending at line ends.
+
+    Rows are assumed to fit on a single line, quoted line breaks are only supported
+    in files smaller than the chunk size.
+
+    Args:
+        filepath: The path of the file.
+        chunk_size: The target size of the chunks in bytes.
+
+    Returns:
+        List[Tuple[int, int]]: The start and end offsets of the chunks.
+    """
+    size = os.path.getsize(filepath)
+    chunks: List[Tuple[int, int]] = []
+    start = 0
+    with open(filepath, "rb") as file:
+        while start < size:
+            file.seek(start + chunk_size)
+            file.readline()
+            end = min(file.tell(), size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def parse_chunk(filepath: str, start: int, end: int, prefix: str) -> List[Tuple[str, str, str]]:
+    """
+    Parse a chunk of a CSV file, in a worker process of the parse stage.
+
+    Args:
+        filepath: The path of the file.
+        start: The offset of the first line of the chunk, 0 for the header line.
+        end: The offset after the last line of the chunk.
+        prefix: The key prefix of the run.
+
+    Returns:
+        List[Tuple[str, str, str]]: The document key, the quote and the person of every row.
+    """
+    filename = os.path.basename(filepath)
+    with open(filepath, "rb") as file:
+        header = b"" if start == 0 else file.readline()
+        file.seek(start)
+        content = header + file.read(end - start)
+
+    rows: List[Tuple[str, str, str]] = []
+    for row in csv.DictReader(io.StringIO(content.decode("utf-8"))):
+        mapping = {"quote": row["Quote"], "person": row["Person"]}
+        rows.append(
+            (document_key(prefix, filename, row_hash(mapping)), row["Quote"], row["Person"])
+        )
+    return rows
+
+
+def escape_glob(pattern: str) -> str:
+    """
+    Escape the glob special characters of a key prefix for SCAN MATCH.
+
+    Args:
+        pattern: The literal key prefix.
+
+    Returns:
+        str: The escaped prefix.
+    """
+    return "".join(f"\\{char}" if char in "*?[]\\" else char for char in pattern)
+
+
+def peak_rss_mib(children: bool = False) -> float:
+    """
+    Get the peak resident set size of the process, or of its child processes.
+
+    The process figure does not include the parse workers of the parallel load mode,
+    which are child processes. Their figure is the peak of the largest child that ended,
+    not the sum of the children, since the OS reports no more.
+
+    Args:
+        children: Report the ended child processes instead of the process itself.
+
+    Returns:
+        float: The peak RSS in MiB.
+    """
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
 
 if __name__ == "__main__":
     IndexerJob.async_execute()
@@ -8,7 +8,7 @@ Copyright: 2023 Translucent Computing Inc.
 """
 import logging
 import logging.config
-from typing import Any, Dict, cast
+from typing import Any, Dict, List, cast
 
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
@@ -18,10 +18,14 @@ from config import Settings
 
 from .exceptions.fastapi_error_handler import ErrorHandler
 from .routes.slack_routes import SlackRoutes
+from .services.listener_executor import ListenerExecutor
 from .services.slack_middleware import SlackMiddleware
+from .services.slack_request_logger import RequestLogger
 from .utils.file_utils import load_json_file
 from .utils.lifespan import lifespan
-from .utils.log_filter import SuppressSpecificLogEntries
+from .utils.log_filter import AccessLogSampler
+from .utils.queued_logging import QueuedLogging
+from .utils.tracing import InMemorySpanExporter, JsonlSpanExporter, SpanExporter, Tracer
 
 
 def setup_logging(fast_api: FastAPI):
@@ -39,11 +43,21 @@ def setup_logging(fast_api: FastAPI):
     app_logger = logging.getLogger("app")
     app_logger.setLevel(fast_api.state.settings.app_log_level.upper())
 
-    # Add the filter to Uvicorn's access logger
-    endpoints_to_suppress = ["/metrics"]
-
+    # Add the sampling filter to Uvicorn's access logger
     uvicorn_access_logger = logging.getLogger("uvicorn.access")
-    uvicorn_access_logger.addFilter(SuppressSpecificLogEntries(endpoints_to_suppress))
+    uvicorn_access_logger.addFilter(
+        AccessLogSampler(
+            fast_api.state.settings.access_log_sample_rates,
+            fast_api.state.settings.access_log_error_sample_rate,
+        )
+    )
+
+    # Move the configured handlers off the event loop thread
+    if fast_api.state.settings.log_queue_enabled:
+        QueuedLogging.start(
+            queue_size=fast_api.state.settings.log_queue_size,
+            overflow=fast_api.state.settings.log_queue_overflow,
+        )
 
 
 def setup_metrics(fast_api: FastAPI):
@@ -59,6 +73,18 @@ def setup_metrics(fast_api: FastAPI):
     fast_api.add_route("/metrics", handle_metrics)  # type: ignore
 
 
+def setup_tracing(fast_api: FastAPI):
+    """Set up the span exporters of the app, when tracing is enabled."""
+    settings = fast_api.state.settings
+    exporters: List[SpanExporter] = []
+    if settings.tracing_enabled:
+        if "memory" in settings.tracing_exporters:
+            exporters.append(InMemorySpanExporter(settings.tracing_memory_max_spans))
+        if "jsonl" in settings.tracing_exporters:
+            exporters.append(JsonlSpanExporter(settings.tracing_jsonl_path))
+    Tracer.configure(exporters)
+
+
 def setup_error_handlers(fast_api: FastAPI):
     """Set up default error handlers for the app."""
     error_handler = ErrorHandler(fast_api)
@@ -93,7 +119,26 @@ def setup_slack_integration(fast_api: FastAPI):
     slack_routes = SlackRoutes(fast_api)
     fast_api.include_router(slack_routes.get_router())
 
-    SlackMiddleware(slack_routes.get_slack_app())
+    # Listeners configured to run in the background share one bounded executor
+    settings = fast_api.state.settings
+    listeners = list(settings.listener_executor_listeners)
+    executors: Dict[str, ListenerExecutor] = {}
+    if listeners:
+        executor = ListenerExecutor(
+            "slack",
+            workers=settings.listener_executor_workers,
+            queue_size=settings.listener_executor_queue_size,
+            overflow=settings.listener_executor_overflow,
+        )
+        executors = {name: executor for name in listeners}
+
+    request_logger = RequestLogger(
+        mode=settings.request_log_mode,
+        sample_rate=settings.request_log_sample_rate,
+        max_bytes=settings.request_log_max_bytes,
+        fields=settings.request_log_fields,
+    )
+    SlackMiddleware(slack_routes.get_slack_app(), executors, request_logger)
 
 
 def create_app() -> FastAPI:
@@ -108,6 +153,7 @@ def create_app() -> FastAPI:
     # Configure the FastAPI application
     setup_logging(fast_api)
     setup_metrics(fast_api)
+    setup_tracing(fast_api)
     setup_error_handlers(fast_api)
     setup_routes(fast_api)
     setup_slack_integration(fast_api)
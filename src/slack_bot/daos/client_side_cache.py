@@ -0,0 +1,421 @@
+"""
+This module provides a client-side cache of Redis replies.
+
+The cache is kept coherent by server-assisted invalidation, CLIENT TRACKING over RESP3.
+A dedicated listener connection receives the invalidation pushes. In the default mode
+every connection reading cacheable keys enables tracking redirected to the listener, so
+Redis remembers the keys each of them read. In the broadcast mode the listener subscribes
+to all the keys with the configured prefixes instead, and the reading connections are not
+tracked.
+
+Cached entries are dropped when Redis pushes an invalidation for one of their keys, and
+the whole cache is flushed whenever a tracked connection is lost, because the
+invalidations sent while it was down are lost with it. Reads bypass the cache while
+the listener is not connected, and for good if the listener cannot be set up.
+
+The tracked connections have their own small pool. When all of them are busy, a missed
+read is served by a connection of the main pool and not cached, as it is not tracked.
+
+The listener relies on the RESP3 push parser of redis-py, which has no public API for
+the invalidation pushes, so redis-py is pinned to the versions the cache is verified on.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+from redis._parsers import _AsyncRESP3Parser
+from redis.asyncio import ConnectionPool, RedisError
+from redis.asyncio.connection import AbstractConnection
+from redis.exceptions import ResponseError
+
+from ..utils.metrics import (
+    CLIENT_CACHE_HITS,
+    CLIENT_CACHE_INVALIDATIONS,
+    CLIENT_CACHE_MISSES,
+    CLIENT_CACHE_SIZE,
+)
+from .metered_connection_pool import MeteredConnectionPool
+
+logger = logging.getLogger("app")
+
+# Cached in place of the members of a set larger than the cache.
+OVERSIZED = object()
+
+CacheKey = Tuple[Hashable, ...]
+
+
+def _decode(value: Any) -> Any:
+    """Decode bytes replies, returned when the connection pool does not decode responses."""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class _TrackingConnectionPool(MeteredConnectionPool):
+    """Connection pool telling the cache when one of its connections (re)connects."""
+
+    def __init__(self, cache: "ClientSideCache", **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cache = cache
+
+    def make_connection(self) -> AbstractConnection:
+        connection = super().make_connection()
+        connection.register_connect_callback(self._cache._on_connect)
+        return connection
+
+
+class ClientSideCache:
+    """LRU cache of Redis replies invalidated by CLIENT TRACKING pushes.
+
+    Cached replies are shared between the callers and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        connection_pool: ConnectionPool,
+        max_entries: int,
+        broadcast: bool = False,
+        prefixes: Sequence[str] = (),
+        retry_interval: float = 1.0,
+        max_connections: int = 2,
+    ):
+        """
+        Initialize an empty cache reading through its own pool of tracked connections.
+
+        Args:
+            connection_pool (ConnectionPool): The main pool, whose connection settings are
+                used and which serves the reads while the tracked connections are busy.
+            max_entries (int): The maximum number of cached replies, the least recently
+                used ones are evicted first.
+            broadcast (bool, optional): Use the broadcast tracking mode instead of the
+                default one. Defaults to False.
+            prefixes (Sequence[str], optional): The key prefixes tracked in the broadcast
+                mode, all the keys when empty. Keys outside of them are not cached.
+            retry_interval (float, optional): Seconds between reconnection attempts of
+                the listener. Defaults to 1.0.
+            max_connections (int, optional): The size of the pool of tracked connections,
+                the listener not included. Defaults to 2.
+        """
+        self._main_pool = connection_pool
+        self._pool = _TrackingConnectionPool(
+            self,
+            connection_class=connection_pool.connection_class,
+            max_connections=max_connections,
+            **connection_pool.connection_kwargs,
+        )
+        self._max_entries = max_entries
+        self._broadcast = broadcast
+        self._prefixes = tuple(prefixes)
+        self._retry_interval = retry_interval
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, Tuple[str, ...]]]" = OrderedDict()
+        self._dependents: Dict[str, Set[CacheKey]] = {}
+        # Bumped by every invalidation, so replies read across one are not cached.
+        self._generation = 0
+        self._listener_id: Optional[int] = None
+        self._connected = asyncio.Event()
+        self._listener_task: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        """Return the number of cached replies."""
+        return len(self._entries)
+
+    @property
+    def connection_pool(self) -> MeteredConnectionPool:
+        """Return the pool of the tracked connections."""
+        return self._pool
+
+    @property
+    def ready(self) -> bool:
+        """
+        Check if the invalidation listener is connected and the cache can be used.
+
+        Returns:
+            bool: True if the replies can be served from and stored in the cache.
+        """
+        return self._listener_id is not None
+
+    async def hgetall(self, key: str) -> Dict[Any, Any]:
+        """
+        Read all the fields of a hash.
+
+        Args:
+            key (str): The key of the hash.
+
+        Returns:
+            Dict[Any, Any]: The fields of the hash, empty if the key does not exist.
+        """
+
+        async def fetch(connection: AbstractConnection) -> Dict[Any, Any]:
+            return await self._send(connection, "HGETALL", key) or {}
+
+        return await self._get("hash", ("HGETALL", key), (key,), fetch)
+
+    async def smembers(self, key: str) -> Any:
+        """
+        Read the members of a set, unless the set has more members than the cache holds.
+
+        Args:
+            key (str): The key of the set.
+
+        Returns:
+            Any: The list of members, or OVERSIZED if the set is too large to be cached.
+        """
+
+        async def fetch(connection: AbstractConnection) -> Any:
+            if await self._send(connection, "SCARD", key) > self._max_entries:
+                return OVERSIZED
+            return list(await self._send(connection, "SMEMBERS", key))
+
+        return await self._get("set", ("SMEMBERS", key), (key,), fetch)
+
+    async def get_or_load(
+        self,
+        kind: str,
+        cache_key: CacheKey,
+        dependency: str,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Cache a reply that Redis cannot track, such as search results, until a key changes.
+
+        Args:
+            kind (str): The kind of reply, used as the metrics label.
+            cache_key (CacheKey): The key of the reply in the cache.
+            dependency (str): The Redis key whose changes invalidate the reply.
+            loader (Callable[[], Awaitable[Any]]): Reads the reply from Redis.
+
+        Returns:
+            Any: The cached or the loaded reply.
+        """
+
+        async def fetch(connection: AbstractConnection) -> Any:
+            # Read the dependency on a tracked connection, so its changes are pushed.
+            await self._send(connection, "GET", dependency)
+            return await loader()
+
+        return await self._get(kind, cache_key, (dependency,), fetch)
+
+    def flush(self, reason: str = "flush") -> None:
+        """
+        Drop all the cached replies.
+
+        Args:
+            reason (str, optional): Why the cache is flushed, used as the metrics label.
+        """
+        self._generation += 1
+        if self._entries:
+            CLIENT_CACHE_INVALIDATIONS.labels(reason=reason).inc(len(self._entries))
+        self._entries.clear()
+        self._dependents.clear()
+        CLIENT_CACHE_SIZE.set(0)
+
+    def invalidate(self, keys: Sequence[Any]) -> None:
+        """
+        Drop the cached replies depending on the keys.
+
+        Args:
+            keys (Sequence[Any]): The invalidated Redis keys.
+        """
+        self._generation += 1
+        for key in keys:
+            for cache_key in self._dependents.pop(_decode(key), ()):
+                if self._remove(cache_key):
+                    CLIENT_CACHE_INVALIDATIONS.labels(reason="push").inc()
+        CLIENT_CACHE_SIZE.set(len(self._entries))
+
+    async def start(self, timeout: float = 5.0) -> None:
+        """
+        Start the invalidation listener and wait for it to connect.
+
+        A listener that fails to connect in time is logged, the cache is bypassed until
+        it connects.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the listener. Defaults to 5.0.
+        """
+        self._listener_task = asyncio.create_task(self._listen())
+        connected = asyncio.create_task(self._connected.wait())
+        # A listener that cannot be set up ends without connecting.
+        await asyncio.wait(
+            {self._listener_task, connected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        if not connected.done():
+            connected.cancel()
+            logger.error("The client-side cache listener did not connect, using Redis.")
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener, drop the cache and close its connections."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self.flush()
+        await self._pool.aclose()
+
+    async def _get(
+        self,
+        kind: str,
+        cache_key: CacheKey,
+        keys: Tuple[str, ...],
+        fetch: Callable[[AbstractConnection], Awaitable[Any]],
+    ) -> Any:
+        """Serve a reply from the cache, or fetch it on a tracked connection and cache it."""
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            self._entries.move_to_end(cache_key)
+            CLIENT_CACHE_HITS.labels(kind=kind).inc()
+            return entry[0]
+
+        CLIENT_CACHE_MISSES.labels(kind=kind).inc()
+        if not self._pool.can_get_connection():
+            return await self._without_tracking(fetch)
+        generation = self._generation
+        value = await self._with_connection(fetch)
+        if self.ready and generation == self._generation and self._trackable(keys):
+            self._store(cache_key, keys, value)
+        return value
+
+    def _trackable(self, keys: Tuple[str, ...]) -> bool:
+        """Check that Redis sends the invalidations of the keys."""
+        if not self._broadcast or not self._prefixes:
+            return True
+        return all(key.startswith(self._prefixes) for key in keys)
+
+    def _store(self, cache_key: CacheKey, keys: Tuple[str, ...], value: Any) -> None:
+        """Cache a reply, evicting the least recently used replies over the size limit."""
+        self._entries[cache_key] = (value, keys)
+        for key in keys:
+            self._dependents.setdefault(key, set()).add(cache_key)
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+            CLIENT_CACHE_INVALIDATIONS.labels(reason="evicted").inc()
+        CLIENT_CACHE_SIZE.set(len(self._entries))
+
+    def _remove(self, cache_key: CacheKey) -> bool:
+        """Remove a cached reply and its key dependencies."""
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return False
+        for key in entry[1]:
+            dependents = self._dependents.get(key)
+            if dependents is not None:
+                dependents.discard(cache_key)
+                if not dependents:
+                    del self._dependents[key]
+        return True
+
+    async def _with_connection(self, fetch: Callable[[AbstractConnection], Awaitable[Any]]) -> Any:
+        """Run a fetch on a pooled connection, tracked by the listener in the default mode."""
+        # The command name is required by redis 5.0 and unused by the pool.
+        connection = await self._pool.get_connection("PING")
+        try:
+            listener_id = self._listener_id
+            tracking_id = getattr(connection, "tracking_id", None)
+            if not self._broadcast and listener_id is not None and tracking_id != listener_id:
+                if tracking_id is not None:
+                    # Tracking cannot be redirected while it is on.
+                    await self._send(connection, "CLIENT", "TRACKING", "OFF")
+                await self._send(connection, "CLIENT", "TRACKING", "ON", "REDIRECT", listener_id)
+                connection.tracking_id = listener_id  # type: ignore
+            return await fetch(connection)
+        except ResponseError:
+            raise
+        except (RedisError, OSError):
+            # The keys tracked by the connection are not invalidated anymore.
+            await connection.disconnect()
+            self.flush("disconnect")
+            raise
+        finally:
+            await self._pool.release(connection)
+
+    async def _without_tracking(self, fetch: Callable[[AbstractConnection], Awaitable[Any]]) -> Any:
+        """Run a fetch on a connection of the main pool, its reply cannot be cached."""
+        # The command name is required by redis 5.0 and unused by the pool.
+        connection = await self._main_pool.get_connection("PING")
+        try:
+            return await fetch(connection)
+        except ResponseError:
+            raise
+        except (RedisError, OSError):
+            await connection.disconnect()
+            raise
+        finally:
+            await self._main_pool.release(connection)
+
+    @staticmethod
+    async def _send(connection: AbstractConnection, *args: Any) -> Any:
+        """Send a command on a connection and read its reply."""
+        await connection.send_command(*args)
+        return await connection.read_response()
+
+    def _on_connect(self, connection: AbstractConnection) -> None:
+        """Flush the cache when a tracked connection reconnects, its tracking was lost."""
+        if getattr(connection, "tracking_id", None) is not None:
+            self.flush("disconnect")
+        connection.tracking_id = None  # type: ignore
+
+    def _on_push(self, response: List[Any]) -> None:
+        """Handle a push, a null key list of an invalidation means the database was flushed."""
+        if _decode(response[0]) != "invalidate":
+            return
+        if response[1] is None:
+            self.flush()
+        else:
+            self.invalidate(response[1])
+
+    async def _on_invalidate(self, response: List[Any]) -> None:
+        """Handle an invalidation push, awaited by the parser of redis 5.1 and later."""
+        self._on_push(response)
+
+    def _set_push_handler(self, connection: AbstractConnection) -> None:
+        """Register the invalidation handler with the parser of the listener connection."""
+        parser = connection._parser  # type: ignore
+        if hasattr(parser, "set_invalidation_push_handler"):
+            parser.set_invalidation_push_handler(self._on_invalidate)
+        else:
+            # redis 5.0 hands every push to one handler, and does not await it.
+            parser.set_push_handler(self._on_push)
+
+    async def _listen(self) -> None:
+        """
+        Keep the listener connected and apply the invalidation pushes it receives.
+
+        The listener reconnects after a connection error, and stops after any other
+        failure, such as a redis client without the push API, leaving the cache bypassed.
+        """
+        while True:
+            connection = self._pool.connection_class(
+                **{**self._pool.connection_kwargs, "parser_class": _AsyncRESP3Parser}
+            )
+            try:
+                await connection.connect()
+                self._set_push_handler(connection)
+                listener_id = await self._send(connection, "CLIENT", "ID")
+                if self._broadcast:
+                    prefixes: List[str] = []
+                    for prefix in self._prefixes:
+                        prefixes += ["PREFIX", prefix]
+                    await self._send(connection, "CLIENT", "TRACKING", "ON", "BCAST", *prefixes)
+                self.flush()
+                self._listener_id = listener_id
+                self._connected.set()
+                logger.info("Client-side cache listener connected as client %s.", listener_id)
+                while True:
+                    await connection.read_response(timeout=None, push_request=True)
+            except (RedisError, OSError) as exc:
+                logger.error("Client-side cache listener disconnected: %s", exc)
+            except Exception:
+                logger.exception("The client-side cache listener failed, using Redis.")
+                return
+            finally:
+                self._listener_id = None
+                self._connected.clear()
+                self.flush("disconnect")
+                await connection.disconnect()
+            await asyncio.sleep(self._retry_interval)
@@ -0,0 +1,67 @@
+"""
+This module provides a Redis connection pool counting its connections.
+
+The counts are kept by the pool itself, through the methods redis-py lets child classes
+override, so the pool metrics do not read the internals of the redis-py pool.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from typing import Any, Set
+
+from redis.asyncio import ConnectionPool
+from redis.asyncio.connection import AbstractConnection
+
+
+class MeteredConnectionPool(ConnectionPool):
+    """Connection pool counting the connections it created and the ones in use.
+
+    Attributes:
+        created (int): The connections created by the pool since it was reset.
+    """
+
+    def __init__(self, **kwargs: Any):
+        """
+        Initialize an empty pool.
+
+        Args:
+            **kwargs: The arguments of the redis-py connection pool.
+        """
+        super().__init__(**kwargs)
+        self.created = 0
+        self._checked_out: Set[AbstractConnection] = set()
+
+    def reset(self) -> None:
+        """Drop the connections of the pool and their counts."""
+        super().reset()
+        self.created = 0
+        self._checked_out = set()
+
+    def make_connection(self) -> AbstractConnection:
+        """Create a new connection, counting it."""
+        connection = super().make_connection()
+        self.created += 1
+        return connection
+
+    async def get_connection(self, *args: Any, **kwargs: Any) -> AbstractConnection:
+        """Get a connected connection from the pool, counting it as in use."""
+        connection = await super().get_connection(*args, **kwargs)
+        self._checked_out.add(connection)
+        return connection
+
+    async def release(self, connection: AbstractConnection) -> None:
+        """Release a connection back to the pool."""
+        # Also called by the pool for a connection that failed to connect.
+        self._checked_out.discard(connection)
+        await super().release(connection)
+
+    @property
+    def in_use(self) -> int:
+        """Return the number of connections handed out and not released yet."""
+        return len(self._checked_out)
+
+    @property
+    def idle(self) -> int:
+        """Return the number of connections waiting in the pool."""
+        return self.created - self.in_use
@@ -0,0 +1,172 @@
+"""
+This module provides an in-process cache of search query results.
+
+Results are kept for a fixed time to live and the least recently used ones are evicted
+when the cache holds more entries, or more estimated bytes, than its limits. Every read
+returns a copy of the cached result, so a caller modifying it does not change what the
+next caller gets.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import copy
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple, Union
+
+from redis.commands.search.query import Query
+
+QueryKey = Tuple[Hashable, ...]
+
+
+def estimate_size(value: Any, _seen: Optional[Set[int]] = None) -> int:
+    """
+    Estimate the memory held by a search result.
+
+    Args:
+        value (Any): The result, made of dictionaries, sequences, scalars and objects.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(key, seen) + estimate_size(item, seen) for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(estimate_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        # Result and Document objects of the RESP2 replies.
+        size += estimate_size(vars(value), seen)
+    return size
+
+
+class QueryResultCache:
+    """TTL and LRU bounded cache of search results, keyed by the normalized query."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        """
+        Initialize an empty cache.
+
+        Args:
+            ttl (float): Seconds a result is served from the cache.
+            max_entries (int): The maximum number of cached results.
+            max_bytes (int): The maximum estimated size of the cached results.
+        """
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[QueryKey, Tuple[float, int, Any]]" = OrderedDict()
+        self._size = 0
+        # Bumped by every clear, so results read across one are not cached.
+        self._generation = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached results."""
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """
+        Get the estimated size of the cached results.
+
+        Returns:
+            int: The estimated size in bytes.
+        """
+        return self._size
+
+    @property
+    def generation(self) -> int:
+        """
+        Get the number of times the cache was cleared.
+
+        Returns:
+            int: The generation to pass to put.
+        """
+        return self._generation
+
+    @staticmethod
+    def key(
+        index_name: str,
+        query: Union[str, Query],
+        query_params: Optional[Dict[str, Union[str, int, float]]] = None,
+    ) -> QueryKey:
+        """
+        Build the cache key of a query.
+
+        A query string is normalized the way the Search client runs it, so "*" and
+        Query("*") share a key, and runs of whitespace in the query string are collapsed.
+
+        Args:
+            index_name (str): The name of the searched index.
+            query (Union[str, Query]): The search query.
+            query_params (Optional[Dict[str, Union[str, int, float]]], optional): The
+                query parameters. Defaults to None.
+
+        Returns:
+            QueryKey: The key of the query, including its paging and parameters.
+        """
+        if not isinstance(query, Query):
+            query = Query(query)
+        query_string, *args = query.get_args()
+        params = tuple(sorted((query_params or {}).items()))
+        return (index_name, " ".join(str(query_string).split()), *args, params)
+
+    def get(self, key: QueryKey) -> Optional[Any]:
+        """
+        Get a copy of a cached result.
+
+        Args:
+            key (QueryKey): The key of the query.
+
+        Returns:
+            Optional[Any]: The result, or None if it is not cached or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(entry[2])
+
+    def put(self, key: QueryKey, result: Any, generation: int) -> None:
+        """
+        Cache a copy of a result, evicting the least recently used results over the limits.
+
+        Args:
+            key (QueryKey): The key of the query.
+            result (Any): The result of the query.
+            generation (int): The generation read before the query was sent, the result
+                is dropped if the cache was cleared since.
+        """
+        if generation != self._generation:
+            return
+        size = estimate_size(result)
+        if size > self._max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self._ttl, size, copy.deepcopy(result))
+        self._size += size
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Drop all the cached results."""
+        self._generation += 1
+        self._entries.clear()
+        self._size = 0
+
+    def _remove(self, key: QueryKey) -> None:
+        """Remove a cached result."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
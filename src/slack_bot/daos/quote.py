@@ -0,0 +1,57 @@
+"""
+This module provides the record type of the quote documents.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from typing import Any, Tuple
+
+
+class Quote:
+    """A quote document, decoded from the projected fields of a search result.
+
+    Attributes:
+        FIELDS (Tuple[str, str]): The document fields the record is decoded from, in the
+            order of the constructor arguments.
+        text (str): The text of the quote.
+        person (str): The author of the quote.
+    """
+
+    FIELDS: Tuple[str, str] = ("quote", "person")
+
+    __slots__ = ("text", "person")
+
+    def __init__(self, text: str, person: str):
+        """
+        Initialize the quote.
+
+        Args:
+            text (str): The text of the quote.
+            person (str): The author of the quote.
+        """
+        self.text = text
+        self.person = person
+
+    def __eq__(self, other: Any) -> bool:
+        """Compare the quotes by their fields."""
+        if not isinstance(other, Quote):
+            return NotImplemented
+        return self.text == other.text and self.person == other.person
+
+    def __hash__(self) -> int:
+        """Hash the quote by its fields, as equal quotes must hash the same."""
+        return hash((self.text, self.person))
+
+    def __repr__(self) -> str:
+        """Return the representation of the quote."""
+        return f"Quote(text={self.text!r}, person={self.person!r})"
+
+    def as_tuple(self) -> Tuple[str, str]:
+        """
+        Get the quote as a tuple.
+
+        Returns:
+            Tuple[str, str]: The text of the quote and its author.
+        """
+        return self.text, self.person
@@ -0,0 +1,232 @@
+"""
+This module provides an in-process cache of the quote corpus.
+
+The corpus is small enough to be held by every worker, so random quotes can be selected
+in memory instead of going to Redis on every interaction. The cache reloads itself when
+the indexer publishes a new corpus version and falls back to Redis when the corpus is
+larger than the configured maximum size.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import logging
+import random
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from ..utils.metrics import (
+    CORPUS_CACHE_HITS,
+    CORPUS_CACHE_MISSES,
+    CORPUS_CACHE_REFRESHES,
+    CORPUS_CACHE_SIZE,
+)
+from .redis_dao_factory_async import AsyncRedisDAOFactory
+from .redis_dao_search_async import AsyncSearchRedisDAO
+
+logger = logging.getLogger("app")
+
+
+class QuoteCorpusCache:
+    """In-process cache of the quote corpus used for random quote selection.
+
+    Quotes are stored in a flat list, and the authors, which repeat a lot, are stored
+    once and referenced by position from an unsigned int array.
+
+    Attributes:
+        _caches (Dict[str, QuoteCorpusCache]): The running caches, keyed by index name.
+    """
+
+    _caches: Dict[str, "QuoteCorpusCache"] = {}
+
+    def __init__(self, redis_dao: AsyncSearchRedisDAO, max_size: int, refresh_interval: float):
+        """
+        Initialize an empty cache.
+
+        Args:
+            redis_dao (AsyncSearchRedisDAO): The DAO of the index the corpus is loaded from.
+            max_size (int): The maximum number of quotes to hold. Larger corpora are
+                served from Redis.
+            refresh_interval (float): Seconds between version checks when no version
+                message is received.
+        """
+        self._redis_dao = redis_dao
+        self._max_size = max_size
+        self._refresh_interval = refresh_interval
+        self._quotes: List[str] = []
+        self._person_ids: array = array("I")
+        self._persons: List[str] = []
+        self._version: Optional[Any] = None
+        self._refresh_task: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        """Return the number of cached quotes."""
+        return len(self._quotes)
+
+    @property
+    def version(self) -> Optional[Any]:
+        """
+        Get the corpus version the cache was loaded from.
+
+        Returns:
+            Optional[Any]: The loaded version, or None if no version was published yet.
+        """
+        return self._version
+
+    def random_quote(self) -> Optional[Tuple[str, str]]:
+        """
+        Select a random quote from the cache.
+
+        Returns:
+            Optional[Tuple[str, str]]: A tuple containing the quote and the author's name,
+                or None if the cache is empty and the caller has to fall back to Redis.
+        """
+        index_name = self._redis_dao.search_index_name
+        if not self._quotes:
+            CORPUS_CACHE_MISSES.labels(index=index_name).inc()
+            return None
+
+        idx = random.randrange(len(self._quotes))
+        CORPUS_CACHE_HITS.labels(index=index_name).inc()
+        return self._quotes[idx], self._persons[self._person_ids[idx]]
+
+    async def load(self) -> None:
+        """
+        Load the corpus from the documents listed in the key set.
+
+        Raises:
+            RedisError: If the corpus could not be read from Redis.
+        """
+        index_name = self._redis_dao.search_index_name
+        client = self._redis_dao.client
+        try:
+            version = await client.get(self._redis_dao.version_key)
+            size = await client.scard(self._redis_dao.keyset_name)
+            if size > self._max_size:
+                logger.warning(
+                    "Corpus of %s quotes exceeds the cache size of %s, using Redis.",
+                    size,
+                    self._max_size,
+                )
+                self._swap([], array("I"), [], version)
+                CORPUS_CACHE_REFRESHES.labels(index=index_name, result="oversized").inc()
+                return
+
+            keys = await client.smembers(self._redis_dao.keyset_name)
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hmget(key, "quote", "person")
+                rows = await pipe.execute()
+        except RedisError:
+            CORPUS_CACHE_REFRESHES.labels(index=index_name, result="failure").inc()
+            raise
+
+        quotes: List[str] = []
+        person_ids = array("I")
+        persons: List[str] = []
+        person_lookup: Dict[str, int] = {}
+        for quote, person in rows:
+            # The document was deleted after the key set was read.
+            if quote is None or person is None:
+                continue
+            person_id = person_lookup.get(person)
+            if person_id is None:
+                person_id = person_lookup[person] = len(persons)
+                persons.append(person)
+            quotes.append(quote)
+            person_ids.append(person_id)
+
+        self._swap(quotes, person_ids, persons, version)
+        CORPUS_CACHE_REFRESHES.labels(index=index_name, result="success").inc()
+        logger.info("Loaded %s quotes into the corpus cache, version %s.", len(quotes), version)
+
+    async def refresh(self) -> None:
+        """Reload the corpus if the published version differs from the loaded one."""
+        version = await self._redis_dao.client.get(self._redis_dao.version_key)
+        if version != self._version:
+            await self.load()
+
+    def _swap(
+        self, quotes: List[str], person_ids: array, persons: List[str], version: Optional[Any]
+    ) -> None:
+        """Replace the cached corpus in one step, without yielding to the event loop."""
+        self._quotes = quotes
+        self._person_ids = person_ids
+        self._persons = persons
+        self._version = version
+        CORPUS_CACHE_SIZE.labels(index=self._redis_dao.search_index_name).set(len(quotes))
+
+    async def _refresh_loop(self) -> None:
+        """Wait for version messages, checking the version at least every refresh interval."""
+        pubsub = self._redis_dao.client.pubsub()
+        try:
+            while True:
+                try:
+                    if not pubsub.subscribed:
+                        await pubsub.subscribe(self._redis_dao.version_key)
+                    await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=self._refresh_interval
+                    )
+                    await self.refresh()
+                except RedisError as exc:
+                    logger.error("Failed to refresh the corpus cache: %s", exc)
+                    await asyncio.sleep(self._refresh_interval)
+        finally:
+            await pubsub.aclose()
+
+    @classmethod
+    async def start(
+        cls, search_index_name: str, max_size: int, refresh_interval: float
+    ) -> "QuoteCorpusCache":
+        """
+        Create, load and register a cache for the index, using the existing connection pool.
+
+        A failed initial load is logged and the cache starts empty, serving from Redis
+        until the next successful refresh.
+
+        Args:
+            search_index_name (str): The name of the index the corpus is loaded from.
+            max_size (int): The maximum number of quotes to hold.
+            refresh_interval (float): Seconds between version checks.
+
+        Returns:
+            QuoteCorpusCache: The running cache.
+        """
+        redis_dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool(search_index_name)
+        cache = cls(redis_dao, max_size, refresh_interval)
+        try:
+            await cache.load()
+        except RedisError as exc:
+            logger.error("Failed to load the corpus cache: %s", exc)
+
+        cache._refresh_task = asyncio.create_task(cache._refresh_loop())
+        cls._caches[search_index_name] = cache
+        return cache
+
+    @classmethod
+    def get_cache(cls, search_index_name: str) -> Optional["QuoteCorpusCache"]:
+        """
+        Get the running cache for the index.
+
+        Args:
+            search_index_name (str): The name of the index.
+
+        Returns:
+            Optional[QuoteCorpusCache]: The cache, or None if caching is not enabled.
+        """
+        return cls._caches.get(search_index_name)
+
+    @classmethod
+    async def stop_all(cls) -> None:
+        """Stop the refresh tasks and unregister all the caches."""
+        for cache in cls._caches.values():
+            if cache._refresh_task is not None:
+                cache._refresh_task.cancel()
+                try:
+                    await cache._refresh_task
+                except asyncio.CancelledError:
+                    pass
+        cls._caches.clear()
@@ -0,0 +1,61 @@
+"""
+This module provides an async DAO claiming keys in Redis.
+
+A claim is a key set only if it does not exist, with a TTL, so one caller at a time
+owns it until it expires or is released. The keys of a DAO live in its own namespace.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from redis.asyncio import ConnectionPool
+from redis.asyncio import Redis as AsyncRedis
+
+from .redis_dao_search_async import timed_command
+
+
+class AsyncClaimRedisDAO:
+    """Claims and releases the keys of a namespace.
+
+    Attributes:
+        client (AsyncRedis): The Redis client on the connection pool.
+        namespace (str): The prefix of the claimed keys.
+    """
+
+    def __init__(self, connection_pool: ConnectionPool, namespace: str):
+        """
+        Initialize the DAO.
+
+        Args:
+            connection_pool (ConnectionPool): The pool the commands borrow connections from.
+            namespace (str): The prefix of the claimed keys, such as "slack:dedup:".
+        """
+        self.client = AsyncRedis(connection_pool=connection_pool)
+        self.namespace = namespace
+
+    async def claim(self, key: str, ttl: int) -> bool:
+        """
+        Claims a key, only if it is not claimed already.
+
+        Args:
+            key (str): The key, without the namespace.
+            ttl (int): Seconds before the claim expires.
+
+        Returns:
+            bool: True if the key was claimed, False if it was already claimed.
+        """
+        with timed_command("SET"):
+            return bool(await self.client.set(self.namespace + key, 1, nx=True, ex=ttl))
+
+    async def release(self, key: str) -> bool:
+        """
+        Releases a claimed key, so it can be claimed again.
+
+        Args:
+            key (str): The key, without the namespace.
+
+        Returns:
+            bool: True if the key was claimed, False if it was not.
+        """
+        with timed_command("DEL"):
+            return bool(await self.client.delete(self.namespace + key))
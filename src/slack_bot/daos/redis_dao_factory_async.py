@@ -2,24 +2,62 @@
 This module provides an async factory class for managing the creation
 of different types of async Redis Data Access Objects (DAOs).
 
+The factory keeps a registry of connection pools keyed by their connection parameters,
+so callers asking for different servers, databases or response decoding get their own
+pool. The first pool created is the existing pool used by the application, and the DAOs
+handed out on it are cached per index name for the lifetime of the pool.
+
 Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+import asyncio
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from redis.asyncio import ConnectionPool, RedisError
+from redis.asyncio.connection import AbstractConnection
 
+from ..utils.metrics import REDIS_POOL_CONNECTIONS
+from .client_side_cache import ClientSideCache
+from .metered_connection_pool import MeteredConnectionPool
+from .query_result_cache import QueryResultCache
+from .redis_dao_claim_async import AsyncClaimRedisDAO
 from .redis_dao_search_async import AsyncSearchRedisDAO
 
 logger = logging.getLogger("app")
 
 
+# Time to live in seconds, maximum entries and maximum bytes of the query result caches.
+QueryCacheSettings = Tuple[float, int, int]
+
+# Connection parameters identifying a pool: host, port, db, password, max connections
+# and response decoding.
+PoolKey = Tuple[str, int, int, str, int, bool]
+
+
 class AsyncRedisDAOFactory:
-    """Factory class for managing dao creation."""
+    """Factory class for managing dao creation.
+
+    Attributes:
+        _connection_pool (Optional[ConnectionPool]): The existing pool, the first one created.
+        _connection_pools (Dict[PoolKey, ConnectionPool]): The pools, keyed by their
+            connection parameters.
+        _pool_labels (Dict[PoolKey, str]): The metrics labels of the pools, unique per key.
+        _daos (Dict[str, AsyncSearchRedisDAO]): The DAOs on the existing pool, keyed by
+            index name.
+        _client_cache (Optional[ClientSideCache]): The client-side cache used by the DAOs
+            on the existing pool, if enabled.
+        _query_cache_settings (Optional[QueryCacheSettings]): The limits of the query result
+            cache of every cached DAO, if enabled.
+    """
 
     _connection_pool: Optional[ConnectionPool] = None
+    _connection_pools: Dict[PoolKey, ConnectionPool] = {}
+    _pool_labels: Dict[PoolKey, str] = {}
+    _daos: Dict[str, AsyncSearchRedisDAO] = {}
+    _client_cache: Optional[ClientSideCache] = None
+    _query_cache_settings: Optional[QueryCacheSettings] = None
 
     @classmethod
     def get_connection_pool(
@@ -31,8 +69,8 @@ class AsyncRedisDAOFactory:
         max_connections: int,
         decode_responses: bool = True,
     ) -> ConnectionPool:
-        """Create and return a Redis connection pool if it doesn't exist,
-        otherwise return the existing one.
+        """Create and return a Redis connection pool for the connection parameters if it
+        doesn't exist, otherwise return the existing one.
 
         Args:
             host (str): Redis host address.
@@ -40,13 +78,16 @@ class AsyncRedisDAOFactory:
             db (int): Redis database number.
             password (str): Redis password.
             max_connections (int): Max connections for Redis.
+            decode_responses (bool, optional): Whether to decode responses from Redis.
 
         Returns:
             ConnectionPool: Redis connection pool object.
         """
-        if cls._connection_pool is None:
+        key: PoolKey = (host, port, db, password, max_connections, decode_responses)
+        connection_pool = cls._connection_pools.get(key)
+        if connection_pool is None:
             try:
-                cls._connection_pool = ConnectionPool(
+                connection_pool = MeteredConnectionPool(
                     host=host,
                     port=port,
                     db=db,
@@ -58,14 +99,164 @@ class AsyncRedisDAOFactory:
             except RedisError as exc:
                 logger.error("Failed to create a Redis connection pool: %s", exc)
                 raise exc
-        return cls._connection_pool
+            cls._connection_pools[key] = connection_pool
+            cls._register_pool_metrics(cls._pool_label(key), connection_pool)
+        if cls._connection_pool is None:
+            cls._connection_pool = connection_pool
+        return connection_pool
+
+    @classmethod
+    async def warm_up_connection_pool(
+        cls, connections: int, connection_pool: Optional[ConnectionPool] = None
+    ) -> int:
+        """
+        Open connections ahead of the first request.
+
+        The first request then does not pay for the TCP connect and the HELLO handshake.
+        Failures are logged and the remaining connections are opened on demand.
+
+        Args:
+            connections (int): The number of connections to open, capped at the pool size.
+            connection_pool (Optional[ConnectionPool], optional): The pool to warm up.
+                Defaults to the existing pool.
+
+        Returns:
+            int: The number of connections opened.
+
+        Raises:
+            ValueError: If no pool is given and no connection pool has been created yet.
+        """
+        pool = connection_pool or cls._connection_pool
+        if pool is None:
+            raise ValueError(
+                "No existing connection pool found. Initialize the connection pool first."
+            )
+
+        acquired: List[AbstractConnection] = []
+        try:
+            for _ in range(min(connections, pool.max_connections)):
+                # The command name is required by redis 5.0 and unused by the pool.
+                acquired.append(await pool.get_connection("PING"))
+        except (RedisError, OSError) as exc:
+            logger.error("Failed to warm up the Redis connection pool: %s", exc)
+        finally:
+            await asyncio.gather(*(pool.release(connection) for connection in acquired))
+        logger.info("Warmed up %s Redis connections.", len(acquired))
+        return len(acquired)
+
+    @classmethod
+    def _pool_label(cls, key: PoolKey) -> str:
+        """
+        Name a pool in the metrics, by its connection parameters.
+
+        The password is not exported, so the pools differing only by their password are
+        numbered in the order they are created.
+
+        Args:
+            key (PoolKey): The connection parameters of the pool.
+
+        Returns:
+            str: The label, such as "localhost:6379/0 max=10" or "localhost:6379/0 max=10 raw".
+        """
+        host, port, db, _, max_connections, decode_responses = key
+        label = f"{host}:{port}/{db} max={max_connections}{'' if decode_responses else ' raw'}"
+        taken = set(cls._pool_labels.values())
+        unique, number = label, 1
+        while unique in taken:
+            number += 1
+            unique = f"{label} #{number}"
+        cls._pool_labels[key] = unique
+        return unique
+
+    @staticmethod
+    def _register_pool_metrics(label: str, connection_pool: MeteredConnectionPool) -> None:
+        """Export the in-use and idle connection counts of a pool, their sum is created."""
+        REDIS_POOL_CONNECTIONS.labels(pool=label, state="in_use").set_function(
+            lambda: connection_pool.in_use
+        )
+        REDIS_POOL_CONNECTIONS.labels(pool=label, state="idle").set_function(
+            lambda: connection_pool.idle
+        )
+
+    @classmethod
+    async def start_client_cache(
+        cls,
+        max_entries: int,
+        broadcast: bool = False,
+        prefixes: Sequence[str] = (),
+        max_connections: int = 2,
+    ) -> ClientSideCache:
+        """
+        Start the client-side cache used by the DAOs created on the existing pool.
+
+        The pool of the tracked connections is exported with the pool metrics, under the
+        label of the existing pool followed by "client-cache".
+
+        Args:
+            max_entries (int): The maximum number of cached replies.
+            broadcast (bool, optional): Use the broadcast tracking mode. Defaults to False.
+            prefixes (Sequence[str], optional): The key prefixes tracked in the broadcast
+                mode, all the keys when empty.
+            max_connections (int, optional): The size of the pool of tracked connections.
+                Defaults to 2.
+
+        Returns:
+            ClientSideCache: The running cache.
+
+        Raises:
+            ValueError: If no connection pool has been created yet.
+        """
+        if cls._connection_pool is None:
+            raise ValueError(
+                "No existing connection pool found. Initialize the connection pool first."
+            )
+        client_cache = ClientSideCache(
+            cls._connection_pool, max_entries, broadcast, prefixes, max_connections=max_connections
+        )
+        label = next(
+            (
+                cls._pool_labels[key]
+                for key, pool in cls._connection_pools.items()
+                if pool is cls._connection_pool and key in cls._pool_labels
+            ),
+            "existing",
+        )
+        cls._register_pool_metrics(f"{label} client-cache", client_cache.connection_pool)
+        await client_cache.start()
+        cls._client_cache = client_cache
+        cls._daos.clear()
+        return client_cache
+
+    @classmethod
+    def enable_query_cache(cls, ttl: float, max_entries: int, max_bytes: int) -> None:
+        """
+        Give every DAO cached on the existing pool its own query result cache.
+
+        Args:
+            ttl (float): Seconds a search result is served from the cache.
+            max_entries (int): The maximum number of cached results per DAO.
+            max_bytes (int): The maximum estimated size of the cached results per DAO.
+        """
+        cls._query_cache_settings = (ttl, max_entries, max_bytes)
+        cls._daos.clear()
 
     @classmethod
     async def reset_connection_pool(cls) -> None:
-        """Reset the connection pool and log the reset action."""
-        if cls._connection_pool is not None:
-            await cls._connection_pool.aclose()
-            cls._connection_pool = None
+        """Close all the connection pools and log the reset action."""
+        if cls._client_cache is not None:
+            await cls._client_cache.stop()
+            cls._client_cache = None
+        pools = list(cls._connection_pools.values())
+        if cls._connection_pool is not None and cls._connection_pool not in pools:
+            pools.append(cls._connection_pool)
+        for connection_pool in pools:
+            await connection_pool.aclose()
+        cls._connection_pools.clear()
+        cls._pool_labels.clear()
+        cls._connection_pool = None
+        cls._daos.clear()
+        cls._query_cache_settings = None
+        REDIS_POOL_CONNECTIONS.clear()
         logger.info("Connection pool reset.")
 
     @classmethod
@@ -73,6 +264,8 @@ class AsyncRedisDAOFactory:
         cls,
         connection_pool: ConnectionPool,
         search_index_name: Optional[str] = None,
+        client_cache: Optional[ClientSideCache] = None,
+        result_cache: Optional[QueryResultCache] = None,
     ) -> AsyncSearchRedisDAO:
         """
         Choose and return the appropriate DAO based on the dao_type.
@@ -80,6 +273,8 @@ class AsyncRedisDAOFactory:
         Args:
             connection_pool (ConnectionPool): The connection pool to use for the DAO.
             search_index_name (Optional[str]): The name of the index used by the Search client.
+            client_cache (Optional[ClientSideCache]): The client-side cache of the DAO.
+            result_cache (Optional[QueryResultCache]): The query result cache of the DAO.
 
         Returns:
             AsyncSearchRedisDAO: DAO object based on the specified type.
@@ -92,6 +287,8 @@ class AsyncRedisDAOFactory:
         return AsyncSearchRedisDAO(
             connection_pool=connection_pool,
             search_index_name=search_index_name,
+            client_cache=client_cache,
+            result_cache=result_cache,
         )
 
     @classmethod
@@ -117,7 +314,61 @@ class AsyncRedisDAOFactory:
                 "No existing connection pool found. Initialize the connection pool first."
             )
 
-        return cls._dao(cls._connection_pool, search_index_name)
+        return cls._dao(cls._connection_pool, search_index_name, cls._client_cache)
+
+    @classmethod
+    def get_redis_dao_with_existing_pool(cls, search_index_name: str) -> AsyncSearchRedisDAO:
+        """
+        Return the long-lived DAO of the index on the existing connection pool.
+
+        The DAO is created on first use and reused until the pool is reset. It holds no
+        connection of its own, every command borrows one from the pool, so it is safe
+        to share between concurrent coroutines. When enabled, it gets its own query
+        result cache.
+
+        Args:
+            search_index_name (str): The name of the index used by the Search client.
+
+        Raises:
+            ValueError: If no connection pool has been created yet.
+
+        Returns:
+            AsyncSearchRedisDAO: The cached DAO of the index.
+        """
+        dao = cls._daos.get(search_index_name)
+        # The pool was replaced since the DAO was cached.
+        if dao is None or dao.client.connection_pool is not cls._connection_pool:
+            if cls._connection_pool is None:
+                raise ValueError(
+                    "No existing connection pool found. Initialize the connection pool first."
+                )
+            result_cache = None
+            if cls._query_cache_settings is not None:
+                result_cache = QueryResultCache(*cls._query_cache_settings)
+            dao = cls._daos[search_index_name] = cls._dao(
+                cls._connection_pool, search_index_name, cls._client_cache, result_cache
+            )
+        return dao
+
+    @classmethod
+    def get_claim_dao_with_existing_pool(cls, namespace: str) -> AsyncClaimRedisDAO:
+        """
+        Return a DAO claiming the keys of a namespace on the existing connection pool.
+
+        Args:
+            namespace (str): The prefix of the claimed keys.
+
+        Raises:
+            ValueError: If no connection pool has been created yet.
+
+        Returns:
+            AsyncClaimRedisDAO: The DAO of the namespace.
+        """
+        if cls._connection_pool is None:
+            raise ValueError(
+                "No existing connection pool found. Initialize the connection pool first."
+            )
+        return AsyncClaimRedisDAO(cls._connection_pool, namespace)
 
     @classmethod
     def create_redis_dao(
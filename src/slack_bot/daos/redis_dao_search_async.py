@@ -6,8 +6,29 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+import asyncio
+import contextlib
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional, Union
+import random
+import time
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 from redis.asyncio import ConnectionPool as AsyncConnectionPool
 from redis.asyncio import Redis as AsyncRedis
@@ -15,10 +36,137 @@ from redis.commands.search import AsyncSearch
 from redis.commands.search.field import Field
 from redis.commands.search.indexDefinition import IndexDefinition
 from redis.commands.search.query import Query
-from redis.exceptions import ResponseError
+from redis.exceptions import NoScriptError, RedisError, ResponseError
+
+from ..exceptions.custom_exceptions import IndexingError
+from ..utils.metrics import REDIS_COMMAND_SECONDS
+from ..utils.tracing import Tracer
+from .client_side_cache import OVERSIZED, ClientSideCache
+from .query_result_cache import QueryResultCache
+from .quote import Quote
 
 logger = logging.getLogger("app")
 
+# Picks a random member of the key set and returns it together with its hash fields,
+# so a random document costs a single round trip regardless of the corpus size.
+# The script reads a hash key it picks itself, not one declared in KEYS, so it is not
+# cluster-safe: it requires a single Redis node, as the search index does.
+RANDOM_DOCUMENT_SCRIPT = """
+local key = redis.call('SRANDMEMBER', KEYS[1])
+if not key then
+    return nil
+end
+return {key, redis.call('HGETALL', key)}
+"""
+RANDOM_DOCUMENT_SCRIPT_SHA = hashlib.sha1(RANDOM_DOCUMENT_SCRIPT.encode("utf-8")).hexdigest()
+
+
+@contextlib.contextmanager
+def timed_command(command: str) -> Iterator[None]:
+    """
+    Record the latency of a Redis command, failed or not, in a span when tracing.
+
+    Args:
+        command (str): The Redis command, such as "FT.SEARCH".
+    """
+    started = time.perf_counter()
+    try:
+        with Tracer.span(f"redis.{command}"):
+            yield
+    finally:
+        REDIS_COMMAND_SECONDS.labels(command=command).observe(time.perf_counter() - started)
+
+
+# A document to write, its key and its fields.
+Document = Tuple[str, Mapping[str, Any]]
+
+# The record type projected search results are decoded into.
+R = TypeVar("R")
+
+
+class BulkWriteResult(NamedTuple):
+    """The outcome of a bulk write.
+
+    Attributes:
+        written (int): The number of documents written.
+        failed (Dict[str, str]): The error of every document that failed, keyed by its key.
+        batches (int): The number of pipelines sent.
+    """
+
+    written: int
+    failed: Dict[str, str]
+    batches: int
+
+
+def _decode(value: Any) -> Any:
+    """Decode bytes replies, returned when the connection pool does not decode responses."""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _info_field(info: Any, name: str) -> Any:
+    """
+    Get a field from an FT.INFO reply.
+
+    The reply is a map with RESP3 and a flat list of name/value pairs with RESP2,
+    and the names are bytes when the responses are not decoded.
+    """
+    if isinstance(info, (list, tuple)):
+        info = dict(zip(info[::2], info[1::2]))
+    for key, value in info.items():
+        if _decode(key) == name:
+            return value
+    return None
+
+
+def _aggregate_rows(reply: Any) -> List[Dict[str, Any]]:
+    """
+    Get the rows of an FT.AGGREGATE or FT.CURSOR READ reply as dictionaries.
+
+    The reply is a map of results with RESP3 and a list of the total followed by flat
+    lists of name/value pairs with RESP2.
+    """
+    if isinstance(reply, dict):
+        results = _info_field(reply, "results") or []
+        rows = [_info_field(result, "extra_attributes") or {} for result in results]
+    else:
+        rows = [dict(zip(row[::2], row[1::2])) for row in reply[1:]]
+    return [{_decode(name): value for name, value in row.items()} for row in rows]
+
+
+def _projected_records(
+    reply: Any, fields: Sequence[str], record: Callable[..., R]
+) -> Tuple[int, List[R]]:
+    """
+    Decode an FT.SEARCH reply of projected fields into records.
+
+    The fields are passed to the record in order, None for the fields a document lacks.
+    The reply is a map of results with RESP3 and a flat list of the total followed by
+    document ids and name/value lists with RESP2.
+    """
+    positions = {field: idx for idx, field in enumerate(fields)}
+    records: List[R] = []
+    if isinstance(reply, dict):
+        total = _info_field(reply, "total_results") or 0
+        for result in _info_field(reply, "results") or []:
+            attributes = _info_field(result, "extra_attributes") or {}
+            values: List[Any] = [None] * len(fields)
+            for name, value in attributes.items():
+                idx = positions.get(_decode(name))
+                if idx is not None:
+                    values[idx] = _decode(value)
+            records.append(record(*values))
+        return total, records
+
+    total = reply[0]
+    for attributes in reply[2::2]:
+        values = [None] * len(fields)
+        for pos in range(0, len(attributes), 2):
+            idx = positions.get(_decode(attributes[pos]))
+            if idx is not None:
+                values[idx] = _decode(attributes[pos + 1])
+        records.append(record(*values))
+    return total, records
+
 
 class AsyncSearchRedisDAO:
     """DAO class for managing Redis search interactions.
@@ -30,12 +178,18 @@ class AsyncSearchRedisDAO:
         client (Redis): The Redis client instance.
         _search_client (Optional[Search]): The Redis Search client instance.
         _search_index_name (Optional[str]): The name of the search index.
+        client_cache (Optional[ClientSideCache]): The client-side cache of the quote
+            documents and the search results, if enabled.
+        result_cache (Optional[QueryResultCache]): The in-process cache of the search
+            results, cleared when the DAO changes the index or its documents, if enabled.
     """
 
     def __init__(
         self,
         connection_pool: AsyncConnectionPool,
         search_index_name: str,
+        client_cache: Optional[ClientSideCache] = None,
+        result_cache: Optional[QueryResultCache] = None,
     ):
         """
         Initialize the Redis Search DAO with a connection pool and an optional search index name.
@@ -43,8 +197,14 @@ class AsyncSearchRedisDAO:
         Args:
             connection_pool (ConnectionPool): The connection pool to use with the Redis client.
             search_index_name (str): The name of the index used by the Search client.
+            client_cache (Optional[ClientSideCache], optional): The client-side cache to serve
+                the random documents and the search results from. Defaults to None.
+            result_cache (Optional[QueryResultCache], optional): The cache to serve repeated
+                search queries from. Defaults to None.
         """
         self.client: AsyncRedis = AsyncRedis(connection_pool=connection_pool)
+        self.client_cache = client_cache
+        self.result_cache = result_cache
 
         if search_index_name is None:  # type: ignore
             raise ValueError("Search index name required.")
@@ -72,13 +232,40 @@ class AsyncSearchRedisDAO:
         """
         return self._search_index_name
 
+    @property
+    def keyset_name(self) -> str:
+        """
+        Get the name of the set holding the keys of all the documents in the index.
+
+        The set is maintained by the indexer next to the hash documents and is used
+        to pick random documents without paging through the search index.
+
+        Returns:
+            str: The name of the key set.
+        """
+        return f"{self._search_index_name}:keys"
+
+    @property
+    def version_key(self) -> str:
+        """
+        Get the name of the key holding the version of the indexed corpus.
+
+        The indexer increments the version on every load and publishes it on a channel
+        with the same name, so in-process caches know when to refresh.
+
+        Returns:
+            str: The name of the version key and channel.
+        """
+        return f"{self._search_index_name}:version"
+
     async def index_info(self) -> Dict[str, Any]:
         """Get information about the search index.
 
         Returns:
             Dict[str, Any]: A dictionary containing information about the search index.
         """
-        return await self.search_client.info()
+        with timed_command("FT.INFO"):
+            return await self.search_client.info()
 
     async def index_drop(self, delete_documents: bool = False) -> bool:
         """
@@ -101,7 +288,10 @@ class AsyncSearchRedisDAO:
             existing documents. If delete_documents=True, you will need to add
             all the documents back to Redis.
         """
-        return await self.search_client.dropindex(delete_documents=delete_documents)
+        try:
+            return await self.search_client.dropindex(delete_documents=delete_documents)
+        finally:
+            self._clear_result_cache()
 
     async def index_exists(self) -> bool:
         """
@@ -116,6 +306,95 @@ class AsyncSearchRedisDAO:
         except ResponseError:
             return False
 
+    async def resolve_index_name(self) -> Optional[str]:
+        """
+        Resolve the name of the index behind the search index name, which can be an alias.
+
+        Returns:
+            Optional[str]: The name of the index, or None if neither an index nor an alias
+                with the search index name exists.
+        """
+        try:
+            info = await self.index_info()
+        except ResponseError:
+            return None
+        return _decode(_info_field(info, "index_name"))
+
+    async def index_prefixes(self) -> List[str]:
+        """
+        Get the key prefixes covered by the search index.
+
+        Returns:
+            List[str]: The key prefixes from the index definition.
+        """
+        definition = _info_field(await self.index_info(), "index_definition")
+        prefixes = _info_field(definition, "prefixes") or []
+        return [_decode(prefix) for prefix in prefixes]
+
+    async def wait_for_indexing(
+        self, poll_interval: float = 0.5, timeout: Optional[float] = None
+    ) -> None:
+        """
+        Wait until FT.INFO reports that the background indexing of the index is complete.
+
+        Args:
+            poll_interval (float, optional): Seconds between FT.INFO calls. Defaults to 0.5.
+            timeout (Optional[float], optional): Maximum seconds to wait. Defaults to None,
+                waiting until the indexing completes.
+
+        Raises:
+            IndexingError: If the indexing did not complete within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            info = await self.index_info()
+            indexing = float(_decode(_info_field(info, "indexing") or 0))
+            percent_indexed = float(_decode(_info_field(info, "percent_indexed") or 1))
+            if indexing == 0 and percent_indexed >= 1:
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                raise IndexingError(
+                    f"Index {self._search_index_name} is {percent_indexed:.0%} indexed "
+                    f"after {timeout} seconds."
+                )
+            await asyncio.sleep(poll_interval)
+
+    async def alias_add(self, alias: str) -> Any:
+        """
+        Add an alias pointing to the search index. Fails if the alias already exists.
+
+        Args:
+            alias (str): The name of the alias.
+
+        Returns:
+            Any: The Redis reply.
+        """
+        return await self.search_client.aliasadd(alias)
+
+    async def alias_update(self, alias: str) -> Any:
+        """
+        Points an alias to the search index, atomically moving it from its previous index.
+
+        Args:
+            alias (str): The name of the alias.
+
+        Returns:
+            Any: The Redis reply.
+        """
+        return await self.search_client.aliasupdate(alias)
+
+    async def alias_delete(self, alias: str) -> Any:
+        """
+        Delete an alias.
+
+        Args:
+            alias (str): The name of the alias.
+
+        Returns:
+            Any: The Redis reply.
+        """
+        return await self.search_client.aliasdel(alias)
+
     async def index_create(
         self,
         fields: List[Field],
@@ -131,10 +410,13 @@ class AsyncSearchRedisDAO:
         Returns:
             None
         """
-        return await self.search_client.create_index(
-            fields,
-            definition=definition,
-        )
+        try:
+            return await self.search_client.create_index(
+                fields,
+                definition=definition,
+            )
+        finally:
+            self._clear_result_cache()
 
     async def index_search(
         self,
@@ -144,6 +426,9 @@ class AsyncSearchRedisDAO:
         """
         Executes a search query on the search index and returns the result.
 
+        Identical queries are served from the result cache, when the DAO has one, until
+        they expire or the DAO changes the index or its documents.
+
         Args:
             query (Union[str, Query]): The search query. This can be a string or a Query object.
             query_params (Optional[dict[str, Union[str, int, float]]], optional): Additional
@@ -153,7 +438,154 @@ class AsyncSearchRedisDAO:
         Returns:
             Result: The result of the search query.
         """
-        return await self.search_client.search(query, query_params)
+        if self.result_cache is None:
+            return await self._search(query, query_params)
+
+        key = QueryResultCache.key(self._search_index_name, query, query_params)
+        result = self.result_cache.get(key)
+        if result is None:
+            generation = self.result_cache.generation
+            result = await self._search(query, query_params)
+            self.result_cache.put(key, result, generation)
+        return result
+
+    async def _search(
+        self,
+        query: Union[str, Query],
+        query_params: Optional[dict[str, Union[str, int, float]]] = None,
+    ) -> Dict[Union[bytes, str], Any]:
+        """Run a search query, through the client-side cache when it is ready."""
+        if self.client_cache is not None and self.client_cache.ready:
+            # Search results are not tracked by Redis, the indexer bumps the corpus version
+            # when the indexed documents change.
+            return await self.client_cache.get_or_load(
+                "search",
+                ("FT.SEARCH", *QueryResultCache.key(self._search_index_name, query, query_params)),
+                self.version_key,
+                lambda: self._search_index(query, query_params),
+            )
+        return await self._search_index(query, query_params)
+
+    async def _search_index(
+        self,
+        query: Union[str, Query],
+        query_params: Optional[dict[str, Union[str, int, float]]] = None,
+    ) -> Dict[Union[bytes, str], Any]:
+        """Run a search query on Redis."""
+        with timed_command("FT.SEARCH"):
+            return await self.search_client.search(query, query_params)
+
+    def _clear_result_cache(self) -> None:
+        """Drop the cached search results after the index or its documents changed."""
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    async def search_projected(
+        self, query: Query, fields: Sequence[str], record: Callable[..., R]
+    ) -> Tuple[int, List[R]]:
+        """
+        Execute a search query returning only the given fields, decoded into records.
+
+        The fields are requested with RETURN and passed straight to the record type,
+        without building the result dictionaries of `index_search`. The results are not
+        cached.
+
+        Args:
+            query (Query): The search query, its paging included.
+            fields (Sequence[str]): The fields to return, in the order of the record
+                constructor arguments.
+            record (Callable[..., R]): The record type, called with the field values.
+
+        Returns:
+            Tuple[int, List[R]]: The total number of matching documents and the records
+                of the returned page.
+        """
+        with timed_command("FT.SEARCH"):
+            reply = await self.client.execute_command(
+                "FT.SEARCH",
+                self._search_index_name,
+                *query.get_args(),
+                "RETURN",
+                len(fields),
+                *fields,
+            )
+        return _projected_records(reply, fields, record)
+
+    async def search_quotes(self, query: Query) -> Tuple[int, List[Quote]]:
+        """
+        Execute a search query returning only the quote fields, decoded into Quote records.
+
+        Args:
+            query (Query): The search query, its paging included.
+
+        Returns:
+            Tuple[int, List[Quote]]: The total number of matching documents and the quotes
+                of the returned page.
+        """
+        return await self.search_projected(query, Quote.FIELDS, Quote)
+
+    async def stream_documents(
+        self,
+        query: str = "*",
+        fields: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+        max_idle: Optional[int] = None,
+        query_params: Optional[Dict[str, Union[str, int, float]]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams the documents matching a query, reading them in batches through a cursor.
+
+        The documents are read with FT.AGGREGATE WITHCURSOR and FT.CURSOR READ, so only
+        one batch is held in memory however many documents match, and every batch costs
+        the same no matter how far into the results it is. The cursor is deleted when the
+        iteration is stopped before the end.
+
+        Args:
+            query (str, optional): The search query. Defaults to "*", all the documents.
+            fields (Optional[Sequence[str]], optional): The fields to load, "__key" loads
+                the document key. Defaults to None, loading all the fields.
+            batch_size (int, optional): Documents read per round trip. Defaults to 1000.
+            max_idle (Optional[int], optional): Milliseconds the cursor is kept between
+                reads. Defaults to None, the server default.
+            query_params (Optional[Dict[str, Union[str, int, float]]], optional): The
+                parameters of the query. Defaults to None.
+
+        Yields:
+            Dict[str, Any]: The loaded fields of every matching document.
+        """
+        args: List[Any] = ["FT.AGGREGATE", self._search_index_name, query]
+        if fields is None:
+            args += ["LOAD", "*"]
+        else:
+            args += ["LOAD", len(fields), *(f"@{field}" for field in fields)]
+        args += ["WITHCURSOR", "COUNT", batch_size]
+        if max_idle is not None:
+            args += ["MAXIDLE", max_idle]
+        if query_params:
+            args += ["PARAMS", 2 * len(query_params)]
+            for name, value in query_params.items():
+                args += [name, value]
+            args += ["DIALECT", 2]
+
+        reply, cursor_id = await self.client.execute_command(*args)
+        try:
+            while True:
+                for row in _aggregate_rows(reply):
+                    yield row
+                if not cursor_id:
+                    return
+                reply, cursor_id = await self.client.execute_command(
+                    "FT.CURSOR", "READ", self._search_index_name, cursor_id, "COUNT", batch_size
+                )
+        finally:
+            if cursor_id:
+                try:
+                    await self.client.execute_command(
+                        "FT.CURSOR", "DEL", self._search_index_name, cursor_id
+                    )
+                except RedisError as exc:
+                    # The cursor expires on the server after max_idle anyway.
+                    logger.warning("Failed to delete cursor %s: %s", cursor_id, str(exc))
 
     async def list_indexes(self) -> List[str]:
         """
@@ -175,6 +607,9 @@ class AsyncSearchRedisDAO:
         """
         Adds a document to the search index.
 
+        FT.ADD is a legacy command sent once per document, use `upsert_documents` to
+        write many documents.
+
         Args:
             doc_id (str): The unique identifier for the document.
             fields (Dict[str, Any]): The fields of the document.
@@ -204,3 +639,160 @@ class AsyncSearchRedisDAO:
                 "Index %s Error adding document: %s,", self._search_index_name, str(exc)
             )
             return False
+        finally:
+            self._clear_result_cache()
+
+    async def upsert_documents(
+        self,
+        documents: Union[Iterable[Document], AsyncIterable[Document]],
+        batch_size: int = 1000,
+        concurrency: int = 4,
+    ) -> BulkWriteResult:
+        """
+        Write documents with HSET, adding their keys to the key set of the index.
+
+        The documents are read lazily and written in non-transactional pipelines of
+        `batch_size` documents. Up to `concurrency` pipelines are in flight at once, each
+        on its own pooled connection, so memory stays bounded by the pipelines in flight.
+        A failed document or pipeline is reported without stopping the others, whatever
+        the error of the pipeline, and only the documents of the completed pipelines are
+        counted as written.
+
+        Args:
+            documents (Union[Iterable[Document], AsyncIterable[Document]]): The keys and
+                fields of the documents.
+            batch_size (int, optional): Documents per pipeline. Defaults to 1000.
+            concurrency (int, optional): Pipelines in flight, capped at the pool size.
+                Defaults to 4.
+
+        Returns:
+            BulkWriteResult: The number of documents written and the failed documents.
+
+        Raises:
+            Exception: Any error raised while reading the documents, after the pipelines
+                in flight are written, whatever their outcome.
+        """
+        # Every pipeline in flight holds a pooled connection, never ask for more than the pool has.
+        max_connections = self.client.connection_pool.max_connections
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, max_connections)))
+        batches: List[List[Document]] = []
+        tasks: List["asyncio.Task[Dict[str, str]]"] = []
+
+        async def start(batch: List[Document]) -> None:
+            await semaphore.acquire()
+            task = asyncio.create_task(self.write_documents(batch))
+            task.add_done_callback(lambda _: semaphore.release())
+            batches.append(batch)
+            tasks.append(task)
+
+        batch: List[Document] = []
+        try:
+            if isinstance(documents, AsyncIterable):
+                async for document in documents:
+                    batch.append(document)
+                    if len(batch) == batch_size:
+                        await start(batch)
+                        batch = []
+            else:
+                for document in documents:
+                    batch.append(document)
+                    if len(batch) == batch_size:
+                        await start(batch)
+                        batch = []
+            if batch:
+                await start(batch)
+        except Exception:
+            # Let the pipelines in flight finish before reporting the read error, their
+            # own errors must not replace it.
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        written = 0
+        failed: Dict[str, str] = {}
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, BaseException):
+                # A pipeline failing outside of Redis, or cancelled, fails its documents.
+                error = str(outcome) or type(outcome).__name__
+                outcome = {key: error for key, _ in batch}
+            failed.update(outcome)
+            written += len(batch) - len(outcome)
+        return BulkWriteResult(written, failed, len(tasks))
+
+    async def write_documents(self, documents: Sequence[Document]) -> Dict[str, str]:
+        """
+        Write documents with HSET in a single non-transactional pipeline.
+
+        Args:
+            documents (Sequence[Document]): The keys and fields of the documents.
+
+        Returns:
+            Dict[str, str]: The error of every document that failed, keyed by its key,
+                all of them if the pipeline failed.
+        """
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, mapping in documents:
+                    pipe.hset(key, mapping=mapping)  # type: ignore
+                    pipe.sadd(self.keyset_name, key)  # type: ignore
+                # The pipeline of HSETs, with the SADDs of their keys, in one round trip.
+                with timed_command("HSET"):
+                    replies = await pipe.execute(raise_on_error=False)
+        except RedisError as exc:
+            return {key: str(exc) for key, _ in documents}
+        finally:
+            self._clear_result_cache()
+
+        failed: Dict[str, str] = {}
+        # Every document has an HSET and an SADD reply.
+        for (key, _), hset_reply, sadd_reply in zip(documents, replies[::2], replies[1::2]):
+            for reply in (hset_reply, sadd_reply):
+                if isinstance(reply, Exception):
+                    failed[key] = str(reply)
+                    break
+        return failed
+
+    async def bump_corpus_version(self) -> int:
+        """
+        Increments the corpus version and publishes it on the version channel.
+
+        Returns:
+            int: The new corpus version.
+        """
+        version = await self.client.incr(self.version_key)
+        await self.client.publish(self.version_key, version)
+        return version
+
+    async def random_document(self) -> Optional[Dict[Union[bytes, str], Any]]:
+        """
+        Fetch a random document using the key set maintained next to the index.
+
+        The member selection and the hash read run server side in a single Lua script,
+        so the cost is one round trip no matter how many documents are indexed. The script
+        reads a key not declared in KEYS, so it requires a single Redis node, not a cluster.
+        With the client-side cache the member is selected from the cached key set and the
+        document is served from the cache, without a round trip once both are cached.
+
+        Returns:
+            Optional[Dict[Union[bytes, str], Any]]: The fields of the random document,
+                or None if the key set is missing/empty or points to a deleted document.
+        """
+        if self.client_cache is not None and self.client_cache.ready:
+            members = await self.client_cache.smembers(self.keyset_name)
+            if members is not OVERSIZED:
+                if not members:
+                    return None
+                return await self.client_cache.hgetall(random.choice(members)) or None
+
+        with timed_command("EVALSHA"):
+            try:
+                reply = await self.client.evalsha(RANDOM_DOCUMENT_SCRIPT_SHA, 1, self.keyset_name)
+            except NoScriptError:
+                await self.client.script_load(RANDOM_DOCUMENT_SCRIPT)
+                reply = await self.client.evalsha(RANDOM_DOCUMENT_SCRIPT_SHA, 1, self.keyset_name)
+
+        if not reply or not reply[1]:
+            return None
+
+        fields = reply[1]
+        return dict(zip(fields[::2], fields[1::2]))
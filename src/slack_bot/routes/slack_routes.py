@@ -7,10 +7,16 @@ Copyright: 2023 Translucent Computing Inc.
 """
 
 import logging
+from typing import Any, Optional
 
-from fastapi import APIRouter, FastAPI, Request
+from fastapi import APIRouter, FastAPI, Request, Response
 from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
 from slack_bolt.async_app import AsyncApp
+from slack_sdk.web.async_client import AsyncWebClient
+
+from ..services.slack_http_session import SlackHttpSession
+from ..services.slack_request_deduplicator import SlackRequestDeduplicator
+from ..utils.tracing import Tracer
 
 logger = logging.getLogger("app")
 
@@ -22,6 +28,8 @@ class SlackRoutes:
         settings (Settings): FastAPI app settings.
         slack_app (AsyncApp): The Slack app instance.
         app_handler (AsyncSlackRequestHandler): Slack request handler.
+        deduplicator (Optional[SlackRequestDeduplicator]): Deduplicator of the Slack
+            retries, if enabled.
         router (APIRouter): The FastAPI router for these routes.
 
     Methods:
@@ -41,14 +49,31 @@ class SlackRoutes:
 
         self.settings = app.state.settings
 
-        self.slack_app = AsyncApp(
+        # The outbound Slack calls use the shared session once the lifespan starts it
+        client = AsyncWebClient(
             token=self.settings.slack_bot_token,
+            logger=logger,
+            timeout=self.settings.slack_http_timeout,  # type: ignore
+        )
+        SlackHttpSession.bind(client)
+
+        self.slack_app = AsyncApp(
+            client=client,
             signing_secret=self.settings.slack_signing_secret,
             logger=logger,
         )
+        self.slack_app.middleware(SlackHttpSession.respond_middleware)  # type: ignore
 
         self.app_handler = AsyncSlackRequestHandler(self.slack_app)
 
+        self.deduplicator: Optional[SlackRequestDeduplicator] = None
+        if self.settings.slack_dedup_enabled:
+            self.deduplicator = SlackRequestDeduplicator(
+                signing_secret=self.settings.slack_signing_secret,
+                ttl=self.settings.slack_dedup_ttl,
+                lru_size=self.settings.slack_dedup_lru_size,
+            )
+
         self.router = APIRouter()
         self._configure_routes()
 
@@ -66,7 +91,7 @@ class SlackRoutes:
             Returns:
                 Any: The result from the Slack request handler.
             """
-            return await self.app_handler.handle(req, {"settings": self.settings})
+            return await self._handle(req)
 
         @self.router.post("/slack/interactions")
         async def endpoint_interactions(req: Request):
@@ -79,8 +104,60 @@ class SlackRoutes:
             Returns:
                 Any: The result from the Slack request handler.
             """
+            return await self._handle(req)
+
+    async def _handle(self, req: Request) -> Any:
+        """
+        Hands a request to Bolt, answering the already delivered ones right away.
+
+        When tracing is enabled, the request runs in the root span of its trace, reported
+        in the Server-Timing header of the response if configured.
+
+        Args:
+            req (Request): The incoming request from FastAPI.
+
+        Returns:
+            Any: The result from the Slack request handler, or an empty 200 response
+                for a duplicate.
+        """
+        with Tracer.span("route", path=req.url.path) as span:
+            response = await self._dispatch(req)
+            if span is not None and self.settings.tracing_server_timing:
+                response.headers["Server-Timing"] = Tracer.server_timing(span)
+            return response
+
+    async def _dispatch(self, req: Request) -> Any:
+        """
+        Hands a request to Bolt unless it is a duplicate.
+
+        The claim of a request that fails, raising or answering with a server error, is
+        released so that the retry of Slack is handled.
+
+        Args:
+            req (Request): The incoming request from FastAPI.
+
+        Returns:
+            Any: The result from the Slack request handler, or an empty 200 response
+                for a duplicate.
+        """
+        if self.deduplicator is None:
             return await self.app_handler.handle(req, {"settings": self.settings})
 
+        if await self.deduplicator.is_duplicate(req):
+            logger.info(
+                "Skipped a duplicate Slack request, retry %s.",
+                req.headers.get("X-Slack-Retry-Num"),
+            )
+            return Response(status_code=200)
+        try:
+            response = await self.app_handler.handle(req, {"settings": self.settings})
+        except Exception:
+            await self.deduplicator.release(req)
+            raise
+        if response.status_code >= 500:
+            await self.deduplicator.release(req)
+        return response
+
     def get_router(self) -> APIRouter:
         """
         Retrieves the router configured with the Slack routes.
@@ -0,0 +1,188 @@
+"""
+This module provides a bounded executor for the follow-up work of Slack listeners.
+
+A listener run in the background acknowledges the request in the request task and
+queues the rest of its work, so a slow Redis or Slack call does not hold the HTTP
+worker. The queue is served by a fixed number of worker tasks, bounding the number of
+concurrent listener runs, and what happens to the work submitted to a full queue is
+set by the overflow policy of the executor.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Literal, Optional, Tuple
+
+from ..utils.metrics import (
+    LISTENER_ERRORS,
+    LISTENER_OVERFLOWS,
+    LISTENER_QUEUE_DEPTH,
+    LISTENER_QUEUE_WAIT_SECONDS,
+    LISTENER_RUN_SECONDS,
+)
+
+logger = logging.getLogger("app")
+
+# "reject" drops the submitted work, "drop_oldest" drops the longest queued work to
+# make room, and "run_inline" runs the submitted work in the caller's task.
+OverflowPolicy = Literal["reject", "drop_oldest", "run_inline"]
+
+Job = Callable[[], Awaitable[None]]
+
+
+class ListenerExecutor:
+    """Bounded pool of worker tasks running queued listener work.
+
+    The queue and the workers are created on the running event loop by the first
+    submit, or by start, and an executor stopped at shutdown can be started again.
+
+    Attributes:
+        _running (Dict[str, ListenerExecutor]): The started executors, keyed by name.
+    """
+
+    _running: Dict[str, "ListenerExecutor"] = {}
+
+    def __init__(
+        self, name: str, workers: int, queue_size: int, overflow: OverflowPolicy = "reject"
+    ):
+        """
+        Initialize a stopped executor.
+
+        Args:
+            name (str): The name of the executor, used as the metrics label.
+            workers (int): The number of worker tasks, the maximum concurrent listener runs.
+            queue_size (int): The maximum number of listener runs waiting for a worker.
+            overflow (OverflowPolicy, optional): What to do with work submitted to a full
+                queue. Defaults to "reject".
+
+        Raises:
+            ValueError: If the number of workers or the queue size is not positive.
+        """
+        if workers < 1 or queue_size < 1:
+            raise ValueError("The executor needs at least one worker and one queue slot.")
+        self.name = name
+        self._workers = workers
+        self._queue_size = queue_size
+        self._overflow = overflow
+        self._queue: Optional["asyncio.Queue[Tuple[str, float, Job]]"] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def depth(self) -> int:
+        """
+        Get the number of listener runs waiting for a worker.
+
+        Returns:
+            int: The queue depth.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Create the queue and the worker tasks on the running event loop."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(self._queue_size)
+        self._tasks = [asyncio.create_task(self._work(self._queue)) for _ in range(self._workers)]
+        self._running[self.name] = self
+        LISTENER_QUEUE_DEPTH.labels(executor=self.name).set(0)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Wait for the queued listener runs to finish, then stop the worker tasks.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the queue to drain, the
+                listener runs not finished after it are cancelled. Defaults to 5.0.
+        """
+        queue, self._queue = self._queue, None
+        tasks, self._tasks = self._tasks, []
+        self._running.pop(self.name, None)
+        if queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Cancelled the unfinished listener runs of the %s executor, %s still queued.",
+                self.name,
+                queue.qsize(),
+            )
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        LISTENER_QUEUE_DEPTH.labels(executor=self.name).set(0)
+
+    async def submit(self, listener: str, job: Job) -> bool:
+        """
+        Queue the work of a listener, applying the overflow policy if the queue is full.
+
+        Args:
+            listener (str): The name of the listener, used as the metrics label.
+            job (Job): The coroutine function running the work.
+
+        Returns:
+            bool: True if the work was queued or run, False if it was dropped.
+        """
+        self.start()
+        queue = self._queue
+        assert queue is not None
+        if queue.full():
+            LISTENER_OVERFLOWS.labels(
+                executor=self.name, listener=listener, policy=self._overflow
+            ).inc()
+            if self._overflow == "run_inline":
+                await self._run(listener, time.perf_counter(), job)
+                return True
+            if self._overflow == "reject":
+                logger.warning("Rejected the %s listener run, the queue is full.", listener)
+                return False
+            dropped, _, _ = queue.get_nowait()
+            queue.task_done()
+            logger.warning("Dropped a queued %s listener run, the queue is full.", dropped)
+
+        queue.put_nowait((listener, time.perf_counter(), job))
+        LISTENER_QUEUE_DEPTH.labels(executor=self.name).set(queue.qsize())
+        return True
+
+    async def _work(self, queue: "asyncio.Queue[Tuple[str, float, Job]]") -> None:
+        """Run the queued listener work, one run at a time."""
+        while True:
+            listener, queued_at, job = await queue.get()
+            LISTENER_QUEUE_DEPTH.labels(executor=self.name).set(queue.qsize())
+            try:
+                await self._run(listener, queued_at, job)
+            finally:
+                queue.task_done()
+
+    async def _run(self, listener: str, queued_at: float, job: Job) -> None:
+        """Run the work of a listener, recording its wait and run time."""
+        started = time.perf_counter()
+        LISTENER_QUEUE_WAIT_SECONDS.labels(executor=self.name, listener=listener).observe(
+            started - queued_at
+        )
+        try:
+            await job()
+        except Exception as error:
+            # There is no request left to report the error to.
+            LISTENER_ERRORS.labels(exception=type(error).__name__).inc()
+            logger.exception("The %s listener failed in the background.", listener)
+        finally:
+            LISTENER_RUN_SECONDS.labels(executor=self.name, listener=listener).observe(
+                time.perf_counter() - started
+            )
+
+    @classmethod
+    async def stop_all(cls, timeout: float = 5.0) -> None:
+        """
+        Stop all the started executors.
+
+        Args:
+            timeout (float, optional): Seconds each executor waits for its queue to drain.
+                Defaults to 5.0.
+        """
+        for executor in list(cls._running.values()):
+            await executor.stop(timeout)
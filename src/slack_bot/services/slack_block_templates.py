@@ -0,0 +1,174 @@
+"""
+This module provides pre-serialized Block Kit templates for the Slack responses.
+
+The blocks are built once, when the module is imported, with the Slack SDK models and
+converted to the dictionaries that are sent to Slack. Responses reuse the static blocks
+as they are and copy only the blocks that carry per-request values, such as the user id
+or the quote, so no Block Kit objects are built or serialized on the request path.
+
+The template dictionaries are shared between requests and must not be mutated.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from typing import Any, Dict, List
+
+from slack_sdk.models.blocks import (
+    ActionsBlock,
+    ButtonElement,
+    MarkdownTextObject,
+    PlainTextObject,
+    SectionBlock,
+    TextObject,
+)
+
+# Placeholder text for the slotted blocks, the Slack SDK rejects sections without text.
+SLOT = "{slot}"
+
+
+def _with_text(template: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """
+    Copy a section block template, replacing the text of its text object.
+
+    Args:
+        template (Dict[str, Any]): The section block template.
+        text (str): The text to put in the copy.
+
+    Returns:
+        Dict[str, Any]: The filled section block.
+    """
+    return {**template, "text": {**template["text"], "text": text}}
+
+
+class SlackBlockTemplates:
+    """Ready-to-send Block Kit responses with slots for the per-request values."""
+
+    SLEEPING: Dict[str, Any] = SectionBlock(
+        block_id="response", text=MarkdownTextObject(text="*Sleeeeeping* :sleeping:")
+    ).to_dict()
+
+    GREETING: Dict[str, Any] = SectionBlock(block_id="response", text=SLOT).to_dict()
+
+    HOW_ARE_YOU: Dict[str, Any] = ActionsBlock(
+        block_id="how_are_you",
+        elements=[
+            ButtonElement(
+                action_id="good",
+                text=TextObject(type=PlainTextObject.type, text="Good", emoji=True),
+                value="good",
+                style="primary",
+            ),
+            ButtonElement(
+                action_id="bad",
+                text=TextObject(type=PlainTextObject.type, text="Bad", emoji=True),
+                value="bad",
+                style="danger",
+            ),
+        ],
+    ).to_dict()
+
+    GOOD_LEAD_IN: Dict[str, Any] = SectionBlock(
+        block_id="response_1",
+        text=MarkdownTextObject(
+            text="*Amazing!* Let's see if this quote will enhance your day a bit more."
+        ),
+    ).to_dict()
+
+    BAD_LEAD_IN: Dict[str, Any] = SectionBlock(
+        block_id="response_1",
+        text=MarkdownTextObject(text="Let's see if the universe has something good to say."),
+    ).to_dict()
+
+    QUOTE: Dict[str, Any] = SectionBlock(
+        block_id="response_2", text=MarkdownTextObject(text=SLOT)
+    ).to_dict()
+
+    GOOD_NO_QUOTE: Dict[str, Any] = SectionBlock(
+        block_id="response", text=MarkdownTextObject(text="*As you were!*")
+    ).to_dict()
+
+    BAD_NO_QUOTE: Dict[str, Any] = SectionBlock(
+        block_id="response",
+        text=MarkdownTextObject(text="*I'd hope things will get better soon.*"),
+    ).to_dict()
+
+    @staticmethod
+    def sleeping() -> List[Dict[str, Any]]:
+        """
+        Blocks for a mention that does not wake the bot up.
+
+        Returns:
+            List[Dict[str, Any]]: The response blocks.
+        """
+        return [SlackBlockTemplates.SLEEPING]
+
+    @staticmethod
+    def wake_up(user: str) -> List[Dict[str, Any]]:
+        """
+        Blocks greeting the user and asking how they feel.
+
+        Args:
+            user (str): The Slack user id to greet.
+
+        Returns:
+            List[Dict[str, Any]]: The response blocks.
+        """
+        return [
+            _with_text(SlackBlockTemplates.GREETING, f"Hi <@{user}>! How are you feeling!"),
+            SlackBlockTemplates.HOW_ARE_YOU,
+        ]
+
+    @staticmethod
+    def good_quote(quote: str, person: str) -> List[Dict[str, Any]]:
+        """
+        Blocks answering a 'good' interaction with a quote.
+
+        Args:
+            quote (str): The quote text.
+            person (str): The author of the quote.
+
+        Returns:
+            List[Dict[str, Any]]: The response blocks.
+        """
+        return [
+            SlackBlockTemplates.GOOD_LEAD_IN,
+            _with_text(SlackBlockTemplates.QUOTE, f'*"{quote}"* by {person}'),
+        ]
+
+    @staticmethod
+    def good_no_quote() -> List[Dict[str, Any]]:
+        """
+        Blocks answering a 'good' interaction when no quote is available.
+
+        Returns:
+            List[Dict[str, Any]]: The response blocks.
+        """
+        return [SlackBlockTemplates.GOOD_NO_QUOTE]
+
+    @staticmethod
+    def bad_quote(quote: str, person: str) -> List[Dict[str, Any]]:
+        """
+        Blocks answering a 'bad' interaction with a quote.
+
+        Args:
+            quote (str): The quote text.
+            person (str): The author of the quote.
+
+        Returns:
+            List[Dict[str, Any]]: The response blocks.
+        """
+        return [
+            SlackBlockTemplates.BAD_LEAD_IN,
+            _with_text(SlackBlockTemplates.QUOTE, f'*"{quote}"* by {person}'),
+        ]
+
+    @staticmethod
+    def bad_no_quote() -> List[Dict[str, Any]]:
+        """
+        Blocks answering a 'bad' interaction when no quote is available.
+
+        Returns:
+            List[Dict[str, Any]]: The response blocks.
+        """
+        return [SlackBlockTemplates.BAD_NO_QUOTE]
@@ -0,0 +1,333 @@
+"""
+This module provides the shared HTTP session of the outbound Slack calls.
+
+The Slack Web API calls, such as chat.postMessage sent by `say`, and the response_url
+posts sent by `respond` share one aiohttp session, so their connections are kept alive
+and reused across requests instead of opening a new session per call. The session is
+created and closed by the application lifespan, and the latency of every outbound call
+is exported to Prometheus by Slack method, and traced in a span when tracing is enabled.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import logging
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import aiohttp
+from slack_bolt.async_app import AsyncBoltContext, AsyncRespond
+from slack_sdk.models.attachments import Attachment
+from slack_sdk.models.blocks import Block
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.webhook import WebhookResponse
+from slack_sdk.webhook.async_client import AsyncWebhookClient
+
+from ..utils.metrics import SLACK_REQUEST_SECONDS
+from ..utils.tracing import Tracer
+
+logger = logging.getLogger("app")
+
+
+def slack_method(path: str) -> str:
+    """
+    Get the Slack method of an outbound call, the metrics label of its latency.
+
+    Args:
+        path (str): The URL path of the call.
+
+    Returns:
+        str: The Web API method, such as "chat.postMessage", "response_url" for the
+            interaction responses, "webhook" for the incoming webhooks or "other".
+    """
+    if path.startswith("/api/"):
+        return path.removeprefix("/api/")
+    if path.startswith("/actions/"):
+        return "response_url"
+    if path.startswith("/services/"):
+        return "webhook"
+    return "other"
+
+
+async def _on_request_start(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestStartParams,
+) -> None:
+    """Record the start time of an outbound call, and start its span."""
+    context.started = time.perf_counter()
+    context.span = Tracer.start_span(f"slack.{slack_method(params.url.path)}")
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession, context: SimpleNamespace, params: aiohttp.TraceRequestEndParams
+) -> None:
+    """Record the latency of an answered outbound call."""
+    status = str(params.response.status)
+    SLACK_REQUEST_SECONDS.labels(method=slack_method(params.url.path), status=status).observe(
+        time.perf_counter() - context.started
+    )
+    if context.span is not None:
+        context.span.attributes["status"] = status
+        Tracer.end_span(context.span)
+
+
+async def _on_request_exception(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestExceptionParams,
+) -> None:
+    """Record the latency of an outbound call that failed without an answer."""
+    SLACK_REQUEST_SECONDS.labels(method=slack_method(params.url.path), status="error").observe(
+        time.perf_counter() - context.started
+    )
+    if context.span is not None:
+        Tracer.end_span(context.span, params.exception)
+
+
+# The message options of the response_url, besides the text, blocks and attachments.
+RESPOND_OPTIONS = (
+    "response_type",
+    "replace_original",
+    "delete_original",
+    "unfurl_links",
+    "unfurl_media",
+    "thread_ts",
+    "metadata",
+)
+
+
+def _as_dicts(items: Sequence[Union[Dict[str, Any], Block, Attachment]]) -> List[Dict[str, Any]]:
+    """Convert the blocks or attachments of a message to dictionaries."""
+    return [item if isinstance(item, dict) else item.to_dict() for item in items]
+
+
+def _build_message(
+    text: str = "",
+    blocks: Optional[Sequence[Union[Dict[str, Any], Block]]] = None,
+    attachments: Optional[Sequence[Union[Dict[str, Any], Attachment]]] = None,
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Build the body of a response_url post, the way Bolt builds it.
+
+    The blocks, the attachments and the options are left out when empty or None.
+
+    Args:
+        text (str, optional): The text of the message. Defaults to "".
+        blocks (Optional[Sequence[Union[Dict[str, Any], Block]]], optional): The blocks
+            of the message. Defaults to None.
+        attachments (Optional[Sequence[Union[Dict[str, Any], Attachment]]], optional):
+            The attachments of the message. Defaults to None.
+        **options: The message options named in RESPOND_OPTIONS.
+
+    Returns:
+        Dict[str, Any]: The message.
+
+    Raises:
+        TypeError: If an option is not a message option.
+    """
+    unknown = set(options).difference(RESPOND_OPTIONS)
+    if unknown:
+        raise TypeError(f"Unexpected message options: {', '.join(sorted(unknown))}")
+    message: Dict[str, Any] = {"text": text}
+    if blocks:
+        message["blocks"] = _as_dicts(blocks)
+    if attachments:
+        message["attachments"] = _as_dicts(attachments)
+    message.update((name, value) for name, value in options.items() if value is not None)
+    return message
+
+
+class SessionRespond(AsyncRespond):
+    """Bolt `respond` function posting to the response_url with a shared session."""
+
+    def __init__(
+        self,
+        *,
+        response_url: Optional[str],
+        session: aiohttp.ClientSession,
+        timeout: float = 30,
+        **kwargs,
+    ):
+        """
+        Initialize the respond function of a request.
+
+        Args:
+            response_url (Optional[str]): The response_url of the request.
+            session (aiohttp.ClientSession): The shared outbound session.
+            timeout (float, optional): Seconds a post may take in total once the session
+                is closed, the running session applies its own timeouts. Defaults to 30,
+                the timeout of the Slack clients.
+            **kwargs: The proxy and ssl arguments of the Bolt respond function.
+        """
+        super().__init__(response_url=response_url, **kwargs)
+        self.session = session
+        self.timeout = timeout
+
+    async def __call__(
+        self,
+        text: Union[str, Dict[str, Any]] = "",
+        blocks: Optional[Sequence[Union[Dict[str, Any], Block]]] = None,
+        attachments: Optional[Sequence[Union[Dict[str, Any], Attachment]]] = None,
+        **kwargs: Any,
+    ) -> WebhookResponse:
+        """
+        Post a message to the response_url.
+
+        Args:
+            text (Union[str, Dict[str, Any]], optional): The text of the message, or the
+                whole message. Defaults to "".
+            blocks (Optional[Sequence[Union[Dict[str, Any], Block]]], optional): The
+                blocks of the message. Defaults to None.
+            attachments (Optional[Sequence[Union[Dict[str, Any], Attachment]]], optional):
+                The attachments of the message. Defaults to None.
+            **kwargs: The other message options, such as response_type or
+                replace_original.
+
+        Returns:
+            WebhookResponse: The response of Slack.
+
+        Raises:
+            ValueError: If the request has no response_url.
+        """
+        if self.response_url is None:
+            raise ValueError("respond is unsupported here as there is no response_url")
+
+        if isinstance(text, dict):
+            message = _build_message(**text)
+        else:
+            message = _build_message(text=text, blocks=blocks, attachments=attachments, **kwargs)
+
+        client = AsyncWebhookClient(
+            url=self.response_url,
+            session=self.session,
+            timeout=self.timeout,  # type: ignore
+            proxy=self.proxy,
+            ssl=self.ssl,
+        )
+        return await client.send_dict(message)
+
+
+class SlackHttpSession:
+    """Owner of the shared outbound HTTP session.
+
+    The Slack clients only apply their own timeout to the sessions they open, so the calls
+    made through the shared session are timed out by the timeouts of the session. The
+    clients are given the same total timeout for the calls made before it starts.
+
+    Attributes:
+        _session (Optional[aiohttp.ClientSession]): The running session.
+        _client (Optional[AsyncWebClient]): The Web API client of the Slack app using
+            the session.
+    """
+
+    _session: Optional[aiohttp.ClientSession] = None
+    _client: Optional[AsyncWebClient] = None
+
+    @classmethod
+    def bind(cls, client: AsyncWebClient) -> None:
+        """
+        Make the Web API client of the Slack app use the shared session, once started.
+
+        Bolt copies the session of the app client into the client of every request. The
+        client replaces the client bound before, such as the client of a previous app,
+        which goes back to a session per call.
+
+        Args:
+            client (AsyncWebClient): The client of the Slack app.
+        """
+        if cls._client is not None and cls._client is not client:
+            cls._client.session = None
+        cls._client = client
+        client.session = cls._session
+
+    @classmethod
+    def start(
+        cls,
+        limit: int,
+        limit_per_host: int,
+        keepalive_timeout: float,
+        dns_cache_ttl: int,
+        timeout: float,
+        connect_timeout: float,
+    ) -> aiohttp.ClientSession:
+        """
+        Create the shared session on the running event loop and hand it to the client.
+
+        Args:
+            limit (int): The maximum number of open connections, 0 for no limit.
+            limit_per_host (int): The maximum number of open connections to one host,
+                0 for no limit.
+            keepalive_timeout (float): Seconds an idle connection is kept open.
+            dns_cache_ttl (int): Seconds a resolved Slack host is cached.
+            timeout (float): Seconds an outbound call may take in total.
+            connect_timeout (float): Seconds to wait for a connection from the pool,
+                including opening it.
+
+        Returns:
+            aiohttp.ClientSession: The shared session.
+        """
+        if cls._session is not None and not cls._session.closed:
+            return cls._session
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(_on_request_start)
+        trace_config.on_request_end.append(_on_request_end)
+        trace_config.on_request_exception.append(_on_request_exception)
+
+        cls._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=limit,
+                limit_per_host=limit_per_host,
+                keepalive_timeout=keepalive_timeout,
+                ttl_dns_cache=dns_cache_ttl,
+            ),
+            timeout=aiohttp.ClientTimeout(total=timeout, connect=connect_timeout),
+            trace_configs=[trace_config],
+        )
+        if cls._client is not None:
+            cls._client.session = cls._session
+        logger.info("Started the outbound Slack session, %s connections.", limit or "unlimited")
+        return cls._session
+
+    @classmethod
+    def get_session(cls) -> Optional[aiohttp.ClientSession]:
+        """
+        Get the shared session.
+
+        Returns:
+            Optional[aiohttp.ClientSession]: The running session, or None if it is not
+                started and the Slack clients open a session per call.
+        """
+        return cls._session
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared session and its connections."""
+        session, cls._session = cls._session, None
+        if cls._client is not None:
+            cls._client.session = None
+        if session is not None:
+            await session.close()
+
+    @staticmethod
+    async def respond_middleware(context: AsyncBoltContext, next_):
+        """
+        Middleware giving the listeners a `respond` function using the shared session.
+
+        Args:
+            context (AsyncBoltContext): Slack context object.
+            next_ (Callable[[], Awaitable[None]]): Next middleware or handler to call.
+        """
+        session = SlackHttpSession.get_session()
+        if session is not None and context.response_url is not None:
+            context["respond"] = SessionRespond(
+                response_url=context.response_url,
+                session=session,
+                timeout=context.client.timeout,
+                proxy=context.client.proxy,
+                ssl=context.client.ssl,
+            )
+        return await next_()
@@ -0,0 +1,369 @@
+"""
+This module provides a rate limit aware scheduler of the outbound Slack messages.
+
+Slack limits the Web API calls per method and the messages posted per channel, so a
+burst of mentions answered at once turns into rate limited calls and retries. The
+scheduler queues the sends and dispatches them, in the order they were queued, only when the token
+buckets of their method and their channel allow it. A rate limited call pauses its
+method for the Retry-After time and is queued again instead of failing.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, Optional, Set, Tuple
+
+from slack_sdk.errors import SlackApiError
+
+from ..utils.metrics import (
+    SLACK_SCHEDULER_QUEUE_DEPTH,
+    SLACK_SCHEDULER_RATE_LIMITED,
+    SLACK_SCHEDULER_WAIT_SECONDS,
+)
+
+logger = logging.getLogger("app")
+
+# Seconds to pause a method rate limited without a Retry-After header.
+DEFAULT_RETRY_AFTER = 1.0
+
+# Channel buckets kept before the full ones are dropped.
+MAX_CHANNEL_BUCKETS = 1024
+
+Send = Callable[[], Awaitable[Any]]
+
+
+class TokenBucket:
+    """Token bucket refilled at a fixed rate, which can be paused until a given time."""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate (float): The tokens added per second.
+            burst (int): The maximum number of tokens, the calls allowed at once.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last update."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Get the time until a token can be taken.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            float: The seconds to wait, 0 if a token is available.
+        """
+        self._refill(now)
+        wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        return max(wait, self._paused_until - now)
+
+    def take(self, now: float) -> None:
+        """
+        Take a token.
+
+        Args:
+            now (float): The current monotonic time.
+        """
+        self._refill(now)
+        self._tokens -= 1
+
+    def pause(self, until: float) -> None:
+        """
+        Allow no token to be taken before a time.
+
+        Args:
+            until (float): The monotonic time the bucket is paused until.
+        """
+        self._paused_until = max(self._paused_until, until)
+
+    def full(self, now: float) -> bool:
+        """
+        Check if the bucket is full and not paused, so it can be dropped and recreated.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            bool: True if the bucket is full.
+        """
+        self._refill(now)
+        return self._tokens >= self.burst and self._paused_until <= now
+
+
+class _QueuedSend:
+    """A send waiting for its turn, with the future of its caller."""
+
+    __slots__ = ("method", "channel", "send", "future", "queued_at", "attempts")
+
+    def __init__(self, method: str, channel: str, send: Send, future: "asyncio.Future[Any]"):
+        self.method = method
+        self.channel = channel
+        self.send = send
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+
+def retry_after(error: SlackApiError) -> float:
+    """
+    Get the Retry-After time of a rate limited call.
+
+    Args:
+        error (SlackApiError): The error of the call.
+
+    Returns:
+        float: The seconds to wait before calling the method again.
+    """
+    headers = getattr(error.response, "headers", None) or {}
+    for name, value in headers.items():
+        if name.lower() == "retry-after":
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                break
+    return DEFAULT_RETRY_AFTER
+
+
+class SlackMessageScheduler:
+    """First in first out queue of outbound Slack sends, throttled by token buckets.
+
+    Attributes:
+        _scheduler (Optional[SlackMessageScheduler]): The running scheduler.
+    """
+
+    _scheduler: Optional["SlackMessageScheduler"] = None
+
+    def __init__(
+        self,
+        method_rates: Mapping[str, float],
+        default_rate: float,
+        channel_rate: float,
+        burst: int,
+        max_retries: int = 5,
+    ):
+        """
+        Initialize a stopped scheduler.
+
+        Args:
+            method_rates (Mapping[str, float]): The calls per second allowed by Web API
+                method, such as "chat.postMessage".
+            default_rate (float): The calls per second of the other methods.
+            channel_rate (float): The calls per second allowed per channel.
+            burst (int): The calls allowed at once by every bucket.
+            max_retries (int, optional): The times a rate limited send is queued again
+                before its error is raised to the caller. Defaults to 5.
+        """
+        self._method_rates = dict(method_rates)
+        self._default_rate = default_rate
+        self._channel_rate = channel_rate
+        self._burst = burst
+        self._max_retries = max_retries
+        self._method_buckets: Dict[str, TokenBucket] = {}
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        self._pending: Deque[_QueuedSend] = deque()
+        self._in_flight: Set["asyncio.Task[None]"] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        """Return the number of queued sends."""
+        return len(self._pending)
+
+    async def send(self, method: str, channel: str, send: Send) -> Any:
+        """
+        Queue a send and wait for its result.
+
+        Args:
+            method (str): The Web API method called by the send.
+            channel (str): The channel the send posts to.
+            send (Send): The coroutine function calling Slack.
+
+        Returns:
+            Any: The result of the send.
+
+        Raises:
+            SlackApiError: If the send failed, or was still rate limited after the
+                maximum number of retries.
+        """
+        self._start_dispatcher()
+        queued = _QueuedSend(method, channel, send, asyncio.get_running_loop().create_future())
+        self._pending.append(queued)
+        self._queued()
+        return await queued.future
+
+    def _queued(self) -> None:
+        """Record the queue depth and wake the dispatcher up after a send is queued."""
+        SLACK_SCHEDULER_QUEUE_DEPTH.set(len(self._pending))
+        assert self._wakeup is not None
+        self._wakeup.set()
+
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, rate: float) -> TokenBucket:
+        """Get the bucket of a method or a channel, creating it full."""
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, self._burst)
+        return bucket
+
+    def _buckets(self, queued: _QueuedSend) -> Tuple[TokenBucket, TokenBucket]:
+        """Get the method and the channel buckets of a send."""
+        rate = self._method_rates.get(queued.method, self._default_rate)
+        return (
+            self._bucket(self._method_buckets, queued.method, rate),
+            self._bucket(self._channel_buckets, queued.channel, self._channel_rate),
+        )
+
+    def _dispatch_ready(self) -> Optional[float]:
+        """
+        Start the queued sends allowed by their buckets, in the order they were queued.
+
+        Returns:
+            Optional[float]: The seconds until the next queued send is allowed, None if
+                the queue is empty.
+        """
+        now = time.monotonic()
+        next_delay: Optional[float] = None
+        waiting: Deque[_QueuedSend] = deque()
+        for queued in self._pending:
+            if queued.future.done():
+                # The caller was cancelled.
+                continue
+            method_bucket, channel_bucket = self._buckets(queued)
+            delay = max(method_bucket.delay(now), channel_bucket.delay(now))
+            if delay > 0:
+                waiting.append(queued)
+                next_delay = delay if next_delay is None else min(next_delay, delay)
+                continue
+            method_bucket.take(now)
+            channel_bucket.take(now)
+            SLACK_SCHEDULER_WAIT_SECONDS.labels(method=queued.method).observe(
+                now - queued.queued_at
+            )
+            task = asyncio.create_task(self._run(queued))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+        self._pending = waiting
+        SLACK_SCHEDULER_QUEUE_DEPTH.set(len(waiting))
+        if len(self._channel_buckets) > MAX_CHANNEL_BUCKETS:
+            for channel, bucket in list(self._channel_buckets.items()):
+                if bucket.full(now):
+                    del self._channel_buckets[channel]
+        return next_delay
+
+    async def _dispatch(self) -> None:
+        """Dispatch the queued sends, sleeping until a bucket refills or a send is queued."""
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            delay = self._dispatch_ready()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, queued: _QueuedSend) -> None:
+        """Call Slack, queuing the send again if it is rate limited."""
+        try:
+            result = await queued.send()
+        except SlackApiError as error:
+            if error.response.status_code != 429 or queued.attempts >= self._max_retries:
+                if not queued.future.done():
+                    queued.future.set_exception(error)
+                return
+            wait = retry_after(error)
+            SLACK_SCHEDULER_RATE_LIMITED.labels(method=queued.method).inc()
+            logger.warning("Slack rate limited %s, retrying in %ss.", queued.method, wait)
+            self._buckets(queued)[0].pause(time.monotonic() + wait)
+            queued.attempts += 1
+            # Ahead of the sends queued after it, which its method kept waiting.
+            self._pending.appendleft(queued)
+            self._queued()
+        except Exception as error:
+            if not queued.future.done():
+                queued.future.set_exception(error)
+        else:
+            if not queued.future.done():
+                queued.future.set_result(result)
+
+    def _start_dispatcher(self) -> None:
+        """Start the dispatcher task on the running event loop."""
+        if self._dispatcher is None:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self) -> None:
+        """Stop dispatching, wait for the sends in flight and cancel the queued sends."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+        for queued in self._pending:
+            queued.future.cancel()
+        self._pending.clear()
+        SLACK_SCHEDULER_QUEUE_DEPTH.set(0)
+
+    @classmethod
+    def start(
+        cls,
+        method_rates: Mapping[str, float],
+        default_rate: float,
+        channel_rate: float,
+        burst: int,
+        max_retries: int = 5,
+    ) -> "SlackMessageScheduler":
+        """
+        Create and register the scheduler used by the listeners.
+
+        Args:
+            method_rates (Mapping[str, float]): The calls per second by Web API method.
+            default_rate (float): The calls per second of the other methods.
+            channel_rate (float): The calls per second per channel.
+            burst (int): The calls allowed at once by every bucket.
+            max_retries (int, optional): The times a rate limited send is retried.
+                Defaults to 5.
+
+        Returns:
+            SlackMessageScheduler: The running scheduler.
+        """
+        cls._scheduler = cls(method_rates, default_rate, channel_rate, burst, max_retries)
+        return cls._scheduler
+
+    @classmethod
+    async def stop(cls) -> None:
+        """Close and unregister the scheduler."""
+        scheduler, cls._scheduler = cls._scheduler, None
+        if scheduler is not None:
+            await scheduler.close()
+
+    @classmethod
+    async def schedule(cls, method: str, channel: str, send: Send) -> Any:
+        """
+        Send through the running scheduler, or right away if none is running.
+
+        Args:
+            method (str): The Web API method called by the send.
+            channel (str): The channel the send posts to.
+            send (Send): The coroutine function calling Slack.
+
+        Returns:
+            Any: The result of the send.
+        """
+        if cls._scheduler is None:
+            return await send()
+        return await cls._scheduler.send(method, channel, send)
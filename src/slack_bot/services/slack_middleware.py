@@ -6,16 +6,33 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+import copy
+import inspect
 import logging
+import time
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
 
 from slack_bolt.async_app import AsyncApp
+from slack_bolt.kwargs_injection.async_args import AsyncArgs
 
+from ..utils.metrics import LISTENER_ACK_SECONDS, LISTENER_HANDLER_SECONDS
+from ..utils.tracing import Tracer
+from .listener_executor import ListenerExecutor
 from .slack_middleware_common_service import MiddlewareCommonService
 from .slack_middleware_eventhandler_service import SlackMiddlewareEventHandlerService
 from .slack_middleware_interactions_service import SlackMiddlewareInteractionsService
+from .slack_request_logger import RequestLogger
 
 logger = logging.getLogger("app")
 
+Listener = Callable[..., Awaitable[Any]]
+
+
+def bind(function: Listener, args: AsyncArgs) -> Dict[str, Any]:
+    """Pick the Bolt arguments a function takes, by parameter name."""
+    return {key: getattr(args, key) for key in inspect.signature(function).parameters}
+
 
 class SlackMiddleware:
     """Encapsulates middleware configuration.
@@ -24,17 +41,33 @@ class SlackMiddleware:
         slack_app (AsyncApp): The Slack app instance.
 
     Methods:
-        __init__(slack_app: AsyncApp): Initializes a new SlackMiddleware instance.
+        __init__(slack_app: AsyncApp, executors: Optional[Mapping[str, ListenerExecutor]],
+                request_logger: Optional[RequestLogger]):
+            Initializes a new SlackMiddleware instance.
     """
 
-    def __init__(self, slack_app: AsyncApp):
+    def __init__(
+        self,
+        slack_app: AsyncApp,
+        executors: Optional[Mapping[str, ListenerExecutor]] = None,
+        request_logger: Optional[RequestLogger] = None,
+    ):
         """
         Initializes a new SlackMiddleware instance.
 
         Args:
             slack_app (AsyncApp): The Slack app instance from `SlackRoutes`.
+            executors (Optional[Mapping[str, ListenerExecutor]], optional): The executors
+                of the listeners run in the background, keyed by listener name: the event
+                type or the action ID. The other listeners run in the request task.
+                Defaults to None.
+            request_logger (Optional[RequestLogger], optional): The logger of the Slack
+                requests, the full payloads are logged if None. Defaults to None.
         """
         self.slack_app = slack_app
+        if request_logger is not None:
+            MiddlewareCommonService.request_logger = request_logger
+        self.executors: Dict[str, ListenerExecutor] = dict(executors or {})
         self._configure_middleware()
         self._configure_error_handlers()
         self._configure_event_handlers()
@@ -43,6 +76,7 @@ class SlackMiddleware:
     def _configure_middleware(self):
         """Configures the middleware for the Slack app."""
 
+        self.slack_app.middleware(MiddlewareCommonService.received_at_middleware)  # type: ignore
         self.slack_app.middleware(MiddlewareCommonService.log_request_middleware)  # type: ignore
 
     def _configure_error_handlers(self):
@@ -52,10 +86,160 @@ class SlackMiddleware:
 
     def _configure_event_handlers(self):
         """Configures the event handlers for the Slack app."""
-        self.slack_app.event("app_mention")(SlackMiddlewareEventHandlerService.app_mention)  # type: ignore
+        # Bolt acknowledges the events before running their listeners.
+        self._register(
+            self.slack_app.event("app_mention"),
+            "app_mention",
+            SlackMiddlewareEventHandlerService.app_mention,
+        )
 
     def _configure_interactions(self):
         """Configures the interactions for the Slack app."""
-        self.slack_app.action("good")(SlackMiddlewareInteractionsService.action_good_button_click)  # type: ignore
+        self._register(
+            self.slack_app.action("good"),
+            "good",
+            SlackMiddlewareInteractionsService.action_good_button_click,
+            ack=SlackMiddlewareInteractionsService.ack_button_click,
+            work=SlackMiddlewareInteractionsService.respond_good_button_click,
+        )
+
+        self._register(
+            self.slack_app.action("bad"),
+            "bad",
+            SlackMiddlewareInteractionsService.action_bad_button_click,
+            ack=SlackMiddlewareInteractionsService.ack_button_click,
+            work=SlackMiddlewareInteractionsService.respond_bad_button_click,
+        )
+
+    def _register(
+        self,
+        register: Callable[[Listener], Any],
+        name: str,
+        listener: Listener,
+        ack: Optional[Listener] = None,
+        work: Optional[Listener] = None,
+    ):
+        """
+        Register a listener, run in the request task or in the background by its executor.
+
+        The listener records its ack time and the time of its handler, the follow-up
+        work when run in the background.
+
+        Args:
+            register (Callable[[Listener], Any]): The Slack app decorator registering the
+                listener.
+            name (str): The name of the listener, the key of its executor.
+            listener (Listener): The listener run in the request task.
+            ack (Optional[Listener], optional): The listener acknowledging the request in
+                the request task when run in the background, None if Bolt acknowledges
+                the request. Defaults to None.
+            work (Optional[Listener], optional): The follow-up work queued on the
+                executor. Defaults to the listener.
+        """
+        executor = self.executors.get(name)
+        if executor is None:
+            timed = self._timed_handler(name, listener)
+            register(
+                self._instrumented_listener(name, listener, lambda args: timed(**bind(timed, args)))
+            )
+            return
+
+        background = self._background_listener(
+            name, executor, ack, self._timed_handler(name, work or listener)
+        )
+        register(self._instrumented_listener(name, listener, background))
+        logger.info("Running the %s listener in the background on %s.", name, executor.name)
+
+    @staticmethod
+    def _background_listener(
+        name: str, executor: ListenerExecutor, ack: Optional[Listener], work: Listener
+    ) -> Listener:
+        """
+        Create a listener acknowledging the request and queuing the follow-up work.
+
+        Args:
+            name (str): The name of the listener.
+            executor (ListenerExecutor): The executor running the follow-up work.
+            ack (Optional[Listener]): The listener acknowledging the request.
+            work (Listener): The follow-up work.
+
+        Returns:
+            Listener: The listener to register with the Slack app.
+        """
+
+        async def background_listener(args: AsyncArgs):
+            if ack is not None:
+                await ack(**bind(ack, args))
+            await executor.submit(name, Tracer.propagate(partial(work, **bind(work, args))))
+
+        return background_listener
+
+    @staticmethod
+    def _timed_handler(name: str, handler: Listener) -> Listener:
+        """
+        Wrap a handler to record its time, keeping its signature for the Bolt arguments.
+
+        The handler runs in a span named after the listener when tracing is enabled.
+
+        Args:
+            name (str): The name of the listener.
+            handler (Listener): The listener, or its follow-up work.
+
+        Returns:
+            Listener: The handler recording its time.
+        """
+
+        @wraps(handler)
+        async def timed_handler(**kwargs: Any):
+            started = time.perf_counter()
+            try:
+                with Tracer.span(f"listener.{name}"):
+                    return await handler(**kwargs)
+            finally:
+                LISTENER_HANDLER_SECONDS.labels(listener=name).observe(
+                    time.perf_counter() - started
+                )
+
+        return timed_handler
+
+    @staticmethod
+    def _instrumented_listener(
+        name: str, listener: Listener, run: Callable[[AsyncArgs], Awaitable[Any]]
+    ) -> Listener:
+        """
+        Create a listener recording the ack time of the request it runs.
+
+        The ack time starts when the request reached Bolt. The events are acknowledged by
+        Bolt before their listener runs, the other requests by the listener calling ack.
+
+        Args:
+            name (str): The name of the listener.
+            listener (Listener): The listener, kept as the `listener` attribute.
+            run (Callable[[AsyncArgs], Awaitable[Any]]): Runs the listener with the Bolt
+                arguments.
+
+        Returns:
+            Listener: The listener to register with the Slack app.
+        """
 
-        self.slack_app.action("bad")(SlackMiddlewareInteractionsService.action_bad_button_click)  # type: ignore
+        async def instrumented_listener(args: AsyncArgs):
+            started = time.perf_counter()
+            received_at = args.context.get("received_at", started)
+            ack = args.ack
+            if ack.response is not None:
+                LISTENER_ACK_SECONDS.labels(listener=name).observe(started - received_at)
+                return await run(args)
+
+            async def timed_ack(*ack_args: Any, **ack_kwargs: Any):
+                response = await ack(*ack_args, **ack_kwargs)
+                LISTENER_ACK_SECONDS.labels(listener=name).observe(
+                    time.perf_counter() - received_at
+                )
+                return response
+
+            args = copy.copy(args)
+            args.ack = timed_ack  # type: ignore
+            return await run(args)
+
+        instrumented_listener.listener = listener  # type: ignore
+        return instrumented_listener
@@ -6,11 +6,14 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
-import json
 import logging
+import time
 from typing import Any, Awaitable, Callable, Dict
 
-from slack_bolt.async_app import AsyncSay
+from slack_bolt.async_app import AsyncBoltContext, AsyncSay
+
+from ..utils.metrics import LISTENER_ERRORS
+from .slack_request_logger import RequestLogger
 
 logger = logging.getLogger("app")
 
@@ -21,8 +24,29 @@ class MiddlewareCommonService:
     This service offers middleware utilities including request logging and global error handling
     within a Slack application. It ensures that every incoming Slack request is logged for debugging
     and error analysis, and provides a unified approach to handling exceptions.
+
+    Attributes:
+        request_logger (RequestLogger): The logger of the Slack requests, logging the full
+            payloads by default.
     """
 
+    request_logger: RequestLogger = RequestLogger()
+
+    @staticmethod
+    async def received_at_middleware(
+        context: AsyncBoltContext, next_: Callable[[], Awaitable[None]]
+    ):
+        """
+        Middleware to record when a Slack request reached Bolt, the start of its ack time.
+
+        Args:
+            context (AsyncBoltContext): Slack request context, "received_at" is set to the
+                performance counter.
+            next_ (Callable[[], Awaitable[None]]): Next middleware or handler to call.
+        """
+        context["received_at"] = time.perf_counter()
+        return await next_()
+
     @staticmethod
     async def log_request_middleware(body: Dict[str, Any], next_: Callable[[], Awaitable[None]]):
         """
@@ -32,8 +56,7 @@ class MiddlewareCommonService:
             body (Dict[str, Any]): Slack request body.
             next_ (Callable[[], Awaitable[None]]): Next middleware or handler to call.
         """
-        logger.debug(json.dumps(body))
-        return await next_()
+        return await MiddlewareCommonService.request_logger.log(body, next_)
 
     @staticmethod
     async def global_error_handler(error: Exception, body: Dict[str, Any], say: AsyncSay):
@@ -45,8 +68,9 @@ class MiddlewareCommonService:
             body (Dict[str, Any]): Slack request body.
             say (AsyncSay): Slack say function to send messages.
         """
-        # log the error
+        # log and count the error
         logger.exception(error)
+        LISTENER_ERRORS.labels(exception=type(error).__name__).inc()
 
         # Retrieve thread identifier
         event = body["event"]
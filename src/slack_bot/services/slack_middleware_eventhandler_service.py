@@ -6,11 +6,13 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+from functools import partial
 from typing import Any, Dict, Optional, Sequence, Union
 
 from slack_bolt.async_app import AsyncSay
 from slack_sdk.models.blocks import Block
 
+from .slack_message_scheduler import SlackMessageScheduler
 from .slack_service import SlackService
 
 
@@ -42,5 +44,9 @@ class SlackMiddlewareEventHandlerService:
             body=body
         )
 
-        # Send message to a specific thread
-        await say(text="Response", blocks=blocks, thread_ts=thread_ts)
+        # Send message to a specific thread, within the rate limits of Slack
+        await SlackMessageScheduler.schedule(
+            "chat.postMessage",
+            event.get("channel", ""),
+            partial(say, text="Response", blocks=blocks, thread_ts=thread_ts),
+        )
@@ -33,10 +33,44 @@ class SlackMiddlewareInteractionsService:
             respond (AsyncRespond): Slack respond function to send responses.
             context (AsyncBoltContext): Slack context object.
         """
+        await SlackMiddlewareInteractionsService.ack_button_click(ack)
+        await SlackMiddlewareInteractionsService.respond_good_button_click(respond, context)
 
+    @staticmethod
+    async def action_bad_button_click(
+        ack: AsyncAck, respond: AsyncRespond, context: AsyncBoltContext
+    ):
+        """
+        Action handler for the "bad" button click in Slack.
+
+        Args:
+            ack (AsyncAck): Slack ack function to acknowledge actions.
+            respond (AsyncRespond): Slack respond function to send responses.
+            context (AsyncBoltContext): Slack context object.
+        """
+        await SlackMiddlewareInteractionsService.ack_button_click(ack)
+        await SlackMiddlewareInteractionsService.respond_bad_button_click(respond, context)
+
+    @staticmethod
+    async def ack_button_click(ack: AsyncAck):
+        """
+        Acknowledge a button click in Slack.
+
+        Args:
+            ack (AsyncAck): Slack ack function to acknowledge actions.
+        """
         # Return immediate response to make Slack happy
         await ack("Thanks!")
 
+    @staticmethod
+    async def respond_good_button_click(respond: AsyncRespond, context: AsyncBoltContext):
+        """
+        Respond to an acknowledged "good" button click in Slack.
+
+        Args:
+            respond (AsyncRespond): Slack respond function to send responses.
+            context (AsyncBoltContext): Slack context object.
+        """
         # Retrieve settings from the context
         settings: Settings = context.get("settings")  # type: ignore
 
@@ -47,21 +81,15 @@ class SlackMiddlewareInteractionsService:
         await respond(blocks=blocks)
 
     @staticmethod
-    async def action_bad_button_click(
-        ack: AsyncAck, respond: AsyncRespond, context: AsyncBoltContext
-    ):
+    async def respond_bad_button_click(respond: AsyncRespond, context: AsyncBoltContext):
         """
-        Action handler for the "bad" button click in Slack.
+        Respond to an acknowledged "bad" button click in Slack.
 
         Args:
-            ack (AsyncAck): Slack ack function to acknowledge actions.
             respond (AsyncRespond): Slack respond function to send responses.
             context (AsyncBoltContext): Slack context object.
         """
 
-        # Return immediate response to make Slack happy
-        await ack("Thanks!")
-
         # Retrieve settings from the context
         settings: Settings = context.get("settings")  # type: ignore
 
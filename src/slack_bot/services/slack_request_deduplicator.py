@@ -0,0 +1,164 @@
+"""
+This module provides the deduplication of the Slack requests delivered more than once.
+
+Slack resends an event when it is not acknowledged within three seconds, so a slow
+answer is followed by retries that would run the listeners, and post the replies, again.
+Every signed request carrying an event_id or a trigger_id claims its ID in Redis with
+SET NX and a TTL, and the IDs seen by the worker are kept in a small in-process LRU in
+front of Redis. A request whose ID was already claimed is answered right away, without
+reaching the listeners. The claim of a request whose handling fails is released, so the
+retry of Slack is processed.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from redis.exceptions import RedisError
+from slack_sdk.signature import SignatureVerifier
+
+from ..daos.redis_dao_factory_async import AsyncRedisDAOFactory
+from ..utils.metrics import SLACK_DUPLICATE_REQUESTS
+
+logger = logging.getLogger("app")
+
+# Prefix of the Redis keys claiming the request IDs.
+KEY_PREFIX = "slack:dedup:"
+
+# The request state attribute holding the ID claimed by the request.
+CLAIMED_ID_STATE = "slack_claimed_request_id"
+
+
+def request_id(body: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Get the ID identifying a Slack request across its deliveries.
+
+    Args:
+        body (bytes): The raw body of the request.
+
+    Returns:
+        Optional[Tuple[str, str]]: The kind of request, "event" or "interaction", and
+            its event_id or trigger_id, or None if the request has no such ID.
+    """
+    try:
+        text = body.decode("utf-8")
+        if text.startswith("{"):
+            event_id = json.loads(text).get("event_id")
+            return ("event", event_id) if event_id else None
+
+        form = parse_qs(text)
+        if "payload" in form:
+            trigger_id = json.loads(form["payload"][0]).get("trigger_id")
+        else:
+            # Slash commands send their fields as the form itself.
+            trigger_id = form.get("trigger_id", [None])[0]
+        return ("interaction", trigger_id) if trigger_id else None
+    except (UnicodeDecodeError, ValueError, AttributeError):
+        return None
+
+
+class SlackRequestDeduplicator:
+    """Remembers the Slack request IDs in Redis and in an in-process LRU."""
+
+    def __init__(self, signing_secret: str, ttl: int, lru_size: int):
+        """
+        Initialize an empty deduplicator.
+
+        Args:
+            signing_secret (str): The Slack signing secret, only signed requests claim
+                their ID.
+            ttl (int): Seconds a request ID is remembered, longer than the Slack retries.
+            lru_size (int): The maximum number of request IDs remembered in process.
+        """
+        self._verifier = SignatureVerifier(signing_secret)
+        self._ttl = ttl
+        self._lru_size = lru_size
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def _seen_recently(self, key: str, now: float) -> bool:
+        """Check the in-process LRU for a request ID."""
+        expires = self._seen.get(key)
+        if expires is None:
+            return False
+        if expires <= now:
+            del self._seen[key]
+            return False
+        self._seen.move_to_end(key)
+        return True
+
+    def _remember(self, key: str, now: float) -> None:
+        """Add a request ID to the in-process LRU."""
+        self._seen[key] = now + self._ttl
+        self._seen.move_to_end(key)
+        while len(self._seen) > self._lru_size:
+            self._seen.popitem(last=False)
+
+    async def is_duplicate(self, req: Request) -> bool:
+        """
+        Check if a request was already delivered, claiming its ID if it was not.
+
+        Unsigned requests and requests without an ID are never duplicates, they are left
+        to Bolt. When Redis is not available the request is processed. The claimed ID is
+        kept in the request state, for `release`.
+
+        Args:
+            req (Request): The incoming request from FastAPI.
+
+        Returns:
+            bool: True if the request is a duplicate and must not be processed.
+        """
+        body = await req.body()
+        identified = request_id(body)
+        if identified is None:
+            return False
+        if not self._verifier.is_valid(
+            body=body,
+            timestamp=req.headers.get("X-Slack-Request-Timestamp"),
+            signature=req.headers.get("X-Slack-Signature"),
+        ):
+            return False
+
+        kind, key = identified
+        now = time.monotonic()
+        if self._seen_recently(key, now):
+            SLACK_DUPLICATE_REQUESTS.labels(kind=kind, source="memory").inc()
+            return True
+
+        try:
+            dao = AsyncRedisDAOFactory.get_claim_dao_with_existing_pool(KEY_PREFIX)
+            claimed = await dao.claim(key, self._ttl)
+        except (RedisError, ValueError) as exc:
+            logger.warning("Failed to claim the Slack request %s: %s", key, exc)
+            return False
+
+        self._remember(key, now)
+        if claimed:
+            setattr(req.state, CLAIMED_ID_STATE, key)
+            return False
+        SLACK_DUPLICATE_REQUESTS.labels(kind=kind, source="redis").inc()
+        return True
+
+    async def release(self, req: Request) -> None:
+        """
+        Release the ID claimed by a request whose handling failed, so its retry is processed.
+
+        Args:
+            req (Request): The request checked by `is_duplicate`.
+        """
+        key = getattr(req.state, CLAIMED_ID_STATE, None)
+        if key is None:
+            return
+        delattr(req.state, CLAIMED_ID_STATE)
+        self._seen.pop(key, None)
+        try:
+            dao = AsyncRedisDAOFactory.get_claim_dao_with_existing_pool(KEY_PREFIX)
+            await dao.release(key)
+        except (RedisError, ValueError) as exc:
+            logger.warning("Failed to release the Slack request %s: %s", key, exc)
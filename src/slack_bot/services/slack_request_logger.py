@@ -0,0 +1,178 @@
+"""
+This module provides the logging of the incoming Slack requests.
+
+The payloads are only serialized when a record is emitted, so a request costs nothing
+more than a level check when the "app" logger is above DEBUG. A share of the requests
+can be sampled, and the logged payloads can be reduced to an allow-list of fields,
+capped in size, or replaced by a fixed summary of the request and its handling time.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import json
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional, Sequence
+
+logger = logging.getLogger("app")
+
+# "full" logs the payloads, "summary" a fixed summary of every request, "off" nothing.
+RequestLogMode = Literal["full", "summary", "off"]
+
+
+def select_fields(body: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """
+    Reduce a payload to the allowed fields.
+
+    Args:
+        body (Dict[str, Any]): Slack request body.
+        fields (Sequence[str]): The allowed fields, nested fields as dotted paths such
+            as "event.type".
+
+    Returns:
+        Dict[str, Any]: The payload with the allowed fields present in the body.
+    """
+    selected: Dict[str, Any] = {}
+    for field in fields:
+        value: Any = body
+        for name in field.split("."):
+            if not isinstance(value, dict) or name not in value:
+                break
+            value = value[name]
+        else:
+            target = selected
+            *parents, leaf = field.split(".")
+            for name in parents:
+                target = target.setdefault(name, {})
+            target[leaf] = value
+    return selected
+
+
+def summarize(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarize a Slack request.
+
+    Args:
+        body (Dict[str, Any]): Slack request body.
+
+    Returns:
+        Dict[str, Any]: The type, team, channel and action ID of the request.
+    """
+    event = body.get("event") or {}
+    team = body.get("team")
+    channel = body.get("channel")
+    actions = body.get("actions") or [{}]
+    return {
+        "type": event.get("type") or body.get("type"),
+        "team": body.get("team_id") or (team.get("id") if isinstance(team, dict) else team),
+        "channel": event.get("channel")
+        or (channel.get("id") if isinstance(channel, dict) else channel),
+        "action_id": actions[0].get("action_id"),
+    }
+
+
+class LazyPayload:
+    """Log argument serializing a payload when the record is formatted."""
+
+    __slots__ = ("body", "fields", "max_bytes")
+
+    def __init__(self, body: Dict[str, Any], fields: Sequence[str], max_bytes: int):
+        """
+        Initialize the argument.
+
+        Args:
+            body (Dict[str, Any]): Slack request body.
+            fields (Sequence[str]): The allowed fields, all the fields if empty.
+            max_bytes (int): The maximum length of the serialized payload, 0 for no limit.
+        """
+        self.body = body
+        self.fields = fields
+        self.max_bytes = max_bytes
+
+    def __str__(self) -> str:
+        """Return the serialized payload."""
+        payload = select_fields(self.body, self.fields) if self.fields else self.body
+        text = json.dumps(payload)
+        if self.max_bytes and len(text) > self.max_bytes:
+            return f"{text[:self.max_bytes]}...({len(text) - self.max_bytes} more)"
+        return text
+
+
+class LazySummary:
+    """Log argument serializing the summary of a request when the record is formatted."""
+
+    __slots__ = ("body", "duration")
+
+    def __init__(self, body: Dict[str, Any], duration: float):
+        """
+        Initialize the argument.
+
+        Args:
+            body (Dict[str, Any]): Slack request body.
+            duration (float): Seconds the request took to handle.
+        """
+        self.body = body
+        self.duration = duration
+
+    def __str__(self) -> str:
+        """Return the serialized summary."""
+        summary = summarize(self.body)
+        summary["duration_ms"] = round(self.duration * 1000, 3)
+        return json.dumps(summary)
+
+
+class RequestLogger:
+    """Debug logging of the Slack requests, sampled and reduced as configured."""
+
+    def __init__(
+        self,
+        mode: RequestLogMode = "full",
+        sample_rate: float = 1.0,
+        max_bytes: int = 0,
+        fields: Optional[Sequence[str]] = None,
+    ):
+        """
+        Initialize the request logger.
+
+        Args:
+            mode (RequestLogMode, optional): What is logged. Defaults to "full".
+            sample_rate (float, optional): The share of the requests logged, between 0
+                and 1. Defaults to 1.0.
+            max_bytes (int, optional): The maximum length of a logged payload, 0 for no
+                limit. Defaults to 0.
+            fields (Optional[Sequence[str]], optional): The allowed payload fields, all
+                the fields if None or empty. Defaults to None.
+        """
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.fields = tuple(fields or ())
+
+    def _sampled(self) -> bool:
+        """Check if the request is logged."""
+        if self.mode == "off" or not logger.isEnabledFor(logging.DEBUG):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    async def log(self, body: Dict[str, Any], next_: Callable[[], Awaitable[None]]):
+        """
+        Log a request and call the next middleware or handler.
+
+        Args:
+            body (Dict[str, Any]): Slack request body.
+            next_ (Callable[[], Awaitable[None]]): Next middleware or handler to call.
+        """
+        if not self._sampled():
+            return await next_()
+
+        if self.mode == "full":
+            logger.debug("%s", LazyPayload(body, self.fields, self.max_bytes))
+            return await next_()
+
+        started = time.perf_counter()
+        try:
+            return await next_()
+        finally:
+            logger.debug("Slack request %s", LazySummary(body, time.perf_counter() - started))
@@ -11,17 +11,12 @@ import random
 from typing import Any, Dict, Optional, Sequence, Tuple, Union
 
 from redis.commands.search.query import Query
-from slack_sdk.models.blocks import (
-    ActionsBlock,
-    Block,
-    ButtonElement,
-    MarkdownTextObject,
-    PlainTextObject,
-    SectionBlock,
-    TextObject,
-)
+from slack_sdk.models.blocks import Block
 
+from ..daos.quote_corpus_cache import QuoteCorpusCache
 from ..daos.redis_dao_factory_async import AsyncRedisDAOFactory
+from ..utils.tracing import Tracer
+from .slack_block_templates import SlackBlockTemplates
 
 logger = logging.getLogger("app")
 
@@ -30,6 +25,7 @@ class SlackService:
     """Service class to handle Slack events and interactions."""
 
     @staticmethod
+    @Tracer.traced("service.handle_event")
     async def handle_event(
         body: Dict[str, Any]
     ) -> Optional[Sequence[Union[Dict[str, Any], Block]]]:
@@ -42,55 +38,27 @@ class SlackService:
         Returns:
             Optional[Sequence[Union[Dict[str, Any], Block]]]: A sequence of response blocks or None.
         """
-        # Response blocks
-        blocks: Optional[Sequence[Union[Dict[str, Any], Block]]] = []
-
         # Get the text from the event
         text = body.get("event", {}).get("text", "")
 
         if text is not None and "wake up" in text:
             user = body.get("event", {}).get("user", "")
-            response_message = f"Hi <@{user}>! How are you feeling!"
-
-            # Create a response
-            blocks.append(SectionBlock(block_id="response", text=response_message))
-
-            # Add buttons to the response
-            blocks.append(
-                ActionsBlock(
-                    block_id="how_are_you",
-                    elements=[
-                        ButtonElement(
-                            action_id="good",
-                            text=TextObject(type=PlainTextObject.type, text="Good", emoji=True),
-                            value="good",
-                            style="primary",
-                        ),
-                        ButtonElement(
-                            action_id="bad",
-                            text=TextObject(type=PlainTextObject.type, text="Bad", emoji=True),
-                            value="bad",
-                            style="danger",
-                        ),
-                    ],
-                )
-            )
-        else:
-            blocks.append(
-                SectionBlock(
-                    block_id="response", text=MarkdownTextObject(text="*Sleeeeeping* :sleeping:")
-                )
-            )
-
-        return blocks
+            return SlackBlockTemplates.wake_up(user)
+
+        return SlackBlockTemplates.sleeping()
 
     @staticmethod
+    @Tracer.traced("service.get_quote")
     async def get_quote(search_index: str) -> Optional[Tuple[str, str]]:
         """
         Retrieves a random quote from a Redis database using the provided search index.
 
-        Connects to a Redis database, performs a search for all entries, and selects one
-        randomly. Returns the selected quote along with the author's name.
+        When the in-process corpus cache is enabled and loaded, the quote is selected in
+        memory. Otherwise it picks a random document from the key set maintained by the
+        indexer in a single round trip. If the key set is not available, for example when the
+        corpus was loaded by an older indexer, it falls back to counting the entries in the
+        search index and fetching the quote fields of one at a random offset. Returns the
+        selected quote along with the author's name.
 
         Args:
             search_index (str): The name of the Redis search index to use for querying quotes.
@@ -99,15 +67,23 @@ class SlackService:
             Optional[Tuple[str, str]]: A tuple containing the quote and the author's name,
                                     or None if no quote is found.
         """
-        redis_search_dao = AsyncRedisDAOFactory.create_redis_dao_with_existing_pool(
-            search_index_name=search_index
-        )
+        corpus_cache = QuoteCorpusCache.get_cache(search_index)
+        if corpus_cache is not None:
+            quote = corpus_cache.random_quote()
+            if quote is not None:
+                return quote
+
+        redis_search_dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool(search_index)
+
+        document = await redis_search_dao.random_document()
+        if document is not None:
+            return (document["quote"], document["person"])
 
         query = Query("*").verbatim().no_content().paging(0, 0)
         results = await redis_search_dao.index_search(query)
         total_entries = results["total_results"]
 
-        logger.info("Results count:%s", total_entries)
+        logger.debug("Results count: %s", total_entries)
 
         entry = None
 
@@ -115,17 +91,18 @@ class SlackService:
             # Generate a random offset
             random_offset = random.randint(0, total_entries - 1)
 
-            # Retrieve the entry at the random offset
+            # Retrieve only the quote fields of the entry at the random offset
             query = Query("*").verbatim().paging(random_offset, 1)
-            random_entry_query = await redis_search_dao.index_search(query)
+            _, quotes = await redis_search_dao.search_quotes(query)
 
-            logger.info("Results random: %s", random_entry_query)
-            attributes = random_entry_query["results"][0]["extra_attributes"]
-            entry = (attributes["quote"], attributes["person"])
+            if quotes:
+                logger.debug("Random quote at offset %s: %r", random_offset, quotes[0])
+                entry = quotes[0].as_tuple()
 
         return entry
 
     @staticmethod
+    @Tracer.traced("service.handle_good_interaction")
     async def handle_good_interaction(
         search_index: str,
     ) -> Optional[Sequence[Union[Dict[str, Any], Block]]]:
@@ -145,34 +122,15 @@ class SlackService:
                                                             or None if no response is needed.
         """
 
-        # Response blocks
-        blocks: Optional[Sequence[Union[Dict[str, Any], Block]]] = []
-
         random_quote = await SlackService.get_quote(search_index)
 
         if random_quote:
-            blocks.append(
-                SectionBlock(
-                    block_id="response_1",
-                    text=MarkdownTextObject(
-                        text="*Amazing!* Let's see if this quote will enhance your day a bit more."
-                    ),
-                )
-            )
-            blocks.append(
-                SectionBlock(
-                    block_id="response_2",
-                    text=MarkdownTextObject(text=f'*"{random_quote[0]}"* by {random_quote[1]}'),
-                )
-            )
-        else:
-            blocks.append(
-                SectionBlock(block_id="response", text=MarkdownTextObject(text="*As you were!*"))
-            )
-
-        return blocks
+            return SlackBlockTemplates.good_quote(*random_quote)
+
+        return SlackBlockTemplates.good_no_quote()
 
     @staticmethod
+    @Tracer.traced("service.handle_bad_interaction")
     async def handle_bad_interaction(
         search_index: str,
     ) -> Optional[Sequence[Union[Dict[str, Any], Block]]]:
@@ -191,32 +149,9 @@ class SlackService:
                                                             to be sent as a response in Slack,
                                                             or None if no response is needed.
         """
-        # Response blocks
-        blocks: Optional[Sequence[Union[Dict[str, Any], Block]]] = []
-
         random_quote = await SlackService.get_quote(search_index)
 
         if random_quote:
-            blocks.append(
-                SectionBlock(
-                    block_id="response_1",
-                    text=MarkdownTextObject(
-                        text="Let's see if the universe has something good to say."
-                    ),
-                )
-            )
-            blocks.append(
-                SectionBlock(
-                    block_id="response_2",
-                    text=MarkdownTextObject(text=f'*"{random_quote[0]}"* by {random_quote[1]}'),
-                )
-            )
-        else:
-            blocks.append(
-                SectionBlock(
-                    block_id="response",
-                    text=MarkdownTextObject(text="*I'd hope things will get better soon.*"),
-                )
-            )
-
-        return blocks
+            return SlackBlockTemplates.bad_quote(*random_quote)
+
+        return SlackBlockTemplates.bad_no_quote()
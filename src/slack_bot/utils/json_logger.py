@@ -3,9 +3,58 @@ Json Formatter Module.
 
 This module provides a custom JSON formatter for logging which
 excludes specific fields from the output.
+
+The formatter writes the JSON of a record directly from the record attributes,
+following a field plan computed once per formatter, with the output of
+python-json-logger byte for byte. Formatters configured with the options that change
+the output, such as renamed fields, use python-json-logger itself. The compact
+orjson serializer can be selected when it is installed.
 """
+import importlib
+import json
+import logging
+import time
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, List, Optional, Tuple
+
 from pythonjsonlogger import jsonlogger
 
+# Record attributes left out of the output, besides the fields of the format.
+RESERVED_ATTRS: Tuple[str, ...] = ("color_message", *jsonlogger.RESERVED_ATTRS)
+
+# The python-json-logger methods the field plan reproduces.
+_PLANNED_METHODS = (
+    "add_fields",
+    "process_log_record",
+    "jsonify_log_record",
+    "serialize_log_record",
+)
+
+
+def load_serializer(name: str, default: Callable[[Any], Any]) -> Optional[Callable[..., str]]:
+    """
+    Import a fast serializer, taking the arguments of json.dumps.
+
+    Args:
+        name (str): The name of the serializer module, such as "orjson", whose dumps
+            function returns bytes.
+        default (Callable[[Any], Any]): The conversion of the values the serializer does
+            not support.
+
+    Returns:
+        Optional[Callable[..., str]]: The serializer, or None if the module is not
+            installed.
+    """
+    try:
+        dumps = importlib.import_module(name).dumps
+    except ImportError:
+        return None
+
+    def serialize(obj: Any, **kwargs: Any) -> str:
+        return dumps(obj, default=default).decode()
+
+    return serialize
+
 
 class JsonFormatter(jsonlogger.JsonFormatter):
     """Custom JSON formatter for logging.
@@ -19,6 +68,8 @@ class JsonFormatter(jsonlogger.JsonFormatter):
 
     Args:
         args (Tuple[Any]): Variable length argument list.
+        serializer (str): "json" for the standard library output, or "orjson" for the
+                          compact orjson output when orjson is installed.
         kwargs (Dict[str, Any]): Arbitrary keyword arguments.
 
     Usage:
@@ -28,6 +79,94 @@ class JsonFormatter(jsonlogger.JsonFormatter):
         Extend or modify the reserved_attrs list to exclude more fields.
     """
 
-    def __init__(self, *args, **kwargs):
-        kwargs["reserved_attrs"] = ["color_message", *jsonlogger.RESERVED_ATTRS]
+    def __init__(self, *args, serializer: str = "json", **kwargs):
+        """
+        Initialize the formatter and plan the fields of its records.
+
+        Args:
+            serializer (str, optional): "json", or a module such as "orjson" used when it
+                is installed. Defaults to "json".
+        """
+        kwargs["reserved_attrs"] = RESERVED_ATTRS
         super().__init__(*args, **kwargs)
+        self._encoder = jsonlogger.JsonEncoder()
+        if serializer != "json":
+            self.json_serializer = load_serializer(serializer, self._encoder.default) or json.dumps
+        self._plan = self._field_plan()
+        self._uses_asctime = "asctime" in self._required_fields
+        # The second of the last formatted time, with its text.
+        self._formatted_second: Tuple[int, str] = (-1, "")
+
+    def _field_plan(self) -> Optional[Tuple[Tuple[str, str], ...]]:
+        """
+        Plan the fields of the format with their encoded keys.
+
+        Returns:
+            Optional[Tuple[Tuple[str, str], ...]]: The field names and their JSON keys
+                in output order, or None if the options require python-json-logger.
+        """
+        standard = (
+            self.json_serializer is json.dumps
+            and self.json_encoder is jsonlogger.JsonEncoder
+            and self.json_default is None
+            and self.json_indent is None
+            and self.json_ensure_ascii
+            and not self.rename_fields
+            and not self.static_fields
+            and not self.timestamp
+            and not {"exc_info", "stack_info"} & set(self._required_fields)
+            and all(
+                getattr(type(self), name) is getattr(jsonlogger.JsonFormatter, name)
+                for name in _PLANNED_METHODS
+            )
+        )
+        if not standard:
+            return None
+        # A field repeated in the format is output once, at its first position.
+        fields: List[str] = list(dict.fromkeys(self._required_fields))
+        return tuple((field, f"{encode_basestring_ascii(field)}: ") for field in fields)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """Format the creation time of a record, reusing the text of the same second."""
+        if datefmt or not self.default_msec_format:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, text = self._formatted_second
+        if second != cached_second:
+            text = time.strftime(self.default_time_format, self.converter(record.created))
+            self._formatted_second = (second, text)
+        return self.default_msec_format % (text, record.msecs)
+
+    def _encode(self, value: Any) -> str:
+        """Encode a value the way json.dumps encodes it in the record."""
+        if type(value) is str:
+            return encode_basestring_ascii(value)
+        return self._encoder.encode(value)
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a log record and serialize it to JSON."""
+        if self._plan is None or isinstance(record.msg, dict):
+            return super().format(record)
+
+        record.message = record.getMessage()
+        attributes = record.__dict__
+        if self._uses_asctime:
+            record.asctime = self.formatTime(record, self.datefmt)
+
+        encode = self._encode
+        parts = [key + encode(attributes.get(field)) for field, key in self._plan]
+
+        exc_info = self.formatException(record.exc_info) if record.exc_info else None
+        if not exc_info and record.exc_text:
+            exc_info = record.exc_text
+        if exc_info is not None:
+            parts.append('"exc_info": ' + encode(exc_info))
+        if record.stack_info:
+            parts.append('"stack_info": ' + encode(self.formatStack(record.stack_info)))
+
+        skip = self._skip_fields
+        for key, value in attributes.items():
+            if key not in skip and not key.startswith("_"):
+                parts.append(f"{encode_basestring_ascii(key)}: {encode(value)}")
+
+        return f"{self.prefix}{{{', '.join(parts)}}}"
@@ -12,7 +12,11 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from ..daos.quote_corpus_cache import QuoteCorpusCache
 from ..daos.redis_dao_factory_async import AsyncRedisDAOFactory
+from ..services.listener_executor import ListenerExecutor
+from ..services.slack_http_session import SlackHttpSession
+from ..services.slack_message_scheduler import SlackMessageScheduler
 
 
 @asynccontextmanager
@@ -22,8 +26,15 @@ async def lifespan(app: FastAPI):
 
     This function is responsible for setting up and tearing down resources during
     the lifespan of the app.
-    It initializes the Redis connection pool at the beginning and closes the connection
-    pool upon completion.
+    It initializes the Redis connection pool at the beginning, opening the configured
+    number of connections ahead of the first request and creating the long-lived DAO of
+    the search index, and closes the connection pools, releasing the DAOs, upon
+    completion. When enabled, the client-side cache is started and the query result
+    caches are enabled with the pool, and the in-process quote corpus cache is loaded
+    after the pool is created and stopped before the pool is closed. The background
+    listener executors finish their queued work before the caches and the pool go away,
+    and the shared outbound Slack session is closed once no listener can use it. When
+    enabled, the outbound message scheduler runs for the lifespan of the session.
 
     Args:
         app (FastAPI): The FastAPI application instance.
@@ -46,9 +57,55 @@ async def lifespan(app: FastAPI):
         password=app_settings.redis_password,
         max_connections=app_settings.redis_max_connections,
     )
+    await AsyncRedisDAOFactory.warm_up_connection_pool(app_settings.redis_warm_up_connections)
+    if app_settings.client_cache_enabled:
+        await AsyncRedisDAOFactory.start_client_cache(
+            max_entries=app_settings.client_cache_max_entries,
+            broadcast=app_settings.client_cache_mode == "broadcast",
+            prefixes=app_settings.client_cache_prefixes,
+            max_connections=app_settings.client_cache_max_connections,
+        )
+    if app_settings.query_cache_enabled:
+        AsyncRedisDAOFactory.enable_query_cache(
+            ttl=app_settings.query_cache_ttl,
+            max_entries=app_settings.query_cache_max_entries,
+            max_bytes=app_settings.query_cache_max_bytes,
+        )
+    if app_settings.redis_search_index:
+        AsyncRedisDAOFactory.get_redis_dao_with_existing_pool(app_settings.redis_search_index)
+
+    if app_settings.corpus_cache_enabled:
+        await QuoteCorpusCache.start(
+            search_index_name=app_settings.redis_search_index,
+            max_size=app_settings.corpus_cache_max_size,
+            refresh_interval=app_settings.corpus_cache_refresh_interval,
+        )
+
+    # Keep the connections of the outbound Slack calls alive across requests.
+    SlackHttpSession.start(
+        limit=app_settings.slack_http_max_connections,
+        limit_per_host=app_settings.slack_http_max_connections_per_host,
+        keepalive_timeout=app_settings.slack_http_keepalive_timeout,
+        dns_cache_ttl=app_settings.slack_http_dns_cache_ttl,
+        timeout=app_settings.slack_http_timeout,
+        connect_timeout=app_settings.slack_http_connect_timeout,
+    )
+    if app_settings.slack_scheduler_enabled:
+        SlackMessageScheduler.start(
+            method_rates=app_settings.slack_scheduler_method_rates,
+            default_rate=app_settings.slack_scheduler_default_rate,
+            channel_rate=app_settings.slack_scheduler_channel_rate,
+            burst=app_settings.slack_scheduler_burst,
+            max_retries=app_settings.slack_scheduler_max_retries,
+        )
 
     # Yield back to the FastAPI event loop.
     yield
 
-    # Tear down resources - here, we close the Redis connection pool.
+    # Tear down resources - here, we drain the listener executors, stop the scheduler,
+    # close the outbound Slack session, stop the caches and close the Redis connection pool.
+    await ListenerExecutor.stop_all()
+    await SlackMessageScheduler.stop()
+    await SlackHttpSession.close()
+    await QuoteCorpusCache.stop_all()
     await AsyncRedisDAOFactory.reset_connection_pool()
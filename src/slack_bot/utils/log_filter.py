@@ -1,6 +1,7 @@
 """
-This module provides a logging filter to suppress specific
-log records based on their content.
+This module provides logging filters to suppress specific
+log records based on their content, and to sample the access
+log records based on their request path.
 
 Author: Patryk Golabek
 Company: Translucent Computing Inc.
@@ -8,7 +9,8 @@ Copyright: 2023 Translucent Computing Inc.
 """
 
 import logging
-from typing import List
+import random
+from typing import Dict, List, Mapping
 
 
 class SuppressSpecificLogEntries(logging.Filter):
@@ -44,3 +46,89 @@ class SuppressSpecificLogEntries(logging.Filter):
             bool: True if the log record should be allowed, False if it should be suppressed.
         """
         return not any(entry in record.getMessage() for entry in self.suppressed_entries)
+
+
+class AccessLogSampler(logging.Filter):
+    """
+    A logging filter sampling the uvicorn access log records by request path.
+
+    The request path and the status code are read from the arguments of the record,
+    so the records left out are never formatted. The paths are matched exactly, or by
+    prefix for the rules ending with "/*", with one lookup per path segment whatever the
+    number of rules.
+
+    Attributes:
+        error_rate (float): The share of the error responses, status 400 and above, kept.
+
+    Methods:
+        filter(record: logging.LogRecord) -> bool:
+            Determines if the access log record is kept, sampling it by path and status.
+    """
+
+    def __init__(self, sample_rates: Mapping[str, float], error_rate: float = 1.0):
+        """
+        Initialize the AccessLogSampler filter with the sampling rates of the paths.
+
+        Args:
+            sample_rates (Mapping[str, float]): The share of the successful responses
+                kept by path, between 0 and 1, such as {"/healthcheck": 0.0}. A path
+                ending with "/*" matches the paths under it, such as "/static/*". The
+                other paths are all kept.
+            error_rate (float, optional): The share of the error responses kept.
+                Defaults to 1.0.
+
+        Raises:
+            ValueError: If a path ends with "*" without the "/" before it, such as
+                "/static*".
+        """
+        super().__init__()
+        self.error_rate = error_rate
+        self._exact: Dict[str, float] = {}
+        self._prefixes: Dict[str, float] = {}
+        for path, rate in sample_rates.items():
+            if path.endswith("/*"):
+                self._prefixes[path[:-1]] = rate
+            elif path.endswith("*"):
+                raise ValueError(
+                    f'The access log path {path!r} is not a prefix rule, which ends with "/*".'
+                )
+            else:
+                self._exact[path] = rate
+
+    def _path_rate(self, path: str) -> float:
+        """Get the sampling rate of a path, the longest prefix applying."""
+        rate = self._exact.get(path)
+        if rate is not None:
+            return rate
+        if self._prefixes:
+            end = len(path)
+            while end > 0:
+                rate = self._prefixes.get(path[:end])
+                if rate is not None:
+                    return rate
+                end = path.rfind("/", 0, end - 1) + 1
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Check if an access log record is kept, by the rate of its path or of the errors.
+
+        Args:
+            record (logging.LogRecord): The log record to be checked, with the uvicorn
+                access arguments: client, method, path, HTTP version and status code.
+
+        Returns:
+            bool: True if the log record should be allowed, False if it should be suppressed.
+        """
+        args = record.args
+        if not isinstance(args, tuple) or len(args) != 5:
+            return True
+        path, status = args[2], args[4]
+        if not isinstance(path, str) or not isinstance(status, int):
+            return True
+
+        if status >= 400:
+            rate = self.error_rate
+        else:
+            rate = self._path_rate(path.partition("?")[0])
+        return rate >= 1 or (rate > 0 and random.random() < rate)
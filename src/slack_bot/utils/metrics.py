@@ -0,0 +1,178 @@
+"""
+This module provides the Prometheus metrics exported by the application.
+
+The metrics are registered with the default Prometheus registry, which is served
+on the `/metrics` route by the starlette exporter.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Latency buckets in seconds, finer up to the 3 seconds Slack waits for the ack of a
+# request before retrying it.
+SLACK_DEADLINE_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    1.5,
+    2.0,
+    2.5,
+    3.0,
+    5.0,
+    10.0,
+)
+
+CORPUS_CACHE_HITS = Counter(
+    "slack_bot_corpus_cache_hits",
+    "Random quote selections served from the in-process corpus cache.",
+    ["index"],
+)
+
+CORPUS_CACHE_MISSES = Counter(
+    "slack_bot_corpus_cache_misses",
+    "Random quote selections that fell back to Redis.",
+    ["index"],
+)
+
+CORPUS_CACHE_REFRESHES = Counter(
+    "slack_bot_corpus_cache_refreshes",
+    "Reloads of the in-process corpus cache.",
+    ["index", "result"],
+)
+
+CORPUS_CACHE_SIZE = Gauge(
+    "slack_bot_corpus_cache_size",
+    "Number of quotes held in the in-process corpus cache.",
+    ["index"],
+)
+
+REDIS_POOL_CONNECTIONS = Gauge(
+    "slack_bot_redis_pool_connections",
+    "Connections of the Redis connection pools, by state: in_use or idle.",
+    ["pool", "state"],
+)
+
+CLIENT_CACHE_HITS = Counter(
+    "slack_bot_client_cache_hits",
+    "Redis replies served from the client-side cache, by kind of reply.",
+    ["kind"],
+)
+
+CLIENT_CACHE_MISSES = Counter(
+    "slack_bot_client_cache_misses",
+    "Redis replies read from Redis on a client-side cache miss, by kind of reply.",
+    ["kind"],
+)
+
+CLIENT_CACHE_INVALIDATIONS = Counter(
+    "slack_bot_client_cache_invalidations",
+    "Replies dropped from the client-side cache, by reason: push, flush, disconnect or evicted.",
+    ["reason"],
+)
+
+CLIENT_CACHE_SIZE = Gauge(
+    "slack_bot_client_cache_size",
+    "Number of replies held in the client-side cache.",
+)
+
+LISTENER_QUEUE_DEPTH = Gauge(
+    "slack_bot_listener_queue_depth",
+    "Slack listener runs waiting for a worker of the background executor.",
+    ["executor"],
+)
+
+LISTENER_QUEUE_WAIT_SECONDS = Histogram(
+    "slack_bot_listener_queue_wait_seconds",
+    "Time Slack listener runs waited in the queue of the background executor.",
+    ["executor", "listener"],
+    buckets=SLACK_DEADLINE_BUCKETS,
+)
+
+LISTENER_RUN_SECONDS = Histogram(
+    "slack_bot_listener_run_seconds",
+    "Time Slack listener runs took on a worker of the background executor.",
+    ["executor", "listener"],
+    buckets=SLACK_DEADLINE_BUCKETS,
+)
+
+LISTENER_OVERFLOWS = Counter(
+    "slack_bot_listener_overflows",
+    "Slack listener runs submitted to a full background executor, by overflow policy.",
+    ["executor", "listener", "policy"],
+)
+
+LISTENER_ACK_SECONDS = Histogram(
+    "slack_bot_listener_ack_seconds",
+    "Time from the Slack request reaching Bolt to its ack, by listener.",
+    ["listener"],
+    buckets=SLACK_DEADLINE_BUCKETS,
+)
+
+LISTENER_HANDLER_SECONDS = Histogram(
+    "slack_bot_listener_handler_seconds",
+    "Time Slack listeners took to handle their request, in the background included.",
+    ["listener"],
+    buckets=SLACK_DEADLINE_BUCKETS,
+)
+
+LISTENER_ERRORS = Counter(
+    "slack_bot_listener_errors",
+    "Errors raised by the Slack listeners, by exception type.",
+    ["exception"],
+)
+
+REDIS_COMMAND_SECONDS = Histogram(
+    "slack_bot_redis_command_seconds",
+    "Latency of the Redis commands of the search DAO, by command.",
+    ["command"],
+    buckets=SLACK_DEADLINE_BUCKETS,
+)
+
+SLACK_REQUEST_SECONDS = Histogram(
+    "slack_bot_slack_request_seconds",
+    "Latency of the outbound Slack calls, by Slack method and HTTP status or error.",
+    ["method", "status"],
+)
+
+SLACK_SCHEDULER_QUEUE_DEPTH = Gauge(
+    "slack_bot_slack_scheduler_queue_depth",
+    "Outbound Slack sends waiting for their rate limit in the message scheduler.",
+)
+
+SLACK_SCHEDULER_WAIT_SECONDS = Histogram(
+    "slack_bot_slack_scheduler_wait_seconds",
+    "Time outbound Slack sends waited in the message scheduler, by Slack method.",
+    ["method"],
+)
+
+SLACK_SCHEDULER_RATE_LIMITED = Counter(
+    "slack_bot_slack_scheduler_rate_limited",
+    "Outbound Slack sends answered with a 429 and queued again, by Slack method.",
+    ["method"],
+)
+
+SLACK_DUPLICATE_REQUESTS = Counter(
+    "slack_bot_slack_duplicate_requests",
+    "Slack requests answered without processing, already delivered, by kind of request "
+    "and where the ID was found: memory or redis.",
+    ["kind", "source"],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "slack_bot_log_records_dropped",
+    "Log records dropped, oldest first, by the queued logging when its queue was full.",
+)
+
+SPANS_DROPPED = Counter(
+    "slack_bot_spans_dropped",
+    "Finished spans dropped by the JSONL span exporter when its queue was full.",
+)
@@ -0,0 +1,167 @@
+"""
+This module provides the queued logging of the application.
+
+The handlers configured by `logging.json` write to stdout on the thread of the logging
+call, so a backed up stdout stalls the event loop. When the queued logging is started,
+the loggers put their records in a bounded queue instead, and a dedicated thread hands
+them to the configured handlers. A full queue drops its oldest record, counted in the
+`slack_bot_log_records_dropped` metric, or blocks the logging call until there is room.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import atexit
+import copy
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Literal, Optional
+
+from .metrics import LOG_RECORDS_DROPPED
+
+# What a full queue does with a new record.
+OverflowPolicy = Literal["drop_oldest", "block"]
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler applying an overflow policy when its bounded queue is full."""
+
+    # The exceptions are formatted the way the JSON formatter formats them.
+    _exception_formatter = logging.Formatter()
+
+    def __init__(self, queue_: "queue.Queue[Any]", overflow: OverflowPolicy = "drop_oldest"):
+        """
+        Initialize the handler.
+
+        Args:
+            queue_ (queue.Queue[Any]): The bounded queue drained by the listener.
+            overflow (OverflowPolicy, optional): What a full queue does with a new
+                record. Defaults to "drop_oldest".
+        """
+        super().__init__(queue_)
+        self.overflow = overflow
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the message and the exception of a record on the logging thread.
+
+        The arguments can change once the logging call returns, so the message is
+        merged before the record is queued. Unlike the default preparation, the
+        exception is kept apart from the message for the JSON formatter.
+
+        Args:
+            record (logging.LogRecord): The record to queue.
+
+        Returns:
+            logging.LogRecord: A copy of the record without arguments or traceback.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Queue a record, dropping the oldest one or blocking if the queue is full.
+
+        Args:
+            record (logging.LogRecord): The prepared record.
+        """
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.queue.task_done()
+                LOG_RECORDS_DROPPED.inc()
+
+
+class _DrainingQueueListener(QueueListener):
+    """Queue listener waiting for room in the queue for its stop sentinel."""
+
+    def enqueue_sentinel(self) -> None:
+        """Queue the sentinel after the records already queued."""
+        self.queue.put(self._sentinel)
+
+
+class QueuedLogging:
+    """Moves the configured logging handlers behind a bounded queue and a thread.
+
+    Attributes:
+        _listener (Optional[QueueListener]): The listener thread running the handlers.
+        _handlers (Dict[logging.Logger, List[logging.Handler]]): The handlers of the
+            loggers, restored when the queued logging is stopped.
+    """
+
+    _listener: Optional[QueueListener] = None
+    _handlers: Dict[logging.Logger, List[logging.Handler]] = {}
+    _exit_registered = False
+
+    @classmethod
+    def start(cls, queue_size: int, overflow: OverflowPolicy = "drop_oldest") -> QueueHandler:
+        """
+        Queue the records of every logger with handlers, root included.
+
+        The handlers are run by the listener thread in place of the loggers, each at its
+        own level, and the records are flushed at exit.
+
+        Args:
+            queue_size (int): The maximum number of queued records.
+            overflow (OverflowPolicy, optional): What a full queue does with a new
+                record. Defaults to "drop_oldest".
+
+        Returns:
+            QueueHandler: The handler now attached to the loggers.
+        """
+        cls.stop()
+
+        candidates = [logging.getLogger()] + [
+            candidate
+            for candidate in logging.Logger.manager.loggerDict.values()
+            if isinstance(candidate, logging.Logger)
+        ]
+        loggers = [candidate for candidate in candidates if candidate.handlers]
+
+        # Handlers shared by several loggers, such as the console, run once per record.
+        handlers: List[logging.Handler] = []
+        for configured in loggers:
+            handlers.extend(h for h in configured.handlers if h not in handlers)
+
+        queue_handler = BoundedQueueHandler(queue.Queue(queue_size), overflow)
+        for configured in loggers:
+            cls._handlers[configured] = configured.handlers
+            configured.handlers = [queue_handler]
+
+        cls._listener = _DrainingQueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        cls._listener.start()
+        if not cls._exit_registered:
+            atexit.register(cls.stop)
+            cls._exit_registered = True
+        return queue_handler
+
+    @classmethod
+    def stop(cls) -> None:
+        """Restore the handlers of the loggers and write the queued records."""
+        for configured, handlers in cls._handlers.items():
+            configured.handlers = handlers
+        cls._handlers = {}
+
+        listener, cls._listener = cls._listener, None
+        if listener is not None:
+            listener.stop()
@@ -0,0 +1,441 @@
+"""
+This module provides the in-process tracing of the application.
+
+A span times one step of a request, such as the Slack route, a Bolt listener, a
+service method, a Redis command or an outbound Slack call. The current span is kept in
+a context variable, so the spans opened by the listeners and the calls they await are
+children of the span of the route, and the spans of a request share its trace ID. The
+finished spans are handed to the configured exporters: the in-memory exporter keeps the
+latest spans and the JSONL exporter appends them to a local file, no collector needed.
+The file is written by a thread of the exporter, so the event loop never waits on disk.
+
+Tracing is disabled until exporters are configured, and a disabled tracer opens no
+spans, so the instrumented code only checks a flag.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import (
+    IO,
+    Any,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+from .metrics import SPANS_DROPPED
+
+logger = logging.getLogger("app")
+
+T = TypeVar("T")
+
+# The span of the running step of a request.
+_current_span: ContextVar[Optional["Span"]] = ContextVar("slack_bot_span", default=None)
+
+# Returned in place of a span by a disabled tracer.
+_DISABLED: ContextManager[None] = nullcontext()
+
+# Queued by a closing JSONL exporter after the spans, to stop its thread.
+_STOP = object()
+
+# The characters not allowed in the metric names of the Server-Timing header.
+_NOT_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+
+class Span:
+    """A timed step of a request.
+
+    Attributes:
+        name (str): The name of the step, such as "service.get_quote".
+        trace_id (str): The ID shared by the spans of a request.
+        span_id (str): The ID of the span.
+        parent_id (Optional[str]): The ID of the enclosing span, None for the root span.
+        start (float): The start time, in seconds since the epoch.
+        duration (Optional[float]): The duration in seconds, None until the span ends.
+        attributes (Dict[str, Any]): The details of the step.
+        error (Optional[str]): The type of the exception the step raised, if any.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "duration",
+        "attributes",
+        "error",
+        "_started",
+        "_finished",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        """
+        Start a span.
+
+        Args:
+            name (str): The name of the step.
+            parent (Optional[Span]): The enclosing span, None to start a trace.
+            attributes (Dict[str, Any]): The details of the step.
+        """
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        if parent is None:
+            self.trace_id = f"{random.getrandbits(128):032x}"
+            self.parent_id: Optional[str] = None
+            # The finished spans of the trace, for the Server-Timing header.
+            self._finished: List[Span] = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self._finished = parent._finished
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self.start = time.time()
+        self._started = time.perf_counter()
+
+    def end(self) -> None:
+        """End the span, recording its duration."""
+        self.duration = time.perf_counter() - self._started
+        self._finished.append(self)
+
+    def elapsed(self) -> float:
+        """Return the seconds since the span started, or its duration once ended."""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the span as a JSON serializable dictionary."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(ABC):
+    """Receives the finished spans."""
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """
+        Export a finished span.
+
+        Args:
+            span (Span): The finished span.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the resources of the exporter."""
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps the latest finished spans in memory."""
+
+    def __init__(self, max_spans: int = 1000):
+        """
+        Initialize the exporter.
+
+        Args:
+            max_spans (int, optional): The number of spans kept, the oldest are
+                discarded first. Defaults to 1000.
+        """
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        """Keep a finished span."""
+        self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        """
+        Return the kept spans, in the order they ended.
+
+        Args:
+            trace_id (Optional[str], optional): Only return the spans of this trace.
+                Defaults to None.
+
+        Returns:
+            List[Span]: The kept spans.
+        """
+        return [span for span in self._spans if trace_id is None or span.trace_id == trace_id]
+
+    def clear(self) -> None:
+        """Discard the kept spans."""
+        self._spans.clear()
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends the finished spans to a file, one JSON object per line.
+
+    The spans are queued and written by a thread of the exporter, which flushes the file
+    once the queue is drained. A full queue drops the new span, counted in the
+    `slack_bot_spans_dropped` metric.
+    """
+
+    def __init__(self, path: str, queue_size: int = 10000):
+        """
+        Initialize the exporter, the file is opened by the first span.
+
+        Args:
+            path (str): The path of the file.
+            queue_size (int, optional): The maximum number of spans waiting to be
+                written. Defaults to 10000.
+        """
+        self.path = path
+        self._queue: "queue.Queue[Any]" = queue.Queue(queue_size)
+        self._thread: Optional[threading.Thread] = threading.Thread(
+            target=self._write, name="jsonl-span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        """Queue a finished span to be written to the file."""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            SPANS_DROPPED.inc()
+
+    def close(self) -> None:
+        """Write the queued spans, then close the file."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _write(self) -> None:
+        """Write the queued spans until the exporter is closed."""
+        file: Optional[IO[str]] = None
+        try:
+            while True:
+                span = self._queue.get()
+                if span is _STOP:
+                    return
+                try:
+                    if file is None:
+                        file = open(self.path, "a", encoding="utf-8")
+                    file.write(json.dumps(span.to_dict(), default=str) + "\n")
+                    if self._queue.empty():
+                        file.flush()
+                except Exception:
+                    logger.exception("Failed to write the %s span to %s.", span.name, self.path)
+        finally:
+            if file is not None:
+                file.close()
+
+
+class Tracer:
+    """Opens the spans of the application and hands the finished ones to the exporters.
+
+    Attributes:
+        enabled (bool): Whether spans are opened, True once exporters are configured.
+        _exporters (List[SpanExporter]): The exporters of the finished spans.
+    """
+
+    enabled = False
+    _exporters: List[SpanExporter] = []
+    _exit_registered = False
+
+    @classmethod
+    def configure(cls, exporters: Sequence[SpanExporter]) -> None:
+        """
+        Replace the exporters, enabling tracing if there is any.
+
+        The exporters are closed at exit.
+
+        Args:
+            exporters (Sequence[SpanExporter]): The exporters of the finished spans.
+        """
+        cls.shutdown()
+        cls._exporters = list(exporters)
+        cls.enabled = bool(cls._exporters)
+        if cls.enabled and not cls._exit_registered:
+            atexit.register(cls.shutdown)
+            cls._exit_registered = True
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Disable tracing and close the exporters."""
+        exporters, cls._exporters = cls._exporters, []
+        cls.enabled = False
+        for exporter in exporters:
+            exporter.close()
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        """Return the span of the running step, if any."""
+        return _current_span.get()
+
+    @classmethod
+    def start_span(cls, name: str, **attributes: Any) -> Optional[Span]:
+        """
+        Start a span under the current one, without making it current.
+
+        Used where a step starts and ends in separate callbacks, as the outbound calls do.
+
+        Args:
+            name (str): The name of the step.
+            **attributes: The details of the step.
+
+        Returns:
+            Optional[Span]: The span to end, or None if tracing is disabled.
+        """
+        if not cls.enabled:
+            return None
+        return Span(name, _current_span.get(), attributes)
+
+    @classmethod
+    def end_span(cls, span: Span, error: Optional[BaseException] = None) -> None:
+        """
+        End a span and export it.
+
+        Args:
+            span (Span): The span started by `start_span`.
+            error (Optional[BaseException], optional): The exception the step raised.
+                Defaults to None.
+        """
+        if error is not None:
+            span.error = type(error).__name__
+        span.end()
+        for exporter in cls._exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.exception("The %s span exporter failed.", type(exporter).__name__)
+
+    @classmethod
+    def span(cls, name: str, **attributes: Any) -> ContextManager[Optional[Span]]:
+        """
+        Open a span for the duration of a with block, as the current span.
+
+        Args:
+            name (str): The name of the step.
+            **attributes: The details of the step.
+
+        Returns:
+            ContextManager[Optional[Span]]: The context manager of the span, yielding
+                None if tracing is disabled.
+        """
+        if not cls.enabled:
+            return _DISABLED
+        return cls._open(name, attributes)
+
+    @classmethod
+    @contextmanager
+    def _open(cls, name: str, attributes: Dict[str, Any]) -> Iterator[Span]:
+        """Run a with block in a new current span."""
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            _current_span.reset(token)
+            cls.end_span(span, error)
+            raise
+        _current_span.reset(token)
+        cls.end_span(span)
+
+    @classmethod
+    def traced(
+        cls, name: str
+    ) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+        """
+        Decorate a coroutine function to run each call in a span.
+
+        Args:
+            name (str): The name of the step.
+
+        Returns:
+            Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]: The
+                decorator.
+        """
+
+        def decorator(function: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+            @wraps(function)
+            async def traced_function(*args: Any, **kwargs: Any) -> T:
+                if not cls.enabled:
+                    return await function(*args, **kwargs)
+                with cls._open(name, {}):
+                    return await function(*args, **kwargs)
+
+            return traced_function
+
+        return decorator
+
+    @classmethod
+    def propagate(cls, job: Callable[[], Awaitable[T]]) -> Callable[[], Awaitable[T]]:
+        """
+        Bind a job run by another task to the current span.
+
+        The worker tasks of the executors are not created by the request, so the work
+        they run carries the span of the request that queued it.
+
+        Args:
+            job (Callable[[], Awaitable[T]]): The job.
+
+        Returns:
+            Callable[[], Awaitable[T]]: The job run under the current span.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return job
+
+        async def propagated_job() -> T:
+            token = _current_span.set(parent)
+            try:
+                return await job()
+            finally:
+                _current_span.reset(token)
+
+        return propagated_job
+
+    @staticmethod
+    def server_timing(span: Span) -> str:
+        """
+        Report the time of a request in the format of the Server-Timing header.
+
+        Args:
+            span (Span): The root span of the request, ended or not.
+
+        Returns:
+            str: The total time of the spans of the trace ended so far, by name, with
+                the time of the root span, in milliseconds.
+        """
+        durations: Dict[str, float] = {}
+        for finished in span._finished:
+            if finished is not span:
+                durations[finished.name] = durations.get(finished.name, 0.0) + (
+                    finished.duration or 0.0
+                )
+        metrics = [(span.name, span.elapsed())] + list(durations.items())
+        return ", ".join(
+            f"{_NOT_TOKEN.sub('_', name)};dur={seconds * 1000:.3f}" for name, seconds in metrics
+        )
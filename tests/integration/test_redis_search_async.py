@@ -261,3 +261,52 @@ async def test_search_redis_update_document(search_redis_dao: AsyncSearchRedisDA
 
     assert extra_attributes["title"] == "Updated Product"
     assert extra_attributes["price"] == str(29.99)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("search_redis_dao")
+async def test_search_redis_random_document(search_redis_dao: AsyncSearchRedisDAO):
+    """Test fetching a random document through the key set."""
+    # Create an index and add a document to the index and to the key set
+    prefix = generate_prefix()
+    assert await create_index(search_redis_dao, prefix)
+
+    doc_id = f"{prefix}doc{search_redis_dao.search_index_name}_{uuid.uuid4()}"
+    await search_redis_dao.client.hset(doc_id, mapping={"title": "Random Product", "price": 9})
+    await search_redis_dao.client.sadd(search_redis_dao.keyset_name, doc_id)
+
+    # Fetch a random document
+    document = await search_redis_dao.random_document()
+
+    assert document == {"title": "Random Product", "price": "9"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("search_redis_dao")
+async def test_search_redis_random_document_missing_keyset(search_redis_dao: AsyncSearchRedisDAO):
+    """Test fetching a random document when the key set does not exist."""
+    assert await search_redis_dao.random_document() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("search_redis_dao")
+async def test_search_redis_stream_documents(search_redis_dao: AsyncSearchRedisDAO):
+    """Test streaming all the documents of an index through a cursor."""
+    # Create an index and upsert more documents than a batch holds
+    prefix = generate_prefix()
+    assert await create_index(search_redis_dao, prefix)
+    documents = [
+        (f"{prefix}doc{idx}", {"title": f"Product {idx}", "price": idx}) for idx in range(25)
+    ]
+    result = await search_redis_dao.upsert_documents(documents, batch_size=10)
+    assert result.written == 25
+    await search_redis_dao.wait_for_indexing(poll_interval=0.1)
+
+    # Stream the keys and titles in batches of 10
+    rows = [
+        row
+        async for row in search_redis_dao.stream_documents(fields=["__key", "title"], batch_size=10)
+    ]
+
+    assert sorted(row["__key"] for row in rows) == sorted(key for key, _ in documents)
+    assert all(set(row) == {"__key", "title"} for row in rows)
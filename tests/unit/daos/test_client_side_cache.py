@@ -0,0 +1,364 @@
+"""
+Unit test for the client-side cache.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import inspect
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+from redis._parsers import _AsyncRESP3Parser
+from redis.asyncio import ConnectionPool
+from redis.exceptions import ConnectionError
+
+from src.slack_bot.daos.client_side_cache import OVERSIZED, ClientSideCache
+from src.slack_bot.daos.metered_connection_pool import MeteredConnectionPool
+
+LISTENER_ID = 7
+
+
+class FakeConnection:
+    """Connection replying to the commands from a dictionary of replies."""
+
+    def __init__(self, replies: Dict[Tuple[Any, ...], Any]):
+        """Initialize the connection with the replies, keyed by command."""
+        self.replies = replies
+        self.commands: List[Tuple[Any, ...]] = []
+        self.disconnect = AsyncMock()
+        self.tracking_id: Optional[int] = None
+
+    async def send_command(self, *args: Any) -> None:
+        """Record the command."""
+        self.commands.append(args)
+
+    async def read_response(self) -> Any:
+        """Reply to the last command, raising the reply if it is an exception."""
+        reply = self.replies.get(self.commands[-1])
+        if isinstance(reply, Exception):
+            raise reply
+        return reply() if callable(reply) else reply
+
+
+def make_cache(
+    replies: Dict[Tuple[Any, ...], Any], max_entries: int = 10, **kwargs: Any
+) -> Tuple[ClientSideCache, FakeConnection]:
+    """Create a connected cache reading from a single fake connection."""
+    cache = ClientSideCache(ConnectionPool(), max_entries, **kwargs)
+    connection = FakeConnection(replies)
+    cache._pool.get_connection = AsyncMock(return_value=connection)  # type: ignore
+    cache._pool.release = AsyncMock()  # type: ignore
+    cache._listener_id = LISTENER_ID
+    return cache, connection
+
+
+def sample(name: str, labels: Optional[Dict[str, str]] = None) -> float:
+    """Read a client cache metric, 0 when it was never set."""
+    return REGISTRY.get_sample_value(f"slack_bot_client_cache_{name}", labels or {}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_hgetall_tracks_and_caches():
+    """Test that a hash is read on a tracked connection once and then served from the cache."""
+    cache, connection = make_cache({("HGETALL", "doc:1"): {"quote": "Q"}})
+    hits = sample("hits_total", {"kind": "hash"})
+    misses = sample("misses_total", {"kind": "hash"})
+
+    assert await cache.hgetall("doc:1") == {"quote": "Q"}
+    assert await cache.hgetall("doc:1") == {"quote": "Q"}
+
+    assert connection.commands == [
+        ("CLIENT", "TRACKING", "ON", "REDIRECT", LISTENER_ID),
+        ("HGETALL", "doc:1"),
+    ]
+    assert connection.tracking_id == LISTENER_ID
+    assert len(cache) == 1
+    assert sample("size") == 1
+    assert sample("hits_total", {"kind": "hash"}) == hits + 1
+    assert sample("misses_total", {"kind": "hash"}) == misses + 1
+
+
+@pytest.mark.asyncio
+async def test_tracking_redirected_to_new_listener():
+    """Test that tracking is turned off before it is redirected to a reconnected listener."""
+    cache, connection = make_cache({("HGETALL", "doc:1"): {}})
+    connection.tracking_id = 3
+
+    assert await cache.hgetall("doc:1") == {}
+
+    assert connection.commands[:2] == [
+        ("CLIENT", "TRACKING", "OFF"),
+        ("CLIENT", "TRACKING", "ON", "REDIRECT", LISTENER_ID),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_push():
+    """Test that an invalidation push drops the replies of the invalidated keys only."""
+    cache, connection = make_cache(
+        {("HGETALL", "doc:1"): {"quote": "Q1"}, ("HGETALL", "doc:2"): {"quote": "Q2"}}
+    )
+    await cache.hgetall("doc:1")
+    await cache.hgetall("doc:2")
+    pushes = sample("invalidations_total", {"reason": "push"})
+
+    await cache._on_invalidate(["invalidate", [b"doc:1"]])
+
+    assert len(cache) == 1
+    assert sample("invalidations_total", {"reason": "push"}) == pushes + 1
+    connection.replies[("HGETALL", "doc:1")] = {"quote": "New"}
+    assert await cache.hgetall("doc:1") == {"quote": "New"}
+
+
+@pytest.mark.asyncio
+async def test_flush_push():
+    """Test that a null invalidation push, sent on FLUSHDB, drops the whole cache."""
+    cache, _ = make_cache({("HGETALL", "doc:1"): {}, ("HGETALL", "doc:2"): {}})
+    await cache.hgetall("doc:1")
+    await cache.hgetall("doc:2")
+
+    await cache._on_invalidate(["invalidate", None])
+
+    assert len(cache) == 0
+    assert sample("size") == 0
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    """Test that the least recently used reply is evicted over the size limit."""
+    cache, connection = make_cache(
+        {("HGETALL", key): {"key": key} for key in ("doc:1", "doc:2", "doc:3")}, max_entries=2
+    )
+    evicted = sample("invalidations_total", {"reason": "evicted"})
+
+    await cache.hgetall("doc:1")
+    await cache.hgetall("doc:2")
+    await cache.hgetall("doc:1")  # doc:2 is now the least recently used
+    await cache.hgetall("doc:3")
+
+    assert len(cache) == 2
+    assert sample("invalidations_total", {"reason": "evicted"}) == evicted + 1
+    connection.commands.clear()
+    await cache.hgetall("doc:1")
+    assert connection.commands == []
+    await cache.hgetall("doc:2")
+    assert connection.commands == [("HGETALL", "doc:2")]
+
+
+@pytest.mark.asyncio
+async def test_reply_invalidated_while_read_is_not_cached():
+    """Test that a reply read across an invalidation is returned but not cached."""
+    cache, connection = make_cache({})
+
+    def invalidated_reply() -> Dict[str, str]:
+        cache.invalidate(["doc:1"])
+        return {"quote": "Stale"}
+
+    connection.replies[("HGETALL", "doc:1")] = invalidated_reply
+
+    assert await cache.hgetall("doc:1") == {"quote": "Stale"}
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_not_cached_without_listener():
+    """Test that replies are not cached while the listener is disconnected."""
+    cache, _ = make_cache({("HGETALL", "doc:1"): {}})
+    cache._listener_id = None
+
+    await cache.hgetall("doc:1")
+
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_connection_error_flushes():
+    """Test that a lost tracked connection is disconnected and flushes the cache."""
+    cache, connection = make_cache({("HGETALL", "doc:1"): {}})
+    await cache.hgetall("doc:1")
+    connection.replies[("HGETALL", "doc:2")] = ConnectionError("lost")
+
+    with pytest.raises(ConnectionError):
+        await cache.hgetall("doc:2")
+
+    assert len(cache) == 0
+    connection.disconnect.assert_awaited_once()
+    cache._pool.release.assert_awaited_with(connection)
+
+
+@pytest.mark.asyncio
+async def test_busy_tracked_connections_read_through_the_main_pool():
+    """Test that a read waiting for a tracked connection is served by the main pool."""
+    cache, tracked = make_cache({})
+    cache._pool.can_get_connection = MagicMock(return_value=False)  # type: ignore
+    connection = FakeConnection({("HGETALL", "doc:1"): {"quote": "Test Quote"}})
+    cache._main_pool.get_connection = AsyncMock(return_value=connection)  # type: ignore
+    cache._main_pool.release = AsyncMock()  # type: ignore
+
+    assert await cache.hgetall("doc:1") == {"quote": "Test Quote"}
+
+    # The connection is not tracked, so its reply is not cached.
+    assert connection.commands == [("HGETALL", "doc:1")]
+    assert tracked.commands == []
+    assert len(cache) == 0
+    cache._main_pool.release.assert_awaited_once_with(connection)
+
+
+def test_tracked_connections_have_their_own_pool():
+    """Test that the tracked connections pool is sized by the cache, not the main pool."""
+    cache = ClientSideCache(ConnectionPool(max_connections=50), 10, max_connections=3)
+
+    assert isinstance(cache.connection_pool, MeteredConnectionPool)
+    assert cache.connection_pool.max_connections == 3
+
+
+@pytest.mark.asyncio
+async def test_reconnect_flushes():
+    """Test that the reconnection of a tracked connection flushes the cache."""
+    cache, connection = make_cache({("HGETALL", "doc:1"): {}})
+    await cache.hgetall("doc:1")
+
+    # A new connection did not track anything yet.
+    cache._on_connect(MagicMock(tracking_id=None))
+    assert len(cache) == 1
+
+    cache._on_connect(connection)  # type: ignore
+    assert len(cache) == 0
+    assert connection.tracking_id is None
+
+
+@pytest.mark.asyncio
+async def test_smembers_oversized():
+    """Test that a set larger than the cache is not read."""
+    cache, connection = make_cache({("SCARD", "keyset"): 3}, max_entries=2)
+
+    assert await cache.smembers("keyset") is OVERSIZED
+    assert ("SMEMBERS", "keyset") not in connection.commands
+
+
+@pytest.mark.asyncio
+async def test_smembers():
+    """Test that the members of a set are cached as a list."""
+    cache, _ = make_cache({("SCARD", "keyset"): 2, ("SMEMBERS", "keyset"): {"doc:1", "doc:2"}})
+
+    assert sorted(await cache.smembers("keyset")) == ["doc:1", "doc:2"]
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_load():
+    """Test that a loaded reply is cached until its dependency is invalidated."""
+    cache, connection = make_cache({("GET", "version"): "1"})
+    loader = AsyncMock(return_value="results")
+
+    assert await cache.get_or_load("search", ("FT.SEARCH", "*"), "version", loader) == "results"
+    assert await cache.get_or_load("search", ("FT.SEARCH", "*"), "version", loader) == "results"
+    loader.assert_awaited_once()
+    assert ("GET", "version") in connection.commands
+
+    cache.invalidate(["version"])
+    await cache.get_or_load("search", ("FT.SEARCH", "*"), "version", loader)
+    assert loader.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_broadcast_mode():
+    """Test that the broadcast mode does not track connections and caches tracked prefixes."""
+    cache, connection = make_cache(
+        {("HGETALL", "doc:1"): {}, ("HGETALL", "other:1"): {}},
+        broadcast=True,
+        prefixes=["doc:"],
+    )
+
+    await cache.hgetall("doc:1")
+    await cache.hgetall("other:1")
+
+    assert connection.commands == [("HGETALL", "doc:1"), ("HGETALL", "other:1")]
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_listener_start_and_stop():
+    """Test that the listener registers the push handler and subscribes in broadcast mode."""
+    cache = ClientSideCache(ConnectionPool(), 10, broadcast=True, prefixes=["doc:"])
+    listener = FakeConnection({("CLIENT", "ID"): LISTENER_ID})
+    listener.connect = AsyncMock()
+    listener._parser = MagicMock()
+    blocked = asyncio.Event()
+
+    async def read_response(timeout: Any = 0, push_request: bool = False) -> Any:
+        if push_request:
+            await blocked.wait()
+        return listener.replies.get(listener.commands[-1])
+
+    listener.read_response = read_response  # type: ignore
+    cache._pool.connection_class = MagicMock(return_value=listener)  # type: ignore
+
+    await cache.start(timeout=1.0)
+
+    assert cache.ready
+    listener._parser.set_invalidation_push_handler.assert_called_once_with(cache._on_invalidate)
+    assert ("CLIENT", "TRACKING", "ON", "BCAST", "PREFIX", "doc:") in listener.commands
+
+    await cache.stop()
+
+    assert not cache.ready
+    listener.disconnect.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_push_handler_of_the_installed_parser():
+    """Test that the handler registered with the real RESP3 parser applies invalidations."""
+    cache, _ = make_cache({("HGETALL", "doc:1"): {}, ("HGETALL", "doc:2"): {}})
+    await cache.hgetall("doc:1")
+    await cache.hgetall("doc:2")
+    parser = _AsyncRESP3Parser(65536)
+    cache._set_push_handler(MagicMock(_parser=parser))
+
+    # redis 5.1 and later await the invalidation handler, redis 5.0 calls the push handler.
+    handler = getattr(parser, "invalidation_push_handler_func", None) or parser.push_handler_func
+    result = handler([b"invalidate", [b"doc:1"]])
+    if inspect.isawaitable(result):
+        await result
+
+    assert len(cache) == 1
+
+
+def test_redis_5_0_push_handler_ignores_other_pushes():
+    """Test the synchronous push handler of redis 5.0, which also receives other pushes."""
+    cache, _ = make_cache({})
+    cache._store(("HGETALL", "doc:1"), ("doc:1",), {})
+    parser = MagicMock(spec=["set_push_handler"])
+    cache._set_push_handler(MagicMock(_parser=parser))
+    parser.set_push_handler.assert_called_once_with(cache._on_push)
+
+    cache._on_push([b"message", b"channel", b"doc:1"])
+    assert len(cache) == 1
+    cache._on_push([b"invalidate", [b"doc:1"]])
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_listener_setup_failure_falls_back_to_redis():
+    """Test that a listener that cannot be set up is logged and the cache is bypassed."""
+    cache, connection = make_cache({("HGETALL", "doc:1"): {"quote": "Q1"}})
+    cache._listener_id = None
+    listener = FakeConnection({})
+    listener.connect = AsyncMock()
+    listener._parser = MagicMock(spec=[])
+    cache._pool.connection_class = MagicMock(return_value=listener)  # type: ignore
+
+    with patch("src.slack_bot.daos.client_side_cache.logger") as mock_logger:
+        await cache.start(timeout=5.0)
+
+    assert cache._listener_task is not None and cache._listener_task.done()
+    mock_logger.exception.assert_called_once()
+    assert not cache.ready
+    assert await cache.hgetall("doc:1") == {"quote": "Q1"}
+    assert len(cache) == 0
+    listener.disconnect.assert_awaited()
+    await cache.stop()
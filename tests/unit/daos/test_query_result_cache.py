@@ -0,0 +1,105 @@
+"""
+Unit test for the query result cache.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from unittest.mock import patch
+
+from redis.commands.search.document import Document
+from redis.commands.search.query import Query
+from redis.commands.search.result import Result
+
+from src.slack_bot.daos.query_result_cache import QueryResultCache, estimate_size
+
+MONOTONIC = "src.slack_bot.daos.query_result_cache.time.monotonic"
+
+
+def test_key_normalization():
+    """Test that equivalent queries share a key and paging and params are part of it."""
+    key = QueryResultCache.key
+
+    assert key("idx", "*") == key("idx", Query("*"))
+    assert key("idx", "hello   world") == key("idx", "hello world")
+    assert key("idx", Query("*").paging(0, 0)) != key("idx", Query("*").paging(0, 1))
+    assert key("idx", "*", {"a": 1, "b": 2}) == key("idx", "*", {"b": 2, "a": 1})
+    assert key("idx", "*", {"a": 1}) != key("idx", "*", {"a": 2})
+    assert key("idx", "*") != key("other", "*")
+
+
+def test_get_returns_copies():
+    """Test that a cached result is returned as an equal, independent copy."""
+    cache = QueryResultCache(ttl=10, max_entries=10, max_bytes=1_000_000)
+    result = {"total_results": 1, "results": [{"id": "doc:1"}]}
+    cache.put(("q",), result, cache.generation)
+    result["total_results"] = 2
+
+    cached = cache.get(("q",))
+    assert cached == {"total_results": 1, "results": [{"id": "doc:1"}]}
+    cached["results"].clear()
+    assert cache.get(("q",)) == {"total_results": 1, "results": [{"id": "doc:1"}]}
+
+
+def test_ttl_expiry():
+    """Test that results expire after the time to live."""
+    cache = QueryResultCache(ttl=5, max_entries=10, max_bytes=1_000_000)
+    with patch(MONOTONIC, return_value=100.0):
+        cache.put(("q",), {"total_results": 1}, cache.generation)
+    with patch(MONOTONIC, return_value=104.9):
+        assert cache.get(("q",)) == {"total_results": 1}
+    with patch(MONOTONIC, return_value=105.0):
+        assert cache.get(("q",)) is None
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_lru_eviction_by_entries():
+    """Test that the least recently used result is evicted over the entry limit."""
+    cache = QueryResultCache(ttl=10, max_entries=2, max_bytes=1_000_000)
+    cache.put(("a",), 1, cache.generation)
+    cache.put(("b",), 2, cache.generation)
+    cache.get(("a",))
+    cache.put(("c",), 3, cache.generation)
+
+    assert cache.get(("a",)) == 1
+    assert cache.get(("b",)) is None
+    assert cache.get(("c",)) == 3
+
+
+def test_lru_eviction_by_bytes():
+    """Test that results are evicted over the byte limit and oversized ones not cached."""
+    item = {"quote": "x" * 100}
+    item_size = estimate_size(item)
+    cache = QueryResultCache(ttl=10, max_entries=10, max_bytes=2 * item_size)
+
+    for name in "abc":
+        cache.put((name,), dict(item), cache.generation)
+
+    assert len(cache) == 2
+    assert cache.size == 2 * item_size
+    assert cache.get(("a",)) is None
+
+    cache.put(("big",), {"quote": "x" * 10_000}, cache.generation)
+    assert cache.get(("big",)) is None
+    assert len(cache) == 2
+
+
+def test_clear_discards_results_read_before():
+    """Test that a result read before a clear is not cached."""
+    cache = QueryResultCache(ttl=10, max_entries=10, max_bytes=1_000_000)
+    generation = cache.generation
+    cache.clear()
+
+    cache.put(("q",), 1, generation)
+
+    assert cache.get(("q",)) is None
+
+
+def test_estimate_size_of_resp2_result():
+    """Test that the documents of a RESP2 result count in its size."""
+    small = Result([1, "doc:1", ["quote", "x"]], True)
+    large = Result([1, "doc:1", ["quote", "x" * 1000]], True)
+
+    assert isinstance(large.docs[0], Document)
+    assert estimate_size(large) - estimate_size(small) >= 999
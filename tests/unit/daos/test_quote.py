@@ -0,0 +1,37 @@
+"""
+Unit test for the quote record.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import pytest
+
+from src.slack_bot.daos.quote import Quote
+
+
+def test_quote():
+    """Test the fields, the comparison and the tuple form of a quote."""
+    quote = Quote("Test Quote", "Test Person")
+
+    assert quote.as_tuple() == ("Test Quote", "Test Person")
+    assert quote == Quote("Test Quote", "Test Person")
+    assert quote != Quote("Test Quote", "Other Person")
+    assert repr(quote) == "Quote(text='Test Quote', person='Test Person')"
+
+
+def test_equal_quotes_hash_the_same():
+    """Test that a quote can be used in sets and as a dictionary key."""
+    quotes = {Quote("Test Quote", "Test Person"), Quote("Test Quote", "Test Person")}
+
+    assert quotes == {Quote("Test Quote", "Test Person")}
+    assert hash(Quote("Test Quote", "Test Person")) == hash(("Test Quote", "Test Person"))
+
+
+def test_quote_has_no_instance_dict():
+    """Test that a quote only holds its slots."""
+    quote = Quote("Test Quote", "Test Person")
+
+    assert not hasattr(quote, "__dict__")
+    with pytest.raises(AttributeError):
+        quote.extra = "value"  # type: ignore
@@ -0,0 +1,100 @@
+"""
+Unit test for the in-process quote corpus cache.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.slack_bot.daos.quote_corpus_cache import QuoteCorpusCache
+
+SEARCH_INDEX_NAME = "test_index"
+
+
+@pytest.fixture
+def redis_dao() -> MagicMock:
+    """Create a DAO mock holding two quotes by the same author."""
+    dao = MagicMock()
+    dao.search_index_name = SEARCH_INDEX_NAME
+    dao.keyset_name = f"{SEARCH_INDEX_NAME}:keys"
+    dao.version_key = f"{SEARCH_INDEX_NAME}:version"
+    dao.client.get = AsyncMock(return_value="1")
+    dao.client.scard = AsyncMock(return_value=2)
+    dao.client.smembers = AsyncMock(return_value={"doc:1", "doc:2"})
+
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[["Quote 1", "Person"], ["Quote 2", "Person"]])
+    dao.client.pipeline.return_value.__aenter__.return_value = pipe
+    return dao
+
+
+@pytest.mark.asyncio
+async def test_load(redis_dao: MagicMock):
+    """Test that the corpus is loaded with the published version."""
+    cache = QuoteCorpusCache(redis_dao, max_size=10, refresh_interval=1)
+
+    await cache.load()
+
+    assert len(cache) == 2
+    assert cache.version == "1"
+    assert cache.random_quote() in {("Quote 1", "Person"), ("Quote 2", "Person")}
+
+
+@pytest.mark.asyncio
+async def test_load_skips_deleted_documents(redis_dao: MagicMock):
+    """Test that documents deleted after the key set was read are skipped."""
+    pipe = redis_dao.client.pipeline.return_value.__aenter__.return_value
+    pipe.execute = AsyncMock(return_value=[["Quote 1", "Person"], [None, None]])
+    cache = QuoteCorpusCache(redis_dao, max_size=10, refresh_interval=1)
+
+    await cache.load()
+
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_oversized_corpus(redis_dao: MagicMock):
+    """Test that a corpus larger than the max size is left to Redis."""
+    cache = QuoteCorpusCache(redis_dao, max_size=1, refresh_interval=1)
+
+    await cache.load()
+
+    assert len(cache) == 0
+    assert cache.random_quote() is None
+    redis_dao.client.smembers.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_refresh_reloads_on_new_version(redis_dao: MagicMock):
+    """Test that refresh reloads only when the published version changes."""
+    cache = QuoteCorpusCache(redis_dao, max_size=10, refresh_interval=1)
+    await cache.load()
+
+    await cache.refresh()
+    assert redis_dao.client.smembers.await_count == 1
+
+    redis_dao.client.get.return_value = "2"
+    await cache.refresh()
+    assert redis_dao.client.smembers.await_count == 2
+    assert cache.version == "2"
+
+
+@pytest.mark.asyncio
+async def test_start_and_stop(redis_dao: MagicMock):
+    """Test that started caches are registered and stopped."""
+    with patch("src.slack_bot.daos.quote_corpus_cache.AsyncRedisDAOFactory") as mock_factory:
+        mock_factory.get_redis_dao_with_existing_pool.return_value = redis_dao
+        redis_dao.client.get.side_effect = [RedisConnectionError("down"), "1"]
+
+        cache = await QuoteCorpusCache.start(SEARCH_INDEX_NAME, max_size=10, refresh_interval=1)
+
+        # A failed initial load leaves the cache empty instead of failing the startup.
+        assert len(cache) == 0
+        assert QuoteCorpusCache.get_cache(SEARCH_INDEX_NAME) is cache
+
+        await QuoteCorpusCache.stop_all()
+        assert QuoteCorpusCache.get_cache(SEARCH_INDEX_NAME) is None
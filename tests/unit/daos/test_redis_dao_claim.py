@@ -0,0 +1,43 @@
+"""
+Unit tests for the Redis claim DAO.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from unittest.mock import AsyncMock
+
+import pytest
+from redis.asyncio import ConnectionPool
+
+from src.slack_bot.daos.redis_dao_claim_async import AsyncClaimRedisDAO
+
+
+@pytest.fixture
+def claim_dao() -> AsyncClaimRedisDAO:
+    """Create a claim DAO with a mocked Redis client."""
+    dao = AsyncClaimRedisDAO(ConnectionPool(), "slack:dedup:")
+    dao.client = AsyncMock()
+    return dao
+
+
+@pytest.mark.asyncio
+async def test_claim(claim_dao: AsyncClaimRedisDAO):
+    """Test that a key of the namespace is claimed with SET NX and a TTL, once."""
+    claim_dao.client.set.side_effect = [True, None]
+
+    assert await claim_dao.claim("Ev1", 600)
+    assert not await claim_dao.claim("Ev1", 600)
+
+    claim_dao.client.set.assert_awaited_with("slack:dedup:Ev1", 1, nx=True, ex=600)
+
+
+@pytest.mark.asyncio
+async def test_release(claim_dao: AsyncClaimRedisDAO):
+    """Test that a released key of the namespace is deleted."""
+    claim_dao.client.delete.side_effect = [1, 0]
+
+    assert await claim_dao.release("Ev1")
+    assert not await claim_dao.release("Ev1")
+
+    claim_dao.client.delete.assert_awaited_with("slack:dedup:Ev1")
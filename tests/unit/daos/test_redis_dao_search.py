@@ -5,13 +5,24 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
-from unittest.mock import AsyncMock, MagicMock
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, call
 
 import pytest
+from prometheus_client import REGISTRY
 from redis.commands.search.field import NumericField, TextField
-from redis.exceptions import ResponseError
-
-from src.slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
+from redis.commands.search.query import Query
+from redis.exceptions import ConnectionError, NoScriptError, ResponseError
+
+from src.slack_bot.daos.client_side_cache import OVERSIZED
+from src.slack_bot.daos.query_result_cache import QueryResultCache
+from src.slack_bot.daos.quote import Quote
+from src.slack_bot.daos.redis_dao_search_async import (
+    RANDOM_DOCUMENT_SCRIPT,
+    RANDOM_DOCUMENT_SCRIPT_SHA,
+    AsyncSearchRedisDAO,
+)
+from src.slack_bot.exceptions.custom_exceptions import IndexingError
 
 SEARCH_INDEX_NAME = "test_index"  # Define a constant for the search index name
 
@@ -127,3 +138,567 @@ async def test_index_create(redis_search_dao: AsyncSearchRedisDAO):
 
     # Assert: Verify 'create_index' was called correctly on 'search_client'
     redis_search_dao.search_client.create_index.assert_called_once_with(fields, definition=None)
+
+
+def test_keyset_name(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the key set name is derived from the index name."""
+    assert redis_search_dao.keyset_name == f"{SEARCH_INDEX_NAME}:keys"
+
+
+@pytest.mark.asyncio
+async def test_random_document(redis_search_dao: AsyncSearchRedisDAO):
+    """
+    Test the 'random_document' method of the AsyncSearchRedisDAO object.
+
+    This test ensures that the script reply is decoded into the document fields.
+    """
+    # Arrange: Mock the script reply with the key and the flat hash fields
+    redis_search_dao.client.evalsha = AsyncMock(
+        return_value=["doc:1", ["quote", "Test Quote", "person", "Test Person"]]
+    )
+
+    # Act
+    document = await redis_search_dao.random_document()
+
+    # Assert
+    assert document == {"quote": "Test Quote", "person": "Test Person"}
+    redis_search_dao.client.evalsha.assert_awaited_once_with(
+        RANDOM_DOCUMENT_SCRIPT_SHA, 1, redis_search_dao.keyset_name
+    )
+
+
+@pytest.mark.asyncio
+async def test_random_document_empty_keyset(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that 'random_document' returns None when the key set is empty."""
+    # Arrange: Mock the script reply for a missing key set
+    redis_search_dao.client.evalsha = AsyncMock(return_value=None)
+
+    # Act & Assert
+    assert await redis_search_dao.random_document() is None
+
+
+@pytest.mark.asyncio
+async def test_random_document_loads_script(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that 'random_document' loads the script when it is not cached by Redis."""
+    # Arrange: Fail the first call with NoScriptError
+    redis_search_dao.client.evalsha = AsyncMock(
+        side_effect=[NoScriptError(), ["doc:1", ["quote", "Test Quote"]]]
+    )
+
+    # Act
+    document = await redis_search_dao.random_document()
+
+    # Assert
+    assert document == {"quote": "Test Quote"}
+    redis_search_dao.client.script_load.assert_awaited_once_with(RANDOM_DOCUMENT_SCRIPT)
+    assert redis_search_dao.client.evalsha.await_count == 2
+
+
+@pytest.fixture
+def client_cache(redis_search_dao: AsyncSearchRedisDAO) -> MagicMock:
+    """Attach a ready client cache mock to the DAO."""
+    redis_search_dao.client_cache = MagicMock(ready=True)
+    return redis_search_dao.client_cache
+
+
+@pytest.mark.asyncio
+async def test_random_document_client_cache(
+    redis_search_dao: AsyncSearchRedisDAO, client_cache: MagicMock
+):
+    """Test that 'random_document' reads the key set and the document through the cache."""
+    client_cache.smembers = AsyncMock(return_value=["doc:1"])
+    client_cache.hgetall = AsyncMock(return_value={"quote": "Test Quote"})
+
+    assert await redis_search_dao.random_document() == {"quote": "Test Quote"}
+
+    client_cache.smembers.assert_awaited_once_with(redis_search_dao.keyset_name)
+    client_cache.hgetall.assert_awaited_once_with("doc:1")
+    redis_search_dao.client.evalsha.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_random_document_client_cache_deleted_document(
+    redis_search_dao: AsyncSearchRedisDAO, client_cache: MagicMock
+):
+    """Test that an empty key set or a deleted document gives None with the cache."""
+    client_cache.smembers = AsyncMock(return_value=[])
+    assert await redis_search_dao.random_document() is None
+
+    client_cache.smembers = AsyncMock(return_value=["doc:1"])
+    client_cache.hgetall = AsyncMock(return_value={})
+    assert await redis_search_dao.random_document() is None
+
+
+@pytest.mark.asyncio
+async def test_random_document_client_cache_oversized(
+    redis_search_dao: AsyncSearchRedisDAO, client_cache: MagicMock
+):
+    """Test that a key set larger than the cache falls back to the script."""
+    client_cache.smembers = AsyncMock(return_value=OVERSIZED)
+    redis_search_dao.client.evalsha = AsyncMock(return_value=["doc:1", ["quote", "Test Quote"]])
+
+    assert await redis_search_dao.random_document() == {"quote": "Test Quote"}
+    redis_search_dao.client.evalsha.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_index_search_client_cache(
+    redis_search_dao: AsyncSearchRedisDAO, client_cache: MagicMock
+):
+    """Test that the search results are cached until the corpus version changes."""
+    client_cache.get_or_load = AsyncMock(return_value="results")
+
+    assert await redis_search_dao.index_search("hello", {"limit": 1}) == "results"
+
+    kind, cache_key, dependency, loader = client_cache.get_or_load.await_args.args
+    assert kind == "search"
+    assert cache_key == ("FT.SEARCH", SEARCH_INDEX_NAME, "hello", "LIMIT", 0, 10, (("limit", 1),))
+    assert dependency == redis_search_dao.version_key
+    await loader()
+    redis_search_dao.search_client.search.assert_awaited_once_with("hello", {"limit": 1})
+
+
+@pytest.mark.asyncio
+async def test_index_search_client_cache_not_ready(
+    redis_search_dao: AsyncSearchRedisDAO, client_cache: MagicMock
+):
+    """Test that the cache is bypassed while its listener is disconnected."""
+    client_cache.ready = False
+    client_cache.get_or_load = AsyncMock()
+
+    await redis_search_dao.index_search("hello")
+
+    client_cache.get_or_load.assert_not_awaited()
+    redis_search_dao.search_client.search.assert_awaited_once_with("hello", None)
+
+
+@pytest.fixture
+def result_cache(redis_search_dao: AsyncSearchRedisDAO) -> QueryResultCache:
+    """Attach a query result cache to the DAO."""
+    redis_search_dao.result_cache = QueryResultCache(ttl=60, max_entries=10, max_bytes=1_000_000)
+    return redis_search_dao.result_cache
+
+
+@pytest.mark.asyncio
+async def test_index_search_result_cache(
+    redis_search_dao: AsyncSearchRedisDAO, result_cache: QueryResultCache
+):
+    """Test that repeated queries are served from the cache with the same result shape."""
+    reply = {"total_results": 3, "results": [], "warning": []}
+    redis_search_dao.search_client.search.return_value = reply
+    count_query = Query("*").verbatim().no_content().paging(0, 0)
+
+    uncached = await redis_search_dao.index_search(count_query)
+    cached = await redis_search_dao.index_search(Query("*").verbatim().no_content().paging(0, 0))
+
+    assert cached == uncached == reply
+    assert type(cached) is type(uncached)
+    redis_search_dao.search_client.search.assert_awaited_once()
+
+    # Different paging is a different query.
+    await redis_search_dao.index_search(Query("*").verbatim().no_content().paging(0, 1))
+    assert redis_search_dao.search_client.search.await_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda dao: dao.add_document("doc:1", {"quote": "Q"}),
+        lambda dao: dao.index_drop(),
+        lambda dao: dao.index_create([TextField("quote")]),
+    ],
+    ids=["add_document", "index_drop", "index_create"],
+)
+async def test_index_search_result_cache_invalidation(
+    redis_search_dao: AsyncSearchRedisDAO, result_cache: QueryResultCache, change
+):
+    """Test that the DAO changing the index or its documents clears the cached results."""
+    redis_search_dao.search_client.search.return_value = {"total_results": 0}
+    await redis_search_dao.index_search("*")
+    assert len(result_cache) == 1
+
+    await change(redis_search_dao)
+
+    assert len(result_cache) == 0
+    await redis_search_dao.index_search("*")
+    assert redis_search_dao.search_client.search.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_index_search_result_cache_change_during_search(
+    redis_search_dao: AsyncSearchRedisDAO, result_cache: QueryResultCache
+):
+    """Test that a result read while the DAO adds a document is not cached."""
+    searching = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_search(*args):
+        searching.set()
+        await release.wait()
+        return {"total_results": 0}
+
+    redis_search_dao.search_client.search = AsyncMock(side_effect=slow_search)
+    search = asyncio.create_task(redis_search_dao.index_search("*"))
+    await searching.wait()
+    await redis_search_dao.add_document("doc:1", {"quote": "Q"})
+    release.set()
+    await search
+
+    assert len(result_cache) == 0
+
+
+def mock_pipeline(dao: AsyncSearchRedisDAO, execute: AsyncMock) -> MagicMock:
+    """Make the pipelines of the DAO client run the given execute mock."""
+    dao.client.pipeline = MagicMock()
+    dao.client.connection_pool.max_connections = 10
+    pipe = MagicMock()
+    pipe.execute = execute
+    dao.client.pipeline.return_value.__aenter__.return_value = pipe
+    return pipe
+
+
+def documents(count: int):
+    """Create the keys and fields of quote documents."""
+    return [(f"doc:{idx}", {"quote": f"Quote {idx}"}) for idx in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the documents are written with HSET in pipelines of the batch size."""
+    execute = AsyncMock(side_effect=lambda raise_on_error: [1, 1] * 2)
+    pipe = mock_pipeline(redis_search_dao, execute)
+
+    result = await redis_search_dao.upsert_documents(documents(5), batch_size=2)
+
+    assert result == (5, {}, 3)
+    assert execute.await_count == 3
+    execute.assert_awaited_with(raise_on_error=False)
+    redis_search_dao.client.pipeline.assert_called_with(transaction=False)
+    pipe.hset.assert_any_call("doc:4", mapping={"quote": "Quote 4"})
+    pipe.sadd.assert_any_call(redis_search_dao.keyset_name, "doc:4")
+    assert pipe.hset.call_count == 5
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents_async_iterable(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the documents can be read from an async iterable."""
+    mock_pipeline(redis_search_dao, AsyncMock(return_value=[1, 1, 1, 1]))
+
+    async def generate():
+        for document in documents(4):
+            yield document
+
+    result = await redis_search_dao.upsert_documents(generate(), batch_size=2)
+
+    assert result.written == 4
+    assert result.batches == 2
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents_failures(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that failed documents and pipelines are reported without stopping the others."""
+    execute = AsyncMock(
+        side_effect=[[1, 1, ResponseError("WRONGTYPE"), 1], ConnectionError("lost"), [1, 1]]
+    )
+    mock_pipeline(redis_search_dao, execute)
+
+    result = await redis_search_dao.upsert_documents(documents(5), batch_size=2, concurrency=1)
+
+    assert result.written == 2
+    assert result.failed == {"doc:1": "WRONGTYPE", "doc:2": "lost", "doc:3": "lost"}
+    assert execute.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents_read_error(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that a read error is raised after the pipelines in flight are written."""
+    execute = AsyncMock(return_value=[1, 1, 1, 1])
+    mock_pipeline(redis_search_dao, execute)
+
+    def failing():
+        yield from documents(2)
+        raise IOError("read error")
+
+    with pytest.raises(IOError):
+        await redis_search_dao.upsert_documents(failing(), batch_size=2)
+
+    execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error, message",
+    [(ValueError("bad mapping"), "bad mapping"), (asyncio.CancelledError(), "CancelledError")],
+)
+async def test_upsert_documents_pipeline_errors_do_not_abort(
+    redis_search_dao: AsyncSearchRedisDAO, error: BaseException, message: str
+):
+    """Test that a pipeline failing outside of Redis fails its documents, not the batch."""
+    execute = AsyncMock(side_effect=[[1, 1, 1, 1], error, [1, 1]])
+    mock_pipeline(redis_search_dao, execute)
+
+    result = await redis_search_dao.upsert_documents(documents(5), batch_size=2, concurrency=1)
+
+    assert result == (3, {"doc:2": message, "doc:3": message}, 3)
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents_read_error_is_not_hidden(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that a failed pipeline in flight does not replace the read error."""
+    mock_pipeline(redis_search_dao, AsyncMock(side_effect=ValueError("bad mapping")))
+
+    def failing():
+        yield from documents(2)
+        raise IOError("read error")
+
+    with pytest.raises(IOError, match="read error"):
+        await redis_search_dao.upsert_documents(failing(), batch_size=2)
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents_concurrency(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the pipelines in flight are bounded by the concurrency and the pool size."""
+    in_flight = peak = 0
+
+    async def execute(raise_on_error):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [1, 1]
+
+    mock_pipeline(redis_search_dao, AsyncMock(side_effect=execute))
+    redis_search_dao.client.connection_pool.max_connections = 2
+
+    result = await redis_search_dao.upsert_documents(documents(8), batch_size=1, concurrency=4)
+
+    assert result.written == 8
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_upsert_documents_clears_result_cache(
+    redis_search_dao: AsyncSearchRedisDAO, result_cache: QueryResultCache
+):
+    """Test that bulk writes clear the cached search results."""
+    redis_search_dao.search_client.search.return_value = {"total_results": 0}
+    await redis_search_dao.index_search("*")
+    mock_pipeline(redis_search_dao, AsyncMock(return_value=[1, 1]))
+
+    await redis_search_dao.upsert_documents(documents(1))
+
+    assert len(result_cache) == 0
+
+
+def resp3_batch(*rows):
+    """Create the RESP3 results map of an aggregate batch."""
+    return {
+        "total_results": 3,
+        "results": [{"extra_attributes": row, "values": []} for row in rows],
+        "warning": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_stream_documents(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the documents are read batch by batch through the cursor."""
+    redis_search_dao.client.execute_command = AsyncMock(
+        side_effect=[
+            [resp3_batch({"__key": "doc:1"}, {"__key": "doc:2"}), 42],
+            [resp3_batch({"__key": "doc:3"}), 0],
+        ]
+    )
+
+    rows = [row async for row in redis_search_dao.stream_documents(fields=["__key"], batch_size=2)]
+
+    assert rows == [{"__key": "doc:1"}, {"__key": "doc:2"}, {"__key": "doc:3"}]
+    assert redis_search_dao.client.execute_command.await_args_list == [
+        call("FT.AGGREGATE", SEARCH_INDEX_NAME, "*", "LOAD", 1, "@__key", "WITHCURSOR", "COUNT", 2),
+        call("FT.CURSOR", "READ", SEARCH_INDEX_NAME, 42, "COUNT", 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_documents_resp2(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that RESP2 replies, flat lists of names and values, are read too."""
+    redis_search_dao.client.execute_command = AsyncMock(
+        return_value=[[1, [b"quote", "Q", b"person", "P"]], 0]
+    )
+
+    rows = [
+        row
+        async for row in redis_search_dao.stream_documents(
+            "@person:$name", max_idle=500, query_params={"name": "P"}
+        )
+    ]
+
+    assert rows == [{"quote": "Q", "person": "P"}]
+    redis_search_dao.client.execute_command.assert_awaited_once_with(
+        "FT.AGGREGATE",
+        SEARCH_INDEX_NAME,
+        "@person:$name",
+        "LOAD",
+        "*",
+        "WITHCURSOR",
+        "COUNT",
+        1000,
+        "MAXIDLE",
+        500,
+        "PARAMS",
+        2,
+        "name",
+        "P",
+        "DIALECT",
+        2,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_documents_deletes_cursor(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that stopping the iteration early deletes the cursor."""
+    redis_search_dao.client.execute_command = AsyncMock(
+        side_effect=[[resp3_batch({"quote": "Q1"}, {"quote": "Q2"}), 42], "OK"]
+    )
+
+    stream = redis_search_dao.stream_documents(batch_size=2)
+    assert await stream.__anext__() == {"quote": "Q1"}
+    await stream.aclose()
+
+    redis_search_dao.client.execute_command.assert_awaited_with(
+        "FT.CURSOR", "DEL", SEARCH_INDEX_NAME, 42
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_quotes(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that only the quote fields are returned and decoded into Quote records."""
+    redis_search_dao.client.execute_command = AsyncMock(
+        return_value={
+            "total_results": 7,
+            "results": [
+                {"id": "doc:1", "extra_attributes": {"person": "P1", "quote": "Q1"}},
+                {"id": "doc:2", "extra_attributes": {"quote": "Q2"}},
+            ],
+        }
+    )
+
+    total, quotes = await redis_search_dao.search_quotes(Query("*").paging(3, 2))
+
+    assert total == 7
+    assert quotes == [Quote("Q1", "P1"), Quote("Q2", None)]  # type: ignore
+    redis_search_dao.client.execute_command.assert_awaited_once_with(
+        "FT.SEARCH", SEARCH_INDEX_NAME, "*", "LIMIT", 3, 2, "RETURN", 2, "quote", "person"
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_projected_resp2(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that RESP2 replies, flat lists of ids and fields, are decoded too."""
+    redis_search_dao.client.execute_command = AsyncMock(
+        return_value=[2, b"doc:1", [b"quote", b"Q1", b"person", b"P1"], b"doc:2", [b"quote", b"Q2"]]
+    )
+
+    total, records = await redis_search_dao.search_projected(
+        Query("*"), ["person", "quote"], lambda person, quote: (person, quote)
+    )
+
+    assert total == 2
+    assert records == [("P1", "Q1"), (None, "Q2")]
+
+
+@pytest.mark.asyncio
+async def test_bump_corpus_version(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the corpus version is incremented and published."""
+    redis_search_dao.client.incr.return_value = 3
+
+    assert await redis_search_dao.bump_corpus_version() == 3
+
+    redis_search_dao.client.incr.assert_awaited_once_with(redis_search_dao.version_key)
+    redis_search_dao.client.publish.assert_awaited_once_with(redis_search_dao.version_key, 3)
+
+
+@pytest.mark.asyncio
+async def test_resolve_index_name_resp3(redis_search_dao: AsyncSearchRedisDAO):
+    """Test resolving the index behind an alias from an undecoded RESP3 reply."""
+    redis_search_dao.search_client.info.return_value = {b"index_name": b"test_index-1"}
+
+    assert await redis_search_dao.resolve_index_name() == "test_index-1"
+
+
+@pytest.mark.asyncio
+async def test_resolve_index_name_missing(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that resolving a missing index returns None."""
+    redis_search_dao.search_client.info.side_effect = ResponseError("Unknown index name")
+
+    assert await redis_search_dao.resolve_index_name() is None
+
+
+@pytest.mark.asyncio
+async def test_index_prefixes_resp2(redis_search_dao: AsyncSearchRedisDAO):
+    """Test reading the prefixes from a RESP2 index definition."""
+    redis_search_dao.search_client.info.return_value = {
+        "index_definition": [b"key_type", b"HASH", b"prefixes", [b"prefix:"]]
+    }
+
+    assert await redis_search_dao.index_prefixes() == ["prefix:"]
+
+
+@pytest.mark.asyncio
+async def test_wait_for_indexing(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that waiting polls FT.INFO until the indexing is complete."""
+    redis_search_dao.search_client.info.side_effect = [
+        {"indexing": 1, "percent_indexed": 0.5},
+        {"indexing": 0, "percent_indexed": 1},
+    ]
+
+    await redis_search_dao.wait_for_indexing(poll_interval=0)
+
+    assert redis_search_dao.search_client.info.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_wait_for_indexing_timeout(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that waiting raises IndexingError after the timeout."""
+    redis_search_dao.search_client.info.return_value = {"indexing": 1, "percent_indexed": 0.5}
+
+    with pytest.raises(IndexingError):
+        await redis_search_dao.wait_for_indexing(poll_interval=0, timeout=0)
+
+
+@pytest.mark.asyncio
+async def test_alias_operations(redis_search_dao: AsyncSearchRedisDAO):
+    """Test that the alias operations call the Search client."""
+    await redis_search_dao.alias_add("alias")
+    await redis_search_dao.alias_update("alias")
+    await redis_search_dao.alias_delete("alias")
+
+    redis_search_dao.search_client.aliasadd.assert_awaited_once_with("alias")
+    redis_search_dao.search_client.aliasupdate.assert_awaited_once_with("alias")
+    redis_search_dao.search_client.aliasdel.assert_awaited_once_with("alias")
+
+
+def command_count(command: str) -> float:
+    """Return the number of timed calls of a Redis command."""
+    return (
+        REGISTRY.get_sample_value("slack_bot_redis_command_seconds_count", {"command": command})
+        or 0.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_redis_commands_are_timed(redis_search_dao: AsyncSearchRedisDAO):
+    """Tests that the search, info and write commands record their latency, failed or not."""
+    before = {command: command_count(command) for command in ("FT.SEARCH", "FT.INFO", "HSET")}
+    mock_pipeline(redis_search_dao, AsyncMock(return_value=[1, 1]))
+    redis_search_dao.search_client.info.side_effect = ConnectionError("down")
+
+    await redis_search_dao.index_search("hello")
+    await redis_search_dao.write_documents([("quote:1", {"quote": "hello"})])
+    with pytest.raises(ConnectionError):
+        await redis_search_dao.index_info()
+
+    assert command_count("FT.SEARCH") == before["FT.SEARCH"] + 1
+    assert command_count("HSET") == before["HSET"] + 1
+    assert command_count("FT.INFO") == before["FT.INFO"] + 1
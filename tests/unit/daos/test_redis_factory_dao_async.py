@@ -5,11 +5,16 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
-from unittest.mock import patch
+from typing import Any, List, Tuple
+from unittest.mock import AsyncMock, patch
 
 import pytest
+from prometheus_client import REGISTRY
 from redis.asyncio import ConnectionPool
+from redis.exceptions import ConnectionError
 
+from src.slack_bot.daos.client_side_cache import ClientSideCache
+from src.slack_bot.daos.redis_dao_claim_async import AsyncClaimRedisDAO
 from src.slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
 from src.slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
 
@@ -144,3 +149,267 @@ def test_create_redis_dao_search_with_index():
     # Assert - Verify the DAO's properties
     assert isinstance(dao, AsyncSearchRedisDAO)
     assert dao.search_index_name == "test_index"
+
+
+@pytest.fixture
+def empty_registry(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Start the test without any connection pool."""
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_connection_pool", None)
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_connection_pools", {})
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_pool_labels", {})
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_daos", {})
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_client_cache", None)
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_query_cache_settings", None)
+
+
+def pool_gauge(pool: str, state: str) -> float:
+    """Read a connection gauge of a pool."""
+    return REGISTRY.get_sample_value(
+        "slack_bot_redis_pool_connections", {"pool": pool, "state": state}
+    )
+
+
+def test_connection_pool_registry(empty_registry: None):
+    """Test that different connection parameters get different pools."""
+    decoded = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "password", 10)
+    raw = AsyncRedisDAOFactory.get_connection_pool(
+        "localhost", 6379, 0, "password", 10, decode_responses=False
+    )
+    other_db = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 1, "password", 10)
+
+    assert len({id(decoded), id(raw), id(other_db)}) == 3
+    assert raw.connection_kwargs["decode_responses"] is False
+    assert other_db.connection_kwargs["db"] == 1
+    # The first pool created stays the existing pool.
+    assert AsyncRedisDAOFactory._connection_pool is decoded
+    dao = AsyncRedisDAOFactory.create_redis_dao_with_existing_pool(search_index_name="test")
+    assert dao.client.connection_pool is decoded
+
+
+@pytest.mark.asyncio
+async def test_connection_pool_gauges(empty_registry: None):
+    """Test that the pool connections are exported by state."""
+    pool = AsyncRedisDAOFactory.get_connection_pool("gauges", 6379, 0, "", 10)
+    pool.ensure_connection = AsyncMock()  # type: ignore
+    connections = [await pool.get_connection("PING") for _ in range(3)]
+    await pool.release(connections[0])
+    await pool.release(connections[1])
+
+    assert pool_gauge("gauges:6379/0 max=10", "idle") == 2
+    assert pool_gauge("gauges:6379/0 max=10", "in_use") == 1
+    assert pool_gauge("gauges:6379/0 max=10", "created") is None
+    await pool.release(connections[2])
+    assert pool_gauge("gauges:6379/0 max=10", "in_use") == 0
+
+
+@pytest.mark.asyncio
+async def test_connection_pool_gauges_do_not_count_failed_connections(empty_registry: None):
+    """Test that a connection failing to connect is idle, not in use."""
+    pool = AsyncRedisDAOFactory.get_connection_pool("gauges", 6379, 0, "", 10)
+    pool.ensure_connection = AsyncMock(side_effect=ConnectionError("refused"))  # type: ignore
+
+    with pytest.raises(ConnectionError):
+        await pool.get_connection("PING")
+
+    assert pool_gauge("gauges:6379/0 max=10", "in_use") == 0
+    assert pool_gauge("gauges:6379/0 max=10", "idle") == 1
+
+
+def test_connection_pool_gauges_have_one_label_per_pool(empty_registry: None):
+    """Test that the pools differing in any connection parameter keep their own gauges."""
+    keys = [
+        ("labels", 6379, 0, "first", 10, True),
+        ("labels", 6379, 0, "second", 10, True),
+        ("labels", 6379, 0, "first", 20, True),
+        ("labels", 6379, 0, "first", 10, False),
+    ]
+    pools = [AsyncRedisDAOFactory.get_connection_pool(*key) for key in keys]
+
+    assert len(set(map(id, pools))) == 4
+    assert list(AsyncRedisDAOFactory._pool_labels.values()) == [
+        "labels:6379/0 max=10",
+        "labels:6379/0 max=10 #2",
+        "labels:6379/0 max=20",
+        "labels:6379/0 max=10 raw",
+    ]
+    for label in AsyncRedisDAOFactory._pool_labels.values():
+        assert pool_gauge(label, "idle") == 0
+
+
+@pytest.mark.asyncio
+async def test_reset_connection_pool_closes_all_pools(empty_registry: None):
+    """Test that the reset closes every pool and removes their gauges."""
+    pools = [AsyncRedisDAOFactory.get_connection_pool("reset", 6379, db, "", 10) for db in range(2)]
+    for pool in pools:
+        pool.aclose = AsyncMock()
+
+    await AsyncRedisDAOFactory.reset_connection_pool()
+
+    for pool in pools:
+        pool.aclose.assert_awaited_once()
+    assert AsyncRedisDAOFactory._connection_pool is None
+    assert AsyncRedisDAOFactory._connection_pools == {}
+    assert pool_gauge("reset:6379/0 max=10", "idle") is None
+    assert AsyncRedisDAOFactory._pool_labels == {}
+
+
+@pytest.mark.asyncio
+async def test_warm_up_connection_pool(empty_registry: None):
+    """Test that the warm-up opens the connections and returns them to the pool."""
+    pool = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 3)
+    pool.ensure_connection = AsyncMock()
+
+    opened = await AsyncRedisDAOFactory.warm_up_connection_pool(5)
+
+    # Capped at the pool size.
+    assert opened == 3
+    assert pool.ensure_connection.await_count == 3
+    assert len(pool._available_connections) == 3
+    assert len(pool._in_use_connections) == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_up_connection_pool_calls_the_pool_api(empty_registry: None):
+    """Test that the warm-up calls the real pool with the command name redis 5.0 requires."""
+    pool = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 2)
+    pool.ensure_connection = AsyncMock()
+    calls: List[Tuple[Any, ...]] = []
+    pool_get_connection = pool.get_connection
+
+    async def get_connection(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        return await pool_get_connection(*args, **kwargs)
+
+    pool.get_connection = get_connection  # type: ignore
+
+    opened = await AsyncRedisDAOFactory.warm_up_connection_pool(2)
+
+    assert opened == 2
+    assert calls == [("PING",), ("PING",)]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_connection_pool_failure(empty_registry: None):
+    """Test that a failed warm-up is logged and does not fail the startup."""
+    pool = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    pool.ensure_connection = AsyncMock(side_effect=[None, ConnectionError("refused")])
+
+    with patch("src.slack_bot.daos.redis_dao_factory_async.logger") as mock_logger:
+        opened = await AsyncRedisDAOFactory.warm_up_connection_pool(4)
+
+    assert opened == 1
+    assert len(pool._in_use_connections) == 0
+    mock_logger.error.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_connection_pool_without_pool(empty_registry: None):
+    """Test that the warm-up requires a pool."""
+    with pytest.raises(ValueError):
+        await AsyncRedisDAOFactory.warm_up_connection_pool(2)
+
+
+def test_get_claim_dao_with_existing_pool(empty_registry: None):
+    """Test that the claim DAOs use the existing pool and their own namespace."""
+    with pytest.raises(ValueError):
+        AsyncRedisDAOFactory.get_claim_dao_with_existing_pool("slack:dedup:")
+    pool = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+
+    dao = AsyncRedisDAOFactory.get_claim_dao_with_existing_pool("slack:dedup:")
+
+    assert isinstance(dao, AsyncClaimRedisDAO)
+    assert dao.client.connection_pool is pool
+    assert dao.namespace == "slack:dedup:"
+
+
+def test_get_redis_dao_with_existing_pool(empty_registry: None):
+    """Test that the DAO of an index is created once and reused."""
+    AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+
+    dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+
+    assert AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test") is dao
+    assert AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("other") is not dao
+    assert dao.search_index_name == "test"
+
+
+@pytest.mark.asyncio
+async def test_get_redis_dao_after_reset(empty_registry: None):
+    """Test that the cached DAOs are released with the pool."""
+    AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+
+    await AsyncRedisDAOFactory.reset_connection_pool()
+    with pytest.raises(ValueError):
+        AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+
+    pool = AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    new_dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+    assert new_dao is not dao
+    assert new_dao.client.connection_pool is pool
+
+
+@pytest.mark.asyncio
+async def test_start_client_cache(empty_registry: None):
+    """Test that the DAOs on the existing pool use the client cache until the reset."""
+    AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    uncached = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+
+    with patch(
+        "src.slack_bot.daos.redis_dao_factory_async.ClientSideCache", autospec=True
+    ) as mock_cache_class:
+        client_cache = await AsyncRedisDAOFactory.start_client_cache(100, True, ["doc:"])
+
+    mock_cache_class.assert_called_once_with(
+        AsyncRedisDAOFactory._connection_pool, 100, True, ["doc:"], max_connections=2
+    )
+    client_cache.start.assert_awaited_once()
+    dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+    assert dao is not uncached
+    assert dao.client_cache is client_cache
+
+    await AsyncRedisDAOFactory.reset_connection_pool()
+
+    client_cache.stop.assert_awaited_once()
+    assert AsyncRedisDAOFactory._client_cache is None
+
+
+@pytest.mark.asyncio
+async def test_client_cache_pool_has_its_own_size_and_gauges(empty_registry: None):
+    """Test that the tracked connections do not take from the budget of the existing pool."""
+    AsyncRedisDAOFactory.get_connection_pool("tracked", 6379, 0, "", 10)
+
+    with patch.object(ClientSideCache, "start", AsyncMock()):
+        client_cache = await AsyncRedisDAOFactory.start_client_cache(100, max_connections=3)
+
+    assert client_cache.connection_pool.max_connections == 3
+    assert pool_gauge("tracked:6379/0 max=10 client-cache", "idle") == 0
+    assert pool_gauge("tracked:6379/0 max=10 client-cache", "in_use") == 0
+    await AsyncRedisDAOFactory.reset_connection_pool()
+
+
+@pytest.mark.asyncio
+async def test_start_client_cache_without_pool(empty_registry: None):
+    """Test that the client cache requires a pool."""
+    with pytest.raises(ValueError):
+        await AsyncRedisDAOFactory.start_client_cache(100)
+
+
+@pytest.mark.asyncio
+async def test_enable_query_cache(empty_registry: None):
+    """Test that every cached DAO gets its own query result cache until the reset."""
+    AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    assert AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test").result_cache is None
+
+    AsyncRedisDAOFactory.enable_query_cache(ttl=5, max_entries=10, max_bytes=1000)
+
+    dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+    other = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("other")
+    assert dao.result_cache is not None
+    assert other.result_cache is not None
+    assert dao.result_cache is not other.result_cache
+    assert AsyncRedisDAOFactory.create_redis_dao_with_existing_pool("test").result_cache is None
+
+    await AsyncRedisDAOFactory.reset_connection_pool()
+    AsyncRedisDAOFactory.get_connection_pool("localhost", 6379, 0, "", 10)
+    assert AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test").result_cache is None
@@ -19,8 +19,11 @@ from src.slack_bot import (
     setup_metrics,
     setup_routes,
     setup_slack_integration,
+    setup_tracing,
 )
+from src.slack_bot.services.listener_executor import ListenerExecutor
 from src.slack_bot.services.slack_middleware import SlackMiddleware
+from src.slack_bot.utils.tracing import InMemorySpanExporter, JsonlSpanExporter
 
 
 @pytest.fixture
@@ -33,6 +36,7 @@ def mock_fast_api() -> FastAPI:
 
 def test_setup_logging(mock_fast_api: FastAPI):
     """Test configuration of logging."""
+    mock_fast_api.state.settings.log_queue_enabled = False
     with patch("src.slack_bot.load_json_file") as mock_load_json, patch(
         "logging.config.dictConfig"
     ) as mock_dict_config, patch("logging.getLogger") as mock_get_logger:
@@ -48,6 +52,21 @@ def test_setup_logging(mock_fast_api: FastAPI):
         mock_logger.setLevel.assert_called_once()
 
 
+def test_setup_logging_with_queue(mock_fast_api: FastAPI):
+    """Test that the queued logging is started when enabled."""
+    settings = mock_fast_api.state.settings
+    settings.log_queue_enabled = True
+    settings.log_queue_size = 100
+    settings.log_queue_overflow = "block"
+
+    with patch("src.slack_bot.load_json_file", return_value={"version": 1}), patch(
+        "logging.config.dictConfig"
+    ), patch("logging.getLogger"), patch("src.slack_bot.QueuedLogging") as queued_logging:
+        setup_logging(mock_fast_api)
+
+        queued_logging.start.assert_called_once_with(queue_size=100, overflow="block")
+
+
 def test_setup_metrics(mock_fast_api: FastAPI):
     """Test configuration of metrics."""
     with patch("src.slack_bot.PrometheusMiddleware"):
@@ -55,6 +74,23 @@ def test_setup_metrics(mock_fast_api: FastAPI):
         assert "/metrics" in [route.path for route in mock_fast_api.routes]
 
 
+def test_setup_tracing(mock_fast_api: FastAPI):
+    """Test that the configured span exporters are set up only when tracing is enabled."""
+    mock_fast_api.state.settings.tracing_enabled = False
+    with patch("src.slack_bot.Tracer") as tracer:
+        setup_tracing(mock_fast_api)
+        tracer.configure.assert_called_once_with([])
+
+    mock_fast_api.state.settings.tracing_enabled = True
+    mock_fast_api.state.settings.tracing_exporters = ["memory", "jsonl"]
+    mock_fast_api.state.settings.tracing_memory_max_spans = 10
+    with patch("src.slack_bot.Tracer") as tracer:
+        setup_tracing(mock_fast_api)
+        memory, jsonl = tracer.configure.call_args.args[0]
+        assert isinstance(memory, InMemorySpanExporter)
+        assert isinstance(jsonl, JsonlSpanExporter)
+
+
 def test_setup_error_handlers(mock_fast_api: FastAPI):
     """Test configuration of error handlers."""
     setup_error_handlers(mock_fast_api)
@@ -87,10 +123,29 @@ def test_setup_slack_integration(mock_fast_api: FastAPI):
         middleware.assert_called_once()
 
 
+def test_setup_slack_integration_with_background_listeners(mock_fast_api: FastAPI):
+    """Test that the background listeners share one executor."""
+    settings = mock_fast_api.state.settings
+    settings.listener_executor_listeners = ["good", "bad"]
+    settings.listener_executor_workers = 2
+    settings.listener_executor_queue_size = 5
+    settings.listener_executor_overflow = "drop_oldest"
+
+    with patch("src.slack_bot.SlackRoutes"), patch("src.slack_bot.SlackMiddleware") as middleware:
+        setup_slack_integration(mock_fast_api)
+
+        executors = middleware.call_args[0][1]
+        assert set(executors) == {"good", "bad"}
+        assert executors["good"] is executors["bad"]
+        assert isinstance(executors["good"], ListenerExecutor)
+
+
 def test_create_app():
     """Test creating FastAPI with config."""
     with patch("src.slack_bot.setup_logging"), patch("src.slack_bot.setup_metrics"), patch(
         "src.slack_bot.setup_error_handlers"
-    ), patch("src.slack_bot.setup_routes"), patch("src.slack_bot.setup_slack_integration"):
+    ), patch("src.slack_bot.setup_routes"), patch("src.slack_bot.setup_slack_integration"), patch(
+        "src.slack_bot.setup_tracing"
+    ):
         app = create_app()
         assert isinstance(app, FastAPI)
@@ -0,0 +1,102 @@
+"""
+Unit tests for the ETL manifest.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import hashlib
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.jobs.etl_manifest import ETLManifest, FileEntry, file_digest, file_stat
+
+
+@pytest.fixture
+def manifest() -> ETLManifest:
+    """Create a manifest of the quotes index on a mocked client."""
+    redis_dao = MagicMock()
+    redis_dao.search_index_name = "quotes"
+    redis_dao.client.hgetall = AsyncMock()
+    redis_dao.client.smembers = AsyncMock()
+    return ETLManifest(redis_dao)
+
+
+def test_file_fingerprint(tmp_path: Path):
+    """Test the size and the content hash of a file."""
+    path = tmp_path / "quotes.csv"
+    path.write_bytes(b"Quote,Person\n")
+
+    assert file_stat(str(path))[0] == 13
+    assert file_digest(str(path)) == hashlib.sha256(b"Quote,Person\n").hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_load(manifest: ETLManifest):
+    """Test that the bytes replies are decoded into the prefix and the file entries."""
+    entry = FileEntry(10, 20, "abc", 3)
+    manifest.client.hgetall.return_value = {
+        b"prefix": b"20230101000000:",
+        b"file:quotes.csv": json.dumps(entry._asdict()).encode(),
+    }
+
+    prefix, entries = await manifest.load()
+
+    manifest.client.hgetall.assert_awaited_once_with("quotes:manifest")
+    assert prefix == "20230101000000:"
+    assert entries == {"quotes.csv": entry}
+
+
+@pytest.mark.asyncio
+async def test_load_missing(manifest: ETLManifest):
+    """Test that a missing manifest has no prefix."""
+    manifest.client.hgetall.return_value = {}
+
+    assert await manifest.load() == (None, {})
+
+
+@pytest.mark.asyncio
+async def test_row_hashes(manifest: ETLManifest):
+    """Test that the row hashes are read from the set of the file."""
+    manifest.client.smembers.return_value = {b"aaaa", b"bbbb"}
+
+    assert await manifest.row_hashes("quotes.csv") == {"aaaa", "bbbb"}
+    manifest.client.smembers.assert_awaited_once_with("quotes:manifest:quotes.csv")
+
+
+def test_update_file(manifest: ETLManifest):
+    """Test that the entry and the row hash changes are queued on the pipeline."""
+    pipe = MagicMock()
+    entry = FileEntry(10, 20, "abc", 3)
+
+    manifest.update_file(pipe, "quotes.csv", entry, added=["aaaa"], removed=[])
+
+    pipe.hset.assert_called_once_with(
+        "quotes:manifest", "file:quotes.csv", json.dumps(entry._asdict())
+    )
+    pipe.sadd.assert_called_once_with("quotes:manifest:quotes.csv", "aaaa")
+    pipe.srem.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reset(manifest: ETLManifest):
+    """Test that a reset replaces the previous manifest in one transaction."""
+    manifest.client.hgetall.return_value = {
+        b"prefix": b"20230101000000:",
+        b"file:old.csv": json.dumps(FileEntry(1, 1, "old", 1)._asdict()).encode(),
+    }
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    manifest.client.pipeline.return_value.__aenter__.return_value = pipe
+
+    await manifest.reset("20240101000000:", {"new.csv": (FileEntry(2, 2, "new", 1), {"cccc"})})
+
+    manifest.client.pipeline.assert_called_once_with(transaction=True)
+    unlinked = [args.args[0] for args in pipe.unlink.call_args_list]
+    assert unlinked == ["quotes:manifest:old.csv", "quotes:manifest"]
+    pipe.hset.assert_any_call("quotes:manifest", "prefix", "20240101000000:")
+    pipe.sadd.assert_called_once_with("quotes:manifest:new.csv", "cccc")
+    pipe.execute.assert_awaited_once()
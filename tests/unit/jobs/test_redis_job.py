@@ -5,11 +5,20 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
-from unittest.mock import AsyncMock, MagicMock, patch
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import pytest
+from redis.exceptions import RedisError, ResponseError
 
-from src.jobs.redis_job import IndexerJob
+from src.jobs.etl_manifest import FileEntry, file_digest, file_stat
+from src.jobs.redis_job import IndexerJob, file_chunks, parse_chunk, peak_rss_mib, row_hash
+from src.slack_bot.daos.redis_dao_search_async import AsyncSearchRedisDAO
+from src.slack_bot.exceptions.custom_exceptions import CSVFileReadError, IndexingError
 
 
 @pytest.fixture(autouse=True)
@@ -51,6 +60,9 @@ async def test_async_run():
                 # Verify if redis_pipeline is called
                 mock_redis_pipeline.assert_awaited_once_with(mock_redis_dao)
 
+                # Verify the new corpus version is published
+                mock_redis_dao.bump_corpus_version.assert_awaited_once()
+
                 # Verify logging calls if necessary
                 mock_logger.info.assert_called()
 
@@ -86,6 +98,7 @@ async def test_redis_pipeline():
                     (
                         f"/test/path/{filename}",
                         mock_redis_dao.search_client.pipeline.return_value.__aenter__.return_value,
+                        mock_redis_dao.keyset_name,
                     ),
                     {},
                 )
@@ -98,3 +111,441 @@ async def test_redis_pipeline():
                 mock_redis_dao.search_client.pipeline.return_value.__aenter__.return_value.execute
             )
             pipeline_execute.assert_awaited_once_with(raise_on_error=True)
+
+
+def write_csv(directory: Path, filename: str, rows: int) -> None:
+    """Write a CSV file in the quotes schema."""
+    lines = ["Quote,Person"] + [f"Quote {idx},Person {idx}" for idx in range(rows)]
+    (directory / filename).write_text("\n".join(lines), encoding="utf-8")
+
+
+def streaming_dao(execute: AsyncMock) -> AsyncSearchRedisDAO:
+    """Create a DAO with a mock client whose pipelines run the given execute mock."""
+    mock_redis_dao = AsyncSearchRedisDAO(MagicMock(), "quotes")
+    mock_redis_dao.client = MagicMock()
+    mock_redis_dao.client.connection_pool.max_connections = 10
+    mock_redis_dao.client.delete = AsyncMock()
+    mock_redis_dao.bump_corpus_version = AsyncMock()  # type: ignore
+
+    pipe = MagicMock()
+    pipe.execute = execute
+    mock_redis_dao.client.pipeline.return_value.__aenter__.return_value = pipe
+    return mock_redis_dao
+
+
+def test_read_file(tmp_path: Path):
+    """Test that the rows are read lazily with their document keys."""
+    write_csv(tmp_path, "quotes.csv", 2)
+    test_instance = IndexerJob()
+
+    rows = list(test_instance.read_file(str(tmp_path / "quotes.csv")))
+
+    expected = [{"quote": f"Quote {idx}", "person": f"Person {idx}"} for idx in range(2)]
+    assert rows == [
+        (f"{test_instance.prefix}quotes.csv:{row_hash(mapping)}", mapping) for mapping in expected
+    ]
+
+
+def test_row_hash():
+    """Test that the row hash depends on the row content only."""
+    assert row_hash({"quote": "a", "person": "b"}) == row_hash({"person": "b", "quote": "a"})
+    assert row_hash({"quote": "a", "person": "b"}) != row_hash({"quote": "ab", "person": ""})
+
+
+def test_read_file_missing():
+    """Test that a missing file raises CSVFileReadError."""
+    with pytest.raises(CSVFileReadError):
+        list(IndexerJob().read_file("/missing/quotes.csv"))
+
+
+@pytest.mark.asyncio
+async def test_redis_streaming_load(tmp_path: Path):
+    """Test that the rows are written in batches of the configured size."""
+    write_csv(tmp_path, "file1.csv", 5)
+    write_csv(tmp_path, "file2.csv", 4)
+    execute = AsyncMock()
+    mock_redis_dao = streaming_dao(execute)
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+    test_instance.etl_settings.load_batch_size = 4
+    test_instance.etl_settings.load_concurrency = 2
+
+    rows = await test_instance.redis_streaming_load(mock_redis_dao)
+
+    assert rows == 9
+    assert execute.await_count == 3
+    execute.assert_awaited_with(raise_on_error=False)
+    mock_redis_dao.client.pipeline.assert_called_with(transaction=False)
+    mock_redis_dao.client.delete.assert_awaited_once_with("quotes:keys")
+
+
+@pytest.mark.asyncio
+async def test_redis_streaming_load_reports_failed_documents(tmp_path: Path):
+    """Test that failed documents are reported without stopping the other batches."""
+    write_csv(tmp_path, "file1.csv", 6)
+    # The second batch fails as a whole, the HSET of the first row of the third one fails.
+    execute = AsyncMock(
+        side_effect=[[1, 1, 1, 1], RedisError("boom"), [ResponseError("WRONGTYPE"), 1, 1, 1]]
+    )
+    mock_redis_dao = streaming_dao(execute)
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+    test_instance.etl_settings.load_batch_size = 2
+
+    with patch("src.jobs.redis_job.logger") as mock_logger, pytest.raises(
+        IndexingError, match="3 of 6 documents failed"
+    ):
+        await test_instance.redis_streaming_load(mock_redis_dao)
+
+    assert execute.await_count == 3
+    assert mock_logger.error.call_count == 3
+
+
+def alias_daos() -> Dict[str, AsyncMock]:
+    """Create DAO mocks for the alias and the new generation of the index."""
+    alias_dao = AsyncMock()
+    alias_dao.search_index_name = "quotes"
+    alias_dao.keyset_name = "quotes:keys"
+    alias_dao.resolve_index_name.return_value = "quotes-20230101000000"
+    alias_dao.index_prefixes.return_value = ["20230101000000:"]
+    alias_dao.client.pipeline = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    alias_dao.client.pipeline.return_value.__aenter__.return_value = pipe
+
+    generation_dao = AsyncMock()
+    generation_dao.search_index_name = "quotes-new"
+    generation_dao.keyset_name = "quotes-new:keys"
+    return {"alias": alias_dao, "generation": generation_dao, "previous": AsyncMock()}
+
+
+@pytest.mark.asyncio
+async def test_alias_rebuild():
+    """Test that the alias is swapped to the new generation once it is indexed."""
+    daos = alias_daos()
+    test_instance = IndexerJob()
+    test_instance.etl_settings.redis_search_index = "quotes"
+
+    with patch.object(
+        test_instance,
+        "create_redis_dao",
+        side_effect=[daos["generation"], daos["previous"]],
+    ), patch.object(test_instance, "redis_pipeline", new_callable=AsyncMock), patch.object(
+        test_instance, "cleanup_generation", new_callable=AsyncMock
+    ) as mock_cleanup:
+        cleanup = await test_instance.alias_rebuild(daos["alias"])
+        await cleanup
+
+    daos["generation"].index_create.assert_awaited_once()
+    daos["generation"].wait_for_indexing.assert_awaited_once()
+    daos["generation"].alias_update.assert_awaited_once_with("quotes")
+    daos["alias"].index_drop.assert_not_awaited()
+
+    pipe = daos["alias"].client.pipeline.return_value.__aenter__.return_value
+    pipe.rename.assert_any_call("quotes:keys", "quotes:keys:retired")
+    pipe.rename.assert_any_call("quotes-new:keys", "quotes:keys")
+
+    mock_cleanup.assert_awaited_once_with(
+        daos["previous"], ["20230101000000:"], "quotes:keys:retired"
+    )
+
+
+@pytest.mark.asyncio
+async def test_alias_rebuild_replaces_legacy_index():
+    """Test that an index owning the alias name is dropped before the alias is created."""
+    daos = alias_daos()
+    daos["alias"].resolve_index_name.return_value = "quotes"
+    test_instance = IndexerJob()
+
+    with patch.object(
+        test_instance, "create_redis_dao", return_value=daos["generation"]
+    ), patch.object(test_instance, "redis_pipeline", new_callable=AsyncMock), patch.object(
+        test_instance, "cleanup_generation", new_callable=AsyncMock
+    ) as mock_cleanup:
+        await (await test_instance.alias_rebuild(daos["alias"]))
+
+    daos["alias"].index_drop.assert_awaited_once_with(delete_documents=False)
+    daos["generation"].alias_update.assert_awaited_once_with("quotes")
+    mock_cleanup.assert_awaited_once_with(None, ["20230101000000:"], "quotes:keys:retired")
+
+
+@pytest.mark.asyncio
+async def test_alias_rebuild_keeps_alias_on_failure():
+    """Test that a failed build is cleaned up and the alias is left alone."""
+    daos = alias_daos()
+    daos["generation"].wait_for_indexing.side_effect = IndexingError("timeout")
+    test_instance = IndexerJob()
+
+    with patch.object(
+        test_instance, "create_redis_dao", return_value=daos["generation"]
+    ), patch.object(test_instance, "redis_pipeline", new_callable=AsyncMock), patch.object(
+        test_instance, "cleanup_generation", new_callable=AsyncMock
+    ) as mock_cleanup:
+        with pytest.raises(IndexingError):
+            await test_instance.alias_rebuild(daos["alias"])
+
+    daos["generation"].alias_update.assert_not_awaited()
+    mock_cleanup.assert_awaited_once_with(
+        daos["generation"], [test_instance.prefix], "quotes-new:keys"
+    )
+
+
+@pytest.mark.asyncio
+async def test_cleanup_generation():
+    """Test that the generation is dropped and its keys unlinked in batches."""
+    previous_dao = AsyncMock()
+    client = MagicMock()
+    client.unlink = AsyncMock(side_effect=lambda *keys: len(keys))
+
+    async def scan_iter(match: str, count: int):
+        for idx in range(3):
+            yield f"20230101000000:{idx}"
+
+    client.scan_iter = MagicMock(side_effect=scan_iter)
+    test_instance = IndexerJob()
+
+    with patch("src.jobs.redis_job.CLEANUP_BATCH_SIZE", 2), patch.object(
+        test_instance, "create_redis_dao", return_value=MagicMock(client=client)
+    ):
+        await test_instance.cleanup_generation(
+            previous_dao, ["20230101000000:"], "quotes:keys:retired"
+        )
+
+    previous_dao.index_drop.assert_awaited_once_with(delete_documents=False)
+    client.scan_iter.assert_called_once_with(match="20230101000000:*", count=2)
+    assert client.unlink.await_args_list[0].args == ("20230101000000:0", "20230101000000:1")
+    assert client.unlink.await_args_list[1].args == ("20230101000000:2",)
+    assert client.unlink.await_args_list[2].args == ("quotes:keys:retired",)
+
+
+def incremental_manifest(prefix, entries, row_hashes) -> MagicMock:
+    """Create a manifest mock holding the given prefix, file entries and row hashes."""
+    manifest = MagicMock()
+    manifest.load = AsyncMock(return_value=(prefix, dict(entries)))
+    manifest.row_hashes = AsyncMock(side_effect=lambda filename: set(row_hashes[filename]))
+    return manifest
+
+
+def file_entry(path: Path) -> FileEntry:
+    """Fingerprint a file the way the manifest records it."""
+    size, mtime_ns = file_stat(str(path))
+    return FileEntry(size, mtime_ns, file_digest(str(path)), 0)
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_without_manifest(tmp_path: Path):
+    """Test that a missing manifest asks for a full rebuild."""
+    mock_redis_dao = streaming_dao(AsyncMock())
+    mock_redis_dao.index_prefixes = AsyncMock(return_value=["20230101000000:"])
+    manifest = incremental_manifest(None, {}, {})
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+
+    assert await test_instance.incremental_run(mock_redis_dao, manifest) is False
+    mock_redis_dao.bump_corpus_version.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_stale_manifest(tmp_path: Path):
+    """Test that a manifest of another prefix than the live index asks for a full rebuild."""
+    mock_redis_dao = streaming_dao(AsyncMock())
+    mock_redis_dao.index_prefixes = AsyncMock(side_effect=RedisError("Unknown index name"))
+    manifest = incremental_manifest("20230101000000:", {}, {})
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+
+    assert await test_instance.incremental_run(mock_redis_dao, manifest) is False
+
+
+@pytest.mark.asyncio
+async def test_incremental_run(tmp_path: Path):
+    """Test that only the changed rows are written and only the removed rows deleted."""
+    write_csv(tmp_path, "same.csv", 3)
+    write_csv(tmp_path, "changed.csv", 3)
+    prefix = "20230101000000:"
+    rows = {idx: {"quote": f"Quote {idx}", "person": f"Person {idx}"} for idx in range(4)}
+
+    entries = {
+        "same.csv": file_entry(tmp_path / "same.csv")._replace(rows=3),
+        "changed.csv": FileEntry(1, 1, "outdated", 3),
+        "removed.csv": FileEntry(1, 1, "removed", 2),
+    }
+    row_hashes = {
+        # Rows 0 and 1 are unchanged, row 2 is new and row 3 was removed.
+        "changed.csv": [row_hash(rows[0]), row_hash(rows[1]), row_hash(rows[3])],
+        "removed.csv": ["aaaa", "bbbb"],
+    }
+    execute = AsyncMock()
+    mock_redis_dao = streaming_dao(execute)
+    mock_redis_dao.index_prefixes = AsyncMock(return_value=[prefix])
+    mock_redis_dao.bump_corpus_version = AsyncMock(return_value=2)
+    manifest = incremental_manifest(prefix, entries, row_hashes)
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+    with patch("src.jobs.redis_job.logger") as mock_logger:
+        assert await test_instance.incremental_run(mock_redis_dao, manifest) is True
+
+    pipe = mock_redis_dao.client.pipeline.return_value.__aenter__.return_value
+    new_key = f"{prefix}changed.csv:{row_hash(rows[2])}"
+    pipe.hset.assert_called_once_with(new_key, mapping=rows[2])
+    pipe.sadd.assert_called_once_with("quotes:keys", new_key)
+    assert {args.args[0] for args in pipe.unlink.call_args_list} == {
+        f"{prefix}changed.csv:{row_hash(rows[3])}",
+        f"{prefix}removed.csv:aaaa",
+        f"{prefix}removed.csv:bbbb",
+    }
+    assert pipe.srem.call_count == 3
+
+    # The same file is not read, the changed and removed files are recorded in the manifest.
+    manifest.row_hashes.assert_has_awaits([call("changed.csv"), call("removed.csv")])
+    manifest.update_file.assert_called_once()
+    assert manifest.update_file.call_args.args[2].rows == 3
+    manifest.delete_file.assert_called_once_with(pipe, "removed.csv")
+
+    mock_logger.info.assert_any_call(
+        "Incremental run: %s documents skipped, %s updated, %s deleted", 5, 1, 3
+    )
+    mock_redis_dao.bump_corpus_version.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_touched_file(tmp_path: Path):
+    """Test that a file with a new mtime but the same content is not parsed."""
+    write_csv(tmp_path, "quotes.csv", 2)
+    prefix = "20230101000000:"
+    entries = {"quotes.csv": file_entry(tmp_path / "quotes.csv")._replace(mtime_ns=1, rows=2)}
+    mock_redis_dao = streaming_dao(AsyncMock())
+    mock_redis_dao.index_prefixes = AsyncMock(return_value=[prefix])
+    manifest = incremental_manifest(prefix, entries, {})
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+    with patch.object(test_instance, "read_file_rows") as mock_read_file_rows:
+        assert await test_instance.incremental_run(mock_redis_dao, manifest) is True
+
+    mock_read_file_rows.assert_not_called()
+    manifest.row_hashes.assert_not_called()
+    entry = manifest.update_file.call_args.args[2]
+    assert entry.mtime_ns == file_stat(str(tmp_path / "quotes.csv"))[1]
+    mock_redis_dao.bump_corpus_version.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_run_incremental_full_rebuild():
+    """Test that an incremental run without a manifest rebuilds and saves the manifest."""
+    with patch("src.jobs.redis_job.AsyncRedisDAOFactory") as mock_factory, patch(
+        "src.jobs.redis_job.ETLManifest"
+    ) as mock_manifest_class:
+        mock_redis_dao = AsyncMock()
+        mock_factory.return_value.create_redis_dao.return_value = mock_redis_dao
+        manifest = mock_manifest_class.return_value
+        manifest.reset = AsyncMock()
+
+        indexer_job = IndexerJob()
+        indexer_job.etl_settings.incremental = True
+        with patch.object(
+            indexer_job, "incremental_run", AsyncMock(return_value=False)
+        ), patch.object(indexer_job, "drop_rebuild", new_callable=AsyncMock), patch.object(
+            indexer_job, "fingerprint_files", return_value={}
+        ):
+            await indexer_job.async_run()
+
+        manifest.reset.assert_awaited_once_with(indexer_job.prefix, {})
+        mock_redis_dao.bump_corpus_version.assert_awaited_once()
+
+
+def test_file_chunks(tmp_path: Path):
+    """Test that the chunks end at line ends and cover the whole file."""
+    write_csv(tmp_path, "quotes.csv", 50)
+    path = str(tmp_path / "quotes.csv")
+    content = (tmp_path / "quotes.csv").read_bytes()
+
+    chunks = file_chunks(path, 64)
+
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(content)
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end == start and content.endswith(b"\n", 0, end)
+
+
+def test_parse_chunk(tmp_path: Path):
+    """Test that the chunks of a file parse to the rows of the whole file."""
+    write_csv(tmp_path, "quotes.csv", 50)
+    path = str(tmp_path / "quotes.csv")
+    test_instance = IndexerJob()
+
+    rows = [
+        row
+        for start, end in file_chunks(path, 64)
+        for row in parse_chunk(path, start, end, test_instance.prefix)
+    ]
+
+    assert rows == [
+        (key, mapping["quote"], mapping["person"]) for key, mapping in test_instance.read_file(path)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_redis_parallel_load(tmp_path: Path):
+    """Test that the parsed chunks are written in batches of the configured size."""
+    write_csv(tmp_path, "file1.csv", 30)
+    write_csv(tmp_path, "file2.csv", 20)
+    execute = AsyncMock()
+    mock_redis_dao = streaming_dao(execute)
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+    test_instance.etl_settings.load_mode = "parallel"
+    test_instance.etl_settings.load_batch_size = 8
+    test_instance.etl_settings.parse_workers = 2
+    test_instance.etl_settings.parse_chunk_size = 128
+    test_instance.etl_settings.parse_queue_size = 1
+    with patch.object(test_instance, "create_parse_executor", return_value=ThreadPoolExecutor(2)):
+        rows = await test_instance.redis_parallel_load(mock_redis_dao)
+
+    assert rows == 50
+    assert execute.await_count == 7
+    pipe = mock_redis_dao.client.pipeline.return_value.__aenter__.return_value
+    written = {args.args[0] for args in pipe.hset.call_args_list}
+    expected = {
+        key for path in test_instance.csv_files() for key, _ in test_instance.read_file(path)
+    }
+    assert written == expected
+    assert all(len(args.args) == 1 for args in pipe.hset.call_args_list)
+    mock_redis_dao.client.delete.assert_awaited_once_with("quotes:keys")
+
+
+@pytest.mark.asyncio
+async def test_redis_parallel_load_read_error(tmp_path: Path):
+    """Test that a read error is raised after the parsed rows are loaded."""
+    write_csv(tmp_path, "file1.csv", 5)
+    execute = AsyncMock()
+    mock_redis_dao = streaming_dao(execute)
+
+    test_instance = IndexerJob()
+    test_instance.csv_directory_path = str(tmp_path)
+    test_instance.etl_settings.parse_workers = 1
+    with patch.object(
+        test_instance, "create_parse_executor", return_value=ThreadPoolExecutor(1)
+    ), patch.object(
+        test_instance,
+        "csv_files",
+        return_value=[str(tmp_path / "file1.csv"), str(tmp_path / "missing.csv")],
+    ):
+        with pytest.raises(CSVFileReadError):
+            await test_instance.redis_parallel_load(mock_redis_dao)
+
+    execute.assert_awaited_once()
+
+
+def test_peak_rss_mib_reports_the_child_processes_apart():
+    """Test that the memory of an ended child process is reported apart from the process."""
+    subprocess.run([sys.executable, "-c", "data = b'x' * (64 * 1024 * 1024)"], check=True)
+
+    assert peak_rss_mib(children=True) >= 64
+    assert peak_rss_mib() > 0
@@ -9,12 +9,14 @@ from typing import Optional
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Response
 from pytest_mock import MockerFixture
 from slack_bolt.async_app import AsyncApp
 from starlette.routing import Route
 
 from src.slack_bot.routes.slack_routes import SlackRoutes
+from src.slack_bot.services.slack_http_session import SlackHttpSession
+from src.slack_bot.utils.tracing import InMemorySpanExporter, Tracer
 
 
 @pytest.fixture
@@ -22,6 +24,7 @@ def mock_app() -> FastAPI:
     """Fixture to create a mock FastAPI app with settings."""
     app = FastAPI()
     app.state.settings = MagicMock()  # Mock the settings
+    app.state.settings.slack_dedup_enabled = False
     return app
 
 
@@ -144,3 +147,95 @@ def test_get_slack_app_returns_slack_app_instance(slack_routes: SlackRoutes):
     assert slack_app is not None
     assert isinstance(slack_app, AsyncApp)
     assert isinstance(slack_app, AsyncApp)
+
+
+def test_slack_app_uses_shared_outbound_session(mock_app: FastAPI, monkeypatch: pytest.MonkeyPatch):
+    """Test that the Slack app client and respond use the shared outbound session."""
+    monkeypatch.setattr(SlackHttpSession, "_client", None)
+    mock_app.state.settings.slack_http_timeout = 5.0
+
+    slack_routes = SlackRoutes(mock_app)
+
+    assert SlackHttpSession._client is slack_routes.slack_app.client
+    assert slack_routes.slack_app.client.timeout == 5.0
+    assert SlackHttpSession.respond_middleware in [
+        getattr(middleware, "func", None)
+        for middleware in slack_routes.slack_app._async_middleware_list
+    ]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_requests_skip_bolt(
+    mocker: MockerFixture, mock_app: FastAPI, mock_request: AsyncMock, mock_handler: AsyncMock
+):
+    """Test that an already delivered request is answered without reaching Bolt."""
+    mock_app.state.settings.slack_dedup_enabled = True
+    mock_app.state.settings.slack_signing_secret = "secret"
+    slack_routes = SlackRoutes(mock_app)
+    assert slack_routes.deduplicator is not None
+    mocker.patch.object(
+        slack_routes.deduplicator, "is_duplicate", AsyncMock(side_effect=[False, True])
+    )
+    mock_handler.handle = mocker.AsyncMock(return_value=Response(status_code=200))
+    mock_request.headers = {"X-Slack-Retry-Num": "1"}
+    route: Optional[Route] = find_route_by_path(slack_routes.router, "/slack/events")
+    assert route is not None, "Route /slack/events not found"
+
+    await route.endpoint(mock_request)
+    response = await route.endpoint(mock_request)
+
+    mock_handler.handle.assert_called_once_with(mock_request, {"settings": slack_routes.settings})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_traced_request_reports_server_timing(
+    mocker: MockerFixture,
+    slack_routes: SlackRoutes,
+    mock_request: AsyncMock,
+    mock_handler: AsyncMock,
+):
+    """Test that a traced request runs in a root span reported in the Server-Timing header."""
+    exporter = InMemorySpanExporter()
+    Tracer.configure([exporter])
+    slack_routes.settings.tracing_server_timing = True
+    mock_request.url.path = "/slack/events"
+    mock_handler.handle = mocker.AsyncMock(return_value=Response(status_code=200))
+    route: Optional[Route] = find_route_by_path(slack_routes.router, "/slack/events")
+    assert route is not None, "Route /slack/events not found"
+
+    try:
+        response = await route.endpoint(mock_request)
+    finally:
+        Tracer.shutdown()
+
+    [span] = exporter.spans()
+    assert span.name == "route"
+    assert span.attributes == {"path": "/slack/events"}
+    assert response.headers["Server-Timing"].startswith("route;dur=")
+
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_its_claim(
+    mocker: MockerFixture, mock_app: FastAPI, mock_request: AsyncMock, mock_handler: AsyncMock
+):
+    """Test that the retry of a request whose handling failed reaches Bolt."""
+    mock_app.state.settings.slack_dedup_enabled = True
+    mock_app.state.settings.slack_signing_secret = "secret"
+    slack_routes = SlackRoutes(mock_app)
+    assert slack_routes.deduplicator is not None
+    mocker.patch.object(slack_routes.deduplicator, "is_duplicate", AsyncMock(return_value=False))
+    release = mocker.patch.object(slack_routes.deduplicator, "release", AsyncMock())
+    mock_handler.handle = mocker.AsyncMock(
+        side_effect=[RuntimeError("boom"), Response(status_code=500), Response(status_code=200)]
+    )
+    route: Optional[Route] = find_route_by_path(slack_routes.router, "/slack/events")
+    assert route is not None, "Route /slack/events not found"
+
+    with pytest.raises(RuntimeError):
+        await route.endpoint(mock_request)
+    assert (await route.endpoint(mock_request)).status_code == 500
+    assert (await route.endpoint(mock_request)).status_code == 200
+
+    assert mock_handler.handle.await_count == 3
+    assert release.await_count == 2
@@ -0,0 +1,193 @@
+"""
+Unit tests for the listener executor.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+from typing import Awaitable, Callable, List
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.slack_bot.services.listener_executor import ListenerExecutor
+
+
+def job(events: List[str], name: str, gate: "asyncio.Event") -> Callable[[], Awaitable[None]]:
+    """Create a job recording its name once the gate is opened."""
+
+    async def run() -> None:
+        await gate.wait()
+        events.append(name)
+
+    return run
+
+
+def sample(name: str, **labels: str) -> float:
+    """Read a metric sample, zero if it was not recorded yet."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_submit_runs_jobs_on_workers():
+    """Test that the submitted work runs in the background and records its metrics."""
+    executor = ListenerExecutor("test_run", workers=2, queue_size=10)
+    events: List[str] = []
+    gate = asyncio.Event()
+
+    assert await executor.submit("good", job(events, "a", gate))
+    assert await executor.submit("good", job(events, "b", gate))
+    assert events == []
+
+    gate.set()
+    await executor.stop()
+
+    assert sorted(events) == ["a", "b"]
+    labels = {"executor": "test_run", "listener": "good"}
+    assert sample("slack_bot_listener_queue_wait_seconds_count", **labels) == 2
+    assert sample("slack_bot_listener_run_seconds_count", **labels) == 2
+    assert sample("slack_bot_listener_queue_depth", executor="test_run") == 0
+
+
+@pytest.mark.asyncio
+async def test_workers_bound_concurrency():
+    """Test that no more listener runs than workers are in flight."""
+    executor = ListenerExecutor("test_bound", workers=2, queue_size=10)
+    running = 0
+    peak = 0
+
+    async def run() -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    for _ in range(6):
+        await executor.submit("good", run)
+    await asyncio.sleep(0)
+    assert executor.depth == 4
+
+    await executor.stop()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_overflow_reject():
+    """Test that work submitted to a full queue is rejected."""
+    executor = ListenerExecutor("test_reject", workers=1, queue_size=1, overflow="reject")
+    events: List[str] = []
+    gate = asyncio.Event()
+    before = sample(
+        "slack_bot_listener_overflows_total",
+        executor="test_reject",
+        listener="bad",
+        policy="reject",
+    )
+
+    await executor.submit("bad", job(events, "running", gate))
+    await asyncio.sleep(0)
+    await executor.submit("bad", job(events, "queued", gate))
+
+    assert not await executor.submit("bad", job(events, "rejected", gate))
+
+    gate.set()
+    await executor.stop()
+    assert events == ["running", "queued"]
+    after = sample(
+        "slack_bot_listener_overflows_total",
+        executor="test_reject",
+        listener="bad",
+        policy="reject",
+    )
+    assert after - before == 1
+
+
+@pytest.mark.asyncio
+async def test_overflow_drop_oldest():
+    """Test that the longest queued work makes room for the submitted one."""
+    executor = ListenerExecutor("test_drop", workers=1, queue_size=2, overflow="drop_oldest")
+    events: List[str] = []
+    gate = asyncio.Event()
+
+    await executor.submit("good", job(events, "running", gate))
+    await asyncio.sleep(0)
+    await executor.submit("good", job(events, "oldest", gate))
+    await executor.submit("good", job(events, "newer", gate))
+
+    assert await executor.submit("good", job(events, "newest", gate))
+    assert executor.depth == 2
+
+    gate.set()
+    await executor.stop()
+    assert events == ["running", "newer", "newest"]
+
+
+@pytest.mark.asyncio
+async def test_overflow_run_inline():
+    """Test that work submitted to a full queue runs in the caller's task."""
+    executor = ListenerExecutor("test_inline", workers=1, queue_size=1, overflow="run_inline")
+    events: List[str] = []
+    gate = asyncio.Event()
+    opened = asyncio.Event()
+    opened.set()
+
+    await executor.submit("good", job(events, "running", gate))
+    await asyncio.sleep(0)
+    await executor.submit("good", job(events, "queued", gate))
+
+    assert await executor.submit("good", job(events, "inline", opened))
+    assert events == ["inline"]
+
+    gate.set()
+    await executor.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_logged(caplog: pytest.LogCaptureFixture):
+    """Test that a failing listener is logged and does not stop its worker."""
+    executor = ListenerExecutor("test_failure", workers=1, queue_size=10)
+    events: List[str] = []
+    gate = asyncio.Event()
+    gate.set()
+
+    async def fail() -> None:
+        raise RuntimeError("boom")
+
+    await executor.submit("good", fail)
+    await executor.submit("good", job(events, "after", gate))
+    await executor.stop()
+
+    assert events == ["after"]
+    assert "The good listener failed in the background." in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_stop_all_drops_work_left_after_timeout():
+    """Test that stopping waits for the queue up to the timeout and can be restarted."""
+    executor = ListenerExecutor("test_stop", workers=1, queue_size=10)
+    events: List[str] = []
+    gate = asyncio.Event()
+
+    await executor.submit("good", job(events, "stuck", gate))
+    assert ListenerExecutor._running["test_stop"] is executor
+
+    await ListenerExecutor.stop_all(timeout=0.01)
+
+    assert "test_stop" not in ListenerExecutor._running
+    assert executor.depth == 0
+
+    gate.set()
+    await executor.submit("good", job(events, "restarted", gate))
+    await executor.stop()
+    assert events == ["restarted"]
+
+
+def test_invalid_bounds():
+    """Test that an executor needs a worker and a queue slot."""
+    with pytest.raises(ValueError):
+        ListenerExecutor("test_invalid", workers=0, queue_size=1)
+    with pytest.raises(ValueError):
+        ListenerExecutor("test_invalid", workers=1, queue_size=0)
@@ -0,0 +1,74 @@
+"""
+Unit tests for the pre-serialized Block Kit templates.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+from slack_sdk.models.blocks import (
+    ActionsBlock,
+    ButtonElement,
+    MarkdownTextObject,
+    PlainTextObject,
+    SectionBlock,
+    TextObject,
+)
+
+from src.slack_bot.services.slack_block_templates import SlackBlockTemplates
+
+
+def test_wake_up_matches_block_builders():
+    """Test that the filled template is identical to the serialized Block Kit objects."""
+    expected = [
+        SectionBlock(block_id="response", text="Hi <@U12345>! How are you feeling!").to_dict(),
+        ActionsBlock(
+            block_id="how_are_you",
+            elements=[
+                ButtonElement(
+                    action_id="good",
+                    text=TextObject(type=PlainTextObject.type, text="Good", emoji=True),
+                    value="good",
+                    style="primary",
+                ),
+                ButtonElement(
+                    action_id="bad",
+                    text=TextObject(type=PlainTextObject.type, text="Bad", emoji=True),
+                    value="bad",
+                    style="danger",
+                ),
+            ],
+        ).to_dict(),
+    ]
+
+    assert SlackBlockTemplates.wake_up("U12345") == expected
+
+
+def test_good_quote_matches_block_builders():
+    """Test that the filled quote template is identical to the serialized Block Kit objects."""
+    expected = [
+        SectionBlock(
+            block_id="response_1",
+            text=MarkdownTextObject(
+                text="*Amazing!* Let's see if this quote will enhance your day a bit more."
+            ),
+        ).to_dict(),
+        SectionBlock(
+            block_id="response_2",
+            text=MarkdownTextObject(text='*"Test Quote"* by Test Person'),
+        ).to_dict(),
+    ]
+
+    assert SlackBlockTemplates.good_quote("Test Quote", "Test Person") == expected
+
+
+def test_slot_substitution_does_not_mutate_templates():
+    """Test that filling a slot copies the template instead of changing it."""
+    first = SlackBlockTemplates.bad_quote("First", "Person")
+    second = SlackBlockTemplates.bad_quote("Second", "Person")
+
+    assert first[1]["text"]["text"] == '*"First"* by Person'
+    assert second[1]["text"]["text"] == '*"Second"* by Person'
+    assert SlackBlockTemplates.QUOTE["text"]["text"] != first[1]["text"]["text"]
+
+    # The static lead-in block is shared between the responses.
+    assert first[0] is second[0]
@@ -0,0 +1,247 @@
+"""
+Unit tests for the shared outbound Slack HTTP session.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+from typing import AsyncGenerator, Generator, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from prometheus_client import REGISTRY
+from slack_bolt.async_app import AsyncBoltContext, AsyncRespond
+from slack_sdk.models.blocks import DividerBlock, SectionBlock
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.webhook.async_client import AsyncWebhookClient
+
+from src.slack_bot.services.slack_http_session import SessionRespond, SlackHttpSession, slack_method
+
+SESSION_SETTINGS = dict(
+    limit=10,
+    limit_per_host=0,
+    keepalive_timeout=30.0,
+    dns_cache_ttl=300,
+    timeout=5.0,
+    connect_timeout=1.0,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_session(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    """Run every test without a started session and bound client."""
+    monkeypatch.setattr(SlackHttpSession, "_session", None)
+    monkeypatch.setattr(SlackHttpSession, "_client", None)
+    yield
+
+
+@pytest.fixture
+async def slack_server() -> AsyncGenerator[TestServer, None]:
+    """Serve the Web API and response_url endpoints, recording the client ports."""
+    peers: List[int] = []
+
+    async def api(request: web.Request) -> web.Response:
+        peers.append(request.transport.get_extra_info("peername")[1])  # type: ignore
+        return web.json_response({"ok": True})
+
+    async def response_url(request: web.Request) -> web.Response:
+        peers.append(request.transport.get_extra_info("peername")[1])  # type: ignore
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/api/{method}", api)
+    app.router.add_post("/actions/{team}/{id}", response_url)
+    server = TestServer(app)
+    server.peers = peers  # type: ignore
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+def sample(method: str, status: str) -> float:
+    """Read the number of recorded calls of a Slack method."""
+    labels = {"method": method, "status": status}
+    return REGISTRY.get_sample_value("slack_bot_slack_request_seconds_count", labels) or 0.0
+
+
+def test_slack_method():
+    """Test that the outbound calls are labeled by Slack method."""
+    assert slack_method("/api/chat.postMessage") == "chat.postMessage"
+    assert slack_method("/actions/T123/456/abc") == "response_url"
+    assert slack_method("/services/T123/B456/abc") == "webhook"
+    assert slack_method("/") == "other"
+
+
+@pytest.mark.asyncio
+async def test_bound_client_shares_the_session():
+    """Test that the bound client uses the session between start and close."""
+    client = AsyncWebClient(token="xoxb-test")
+    SlackHttpSession.bind(client)
+    assert client.session is None
+
+    session = SlackHttpSession.start(**SESSION_SETTINGS)
+
+    assert client.session is session
+    assert SlackHttpSession.start(**SESSION_SETTINGS) is session
+
+    await SlackHttpSession.close()
+
+    assert session.closed
+    assert client.session is None
+    assert SlackHttpSession.get_session() is None
+
+
+@pytest.mark.asyncio
+async def test_bind_replaces_the_client_of_a_previous_app():
+    """Test that only the client bound last uses the session, the previous one is released."""
+    client = AsyncWebClient(token="xoxb-test")
+    SlackHttpSession.bind(client)
+    session = SlackHttpSession.start(**SESSION_SETTINGS)
+
+    new_client = AsyncWebClient(token="xoxb-test")
+    SlackHttpSession.bind(new_client)
+
+    assert new_client.session is session
+    assert client.session is None
+    assert SlackHttpSession._client is new_client
+
+    await SlackHttpSession.close()
+
+    assert new_client.session is None
+    assert SlackHttpSession.get_session() is None
+
+
+@pytest.mark.asyncio
+async def test_outbound_calls_reuse_connections(slack_server: TestServer):
+    """Test that Web API and response_url calls keep one connection alive."""
+    client = AsyncWebClient(token="xoxb-test", base_url=str(slack_server.make_url("/api/")))
+    SlackHttpSession.bind(client)
+    session = SlackHttpSession.start(**SESSION_SETTINGS)
+    before = sample("chat.postMessage", "200"), sample("response_url", "200")
+
+    try:
+        for _ in range(3):
+            await client.chat_postMessage(channel="C1", text="hi")
+        respond = SessionRespond(
+            response_url=str(slack_server.make_url("/actions/T1/1")), session=session
+        )
+        response = await respond(blocks=[])
+        assert response.status_code == 200
+    finally:
+        await SlackHttpSession.close()
+
+    assert len(set(slack_server.peers)) == 1  # type: ignore
+    assert sample("chat.postMessage", "200") - before[0] == 3
+    assert sample("response_url", "200") - before[1] == 1
+
+
+@pytest.mark.asyncio
+async def test_respond_builds_the_message_without_bolt_internals():
+    """Test the body posted to the response_url, from arguments or from a whole message."""
+    respond = SessionRespond(
+        response_url="https://hooks.slack.com/actions/T1/1", session=MagicMock()
+    )
+    sent: List[dict] = []
+
+    async def send_dict(client: AsyncWebhookClient, message: dict) -> None:
+        sent.append(message)
+
+    with patch.object(AsyncWebhookClient, "send_dict", send_dict):
+        await respond(
+            "hi",
+            blocks=[SectionBlock(text="hi"), {"type": "divider"}],
+            attachments=[],
+            response_type="ephemeral",
+            replace_original=None,
+        )
+        await respond({"text": "bye", "blocks": [DividerBlock()], "delete_original": True})
+        with pytest.raises(TypeError):
+            await respond("hi", colour="red")
+
+    assert sent == [
+        {
+            "text": "hi",
+            "blocks": [
+                {"type": "section", "text": {"type": "mrkdwn", "text": "hi"}},
+                {"type": "divider"},
+            ],
+            "response_type": "ephemeral",
+        },
+        {"text": "bye", "blocks": [{"type": "divider"}], "delete_original": True},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_respond_without_response_url():
+    """Test that responding to a request without a response_url fails like Bolt."""
+    respond = SessionRespond(response_url=None, session=MagicMock())
+
+    with pytest.raises(ValueError):
+        await respond("hi")
+
+
+@pytest.mark.asyncio
+async def test_respond_middleware_uses_the_session():
+    """Test that the listeners get a respond function bound to the session."""
+    context = AsyncBoltContext(
+        response_url="https://hooks.slack.com/actions/T1/1", client=AsyncWebClient()
+    )
+    next_ = AsyncMock()
+
+    await SlackHttpSession.respond_middleware(context, next_)
+    assert not isinstance(context.respond, SessionRespond)
+    assert isinstance(context.respond, AsyncRespond)
+
+    session = SlackHttpSession.start(**SESSION_SETTINGS)
+    try:
+        context = AsyncBoltContext(
+            response_url="https://hooks.slack.com/actions/T1/1", client=AsyncWebClient(timeout=7)
+        )
+        await SlackHttpSession.respond_middleware(context, next_)
+    finally:
+        await SlackHttpSession.close()
+
+    assert isinstance(context.respond, SessionRespond)
+    assert context.respond.session is session
+    assert context.respond.timeout == 7
+    assert next_.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_outbound_calls_time_out():
+    """Test the timeout of the calls through the shared session and before it starts."""
+
+    async def slow(request: web.Request) -> web.Response:
+        await asyncio.sleep(1)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_post("/api/{method}", slow)
+    app.router.add_post("/actions/{team}/{id}", slow)
+    server = TestServer(app)
+    await server.start_server()
+    response_url = str(server.make_url("/actions/T1/1"))
+    client = AsyncWebClient(
+        token="xoxb-test", base_url=str(server.make_url("/api/")), timeout=0.05  # type: ignore
+    )
+    SlackHttpSession.bind(client)
+
+    try:
+        # Without the shared session, the clients open a session with their own timeout.
+        with pytest.raises(asyncio.TimeoutError):
+            await client.chat_postMessage(channel="C1", text="hi")
+
+        # The shared session applies its timeouts to the clients using it.
+        client.timeout = 30
+        session = SlackHttpSession.start(**{**SESSION_SETTINGS, "timeout": 0.05})
+        respond = SessionRespond(response_url=response_url, session=session)
+        with pytest.raises(asyncio.TimeoutError):
+            await client.chat_postMessage(channel="C1", text="hi")
+        with pytest.raises(asyncio.TimeoutError):
+            await respond(text="hi")
+    finally:
+        await SlackHttpSession.close()
+        await server.close()
@@ -0,0 +1,202 @@
+"""
+Unit tests for the outbound Slack message scheduler.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import time
+from typing import AsyncGenerator, List
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+from src.slack_bot.services.slack_message_scheduler import (
+    SlackMessageScheduler,
+    TokenBucket,
+    retry_after,
+)
+
+# Seconds the stub Slack API asks to wait after a 429.
+RETRY_AFTER = 0.1
+
+
+class StubSlackApi:
+    """Stub Slack Web API answering 429 to the first calls, recording the call times."""
+
+    def __init__(self, rate_limited_calls: int):
+        """Initialize the stub, answering 429 to the first calls."""
+        self.rate_limited_calls = rate_limited_calls
+        self.calls: List[float] = []
+        self.limited: List[float] = []
+
+    async def post_message(self, request: web.Request) -> web.Response:
+        """Answer a chat.postMessage call, rate limited or not."""
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.rate_limited_calls:
+            self.limited.append(self.calls[-1])
+            return web.json_response(
+                {"ok": False, "error": "ratelimited"},
+                status=429,
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        return web.json_response({"ok": True, "ts": str(len(self.calls))})
+
+
+@pytest.fixture
+async def stub_api() -> AsyncGenerator[StubSlackApi, None]:
+    """Serve chat.postMessage from a stub rate limiting the first two calls."""
+    api = StubSlackApi(rate_limited_calls=2)
+    app = web.Application()
+    app.router.add_post("/api/chat.postMessage", api.post_message)
+    server = TestServer(app)
+    await server.start_server()
+    api.base_url = str(server.make_url("/api/"))  # type: ignore
+    yield api
+    await server.close()
+
+
+def rate_limited_error(headers: dict) -> SlackApiError:
+    """Create the error of a rate limited call."""
+    return SlackApiError("ratelimited", MagicMock(status_code=429, headers=headers))
+
+
+def test_token_bucket():
+    """Test that the bucket allows bursts, refills at its rate and can be paused."""
+    bucket = TokenBucket(rate=2.0, burst=2)
+    now = time.monotonic()
+
+    assert bucket.delay(now) == 0
+    bucket.take(now)
+    bucket.take(now)
+    assert bucket.delay(now) == pytest.approx(0.5)
+    assert bucket.delay(now + 0.5) == 0
+    assert not bucket.full(now + 0.5)
+
+    bucket.pause(now + 3)
+    assert bucket.delay(now + 1) == pytest.approx(2)
+    assert bucket.full(now + 3)
+
+
+def test_retry_after():
+    """Test that the Retry-After header is read case insensitively, with a fallback."""
+    assert retry_after(rate_limited_error({"retry-after": "30"})) == 30
+    assert retry_after(rate_limited_error({"Retry-After": "2"})) == 2
+    assert retry_after(rate_limited_error({})) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_sends_are_throttled_in_queue_order():
+    """Test that a channel over its rate sends the queued messages first in first out."""
+    scheduler = SlackMessageScheduler({}, default_rate=1000, channel_rate=50, burst=1)
+    sent: List[str] = []
+
+    def send(name: str):
+        async def call() -> str:
+            sent.append(name)
+            return name
+
+        return call
+
+    results = await asyncio.gather(
+        scheduler.send("chat.postMessage", "C1", send("first")),
+        scheduler.send("chat.postMessage", "C1", send("second")),
+        scheduler.send("chat.postMessage", "C2", send("other channel")),
+        scheduler.send("chat.postMessage", "C1", send("third")),
+    )
+    await scheduler.close()
+
+    assert results == ["first", "second", "other channel", "third"]
+    # The other channel is not held up by the throttled one.
+    assert sent == ["first", "other channel", "second", "third"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_sends_are_retried_after_retry_after(stub_api: StubSlackApi):
+    """Test that sends answered with 429s by a stub Slack API are retried, not failed."""
+    client = AsyncWebClient(token="xoxb-test", base_url=stub_api.base_url)  # type: ignore
+    scheduler = SlackMessageScheduler({}, default_rate=1000, channel_rate=1000, burst=10)
+
+    responses = await asyncio.gather(
+        *(
+            scheduler.send(
+                "chat.postMessage",
+                "C1",
+                lambda: client.chat_postMessage(channel="C1", text="hi"),
+            )
+            for _ in range(3)
+        )
+    )
+    await scheduler.close()
+
+    assert all(response["ok"] for response in responses)
+    assert len(stub_api.calls) == 5
+    # The first three calls are sent at once, the retries wait for the Retry-After.
+    assert min(stub_api.calls[3:]) >= max(stub_api.limited) + RETRY_AFTER
+
+
+@pytest.mark.asyncio
+async def test_send_fails_after_max_retries():
+    """Test that a send still rate limited after the retries raises the error."""
+    scheduler = SlackMessageScheduler(
+        {"chat.postMessage": 1000}, default_rate=1, channel_rate=1000, burst=1, max_retries=2
+    )
+    send = AsyncMock(side_effect=rate_limited_error({"Retry-After": "0"}))
+
+    with pytest.raises(SlackApiError):
+        await scheduler.send("chat.postMessage", "C1", send)
+    await scheduler.close()
+
+    assert send.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_raised():
+    """Test that the errors other than rate limits are raised to the caller."""
+    scheduler = SlackMessageScheduler({}, default_rate=1000, channel_rate=1000, burst=1)
+    error = SlackApiError("channel_not_found", MagicMock(status_code=200, headers={}))
+
+    with pytest.raises(SlackApiError):
+        await scheduler.send("chat.postMessage", "C1", AsyncMock(side_effect=error))
+    with pytest.raises(RuntimeError):
+        await scheduler.send("chat.postMessage", "C1", AsyncMock(side_effect=RuntimeError()))
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_queued_sends():
+    """Test that the sends still queued at shutdown are cancelled."""
+    scheduler = SlackMessageScheduler({}, default_rate=1000, channel_rate=0.001, burst=1)
+    send = AsyncMock()
+
+    first = asyncio.create_task(scheduler.send("chat.postMessage", "C1", send))
+    queued = asyncio.create_task(scheduler.send("chat.postMessage", "C1", send))
+    await first
+    assert len(scheduler) == 1
+
+    await scheduler.close()
+
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert send.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_schedule_without_running_scheduler(monkeypatch: pytest.MonkeyPatch):
+    """Test that the sends go out right away when no scheduler is running."""
+    monkeypatch.setattr(SlackMessageScheduler, "_scheduler", None)
+    send = AsyncMock(return_value="sent")
+
+    assert await SlackMessageScheduler.schedule("chat.postMessage", "C1", send) == "sent"
+
+    scheduler = SlackMessageScheduler.start({}, default_rate=1000, channel_rate=1000, burst=1)
+    assert SlackMessageScheduler._scheduler is scheduler
+    assert await SlackMessageScheduler.schedule("chat.postMessage", "C1", send) == "sent"
+
+    await SlackMessageScheduler.stop()
+    assert SlackMessageScheduler._scheduler is None
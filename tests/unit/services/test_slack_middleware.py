@@ -5,12 +5,24 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
-from unittest.mock import AsyncMock
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from prometheus_client import REGISTRY
 from slack_bolt.async_app import AsyncApp
 
+from config import Settings
+from src.slack_bot.services.listener_executor import ListenerExecutor
 from src.slack_bot.services.slack_middleware import SlackMiddleware
+from src.slack_bot.services.slack_middleware_common_service import MiddlewareCommonService
+from src.slack_bot.services.slack_middleware_interactions_service import (
+    SlackMiddlewareInteractionsService,
+)
+from src.slack_bot.services.slack_request_logger import RequestLogger
+from src.slack_bot.services.slack_service import SlackService
 
 
 @pytest.fixture
@@ -48,6 +60,16 @@ def test_configure_middleware_registers_correct_middleware(mock_slack_app: Async
     ), "log_request_middleware should be registered"
 
 
+def test_request_logger_is_configured(mock_slack_app: AsyncMock, monkeypatch: pytest.MonkeyPatch):
+    """Test that the request logger is used by the request logging middleware."""
+    monkeypatch.setattr(MiddlewareCommonService, "request_logger", RequestLogger())
+    request_logger = RequestLogger(mode="summary")
+
+    SlackMiddleware(mock_slack_app, request_logger=request_logger)
+
+    assert MiddlewareCommonService.request_logger is request_logger
+
+
 def test_configure_error_handlers_registers_global_error_handler(mock_slack_app: AsyncMock):
     """Test that the global error handler is registered."""
     SlackMiddleware(mock_slack_app)
@@ -76,3 +98,94 @@ def test_configure_interactions_registers_action_handlers(mock_slack_app: AsyncM
     action_calls = [call[0][0] for call in mock_slack_app.action.call_args_list]
     assert "good" in action_calls, "'Good' action handler should be registered"
     assert "bad" in action_calls, "'Bad' action handler should be registered"
+
+
+def test_listeners_without_executor_run_in_request_task(mock_slack_app: AsyncMock):
+    """Test that the listeners are registered instrumented when no executor is configured."""
+    SlackMiddleware(mock_slack_app)
+
+    registered = [call[0][0] for call in mock_slack_app.action.return_value.call_args_list]
+    assert [listener.listener for listener in registered] == [
+        SlackMiddlewareInteractionsService.action_good_button_click,
+        SlackMiddlewareInteractionsService.action_bad_button_click,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_background_listener_acks_and_queues_work(mock_slack_app: AsyncMock):
+    """Test that a background listener acks in the request task and responds on a worker."""
+    executor = ListenerExecutor("test_middleware", workers=1, queue_size=10)
+    SlackMiddleware(mock_slack_app, {"good": executor})
+
+    good_listener, bad_listener = [
+        call[0][0] for call in mock_slack_app.action.return_value.call_args_list
+    ]
+    assert bad_listener.listener is SlackMiddlewareInteractionsService.action_bad_button_click
+
+    gate = asyncio.Event()
+
+    async def handle_good_interaction(index: str):
+        await gate.wait()
+        return []
+
+    args = SimpleNamespace(
+        ack=AsyncMock(response=None),
+        respond=AsyncMock(),
+        context={"settings": Settings()},
+    )
+    with patch.object(SlackService, "handle_good_interaction", handle_good_interaction):
+        await good_listener(args)
+
+        args.ack.assert_awaited_once_with("Thanks!")
+        args.respond.assert_not_awaited()
+
+        gate.set()
+        await executor.stop()
+
+    args.respond.assert_awaited_once_with(blocks=[])
+
+
+def sample(name: str, listener: str) -> float:
+    """Return the sample count of a listener histogram."""
+    return REGISTRY.get_sample_value(f"{name}_count", {"listener": listener}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_listener_records_ack_and_handler_time(mock_slack_app: AsyncMock):
+    """Test that a listener acking the request records its ack and handler time."""
+    SlackMiddleware(mock_slack_app)
+    good_listener = mock_slack_app.action.return_value.call_args_list[0][0][0]
+    acks = sample("slack_bot_listener_ack_seconds", "good")
+    handlers = sample("slack_bot_listener_handler_seconds", "good")
+
+    args = SimpleNamespace(
+        ack=AsyncMock(response=None),
+        respond=AsyncMock(),
+        context={"settings": Settings(), "received_at": time.perf_counter()},
+    )
+    with patch.object(SlackService, "handle_good_interaction", AsyncMock(return_value=[])):
+        await good_listener(args)
+
+    args.ack.assert_awaited_once()
+    assert sample("slack_bot_listener_ack_seconds", "good") == acks + 1
+    assert sample("slack_bot_listener_handler_seconds", "good") == handlers + 1
+
+
+@pytest.mark.asyncio
+async def test_event_listener_records_the_ack_by_bolt(mock_slack_app: AsyncMock):
+    """Test that an event acknowledged by Bolt records its ack time when the listener runs."""
+    SlackMiddleware(mock_slack_app)
+    app_mention = mock_slack_app.event.return_value.call_args_list[0][0][0]
+    acks = sample("slack_bot_listener_ack_seconds", "app_mention")
+
+    args = SimpleNamespace(
+        ack=MagicMock(response=MagicMock()),
+        context={"received_at": time.perf_counter()},
+        body={"event": {"ts": "1", "text": "wake up"}},
+        say=AsyncMock(),
+    )
+    with patch.object(SlackService, "handle_event", AsyncMock(return_value=[])):
+        await app_mention(args)
+
+    args.say.assert_awaited_once()
+    assert sample("slack_bot_listener_ack_seconds", "app_mention") == acks + 1
@@ -9,6 +9,7 @@ import json
 from unittest.mock import AsyncMock
 
 import pytest
+from prometheus_client import REGISTRY
 from pytest import LogCaptureFixture
 
 from src.slack_bot.services.slack_middleware_common_service import MiddlewareCommonService
@@ -77,3 +78,28 @@ async def test_global_error_handler_with_description():
     # Assert say was called with a message that contains the custom description
     error_message = mock_say.call_args[1]["text"]
     assert test_description in error_message, "Error message did not contain expected description"
+
+
+@pytest.mark.asyncio
+async def test_global_error_handler_counts_errors_by_type():
+    """Test that the global error handler counts the errors by exception type."""
+    labels = {"exception": "KeyError"}
+    before = REGISTRY.get_sample_value("slack_bot_listener_errors_total", labels) or 0.0
+
+    await MiddlewareCommonService.global_error_handler(
+        KeyError("missing"), {"event": {"ts": "12345"}}, AsyncMock()
+    )
+
+    assert REGISTRY.get_sample_value("slack_bot_listener_errors_total", labels) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_received_at_middleware_records_the_time():
+    """Test that the time a request reached Bolt is recorded in the context."""
+    context: dict = {}
+    next_ = AsyncMock()
+
+    await MiddlewareCommonService.received_at_middleware(context, next_)  # type: ignore
+
+    assert isinstance(context["received_at"], float)
+    next_.assert_awaited_once()
@@ -9,6 +9,7 @@ from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from src.slack_bot.services.slack_message_scheduler import SlackMessageScheduler
 from src.slack_bot.services.slack_middleware_eventhandler_service import (
     SlackMiddlewareEventHandlerService,
 )
@@ -64,3 +65,22 @@ async def test_app_mention_with_thread_ts():
         assert (
             mock_say.call_args[1]["thread_ts"] == "54321.09876"
         ), "Message should be sent to the specific thread_ts"
+
+
+@pytest.mark.asyncio
+async def test_app_mention_sends_through_scheduler():
+    """Test that app_mention posts its message through the rate limit scheduler."""
+    mock_say = AsyncMock()
+    mock_body = {"event": {"ts": "12345.67890", "channel": "C123"}}
+
+    with patch.object(SlackService, "handle_event", return_value=[]), patch.object(
+        SlackMessageScheduler, "schedule", AsyncMock()
+    ) as mock_schedule:
+        await SlackMiddlewareEventHandlerService.app_mention(body=mock_body, say=mock_say)
+
+        method, channel, send = mock_schedule.call_args[0]
+        assert (method, channel) == ("chat.postMessage", "C123")
+        mock_say.assert_not_called()
+
+        await send()
+        mock_say.assert_called_once_with(text="Response", blocks=[], thread_ts="12345.67890")
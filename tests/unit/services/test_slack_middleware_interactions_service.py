@@ -57,3 +57,28 @@ async def test_action_bad_button_click():
         mock_ack.assert_called_once_with("Thanks!")
         mock_context.get.assert_called_once_with("settings")
         mock_respond.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_ack_button_click():
+    """Test that a button click is acknowledged without a response."""
+    mock_ack = AsyncMock()
+
+    await SlackMiddlewareInteractionsService.ack_button_click(mock_ack)
+
+    mock_ack.assert_called_once_with("Thanks!")
+
+
+@pytest.mark.asyncio
+async def test_respond_good_button_click():
+    """Test that the follow-up of the "good" button click responds without acking."""
+    mock_respond = AsyncMock()
+    mock_context = AsyncMock(AsyncBoltContext, get=MagicMock(return_value=Settings()))
+
+    with patch.object(SlackService, "handle_good_interaction", return_value=[]) as handle:
+        await SlackMiddlewareInteractionsService.respond_good_button_click(
+            mock_respond, mock_context
+        )
+
+        handle.assert_called_once_with(Settings().redis_search_index)
+        mock_respond.assert_called_once_with(blocks=[])
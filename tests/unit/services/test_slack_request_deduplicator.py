@@ -0,0 +1,183 @@
+"""
+Unit tests for the Slack request deduplicator.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import json
+import time
+from typing import Dict, Generator, Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import Request
+from redis.exceptions import ConnectionError as RedisConnectionError
+from slack_sdk.signature import SignatureVerifier
+
+from src.slack_bot.services.slack_request_deduplicator import (
+    KEY_PREFIX,
+    SlackRequestDeduplicator,
+    request_id,
+)
+
+SIGNING_SECRET = "secret"
+
+EVENT = json.dumps({"type": "event_callback", "event_id": "Ev123", "event": {}}).encode()
+
+
+def make_request(body: bytes, signed: bool = True, retry: Optional[str] = None) -> Request:
+    """Create a FastAPI request with the body, signed with the test signing secret."""
+    timestamp = str(int(time.time()))
+    signature = SignatureVerifier(SIGNING_SECRET).generate_signature(timestamp=timestamp, body=body)
+    headers: Dict[str, str] = {
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature if signed else "v0=forged",
+    }
+    if retry is not None:
+        headers["X-Slack-Retry-Num"] = retry
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/slack/events",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    return Request(scope, receive)
+
+
+@pytest.fixture
+def mock_dao() -> Generator[MagicMock, None, None]:
+    """Mock the DAO claiming the request IDs."""
+    dao = MagicMock()
+    dao.claim = AsyncMock(return_value=True)
+    dao.release = AsyncMock(return_value=True)
+    with patch(
+        "src.slack_bot.services.slack_request_deduplicator.AsyncRedisDAOFactory"
+    ) as mock_factory:
+        mock_factory.get_claim_dao_with_existing_pool.return_value = dao
+        yield dao
+
+
+def deduplicator(lru_size: int = 10) -> SlackRequestDeduplicator:
+    """Create a deduplicator with the test signing secret."""
+    return SlackRequestDeduplicator(SIGNING_SECRET, ttl=600, lru_size=lru_size)
+
+
+def test_request_id():
+    """Test that the events, interactions and commands are identified."""
+    interaction = urlencode({"payload": json.dumps({"type": "block_actions", "trigger_id": "T1"})})
+    command = urlencode({"command": "/quote", "trigger_id": "T2"})
+
+    assert request_id(EVENT) == ("event", "Ev123")
+    assert request_id(interaction.encode()) == ("interaction", "T1")
+    assert request_id(command.encode()) == ("interaction", "T2")
+    assert request_id(json.dumps({"type": "url_verification"}).encode()) is None
+    assert request_id(b"{not json") is None
+    assert request_id(b"\xff") is None
+
+
+@pytest.mark.asyncio
+async def test_retry_is_answered_from_memory(mock_dao: MagicMock):
+    """Test that a retry reaching the same worker does not go to Redis."""
+    dedup = deduplicator()
+
+    assert not await dedup.is_duplicate(make_request(EVENT))
+    assert await dedup.is_duplicate(make_request(EVENT, retry="1"))
+
+    mock_dao.claim.assert_awaited_once_with("Ev123", 600)
+
+
+@pytest.mark.asyncio
+async def test_retry_is_answered_from_redis(mock_dao: MagicMock):
+    """Test that a retry reaching another worker is found in Redis."""
+    assert not await deduplicator().is_duplicate(make_request(EVENT))
+
+    mock_dao.claim.return_value = False
+    assert await deduplicator().is_duplicate(make_request(EVENT, retry="1"))
+
+
+@pytest.mark.asyncio
+async def test_lru_is_bounded(mock_dao: MagicMock):
+    """Test that the oldest request IDs leave the in-process LRU."""
+    dedup = deduplicator(lru_size=1)
+    other_event = json.dumps({"event_id": "Ev456"}).encode()
+
+    await dedup.is_duplicate(make_request(EVENT))
+    await dedup.is_duplicate(make_request(other_event))
+    await dedup.is_duplicate(make_request(EVENT, retry="1"))
+
+    assert mock_dao.claim.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_unsigned_requests_are_left_to_bolt(mock_dao: MagicMock):
+    """Test that an unsigned request cannot claim an ID."""
+    dedup = deduplicator()
+
+    assert not await dedup.is_duplicate(make_request(EVENT, signed=False))
+    assert not await dedup.is_duplicate(make_request(EVENT, signed=False))
+
+    mock_dao.claim.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_processes_the_request(mock_dao: MagicMock):
+    """Test that the request is processed when Redis is not available."""
+    mock_dao.claim.side_effect = RedisConnectionError("down")
+
+    assert not await deduplicator().is_duplicate(make_request(EVENT))
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_releases_its_claim_for_the_retry():
+    """Test that the retry of a delivery whose handling failed is processed."""
+    claimed: Dict[str, int] = {}
+
+    async def claim(key: str, ttl: int) -> bool:
+        if key in claimed:
+            return False
+        claimed[key] = ttl
+        return True
+
+    async def release(key: str) -> bool:
+        return claimed.pop(key, None) is not None
+
+    dao = MagicMock()
+    dao.claim = AsyncMock(side_effect=claim)
+    dao.release = AsyncMock(side_effect=release)
+    with patch(
+        "src.slack_bot.services.slack_request_deduplicator.AsyncRedisDAOFactory"
+    ) as mock_factory:
+        mock_factory.get_claim_dao_with_existing_pool.return_value = dao
+        dedup = deduplicator()
+        first = make_request(EVENT)
+        assert not await dedup.is_duplicate(first)
+        # The retry of a delivery still being handled is a duplicate.
+        assert await dedup.is_duplicate(make_request(EVENT, retry="1"))
+
+        await dedup.release(first)
+        retry = make_request(EVENT, retry="2")
+        assert not await dedup.is_duplicate(retry)
+
+    mock_factory.get_claim_dao_with_existing_pool.assert_called_with(KEY_PREFIX)
+    dao.release.assert_awaited_once_with("Ev123")
+    assert claimed == {"Ev123": 600}
+
+
+@pytest.mark.asyncio
+async def test_release_without_claim_is_ignored(mock_dao: MagicMock):
+    """Test that a request that claimed no ID, such as a duplicate, releases nothing."""
+    dedup = deduplicator()
+    assert not await dedup.is_duplicate(make_request(EVENT))
+    duplicate = make_request(EVENT, retry="1")
+    assert await dedup.is_duplicate(duplicate)
+
+    await dedup.release(duplicate)
+    await dedup.release(make_request(EVENT, signed=False))
+
+    mock_dao.release.assert_not_awaited()
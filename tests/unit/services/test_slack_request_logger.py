@@ -0,0 +1,114 @@
+"""
+Unit tests for the Slack request logger.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import json
+import logging
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from pytest import LogCaptureFixture
+
+from src.slack_bot.services.slack_request_logger import (
+    LazyPayload,
+    RequestLogger,
+    select_fields,
+    summarize,
+)
+
+BODY = {
+    "type": "block_actions",
+    "team": {"id": "T1", "domain": "workspace"},
+    "channel": {"id": "C1", "name": "webinar"},
+    "actions": [{"action_id": "good", "value": "good"}],
+    "response_url": "https://hooks.slack.com/actions/T1/1/abc",
+}
+
+
+def test_select_fields():
+    """Test that the payload is reduced to the allowed fields, nested or not."""
+    assert select_fields(BODY, ["type", "team.id", "channel.missing", "missing"]) == {
+        "type": "block_actions",
+        "team": {"id": "T1"},
+    }
+
+
+def test_summarize():
+    """Test that the events and the interactions are summarized."""
+    event = {"team_id": "T2", "event": {"type": "app_mention", "channel": "C2"}}
+
+    assert summarize(BODY) == {
+        "type": "block_actions",
+        "team": "T1",
+        "channel": "C1",
+        "action_id": "good",
+    }
+    assert summarize(event) == {
+        "type": "app_mention",
+        "team": "T2",
+        "channel": "C2",
+        "action_id": None,
+    }
+
+
+def test_lazy_payload_is_capped():
+    """Test that a payload longer than the cap is truncated."""
+    text = str(LazyPayload(BODY, (), max_bytes=20))
+
+    assert text.startswith(json.dumps(BODY)[:20] + "...(")
+
+
+@pytest.mark.asyncio
+async def test_full_payload_is_logged(caplog: LogCaptureFixture):
+    """Test that the full mode logs the payload as JSON."""
+    next_ = AsyncMock()
+
+    with caplog.at_level(logging.DEBUG, logger="app"):
+        await RequestLogger().log(BODY, next_)
+
+    assert json.dumps(BODY) in caplog.text
+    next_.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_summary_is_logged_with_timing(caplog: LogCaptureFixture):
+    """Test that the summary mode logs the summary and the handling time."""
+    with caplog.at_level(logging.DEBUG, logger="app"):
+        await RequestLogger(mode="summary").log(BODY, AsyncMock())
+
+    summary = json.loads(caplog.records[-1].getMessage().split(" ", 2)[2])
+    assert summary["action_id"] == "good"
+    assert summary["duration_ms"] >= 0
+    assert "response_url" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_payload_is_not_serialized_above_debug(caplog: LogCaptureFixture):
+    """Test that nothing is serialized when the logger is above DEBUG."""
+    next_ = AsyncMock()
+
+    with caplog.at_level(logging.INFO, logger="app"), patch(
+        "src.slack_bot.services.slack_request_logger.json.dumps"
+    ) as dumps:
+        await RequestLogger().log(BODY, next_)
+        await RequestLogger(mode="summary").log(BODY, next_)
+
+    dumps.assert_not_called()
+    assert next_.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_requests_are_sampled(caplog: LogCaptureFixture):
+    """Test that only the sampled requests are logged, and none when off."""
+    with caplog.at_level(logging.DEBUG, logger="app"), patch(
+        "src.slack_bot.services.slack_request_logger.random.random", side_effect=[0.05, 0.5]
+    ):
+        request_logger = RequestLogger(sample_rate=0.1)
+        await request_logger.log(BODY, AsyncMock())
+        await request_logger.log(BODY, AsyncMock())
+        await RequestLogger(mode="off").log(BODY, AsyncMock())
+
+    assert len([r for r in caplog.records if r.name == "app"]) == 1
@@ -5,19 +5,12 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
+from typing import Any, Dict
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from slack_sdk.models.blocks import (
-    ActionsBlock,
-    Block,
-    ButtonElement,
-    MarkdownTextObject,
-    PlainTextObject,
-    SectionBlock,
-    TextObject,
-)
 
+from src.slack_bot.daos.quote import Quote
 from src.slack_bot.services.slack_service import SlackService
 
 
@@ -29,24 +22,25 @@ async def test_handle_event_with_wake_up_message():
     assert response is not None
     assert len(response) == 2  # Expecting 2 blocks
 
-    block_1: Block = response[0]  # type: ignore
+    block_1: Dict[str, Any] = response[0]  # type: ignore
 
-    assert isinstance(block_1, SectionBlock)
+    assert block_1["type"] == "section"
+    assert "<@U12345>" in block_1["text"]["text"]
 
-    block_2: Block = response[1]  # type: ignore
+    block_2: Dict[str, Any] = response[1]  # type: ignore
 
-    assert isinstance(block_2, ActionsBlock)
-    assert len(block_2.elements) == 2
+    assert block_2["type"] == "actions"
+    assert len(block_2["elements"]) == 2
 
-    button_1 = block_2.elements[0]
-    assert isinstance(button_1, ButtonElement)
+    button_1 = block_2["elements"][0]
+    assert button_1["type"] == "button"
 
-    assert button_1.action_id == "good"
+    assert button_1["action_id"] == "good"
 
-    button_2 = block_2.elements[1]
-    assert isinstance(button_2, ButtonElement)
+    button_2 = block_2["elements"][1]
+    assert button_2["type"] == "button"
 
-    assert button_2.action_id == "bad"
+    assert button_2["action_id"] == "bad"
 
 
 @pytest.mark.asyncio
@@ -57,10 +51,35 @@ async def test_handle_event_with_no_wake_up_message():
     assert response is not None
     assert len(response) == 1  # Expecting 1 block
 
-    block_1: Block = response[0]  # type: ignore
+    block_1: Dict[str, Any] = response[0]  # type: ignore
 
-    assert isinstance(block_1, SectionBlock)
-    assert "Sleeeeeping" in block_1.text.text  # type: ignore
+    assert block_1["type"] == "section"
+    assert "Sleeeeeping" in block_1["text"]["text"]
+
+
+@pytest.mark.asyncio
+@patch("src.slack_bot.services.slack_service.AsyncRedisDAOFactory")
+@patch("src.slack_bot.services.slack_service.QuoteCorpusCache")
+async def test_get_quote_from_corpus_cache(mock_cache_class: MagicMock, mock_factory: MagicMock):
+    """Test get_quote method served from the in-process corpus cache."""
+    mock_cache_class.get_cache.return_value.random_quote.return_value = ("Quote", "Person")
+
+    quote = await SlackService.get_quote("search_index")
+    assert quote == ("Quote", "Person")
+    mock_factory.get_redis_dao_with_existing_pool.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("src.slack_bot.services.slack_service.AsyncRedisDAOFactory")
+async def test_get_quote_from_keyset(mock_factory: MagicMock):
+    """Test get_quote method using the key set in a single round trip."""
+    mock_dao = AsyncMock()
+    mock_factory.get_redis_dao_with_existing_pool.return_value = mock_dao
+    mock_dao.random_document.return_value = {"quote": "Test Quote", "person": "Test Person"}
+
+    quote = await SlackService.get_quote("search_index")
+    assert quote == ("Test Quote", "Test Person")
+    mock_dao.index_search.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -68,16 +87,21 @@ async def test_handle_event_with_no_wake_up_message():
 async def test_get_quote_with_results(mock_factory: MagicMock):
     """Test get_quote method."""
     mock_dao = AsyncMock()
-    mock_factory.create_redis_dao_with_existing_pool.return_value = mock_dao
-    mock_dao.index_search.side_effect = [
-        {"total_results": 1},  # First call for total results
-        {
-            "results": [{"extra_attributes": {"quote": "Test Quote", "person": "Test Person"}}]
-        },  # Second call for random entry
-    ]
+    mock_factory.get_redis_dao_with_existing_pool.return_value = mock_dao
+    mock_dao.random_document.return_value = None
+    mock_dao.index_search.return_value = {"total_results": 1}
+    mock_dao.search_quotes.return_value = (1, [Quote("Test Quote", "Test Person")])
+
+    with patch("src.slack_bot.services.slack_service.logger") as mock_logger:
+        quote = await SlackService.get_quote("search_index")
 
-    quote = await SlackService.get_quote("search_index")
     assert quote == ("Test Quote", "Test Person")
+    # The quote is fetched at the only offset, and logged at debug level only.
+    assert mock_dao.search_quotes.await_args.args[0].get_args()[-3:] == ["LIMIT", 0, 1]
+    mock_logger.info.assert_not_called()
+    mock_logger.debug.assert_called_with(
+        "Random quote at offset %s: %r", 0, Quote("Test Quote", "Test Person")
+    )
 
 
 @pytest.mark.asyncio
@@ -85,7 +109,8 @@ async def test_get_quote_with_results(mock_factory: MagicMock):
 async def test_get_quote_with_no_results(mock_factory: MagicMock):
     """Test get_quote method with no results."""
     mock_dao = AsyncMock()
-    mock_factory.create_redis_dao_with_existing_pool.return_value = mock_dao
+    mock_factory.get_redis_dao_with_existing_pool.return_value = mock_dao
+    mock_dao.random_document.return_value = None
     mock_dao.index_search.return_value = {"total_results": 0}
 
     quote = await SlackService.get_quote("search_index")
@@ -7,7 +7,11 @@ Copyright: 2023 Translucent Computing Inc.
 """
 import json
 import logging
+import sys
+from datetime import datetime
 from logging import LogRecord
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
 
 import pytest
 from pythonjsonlogger import jsonlogger
@@ -77,3 +81,81 @@ def test_json_formatter_custom_format(log_record: LogRecord):
     assert "asctime" in log_dict, "The 'asctime' attribute should be in the formatted output"
     assert "levelname" in log_dict, "The 'levelname' attribute should be in the formatted output"
     assert "message" in log_dict, "The 'message' attribute should be in the formatted output"
+
+
+class PreviousJsonFormatter(jsonlogger.JsonFormatter):
+    """The JSON formatter before the field plan, formatting with python-json-logger."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the formatter, excluding the uvicorn color message."""
+        kwargs["reserved_attrs"] = ["color_message", *jsonlogger.RESERVED_ATTRS]
+        super().__init__(*args, **kwargs)
+
+
+def make_records() -> List[LogRecord]:
+    """Create records with arguments, extras, an exception and a stack."""
+    record = LogRecord("app", logging.INFO, __file__, 1, "héllo %s", ("wörld",), None)
+    access = LogRecord("uvicorn.access", logging.INFO, __file__, 2, "%s %d", ("GET", 200), None)
+    access.color_message = "colored"
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        failed = LogRecord("app", logging.ERROR, __file__, 3, "failed", (), sys.exc_info())
+    extras = LogRecord("app", logging.INFO, __file__, 4, "extras", (), None, sinfo="Stack")
+    extras.created_at = datetime(2023, 1, 1)
+    extras.error = ValueError("bad")
+    extras.ratio = float("nan")
+    extras.nested = {"key": {1: [None, True]}}
+    extras._private = "hidden"
+    as_dict = LogRecord("app", logging.INFO, __file__, 5, {"event": "dict"}, (), None)
+    return [record, access, failed, extras, as_dict]
+
+
+@pytest.mark.parametrize(
+    "fmt, kwargs",
+    [
+        ("%(asctime)s %(levelname)s %(name)s %(message)s", {}),
+        (None, {"prefix": "json: "}),
+        ("%(message)s %(lineno)d %(message)s", {}),
+        ("%(levelname)s %(message)s", {"rename_fields": {"levelname": "level"}}),
+    ],
+)
+def test_json_formatter_output_is_unchanged(fmt: Optional[str], kwargs: Dict[str, Any]):
+    """Test that the output is byte for byte the output of python-json-logger."""
+    previous = PreviousJsonFormatter(fmt, **kwargs)
+    formatter = JsonFormatter(fmt, **kwargs)
+
+    for expected, record in zip(make_records(), make_records()):
+        record.created, record.msecs = expected.created, expected.msecs
+        record.relativeCreated = expected.relativeCreated
+        assert formatter.format(record) == previous.format(expected)
+
+
+def test_json_formatter_plans_only_the_standard_options():
+    """Test that the options changing the output are left to python-json-logger."""
+    assert JsonFormatter("%(message)s")._plan is not None
+    assert JsonFormatter("%(message)s", timestamp=True)._plan is None
+    assert JsonFormatter("%(message)s", json_indent=2)._plan is None
+
+
+def test_json_formatter_falls_back_without_the_fast_serializer(log_record: LogRecord):
+    """Test that a serializer which is not installed falls back to the standard library."""
+    with patch("importlib.import_module", side_effect=ImportError):
+        formatter = JsonFormatter("%(message)s", serializer="orjson")
+
+    assert formatter.json_serializer is json.dumps
+    assert formatter.format(log_record) == PreviousJsonFormatter("%(message)s").format(log_record)
+
+
+def test_json_formatter_reuses_the_time_of_the_same_second(log_record: LogRecord):
+    """Test that the time text is formatted once per second, with the milliseconds."""
+    formatter = JsonFormatter("%(asctime)s")
+    log_record.created, log_record.msecs = 1_700_000_000.25, 250
+    first = formatter.formatTime(log_record)
+    assert first == logging.Formatter().formatTime(log_record)
+
+    with patch("time.strftime") as strftime:
+        log_record.msecs = 750
+        second = formatter.formatTime(log_record)
+    strftime.assert_not_called()
+    assert second == first[:-3] + "750"
@@ -5,15 +5,54 @@ Author: Patryk Golabek
 Company: Translucent Computing Inc.
 Copyright: 2023 Translucent Computing Inc.
 """
-from typing import Generator
+import asyncio
+import time
+from functools import partial
+from typing import Any, Generator
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import FastAPI
+from redis.asyncio import Connection
 
 from config import Settings
+from src.slack_bot.daos.metered_connection_pool import MeteredConnectionPool
+from src.slack_bot.daos.redis_dao_factory_async import AsyncRedisDAOFactory
 from src.slack_bot.utils.lifespan import lifespan
 
+# Simulated TCP connect and HELLO handshake time of a Redis connection.
+CONNECT_DELAY = 0.05
+
+
+class SlowConnection(Connection):
+    """Redis connection answering PONG to every command, with a slow connect."""
+
+    def __init__(self, **kwargs: Any):
+        """Initialize the connection, not connected."""
+        super().__init__(**kwargs)
+        self.connected = False
+
+    async def connect(self) -> None:
+        """Connect, taking the simulated connect time."""
+        if not self.connected:
+            await asyncio.sleep(CONNECT_DELAY)
+            self.connected = True
+
+    async def can_read_destructive(self) -> bool:
+        """Report that there is nothing to read."""
+        return False
+
+    async def send_packed_command(self, command: Any, check_health: bool = True) -> None:
+        """Discard the command."""
+
+    async def read_response(self, *args: Any, **kwargs: Any) -> bytes:
+        """Answer PONG."""
+        return b"PONG"
+
+    async def disconnect(self, nowait: bool = False) -> None:
+        """Disconnect."""
+        self.connected = False
+
 
 @pytest.fixture
 def mock_app() -> FastAPI:
@@ -27,7 +66,9 @@ def mock_app() -> FastAPI:
 def mock_async_redis_dao_factory() -> Generator[MagicMock, None, None]:
     """Mock the Redis DAO factor."""
     with patch("src.slack_bot.utils.lifespan.AsyncRedisDAOFactory") as mock_factory:
-        mock_factory.get_connection_pool = AsyncMock()
+        mock_factory.get_connection_pool = MagicMock()
+        mock_factory.warm_up_connection_pool = AsyncMock()
+        mock_factory.start_client_cache = AsyncMock()
         mock_factory.reset_connection_pool = AsyncMock()
         yield mock_factory
 
@@ -40,6 +81,8 @@ async def test_lifespan_context_manager(mock_app: FastAPI, mock_async_redis_dao_
     This test checks if the Redis connection pool is correctly initialized and
     closed during the application's lifespan.
     """
+    mock_app.state.settings.redis_search_index = "quotes"
+
     async with lifespan(mock_app) as life:
         assert life is None  # Check that the context manager yields None
 
@@ -52,10 +95,146 @@ async def test_lifespan_context_manager(mock_app: FastAPI, mock_async_redis_dao_
         max_connections=mock_app.state.settings.redis_max_connections,
     )
 
+    # Assert that the pool was warmed up before serving requests
+    mock_async_redis_dao_factory.warm_up_connection_pool.assert_awaited_once_with(
+        mock_app.state.settings.redis_warm_up_connections
+    )
+
+    # Assert that the client cache is disabled by default
+    mock_async_redis_dao_factory.start_client_cache.assert_not_awaited()
+
+    # Assert that the DAO of the search index was created with the pool
+    mock_async_redis_dao_factory.get_redis_dao_with_existing_pool.assert_called_once_with(
+        mock_app.state.settings.redis_search_index
+    )
+
     # Assert that reset_connection_pool was called once
     mock_async_redis_dao_factory.reset_connection_pool.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_lifespan_starts_client_cache(
+    mock_app: FastAPI, mock_async_redis_dao_factory: MagicMock
+):
+    """Test that the client cache is started with the pool when it is enabled."""
+    mock_app.state.settings.client_cache_enabled = True
+    mock_app.state.settings.client_cache_mode = "broadcast"
+    mock_app.state.settings.client_cache_prefixes = ["quotes:"]
+
+    async with lifespan(mock_app):
+        mock_async_redis_dao_factory.start_client_cache.assert_awaited_once_with(
+            max_entries=mock_app.state.settings.client_cache_max_entries,
+            broadcast=True,
+            prefixes=["quotes:"],
+            max_connections=mock_app.state.settings.client_cache_max_connections,
+        )
+
+
+@pytest.mark.asyncio
+async def test_lifespan_enables_query_cache(
+    mock_app: FastAPI, mock_async_redis_dao_factory: MagicMock
+):
+    """Test that the query result caches are enabled before the DAO is created."""
+    settings = mock_app.state.settings
+    settings.query_cache_enabled = True
+    settings.redis_search_index = "quotes"
+
+    async with lifespan(mock_app):
+        mock_async_redis_dao_factory.enable_query_cache.assert_called_once_with(
+            ttl=settings.query_cache_ttl,
+            max_entries=settings.query_cache_max_entries,
+            max_bytes=settings.query_cache_max_bytes,
+        )
+        assert [name for name, *_ in mock_async_redis_dao_factory.method_calls][-2:] == [
+            "enable_query_cache",
+            "get_redis_dao_with_existing_pool",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_lifespan_starts_corpus_cache(
+    mock_app: FastAPI, mock_async_redis_dao_factory: MagicMock
+):
+    """Test that the corpus cache is started and stopped when it is enabled."""
+    mock_app.state.settings.corpus_cache_enabled = True
+
+    with patch("src.slack_bot.utils.lifespan.QuoteCorpusCache") as mock_cache:
+        mock_cache.start = AsyncMock()
+        mock_cache.stop_all = AsyncMock()
+
+        async with lifespan(mock_app):
+            mock_cache.start.assert_awaited_once_with(
+                search_index_name=mock_app.state.settings.redis_search_index,
+                max_size=mock_app.state.settings.corpus_cache_max_size,
+                refresh_interval=mock_app.state.settings.corpus_cache_refresh_interval,
+            )
+
+        mock_cache.stop_all.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_stops_listener_executors(
+    mock_app: FastAPI, mock_async_redis_dao_factory: MagicMock
+):
+    """Test that the listener executors are drained before the pool is closed."""
+    reset_pool = mock_async_redis_dao_factory.reset_connection_pool
+
+    with patch("src.slack_bot.utils.lifespan.ListenerExecutor") as mock_executor:
+        mock_executor.stop_all = AsyncMock(side_effect=reset_pool.assert_not_awaited)
+
+        async with lifespan(mock_app):
+            mock_executor.stop_all.assert_not_awaited()
+
+        mock_executor.stop_all.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_manages_slack_http_session(
+    mock_app: FastAPI, mock_async_redis_dao_factory: MagicMock
+):
+    """Test that the outbound Slack session is open for the lifespan of the app."""
+    settings = mock_app.state.settings
+
+    with patch("src.slack_bot.utils.lifespan.SlackHttpSession") as mock_session:
+        mock_session.close = AsyncMock()
+
+        async with lifespan(mock_app):
+            mock_session.start.assert_called_once_with(
+                limit=settings.slack_http_max_connections,
+                limit_per_host=settings.slack_http_max_connections_per_host,
+                keepalive_timeout=settings.slack_http_keepalive_timeout,
+                dns_cache_ttl=settings.slack_http_dns_cache_ttl,
+                timeout=settings.slack_http_timeout,
+                connect_timeout=settings.slack_http_connect_timeout,
+            )
+            mock_session.close.assert_not_awaited()
+
+        mock_session.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_starts_slack_message_scheduler(
+    mock_app: FastAPI, mock_async_redis_dao_factory: MagicMock
+):
+    """Test that the message scheduler runs for the lifespan of the app when enabled."""
+    settings = mock_app.state.settings
+    settings.slack_scheduler_enabled = True
+
+    with patch("src.slack_bot.utils.lifespan.SlackMessageScheduler") as mock_scheduler:
+        mock_scheduler.stop = AsyncMock()
+
+        async with lifespan(mock_app):
+            mock_scheduler.start.assert_called_once_with(
+                method_rates=settings.slack_scheduler_method_rates,
+                default_rate=settings.slack_scheduler_default_rate,
+                channel_rate=settings.slack_scheduler_channel_rate,
+                burst=settings.slack_scheduler_burst,
+                max_retries=settings.slack_scheduler_max_retries,
+            )
+
+        mock_scheduler.stop.assert_awaited_once()
+
+
 @pytest.mark.asyncio
 async def test_lifespan_context_manager_with_no_settings(mock_app: FastAPI):
     """
@@ -71,3 +250,38 @@ async def test_lifespan_context_manager_with_no_settings(mock_app: FastAPI):
             pass
 
     assert "The app settings are not set." in str(exc_info.value)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("warm_up_connections", [0, 2])
+async def test_lifespan_startup_to_first_response_latency(
+    mock_app: FastAPI, monkeypatch: pytest.MonkeyPatch, warm_up_connections: int
+):
+    """
+    Test that warming up the pool takes the connect time off the first request.
+
+    Without a warm-up the first command waits for the connection to be established,
+    with a warm-up it is served from an idle connection opened during startup.
+    """
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_connection_pool", None)
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_connection_pools", {})
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_pool_labels", {})
+    monkeypatch.setattr(AsyncRedisDAOFactory, "_daos", {})
+    monkeypatch.setattr(
+        "src.slack_bot.daos.redis_dao_factory_async.MeteredConnectionPool",
+        partial(MeteredConnectionPool, connection_class=SlowConnection),
+    )
+    mock_app.state.settings.redis_warm_up_connections = warm_up_connections
+
+    started = time.perf_counter()
+    async with lifespan(mock_app):
+        ready = time.perf_counter()
+        dao = AsyncRedisDAOFactory.get_redis_dao_with_existing_pool("test")
+        assert await dao.client.ping() is True
+        first_response = time.perf_counter()
+
+    assert ready - started >= warm_up_connections * CONNECT_DELAY
+    if warm_up_connections:
+        assert first_response - ready < CONNECT_DELAY
+    else:
+        assert first_response - ready >= CONNECT_DELAY
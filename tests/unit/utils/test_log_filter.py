@@ -7,10 +7,11 @@ Copyright: 2023 Translucent Computing Inc.
 """
 import logging
 from typing import List
+from unittest.mock import patch
 
 import pytest
 
-from src.slack_bot.utils.log_filter import SuppressSpecificLogEntries
+from src.slack_bot.utils.log_filter import AccessLogSampler, SuppressSpecificLogEntries
 
 
 @pytest.mark.parametrize(
@@ -76,3 +77,72 @@ def test_suppress_specific_log_entries():
 
     # Check the collected log messages
     assert log_messages == ["This is a debug message.", "This is a warning."]
+
+
+def access_record(path: str, status: int = 200) -> logging.LogRecord:
+    """Create a uvicorn access log record."""
+    return logging.LogRecord(
+        name="uvicorn.access",
+        level=logging.INFO,
+        pathname="",
+        lineno=0,
+        msg='%s - "%s %s HTTP/%s" %d',
+        args=("127.0.0.1:5000", "GET", path, "1.1", status),
+        exc_info=None,
+    )
+
+
+@pytest.mark.parametrize(
+    "path, status, expected_result",
+    [
+        ("/healthcheck", 200, False),
+        ("/healthcheck?probe=liveness", 200, False),
+        ("/healthcheck", 503, True),
+        ("/static/css/site.css", 200, False),
+        ("/static/public/logo.png", 200, True),
+        ("/static", 200, True),
+        ("/slack/events", 200, True),
+    ],
+)
+def test_access_log_sampler_matches_paths(path: str, status: int, expected_result: bool):
+    """Tests that the access records are kept by exact path and by longest prefix."""
+    sampler = AccessLogSampler(
+        {"/healthcheck": 0.0, "/static/*": 0.0, "/static/public/*": 1.0}, error_rate=1.0
+    )
+
+    assert sampler.filter(access_record(path, status)) == expected_result
+
+
+def test_access_log_sampler_samples_by_rate():
+    """Tests that a path is kept at its rate and the errors at the error rate."""
+    sampler = AccessLogSampler({"/slack/events": 0.01}, error_rate=0.5)
+
+    with patch("src.slack_bot.utils.log_filter.random.random", side_effect=[0.005, 0.5, 0.4]):
+        assert sampler.filter(access_record("/slack/events"))
+        assert not sampler.filter(access_record("/slack/events"))
+        assert sampler.filter(access_record("/slack/events", 500))
+
+
+def test_access_log_sampler_does_not_format_the_records():
+    """Tests that the records are sampled without formatting their message."""
+    sampler = AccessLogSampler({"/metrics": 0.0})
+    record = access_record("/metrics")
+
+    with patch.object(record, "getMessage") as get_message:
+        assert not sampler.filter(record)
+    get_message.assert_not_called()
+
+
+def test_access_log_sampler_keeps_other_records():
+    """Tests that the records without the access arguments are kept."""
+    sampler = AccessLogSampler({"/metrics": 0.0})
+    record = logging.LogRecord("uvicorn.access", logging.INFO, "", 0, "/metrics", None, None)
+
+    assert sampler.filter(record)
+
+
+@pytest.mark.parametrize("path", ["/static*", "*", "/slack/events*"])
+def test_access_log_sampler_rejects_other_wildcards(path: str):
+    """Test that only the "/*" prefix rules are accepted, the other wildcards never match."""
+    with pytest.raises(ValueError):
+        AccessLogSampler({path: 0.0})
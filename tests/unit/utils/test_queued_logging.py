@@ -0,0 +1,107 @@
+"""
+Unit tests for the queued logging.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import logging
+import queue
+import sys
+import threading
+from typing import List, Tuple
+
+from prometheus_client import REGISTRY
+
+from src.slack_bot.utils.queued_logging import BoundedQueueHandler, QueuedLogging
+
+
+class RecordingHandler(logging.Handler):
+    """Handler recording the messages and the threads writing them."""
+
+    def __init__(self):
+        """Initialize the handler with no records."""
+        super().__init__()
+        self.records: List[Tuple[str, int]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Record the message and the thread writing it."""
+        self.records.append((record.getMessage(), threading.get_ident()))
+
+
+def make_record(msg: str, *args) -> logging.LogRecord:
+    """Create a log record of the test logger."""
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+
+def dropped() -> float:
+    """Return the count of dropped log records."""
+    return REGISTRY.get_sample_value("slack_bot_log_records_dropped_total") or 0.0
+
+
+def test_handlers_run_on_the_listener_thread():
+    """Test that the records reach the handlers from another thread, and at stop."""
+    test_logger = logging.getLogger("test_queued_logging")
+    test_logger.propagate = False
+    handler = RecordingHandler()
+    test_logger.addHandler(handler)
+    try:
+        QueuedLogging.start(queue_size=100)
+        assert isinstance(test_logger.handlers[0], BoundedQueueHandler)
+
+        test_logger.warning("hello %s", "world")
+        QueuedLogging.stop()
+
+        assert test_logger.handlers == [handler]
+        [(message, thread)] = handler.records
+        assert message == "hello world"
+        assert thread != threading.get_ident()
+    finally:
+        QueuedLogging.stop()
+        test_logger.removeHandler(handler)
+
+
+def test_full_queue_drops_the_oldest_record():
+    """Test that a full queue keeps the newest records and counts the dropped ones."""
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(2)
+    handler = BoundedQueueHandler(records, "drop_oldest")
+    before = dropped()
+
+    for number in range(3):
+        handler.handle(make_record("record %d", number))
+
+    assert [records.get_nowait().getMessage() for _ in range(2)] == ["record 1", "record 2"]
+    assert dropped() == before + 1
+
+
+def test_full_queue_blocks_until_there_is_room():
+    """Test that the block policy waits for the queue instead of dropping."""
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(1)
+    handler = BoundedQueueHandler(records, "block")
+    handler.handle(make_record("first"))
+
+    writer = threading.Thread(target=handler.handle, args=(make_record("second"),))
+    writer.start()
+    writer.join(0.05)
+    assert writer.is_alive()
+
+    assert records.get().getMessage() == "first"
+    writer.join(1)
+    assert records.get_nowait().getMessage() == "second"
+
+
+def test_prepare_merges_the_message_and_keeps_the_exception_apart():
+    """Test that the queued record has no arguments and a formatted traceback."""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("failed %s", "job")
+        record.exc_info = sys.exc_info()
+
+    prepared = BoundedQueueHandler(queue.Queue()).prepare(record)
+
+    assert prepared.msg == "failed job"
+    assert prepared.args is None
+    assert prepared.exc_info is None
+    assert "ValueError: boom" in prepared.exc_text
+    assert record.args == ("job",)
@@ -0,0 +1,204 @@
+"""
+Unit tests for the in-process tracing.
+
+Author: Patryk Golabek
+Company: Translucent Computing Inc.
+Copyright: 2023 Translucent Computing Inc.
+"""
+import asyncio
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.slack_bot.utils.tracing import (
+    InMemorySpanExporter,
+    JsonlSpanExporter,
+    Span,
+    SpanExporter,
+    Tracer,
+)
+
+
+@pytest.fixture
+def exporter() -> Iterator[InMemorySpanExporter]:
+    """Enable tracing with an in-memory exporter for the test."""
+    exporter = InMemorySpanExporter()
+    Tracer.configure([exporter])
+    yield exporter
+    Tracer.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracer_opens_no_spans():
+    """Test that a disabled tracer runs the code without spans."""
+    assert not Tracer.enabled
+
+    @Tracer.traced("service.answer")
+    async def answer() -> int:
+        assert Tracer.current() is None
+        return 42
+
+    with Tracer.span("route") as span:
+        assert span is None
+        assert await answer() == 42
+    assert Tracer.start_span("slack.chat.postMessage") is None
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_in_one_trace(exporter: InMemorySpanExporter):
+    """Test that the spans opened under a span are its children in its trace."""
+
+    @Tracer.traced("service.get_quote")
+    async def get_quote() -> str:
+        with Tracer.span("redis.EVALSHA", key="quote:1"):
+            return "quote"
+
+    with Tracer.span("route", path="/slack/events") as root:
+        assert Tracer.current() is root
+        assert await get_quote() == "quote"
+    assert Tracer.current() is None
+
+    redis, service, route = exporter.spans()
+    assert [redis.name, service.name, route.name] == ["redis.EVALSHA", "service.get_quote", "route"]
+    assert {span.trace_id for span in (redis, service, route)} == {route.trace_id}
+    assert route.parent_id is None
+    assert service.parent_id == route.span_id
+    assert redis.parent_id == service.span_id
+    assert redis.attributes == {"key": "quote:1"}
+    assert all(span.duration is not None for span in (redis, service, route))
+
+
+def test_failed_span_records_the_exception(exporter: InMemorySpanExporter):
+    """Test that a span ended by an exception records its type and restores the parent."""
+    with Tracer.span("route") as root:
+        with pytest.raises(ValueError):
+            with Tracer.span("redis.FT.SEARCH"):
+                raise ValueError("boom")
+        assert Tracer.current() is root
+
+    failed, route = exporter.spans()
+    assert failed.error == "ValueError"
+    assert route.error is None
+
+
+@pytest.mark.asyncio
+async def test_context_follows_tasks_and_propagated_jobs(exporter: InMemorySpanExporter):
+    """Test that the tasks of a request, and the jobs it queues, carry its span."""
+    jobs: "asyncio.Queue" = asyncio.Queue()
+
+    async def worker():
+        job = await jobs.get()
+        await job()
+
+    async def work():
+        with Tracer.span("listener.good"):
+            pass
+
+    worker_task = asyncio.create_task(worker())
+    with Tracer.span("route") as root:
+        assert root is not None
+        await asyncio.create_task(work())
+        await jobs.put(Tracer.propagate(work))
+    await worker_task
+
+    spans = exporter.spans(root.trace_id)
+    assert [span.name for span in spans] == ["listener.good", "route", "listener.good"]
+    assert spans[2].parent_id == root.span_id
+
+
+def test_jsonl_exporter_appends_one_line_per_span(tmp_path: Path):
+    """Test that the JSONL exporter writes the spans as JSON lines."""
+    path = tmp_path / "traces.jsonl"
+    Tracer.configure([JsonlSpanExporter(str(path))])
+    try:
+        with Tracer.span("route", path="/slack/events"):
+            with Tracer.span("service.handle_event"):
+                pass
+    finally:
+        Tracer.shutdown()
+
+    service, route = [json.loads(line) for line in path.read_text().splitlines()]
+    assert service["name"] == "service.handle_event"
+    assert service["parent_id"] == route["span_id"]
+    assert route["attributes"] == {"path": "/slack/events"}
+
+
+def test_jsonl_exporter_drops_spans_when_its_queue_is_full(tmp_path: Path):
+    """Test that spans are dropped and counted, not waited on, while the writer is busy."""
+    writing, resume = threading.Event(), threading.Event()
+
+    class SlowSpan(Span):
+        """Span holding up the writer thread until the test resumes it."""
+
+        __slots__ = ()
+
+        def to_dict(self) -> Dict[str, Any]:
+            """Block the writer thread, then serialize the span."""
+            writing.set()
+            resume.wait(5)
+            return super().to_dict()
+
+    def dropped() -> float:
+        return REGISTRY.get_sample_value("slack_bot_spans_dropped_total") or 0.0
+
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonlSpanExporter(str(path), queue_size=1)
+    before = dropped()
+    try:
+        exporter.export(SlowSpan("first", None, {}))
+        assert writing.wait(5)
+        exporter.export(Span("second", None, {}))
+        exporter.export(Span("third", None, {}))
+    finally:
+        resume.set()
+        exporter.close()
+
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == [
+        "first",
+        "second",
+    ]
+    assert dropped() == before + 1
+
+
+def test_span_exporter_is_abstract():
+    """Test that an exporter must implement export."""
+    with pytest.raises(TypeError):
+        SpanExporter()  # type: ignore
+
+
+def test_failing_exporter_does_not_fail_the_request(exporter: InMemorySpanExporter):
+    """Test that an exporter error is logged, and the other exporters still get the span."""
+
+    class FailingExporter(SpanExporter):
+        """Exporter failing every span."""
+
+        def export(self, span: Span) -> None:
+            """Fail the span."""
+            raise OSError("disk full")
+
+    Tracer.configure([FailingExporter(), exporter])
+    with Tracer.span("route"):
+        pass
+
+    assert [span.name for span in exporter.spans()] == ["route"]
+
+
+def test_server_timing_sums_the_ended_spans_by_name(exporter: InMemorySpanExporter):
+    """Test the Server-Timing header of a request with repeated steps."""
+    with Tracer.span("route") as root:
+        assert root is not None
+        for _ in range(2):
+            with Tracer.span("redis.FT.SEARCH"):
+                pass
+        with Tracer.span("listener.good/bad"):
+            pass
+        header = Tracer.server_timing(root)
+
+    names = [metric.split(";dur=")[0] for metric in header.split(", ")]
+    assert names == ["route", "redis.FT.SEARCH", "listener.good_bad"]
+    assert all(re.fullmatch(r"[\w.]+;dur=\d+\.\d{3}", metric) for metric in header.split(", "))